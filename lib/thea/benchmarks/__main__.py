@@ -0,0 +1,190 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+Runs the benchmarks from the command line. For example, to record a baseline
+before making a change, and check for regressions afterwards::
+
+    python -m thea.benchmarks --save before
+    python -m thea.benchmarks --compare before
+
+The baseline of the quick scale is kept with the benchmarks, in the
+baselines directory, and compared against with --compare quick. As times
+only compare on the same machine, it is recorded with --save quick on the
+machine used to check for regressions. See baselines/README.
+
+The time taken to import Thea is measured too, and is broken down by module
+with::
+
+    python -m thea.benchmarks --import-report
+
+"""
+import argparse
+import os.path
+import shutil
+import sys
+import tempfile
+
+# Ensures that the package is on the Python path.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+import thea.benchmarks.imports as imports
+import thea.benchmarks.runner as runner
+import thea.benchmarks.suite as suite
+
+
+# The sizes of cube, as numbers of cells, and the numbers of dimensions, run
+# at each scale. The largest cube of the full scale is held in a file of
+# 400 MB. See also suite.MAX_PLOTTED_CELLS.
+SCALES = {'quick': ([10 ** 4, 10 ** 6], [2, 3, 4, 7]),
+          'full': ([10 ** 4, 10 ** 6, 10 ** 7, 10 ** 8], [2, 3, 4, 7])}
+
+
+def parse_args(args):
+    """
+    Reads the command line arguments, returning an argparse.Namespace.
+
+    """
+    names = ['imports'] + [name for name, _ in suite.BENCHMARKS]
+    parser = argparse.ArgumentParser(
+        prog='python -m thea.benchmarks',
+        description='Times Thea on synthetic cubes.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='quick',
+                        help='the sizes of cube to use (default: %(default)s)'
+                        '; full goes up to 1e8 cells')
+    parser.add_argument('--cells', type=int, nargs='+',
+                        help='the numbers of cells to use, instead of those '
+                        'of the scale')
+    parser.add_argument('--ndim', type=int, nargs='+',
+                        help='the numbers of dimensions to use, instead of '
+                        'those of the scale')
+    parser.add_argument('--only', nargs='+', choices=names, metavar='NAME',
+                        help='the benchmarks to run, from: ' +
+                        ', '.join(names))
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='the number of times to run each benchmark '
+                        '(default: %(default)s)')
+    parser.add_argument('--tmpdir', default=None,
+                        help='the directory in which large cubes are written')
+    parser.add_argument('--save', metavar='BASELINE',
+                        help='save the results as a baseline, either a name '
+                        'or a path to a JSON file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='compare the results against a baseline')
+    parser.add_argument('--import-report', action='store_true',
+                        help='only list the modules which take longest to '
+                        'import when starting Thea')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='the slowdown relative to the baseline reported '
+                        'as a regression (default: %(default)s)')
+    return parser.parse_args(args)
+
+
+def report(key, result):
+    print('{:<50} {:>10.4f}s {:>10.4f}s'.format(key, result['min'],
+                                               result['median']))
+    sys.stdout.flush()
+
+
+def main(args=None):
+    """
+    Runs the benchmarks, returning the exit status: 1 if any regressions
+    were found when comparing against a baseline, otherwise 0.
+
+    """
+    args = parse_args(sys.argv[1:] if args is None else args)
+    if args.import_report:
+        for line in imports.format_report(
+                imports.measure_import(imports.MODULES[0])):
+            print(line)
+        return 0
+    all_cells, all_ndims = SCALES[args.scale]
+    all_cells = args.cells or all_cells
+    all_ndims = args.ndim or all_ndims
+    benchmarks = [(name, function) for name, function in suite.BENCHMARKS
+                  if args.only is None or name in args.only]
+    if not benchmarks:
+        # Only the imports were asked for, so no cubes need to be made.
+        all_cells = []
+    # Load the baseline first, so that a bad name fails before the run.
+    baseline = None
+    if args.compare:
+        path = runner.get_baseline_path(args.compare)
+        if not os.path.exists(path):
+            print('There is no baseline at {}. Record one with --save {} '
+                  'first.'.format(path, args.compare))
+            return 2
+        baseline = runner.load_baseline(path)
+
+    print('{:<50} {:>11} {:>11}'.format('benchmark', 'min', 'median'))
+    results = {}
+    if args.only is None or 'imports' in args.only:
+        results.update(imports.run_imports(imports.MODULES, args.repeat,
+                                           report))
+    for num_cells in all_cells:
+        for ndim in all_ndims:
+            directory = tempfile.mkdtemp(dir=args.tmpdir)
+            try:
+                case = suite.Case(num_cells, ndim, directory)
+                results.update(runner.run_case(case, benchmarks, args.repeat,
+                                               report))
+                del case
+            finally:
+                shutil.rmtree(directory)
+
+    if args.save:
+        path = runner.get_baseline_path(args.save)
+        runner.save_baseline(path, results)
+        print('Saved baseline to {}'.format(path))
+
+    if baseline is None:
+        return 0
+    comparisons = runner.compare(results, baseline)
+    print('\n{:<50} {:>11} {:>11} {:>7}'.format('benchmark', 'baseline',
+                                                 'now', 'ratio'))
+    for key, baseline_time, result_time, ratio in comparisons:
+        print('{:<50} {:>10.4f}s {:>10.4f}s {:>7.2f}'.format(
+            key, baseline_time, result_time, ratio))
+    regressions = runner.get_regressions(comparisons, args.threshold)
+    if regressions:
+        print('\n{} benchmarks slowed down by more than {}x:'.format(
+            len(regressions), args.threshold))
+        for key, _, _, ratio in regressions:
+            print('    {} ({:.2f}x)'.format(key, ratio))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
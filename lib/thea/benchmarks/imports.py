@@ -0,0 +1,195 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file measures how long Thea takes to import, which is most of the time
+taken to start it.
+
+Each measurement imports a module in a fresh Python process, with
+__import__ replaced by a version that times the first import of every
+module. This gives a report similar to that of 'python -X importtime' in
+Python 3, showing which modules the time is spent in.
+
+"""
+import json
+import os.path
+import subprocess
+import sys
+
+
+# The modules timed by the benchmarks: the window, which is all that must be
+# imported before it can be shown, and the modules whose import is deferred
+# until a file is opened.
+MODULES = ['thea.main_window', 'thea.cube_logic', 'thea.panel_logic']
+
+# The directory holding the thea package.
+LIB_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+# Run in the fresh process, with the directory to be put on the path and the
+# name of the module to be imported as arguments. It prints a JSON object
+# holding the total time taken, and the inclusive and self times of each
+# module imported.
+SCRIPT = '''
+import json
+import sys
+import time
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+
+sys.path.insert(0, sys.argv[1])
+original_import = builtins.__import__
+modules = {}
+# The time spent in the imports made by each import in progress.
+children = []
+
+
+def timed_import(name, *args, **kwargs):
+    if name in sys.modules:
+        return original_import(name, *args, **kwargs)
+    children.append(0.0)
+    start = time.time()
+    try:
+        return original_import(name, *args, **kwargs)
+    finally:
+        inclusive = time.time() - start
+        own = inclusive - children.pop()
+        if children:
+            children[-1] += inclusive
+        if name not in modules:
+            modules[name] = {'inclusive': inclusive, 'self': own}
+
+builtins.__import__ = timed_import
+start = time.time()
+__import__(sys.argv[2])
+total = time.time() - start
+builtins.__import__ = original_import
+sys.stdout.write(json.dumps({'total': total, 'modules': modules}) + '\\n')
+'''
+
+
+def measure_import(module, python=None):
+    """
+    Imports the module in a fresh Python process, and returns a dictionary
+    holding the total time taken, under 'total', and a dictionary mapping
+    each module imported to the 'inclusive' time taken to import it and
+    everything it imported, and the 'self' time spent in the module itself,
+    under 'modules'.
+
+    Args:
+
+    * module
+        String holding the name of the module to be imported.
+
+    Kwargs:
+
+    * python
+        String holding the path of the Python interpreter, by default the
+        one running this.
+
+    """
+    command = [python or sys.executable, '-c', SCRIPT, LIB_DIR, module]
+    output = subprocess.check_output(command)
+    # Anything printed while importing comes before the result.
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def time_import(module, repeat):
+    """
+    Imports the module the given number of times, each in a fresh process,
+    and returns a dictionary holding the min and median of the times taken,
+    as runner.time_call() does.
+
+    """
+    times = sorted(measure_import(module)['total'] for _ in xrange(repeat))
+    return {'min': times[0],
+            'median': times[len(times) // 2],
+            'repeat': repeat}
+
+
+def get_key(module):
+    """
+    Returns a String identifying the import benchmark of a module.
+
+    """
+    return 'import/{}'.format(module)
+
+
+def run_imports(modules, repeat, report=None):
+    """
+    Times the import of each of the modules, and returns the results, keyed
+    by get_key(), as runner.run_case() does.
+
+    Kwargs:
+
+    * report
+        A function called with the key and result of each benchmark as it
+        finishes.
+
+    """
+    results = {}
+    for module in modules:
+        key = get_key(module)
+        results[key] = time_import(module, repeat)
+        if report is not None:
+            report(key, results[key])
+    return results
+
+
+def format_report(measurement, limit=20):
+    """
+    Returns a list of lines describing the modules which took longest to
+    import, by the time spent in the module itself.
+
+    Args:
+
+    * measurement
+        Dictionary as returned by measure_import().
+
+    Kwargs:
+
+    * limit
+        int holding the greatest number of modules listed.
+
+    """
+    modules = sorted(measurement['modules'].items(),
+                     key=lambda item: item[1]['self'], reverse=True)
+    lines = ['{:>10} {:>10}  {}'.format('self', 'inclusive', 'module')]
+    for name, times in modules[:limit]:
+        lines.append('{:>9.4f}s {:>9.4f}s  {}'.format(
+            times['self'], times['inclusive'], name))
+    lines.append('{:>10} {:>9.4f}s  {}'.format('', measurement['total'],
+                                               'total'))
+    return lines
@@ -0,0 +1,266 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+Replays a session recorded with 'thea --record' against a MainWindow, and
+reports the time taken by each kind of interaction, from changing the
+interface to the new plot being drawn::
+
+    python -m thea.benchmarks.replay session.jsonl --repeat 3
+
+Each repeat replays the session in a fresh window, so the file is loaded
+again in each. The window never asks before an expensive operation, as
+there is no one to answer.
+
+The window is created on Qt's offscreen platform where it is available.
+PySide uses Qt 4, which has no offscreen platform on X11, so there run it
+under a virtual display, such as with xvfb-run.
+
+"""
+import argparse
+import collections
+import json
+import os
+import os.path
+import sys
+import time
+
+# Ensures that the package is on the Python path.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# Must be set before the QApplication is created.
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide import QtGui
+
+import thea.main_window as main_window
+import thea.session as session
+
+
+# The cost limits of the window, above which it would ask the user before an
+# expensive operation. They are never reached. The contour limit, which only
+# downsamples the plot, is left at its default, as for a user.
+NEVER_ASK = {'scan': float('inf'),
+             'table': float('inf'),
+             'load': float('inf')}
+
+def percentile(values, percent):
+    """
+    Returns the given percentile of a list of values, interpolating between
+    the closest ranks.
+
+    """
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * percent / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def set_combo_text(combo_box, text):
+    """
+    Selects the item of the combo box with the given text, if it has one.
+
+    """
+    index = combo_box.findText(text)
+    if index >= 0:
+        combo_box.setCurrentIndex(index)
+
+
+def apply_snapshot(window, snapshot):
+    """
+    Sets the interface of the window to the state held in the snapshot, in
+    the same way as the user would, and starts drawing the plot.
+
+    Args:
+
+    * window
+        The MainWindow.
+
+    * snapshot
+        Dictionary holding the state of the interface, as returned by
+        session.get_snapshot().
+
+    """
+    if not window.cube_loaded or window.filename != snapshot['filename']:
+        window.load_file(snapshot['filename'])
+        window.set_dimension_combos()
+
+    if window.select_cube.currentIndex() != snapshot['cube index']:
+        window.select_cube.setCurrentIndex(snapshot['cube index'])
+        window.set_dimension_combos()
+
+    dim_indices = snapshot['dim indices']
+    if dim_indices['dim 1 index'] >= 0:
+        window.select_dimension_1.setCurrentIndex(dim_indices['dim 1 index'])
+    if dim_indices['dim 2 index'] >= 0:
+        window.select_dimension_2.setCurrentIndex(dim_indices['dim 2 index'])
+    if dim_indices['sliced dim index'] >= 0:
+        window.select_sliced_dim.setCurrentIndex(
+            dim_indices['sliced dim index'])
+        # Refills the slice and collapsed dim boxes for the new dimensions.
+        window.arrange_coords_3()
+        window.select_slice_combo.setCurrentIndex(snapshot['slice index'])
+    for i, index in enumerate(snapshot['collapsed indices'] or []):
+        box = window.findChild(QtGui.QComboBox,
+                               'select_slice_index_' + str(i + 1))
+        box.setCurrentIndex(index)
+
+    set_combo_text(window.select_plot_method, snapshot['plot method'])
+    set_combo_text(window.select_plot_type, snapshot['plot type'])
+    set_combo_text(window.select_projection, snapshot['projection'])
+    set_combo_text(window.select_colormap, snapshot['cmap'])
+    if snapshot['central longitude'] is not None:
+        window.select_central_longitude.setValue(
+            snapshot['central longitude'])
+    window.contour_slider.setValue(snapshot['num contours'])
+    cartographic = snapshot['cartographic']
+    window.action_coastlines.setChecked(cartographic['coastlines'])
+    window.action_country_boundaries.setChecked(cartographic['countries'])
+    window.action_rivers_and_lakes.setChecked(cartographic['rivers'])
+    window.action_gridlines.setChecked(snapshot['gridlines'])
+    window.action_contour_labels.setChecked(snapshot['contour labels'])
+    window.colorbar_dialog.set_colorbar_scheme(snapshot['colorbar scheme'])
+    if snapshot['colorbar scheme'] == 'manual':
+        colorbar_range = snapshot['colorbar range']
+        window.colorbar_dialog.set_max_min(colorbar_range['max'],
+                                           colorbar_range['min'])
+
+    window.set_enabled()
+    window.update()
+
+
+def wait_for_render(app, window, timeout=600):
+    """
+    Processes events until the window has finished drawing its plot.
+
+    """
+    end = time.time() + timeout
+    while (window.render_task is not None or
+           window.render_scheduler.is_pending()):
+        if time.time() > end:
+            raise RuntimeError('The plot was not drawn within {} '
+                               'seconds.'.format(timeout))
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def replay(app, window, snapshots):
+    """
+    Replays the snapshots against the window in turn. Returns a list of
+    (interaction, seconds) tuples, holding the kind of each interaction, as
+    given by session.get_interaction(), and the time from changing the
+    interface to the plot being drawn.
+
+    """
+    latencies = []
+    previous = None
+    for snapshot in snapshots:
+        interaction = session.get_interaction(previous, snapshot)
+        start = time.time()
+        apply_snapshot(window, snapshot)
+        wait_for_render(app, window)
+        latencies.append((interaction, time.time() - start))
+        previous = snapshot
+    return latencies
+
+
+def summarise(latencies):
+    """
+    Returns an OrderedDict mapping each kind of interaction, and 'all', to a
+    dictionary holding the count, p50 and p95 of its latencies in seconds.
+
+    """
+    groups = collections.OrderedDict([('all', [])])
+    for interaction, seconds in latencies:
+        groups['all'].append(seconds)
+        groups.setdefault(interaction, []).append(seconds)
+    summary = collections.OrderedDict()
+    for interaction, values in groups.items():
+        summary[interaction] = {'count': len(values),
+                                'p50': percentile(values, 50),
+                                'p95': percentile(values, 95)}
+    return summary
+
+
+def parse_args(args):
+    """
+    Reads the command line arguments, returning an argparse.Namespace.
+
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m thea.benchmarks.replay',
+        description='Replays a recorded session, and reports the latency of '
+        'each kind of interaction.')
+    parser.add_argument('recording',
+                        help='a session recorded with thea --record')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='the number of times to replay the session '
+                        '(default: %(default)s)')
+    parser.add_argument('--json', metavar='FILE',
+                        help='also write the summary to FILE as JSON')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(sys.argv[1:] if args is None else args)
+    snapshots = session.load_recording(args.recording)
+
+    app = QtGui.QApplication(sys.argv[:1])
+
+    latencies = []
+    for _ in xrange(args.repeat):
+        # Otherwise later repeats would reuse the cubes loaded by the first,
+        # while still being counted as loads.
+        window = main_window.MainWindow(None, limits=NEVER_ASK,
+                                        pick_variables=False)
+        latencies.extend(replay(app, window, snapshots))
+        window.close()
+    summary = summarise(latencies)
+
+    print('{:<12} {:>6} {:>10} {:>10}'.format('interaction', 'count',
+                                               'p50', 'p95'))
+    for interaction, stats in summary.items():
+        print('{:<12} {:>6} {:>9.3f}s {:>9.3f}s'.format(
+            interaction, stats['count'], stats['p50'], stats['p95']))
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(summary, fh, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file times the benchmarks, and saves and compares their results against
+stored baselines.
+
+A set of results is a dictionary mapping the key of each benchmark, as given
+by get_key(), to a dictionary holding the min and median of the times taken
+in seconds, and the number of times it was run.
+
+"""
+import json
+import os.path
+import platform
+import time
+
+
+# Baselines named without a path are stored here, including those of the
+# quick scale kept with the benchmarks.
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'baselines')
+
+
+def get_key(name, num_cells, ndim):
+    """
+    Returns a String identifying a benchmark run at the given size.
+
+    """
+    return '{}/cells={}/ndim={}'.format(name, num_cells, ndim)
+
+
+def time_call(function, repeat):
+    """
+    Calls the function the given number of times, and returns a dictionary
+    holding the min and median of the times taken.
+
+    """
+    times = []
+    for _ in xrange(repeat):
+        start = time.time()
+        function()
+        times.append(time.time() - start)
+    times.sort()
+    return {'min': times[0],
+            'median': times[len(times) // 2],
+            'repeat': repeat}
+
+
+def run_case(case, benchmarks, repeat, report=None):
+    """
+    Runs each of the benchmarks on the case, and returns the results.
+
+    Args:
+
+    * case
+        The suite.Case to be passed to each benchmark. The benchmarks named
+        in its skipped set are not run.
+
+    * benchmarks
+        List of (name, function) tuples holding the benchmarks to be run.
+
+    * repeat
+        int holding the number of times each benchmark is run.
+
+    Kwargs:
+
+    * report
+        A function called with the key and result of each benchmark as it
+        finishes.
+
+    """
+    results = {}
+    for name, function in benchmarks:
+        if name in case.skipped:
+            continue
+        key = get_key(name, case.num_cells, case.ndim)
+        results[key] = time_call(lambda: function(case), repeat)
+        if report is not None:
+            report(key, results[key])
+    return results
+
+
+def get_baseline_path(name):
+    """
+    Returns the path of the baseline with the given name. A name which is not
+    already a path to a JSON file is looked for in BASELINE_DIR.
+
+    """
+    if name.endswith('.json') or os.path.dirname(name):
+        return name
+    return os.path.join(BASELINE_DIR, name + '.json')
+
+
+def save_baseline(path, results):
+    """
+    Writes the results to the given path as JSON, with a description of the
+    machine on which they were measured.
+
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    baseline = {'machine': platform.platform(),
+                'python': platform.python_version(),
+                'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'results': results}
+    with open(path, 'w') as fh:
+        json.dump(baseline, fh, indent=1, sort_keys=True)
+
+
+def load_baseline(path):
+    """
+    Returns the results stored in the baseline at the given path.
+
+    """
+    with open(path) as fh:
+        return json.load(fh)['results']
+
+
+def compare(results, baseline):
+    """
+    Returns a list of (key, baseline_time, time, ratio) tuples for each
+    benchmark found in both the results and the baseline, comparing the
+    minimum times. A ratio above 1 means that the benchmark has slowed down.
+
+    """
+    comparisons = []
+    for key in sorted(set(results) & set(baseline)):
+        baseline_time = baseline[key]['min']
+        result_time = results[key]['min']
+        if baseline_time > 0:
+            ratio = result_time / baseline_time
+        else:
+            ratio = float('inf') if result_time > 0 else 1.0
+        comparisons.append((key, baseline_time, result_time, ratio))
+    return comparisons
+
+
+def get_regressions(comparisons, threshold):
+    """
+    Returns the comparisons, as returned by compare(), in which the benchmark
+    took more than threshold times as long as the baseline.
+
+    """
+    return [comparison for comparison in comparisons
+            if comparison[3] > threshold]
@@ -0,0 +1,189 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file contains the benchmarks themselves. Each benchmark is a function
+taking a Case, and times a single call of the code being measured.
+
+"""
+import matplotlib
+matplotlib.use('Agg')
+
+from PySide import QtCore
+
+import thea.benchmarks.synthetic as synthetic
+import thea.cube_logic as cl
+import thea.gui_logic as gl
+import thea.table_model as table_model
+
+
+# The number of rows and columns of the data table which are read, roughly
+# what fits on the screen at once.
+TABLE_ROWS = 50
+TABLE_COLUMNS = 20
+
+# Slices with more cells than this are not drawn by bench_update, as
+# contouring them takes minutes and several GB of memory.
+MAX_PLOTTED_CELLS = 10 ** 7
+
+
+class Case(object):
+    """
+    A Case holds a synthetic cube, and the state of the interface used to
+    plot it, shared by all of the benchmarks run at one size.
+
+    Longitude and latitude are plotted, the dimension before them is sliced,
+    and the first index is chosen for every other dimension.
+
+    """
+    def __init__(self, num_cells, ndim, directory=None):
+        """
+        Args:
+
+        * num_cells
+            The approximate number of cells in the cube.
+
+        * ndim
+            int holding the number of dimensions of the cube.
+
+        Kwargs:
+
+        * directory
+            String holding a directory in which the data of large cubes is
+            written. See synthetic.make_cube().
+
+        """
+        self.num_cells = num_cells
+        self.ndim = ndim
+        self.cube = synthetic.make_cube(synthetic.get_shape(num_cells, ndim),
+                                        directory)
+        self.dim_names = gl.get_dim_names(self.cube)
+        self.dim_indices = {'dim 1 index': ndim - 1,
+                            'dim 2 index': ndim - 2 if ndim > 1 else -1,
+                            'sliced dim index': ndim - 3 if ndim > 2 else -1}
+        self.collapsed_indices = [0] * max(0, ndim - 3)
+        self.status = self.get_status()
+        self.plot_cube = cl.get_plot_cube(self.status)
+        self.data_max, self.data_min = cl.find_max_min(self.plot_cube)
+        # The names of the benchmarks which are not run at this size.
+        self.skipped = set()
+        if self.plot_cube.data.size > MAX_PLOTTED_CELLS:
+            self.skipped.add('update')
+
+    def get_status(self):
+        """
+        Returns the status of the interface, as built by
+        MainWindow.get_status(), for this case.
+
+        """
+        cartographic = {'coastlines': False,
+                        'countries': False,
+                        'rivers': False}
+        colorbar_range = {'max': None,
+                          'min': None}
+        status = {'cube': self.cube,
+                  'dim indices': self.dim_indices,
+                  'slice index': 0,
+                  'collapsed indices': self.collapsed_indices,
+                  'plot method': "using quickplot",
+                  'plot type': "Filled Contour",
+                  'projection': "Automatic",
+                  'central longitude': 0.0,
+                  'cmap': "Automatic",
+                  'num contours': 25,
+                  'cartographic': cartographic,
+                  'gridlines': False,
+                  'contour labels': False,
+                  'colorbar range': colorbar_range,
+                  'can draw map': self.ndim > 1,
+                  'dim 1 name': self.dim_names[-1],
+                  'dim 2 name': self.dim_names[-2] if self.ndim > 1 else None}
+        return status
+
+
+def bench_update(case):
+    cl.update(case.status, cl.new_figure())
+
+
+def bench_extract_cube(case):
+    cl.extract_cube(case.cube, [0], [0]).data
+
+
+def bench_get_sub_cube(case):
+    cl.get_sub_cube(case.cube, case.dim_indices, case.collapsed_indices).data
+
+
+def bench_set_fixed_colorbar(case):
+    cl.set_fixed_colorbar(case.cube, case.dim_indices,
+                          case.collapsed_indices)
+
+
+def bench_find_max_min(case):
+    cl.find_max_min(case.plot_cube)
+
+
+def bench_get_levels(case):
+    cl.get_levels(case.plot_cube, case.data_max, case.data_min, 25)
+
+
+def bench_get_dim_names(case):
+    gl.get_dim_names(case.cube)
+
+
+def bench_get_coord_values(case):
+    for dim_name in case.dim_names:
+        gl.get_coord_values(case.cube, dim_name, case.dim_names)
+
+
+def bench_table_model(case):
+    # As in MainWindow.show_data(), the whole slice is converted to a list
+    # before the visible cells are read.
+    data = case.plot_cube.data.tolist()
+    rows = len(data)
+    columns = len(data[0]) if case.plot_cube.ndim > 1 else 1
+    model = table_model.TableModel(data, range(columns), range(rows))
+    for row in xrange(min(rows, TABLE_ROWS)):
+        for column in xrange(min(columns, TABLE_COLUMNS)):
+            model.data(model.index(row, column), QtCore.Qt.DisplayRole)
+
+
+# The benchmarks in the order in which they are run, with their names.
+BENCHMARKS = [('get_dim_names', bench_get_dim_names),
+              ('get_coord_values', bench_get_coord_values),
+              ('extract_cube', bench_extract_cube),
+              ('get_sub_cube', bench_get_sub_cube),
+              ('find_max_min', bench_find_max_min),
+              ('get_levels', bench_get_levels),
+              ('set_fixed_colorbar', bench_set_fixed_colorbar),
+              ('table_model', bench_table_model),
+              ('update', bench_update)]
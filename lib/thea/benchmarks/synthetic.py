@@ -0,0 +1,166 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file generates synthetic cubes of any size and number of dimensions for
+the benchmarks.
+
+"""
+import os.path
+
+import iris
+import iris.coord_systems
+import iris.coords
+import iris.cube
+import numpy as np
+
+
+# The names of the dimension coordinates, in the order in which they are
+# used. The last two dimensions are always latitude and longitude, so that
+# every cube can be drawn as a map.
+DIM_NAMES = ['realization', 'forecast_period', 'model_level_number',
+             'height', 'time', 'air_pressure', 'latitude', 'longitude']
+
+# Cubes with more cells than this hold their data in a file, as they may not
+# fit in memory.
+MAX_IN_MEMORY_CELLS = 10 ** 7
+
+
+def get_shape(num_cells, ndim):
+    """
+    Returns a tuple of ints holding the shape of a cube with approximately
+    the given number of cells, shared as evenly as possible between the
+    dimensions.
+
+    Args:
+
+    * num_cells
+        The number of cells wanted.
+
+    * ndim
+        int holding the number of dimensions, from 1 to 8.
+
+    """
+    if not 1 <= ndim <= len(DIM_NAMES):
+        raise ValueError('Synthetic cubes can have between 1 and {} '
+                         'dimensions.'.format(len(DIM_NAMES)))
+    size = max(2, int(round(num_cells ** (1.0 / ndim))))
+    shape = [size] * (ndim - 1)
+    last = max(2, int(round(float(num_cells) / np.prod(shape))))
+    return tuple(shape + [last])
+
+
+def get_coord(name, size):
+    """
+    Returns a DimCoord with the given name and number of points.
+
+    """
+    if name == 'latitude':
+        points = np.linspace(-90, 90, size)
+        return iris.coords.DimCoord(points, standard_name=name,
+                                    units='degrees',
+                                    coord_system=iris.coord_systems.GeogCS(
+                                        6371229.0))
+    elif name == 'longitude':
+        points = np.linspace(0, 360, size, endpoint=False)
+        return iris.coords.DimCoord(points, standard_name=name,
+                                    units='degrees',
+                                    coord_system=iris.coord_systems.GeogCS(
+                                        6371229.0))
+    elif name == 'time':
+        points = np.arange(size, dtype=np.float64) * 6
+        return iris.coords.DimCoord(points, standard_name=name,
+                                    units='hours since 1970-01-01 00:00:00')
+    elif name == 'air_pressure':
+        points = np.linspace(1000, 10, size)
+        return iris.coords.DimCoord(points, standard_name=name, units='hPa')
+    elif name == 'height':
+        points = np.arange(size, dtype=np.float64) * 10
+        return iris.coords.DimCoord(points, standard_name=name, units='m')
+    elif name == 'forecast_period':
+        points = np.arange(size, dtype=np.float64)
+        return iris.coords.DimCoord(points, standard_name=name, units='hours')
+    else:
+        points = np.arange(size, dtype=np.int32)
+        return iris.coords.DimCoord(points, standard_name=name, units='1')
+
+
+def fill_data(data):
+    """
+    Fills the given array with a cheap, varied pattern, one index of the first
+    dimension at a time, so that a file backed array is never held in memory
+    all at once.
+
+    """
+    inner = data[0].size
+    pattern = (np.arange(inner, dtype=np.float32) % 251).reshape(
+        data.shape[1:])
+    for i in xrange(data.shape[0]):
+        data[i] = pattern + i
+
+
+def make_cube(shape, directory=None):
+    """
+    Returns a cube of float32 data with the given shape, described by the last
+    len(shape) entries of DIM_NAMES.
+
+    Args:
+
+    * shape
+        Tuple of ints holding the shape of the cube.
+
+    Kwargs:
+
+    * directory
+        String holding a directory in which the data of large cubes is
+        written. Must be given for cubes of more than MAX_IN_MEMORY_CELLS
+        cells, and should be removed once the cube is no longer needed.
+
+    """
+    num_cells = int(np.prod(shape))
+    if num_cells > MAX_IN_MEMORY_CELLS:
+        if directory is None:
+            raise ValueError('A directory is required for cubes of more '
+                             'than {} cells.'.format(MAX_IN_MEMORY_CELLS))
+        filename = os.path.join(directory, 'cube_{}.dat'.format(
+            'x'.join(str(size) for size in shape)))
+        data = np.memmap(filename, dtype=np.float32, mode='w+', shape=shape)
+    else:
+        data = np.empty(shape, dtype=np.float32)
+    fill_data(data)
+
+    cube = iris.cube.Cube(data, standard_name='air_temperature', units='K')
+    names = DIM_NAMES[-len(shape):]
+    for dim, (name, size) in enumerate(zip(names, shape)):
+        cube.add_dim_coord(get_coord(name, size), dim)
+    return cube
@@ -0,0 +1,366 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file reads slices of compressed, chunked NetCDF4 variables with the
+chunks decompressed in parallel.
+
+Read through iris, each chunk overlapping a slice is decompressed in turn on
+a single core, which dominates the time taken to read a slice of compressed
+high resolution output. A ChunkReader instead reads the compressed bytes of
+each chunk with h5py, and hands them to a pool of threads which undo the
+shuffle and deflate filters and copy the part of the chunk in the slice into
+one preallocated array. zlib releases the GIL while it decompresses, so the
+threads run at the same time.
+
+h5py is optional. Without it, or for variables stored with any other filter
+or with a valid range, slices are read by iris as before.
+
+"""
+import itertools
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import zlib
+
+import numpy as np
+
+try:
+    import h5py
+except ImportError:
+    # Without h5py, slices are read by iris, one chunk at a time.
+    h5py = None
+
+
+# The first bytes of an HDF5 file, and so of a NetCDF4 file.
+HDF5_SIGNATURE = b'\x89HDF\r\n\x1a\n'
+
+# The HDF5 filters that can be undone.
+DEFLATE = 1
+SHUFFLE = 2
+
+# Attributes which iris would use to mask values outside a valid range,
+# which are left to iris.
+VALID_RANGE_ATTRIBUTES = ['valid_min', 'valid_max', 'valid_range']
+
+# The number of threads decompressing chunks.
+WORKERS = multiprocessing.cpu_count()
+
+# The pool of threads, once get_pool() has been called.
+_pool = None
+
+
+def get_pool():
+    """
+    Returns the pool of threads which decompress chunks, starting it the
+    first time.
+
+    """
+    global _pool
+    if _pool is None:
+        _pool = ThreadPool(WORKERS)
+    return _pool
+
+
+def is_hdf5_file(filename):
+    """
+    Returns whether the file is an HDF5 file, such as a NetCDF4 file.
+
+    """
+    try:
+        with open(filename, 'rb') as fh:
+            return fh.read(len(HDF5_SIGNATURE)) == HDF5_SIGNATURE
+    except IOError:
+        return False
+
+
+def unshuffle(data, itemsize):
+    """
+    Returns the bytes of a chunk with the HDF5 shuffle filter undone. The
+    filter stores the first byte of every item, then the second, and so on.
+
+    """
+    count = len(data) // itemsize
+    if itemsize == 1 or count == 0:
+        return data
+    shuffled = np.frombuffer(data, dtype=np.uint8, count=count * itemsize)
+    return (shuffled.reshape(itemsize, count).T.tostring() +
+            data[count * itemsize:])
+
+
+def decode_chunk(data, filter_mask, filters, itemsize):
+    """
+    Returns the bytes of a chunk with its filters undone, in the reverse of
+    the order in which they were applied.
+
+    Args:
+
+    * data
+        The bytes of the chunk as stored.
+
+    * filter_mask
+        int with a bit set for each filter that was skipped for the chunk.
+
+    * filters
+        List of the ids of the filters of the variable, each one of DEFLATE
+        or SHUFFLE.
+
+    * itemsize
+        int holding the number of bytes in each value.
+
+    """
+    for position in reversed(xrange(len(filters))):
+        if filter_mask & (1 << position):
+            continue
+        if filters[position] == DEFLATE:
+            data = zlib.decompress(data)
+        else:
+            data = unshuffle(data, itemsize)
+    return data
+
+
+def get_ranges(keys, shape):
+    """
+    Returns a list of the (start, stop) of the slice along each dimension,
+    given keys holding an index or slice(None) for each dimension, or None if
+    any other key is given.
+
+    """
+    ranges = []
+    for key, length in zip(keys, shape):
+        if isinstance(key, slice):
+            if key != slice(None):
+                return None
+            ranges.append((0, length))
+        else:
+            index = int(key) % length
+            ranges.append((index, index + 1))
+    return ranges
+
+
+def get_chunk_origins(ranges, chunks):
+    """
+    Returns a list of the origins of the chunks overlapping the given
+    ranges.
+
+    """
+    return list(itertools.product(*[xrange(start // size * size, stop, size)
+                                    for (start, stop), size
+                                    in zip(ranges, chunks)]))
+
+
+def get_overlap(ranges, origin, chunks):
+    """
+    Returns a tuple holding the slices of the output array and of a chunk
+    which cover the part of the chunk within the ranges.
+
+    """
+    out_keys = []
+    chunk_keys = []
+    for (start, stop), chunk_start, size in zip(ranges, origin, chunks):
+        low = max(start, chunk_start)
+        high = min(stop, chunk_start + size)
+        out_keys.append(slice(low - start, high - start))
+        chunk_keys.append(slice(low - chunk_start, high - chunk_start))
+    return tuple(out_keys), tuple(chunk_keys)
+
+
+def get_filters(dataset):
+    """
+    Returns a list of the ids of the filters of an h5py dataset, or None if
+    any of them can not be undone.
+
+    """
+    plist = dataset.id.get_create_plist()
+    filters = [plist.get_filter(index)[0]
+               for index in xrange(plist.get_nfilters())]
+    if any(filter_id not in (DEFLATE, SHUFFLE) for filter_id in filters):
+        return None
+    return filters
+
+
+def get_attribute(dataset, name):
+    """
+    Returns the value of an attribute of an h5py dataset as a numpy scalar,
+    or None if it does not have it.
+
+    """
+    if name not in dataset.attrs:
+        return None
+    return np.asarray(dataset.attrs[name]).reshape(-1)[0]
+
+
+def get_chunk_readers(filename, cubes):
+    """
+    Returns a dictionary mapping the index of each cube loaded from a NetCDF4
+    file which can be read by a ChunkReader to its reader. These are the
+    cubes of variables that are chunked and compressed with deflate, and
+    optionally shuffle.
+
+    """
+    if (h5py is None or
+            not hasattr(h5py.h5d.DatasetID, 'read_direct_chunk') or
+            not is_hdf5_file(filename)):
+        return {}
+    readers = {}
+    with h5py.File(filename, 'r') as nc_file:
+        for cube_index, cube in enumerate(cubes):
+            if cube is None:
+                continue
+            dataset = nc_file.get(cube.var_name or '')
+            if (not isinstance(dataset, h5py.Dataset) or
+                    dataset.shape != cube.shape or dataset.chunks is None or
+                    dataset.dtype.kind not in 'fiu'):
+                continue
+            filters = get_filters(dataset)
+            if filters is None or DEFLATE not in filters:
+                continue
+            if any(name in dataset.attrs for name in VALID_RANGE_ATTRIBUTES):
+                continue
+            attributes = dict((name, get_attribute(dataset, name))
+                              for name in ['_FillValue', 'missing_value',
+                                           'scale_factor', 'add_offset'])
+            readers[cube_index] = ChunkReader(
+                filename, cube.var_name, dataset.shape, dataset.chunks,
+                dataset.dtype, filters, attributes)
+    return readers
+
+
+class ChunkReader(object):
+    """
+    Reads slices of one compressed, chunked variable of a NetCDF4 file, with
+    the chunks decompressed in parallel.
+
+    """
+    def __init__(self, filename, var_name, shape, chunks, dtype, filters,
+                 attributes):
+        """
+        Args:
+
+        * filename
+            String holding the path of the NetCDF4 file.
+
+        * var_name
+            String holding the name of the variable.
+
+        * shape, chunks, dtype
+            The shape, the shape of each chunk and the numpy dtype of the
+            variable.
+
+        * filters
+            List of the ids of its filters. See get_filters().
+
+        * attributes
+            Dictionary holding the _FillValue, missing_value, scale_factor
+            and add_offset of the variable, each None if not given.
+
+        """
+        self.filename = filename
+        self.var_name = var_name
+        self.shape = shape
+        self.chunks = chunks
+        self.dtype = np.dtype(dtype)
+        self.filters = filters
+        self.attributes = attributes
+
+    def read(self, keys):
+        """
+        Returns the data of the slice given by keys, masked and scaled as
+        iris would, or None if it can not be read by the reader.
+
+        Args:
+
+        * keys
+            Tuple holding an index or slice(None) for each dimension.
+
+        """
+        ranges = get_ranges(keys, self.shape)
+        if ranges is None:
+            return None
+        out = np.empty([stop - start for start, stop in ranges],
+                       dtype=self.dtype)
+        pool = get_pool()
+        results = []
+        # HDF5 can only be used from one thread at a time, so the chunks
+        # are read here and only decompressed in the pool.
+        with h5py.File(self.filename, 'r') as nc_file:
+            dataset = nc_file[self.var_name]
+            for origin in get_chunk_origins(ranges, self.chunks):
+                try:
+                    filter_mask, data = dataset.id.read_direct_chunk(origin)
+                except (KeyError, ValueError, RuntimeError, IOError, OSError):
+                    # A chunk that has never been written.
+                    filter_mask, data = 0, None
+                results.append(pool.apply_async(
+                    self.place_chunk, (out, ranges, origin, filter_mask,
+                                       data, dataset.fillvalue)))
+        for result in results:
+            result.get()
+        shape = [stop - start for (start, stop), key in zip(ranges, keys)
+                 if isinstance(key, slice)]
+        return self.mask_and_scale(out.reshape(shape))
+
+    def place_chunk(self, out, ranges, origin, filter_mask, data, fill):
+        """
+        Decompresses a chunk and copies the part of it within the ranges into
+        the output array. Run in the pool of threads.
+
+        """
+        out_keys, chunk_keys = get_overlap(ranges, origin, self.chunks)
+        if data is None:
+            out[out_keys] = fill
+            return
+        data = decode_chunk(data, filter_mask, self.filters,
+                            self.dtype.itemsize)
+        chunk = np.frombuffer(data, dtype=self.dtype).reshape(self.chunks)
+        out[out_keys] = chunk[chunk_keys]
+
+    def mask_and_scale(self, data):
+        """
+        Masks the missing values of the data, and applies its scale factor
+        and offset, in the same way as the netCDF4 module does for iris.
+
+        """
+        mask = np.zeros(data.shape, dtype=np.bool_)
+        for name in ['_FillValue', 'missing_value']:
+            value = self.attributes[name]
+            if value is not None:
+                mask |= data == value
+        if mask.any():
+            data = np.ma.masked_array(data, mask=mask)
+        scale_factor = self.attributes['scale_factor']
+        add_offset = self.attributes['add_offset']
+        if scale_factor is not None:
+            data = data * scale_factor
+        if add_offset is not None:
+            data = data + add_offset
+        return data
@@ -121,10 +121,23 @@ class ColorbarOptions(QtGui.QDialog, Ui_ColorbarDialog):
         if self.autoselect_range.isChecked():
             return "auto"
         elif self.fixed_colorbar.isChecked():
+            if self.approximate_colorbar.isChecked():
+                return "approximate"
             return "fixed"
         else:
             return "manual"
 
+    def set_colorbar_scheme(self, scheme):
+        """
+        Selects the method of obtaining the range, as returned by
+        get_colorbar_scheme().
+
+        """
+        self.autoselect_range.setChecked(scheme == "auto")
+        self.fixed_colorbar.setChecked(scheme in ("fixed", "approximate"))
+        self.approximate_colorbar.setChecked(scheme == "approximate")
+        self.manual_range.setChecked(scheme == "manual")
+
     def set_max_min(self, colorbar_max, colorbar_min):
         """
         Allows for the remote setting of the value of the colorbar.
@@ -0,0 +1,184 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file contains functions which estimate the cost of the expensive
+operations from the schema of a cube, before any data is read, so that the
+user can be warned before starting something that would take a long time.
+
+Each estimate is a dictionary holding the name of the operation, the number
+of cells involved and the number of bytes to be read or held. check() compares
+it against the limits, which the user can change on the command line.
+
+"""
+import math
+import os.path
+
+import thea.memory as memory
+
+
+# The default limits. 'scan' is the bytes read to fix the colorbar, 'table'
+# the cells put in the table of data, 'contour' the cells contoured at full
+# resolution and 'load' the size of a file opened.
+DEFAULT_LIMITS = {'scan': 1024 ** 3,
+                  'table': 10 ** 6,
+                  'contour': 4 * 10 ** 6,
+                  'load': 20 * 1024 ** 3}
+
+# The limits which are numbers of bytes, and so can be given as sizes such as
+# '2G'. The others are numbers of cells.
+BYTE_LIMITS = ['scan', 'load']
+
+
+def parse_limit(text):
+    """
+    Reads a limit given on the command line as NAME=VALUE, such as 'scan=2G'
+    or 'contour=1e7', returning a (name, value) tuple.
+
+    """
+    name, _, value = text.partition('=')
+    if name not in DEFAULT_LIMITS or not value:
+        raise ValueError('Limits are given as NAME=VALUE, where NAME is one '
+                         'of {}.'.format(', '.join(sorted(DEFAULT_LIMITS))))
+    if name in BYTE_LIMITS:
+        return name, memory.parse_size(value)
+    return name, int(float(value))
+
+
+def get_plotted_cells(schema, dim_indices):
+    """
+    Returns the number of cells in the 1D or 2D slice plotted for the given
+    dimensions.
+
+    """
+    cells = schema.shape[dim_indices['dim 1 index']]
+    if schema.ndim > 1 and dim_indices['dim 2 index'] >= 0:
+        cells *= schema.shape[dim_indices['dim 2 index']]
+    return cells
+
+
+def estimate_fixed_colorbar(schema, dim_indices):
+    """
+    Returns the cost of cube_logic.set_fixed_colorbar(), which reads every
+    slice along the sliced dimension.
+
+    """
+    cells = get_plotted_cells(schema, dim_indices)
+    if schema.ndim > 2:
+        cells *= schema.shape[dim_indices['sliced dim index']]
+    return {'operation': 'scan',
+            'description': 'Fixing the colorbar',
+            'cells': cells,
+            'nbytes': cells * schema.itemsize}
+
+
+def estimate_table(shape):
+    """
+    Returns the cost of filling the table of data with a slice of the given
+    shape.
+
+    """
+    cells = 1
+    for size in shape:
+        cells *= size
+    return {'operation': 'table',
+            'description': 'Showing the data',
+            'cells': cells,
+            'nbytes': memory.get_table_nbytes(shape)}
+
+
+def estimate_contour(schema, dim_indices, plot_type, num_contours):
+    """
+    Returns the cost of drawing the plotted slice. Only contouring is costed,
+    as the other plots are drawn quickly however large the slice.
+
+    """
+    cells = 0
+    if schema.ndim > 1 and plot_type in ("Contour", "Filled Contour"):
+        cells = get_plotted_cells(schema, dim_indices)
+    return {'operation': 'contour',
+            'description': 'Contouring',
+            'cells': cells,
+            'nbytes': cells * schema.itemsize,
+            'contours': num_contours}
+
+
+def estimate_load(filename):
+    """
+    Returns the cost of opening a file.
+
+    """
+    try:
+        nbytes = os.path.getsize(filename)
+    except OSError:
+        nbytes = 0
+    return {'operation': 'load',
+            'description': 'Loading the file',
+            'cells': None,
+            'nbytes': nbytes}
+
+
+def is_over_limit(estimate, limits):
+    """
+    Returns whether the estimated cost is over the limit for its operation.
+
+    """
+    operation = estimate['operation']
+    if operation in BYTE_LIMITS:
+        return estimate['nbytes'] > limits[operation]
+    return estimate['cells'] > limits[operation]
+
+
+def get_downsample_points(estimate, limits):
+    """
+    Returns the greatest number of points along each dimension of a 2D slice
+    that keeps the number of cells contoured within the limit. See
+    cube_logic.get_preview_cube().
+
+    """
+    return max(2, int(math.sqrt(limits[estimate['operation']])))
+
+
+def describe(estimate):
+    """
+    Returns a sentence describing the estimated cost, to be shown to the user.
+
+    """
+    parts = []
+    if estimate['cells'] is not None:
+        parts.append('{:,} cells'.format(estimate['cells']))
+    parts.append(memory.format_size(estimate['nbytes']))
+    if estimate.get('contours'):
+        parts.append('{} contours'.format(estimate['contours']))
+    return '{} will involve {}.'.format(estimate['description'],
+                                        ' and '.join(parts))
@@ -37,16 +37,22 @@ the cube, get information from the cube and make a plot object from the cube
 a set of options.
 
 """
+import hashlib
+
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-import iris.quickplot as qplt
-import matplotlib.pyplot as plt
+import iris.plot as iplt
+import iris.util
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import numpy as np
 
+import thea.features as features
 from thea.gui_logic import get_dim_names
+import thea.pyramid as pyramid
+from thea.timing import span
 
 
-def update(status):
+def update(status, fig):
     """
     Called whenever the update button is pressed.
 
@@ -54,12 +60,19 @@ def update(status):
     returns the sub_cube that has been plotted, and whether or not the set
     global method has been used.
 
+    The work is split between get_plot_cube(), which extracts the sub-cube,
+    and plot_cube(), which plots it. These can also be called separately, so
+    that the extraction can be done away from the GUI thread.
+
     Args:
 
     * status
         A dictionary representing the complete current state of the interface,
         including the current cube, dimensions to be plotted etc.
 
+    * fig
+        The matplotlib.figure.Figure to draw the plot on. See new_figure().
+
     Returns:
 
     * sub_cube
@@ -71,8 +84,94 @@ def update(status):
         sensible. This variable holds if this method was required.
 
     """
-    # We begin by unpacking the elements of the dictionary that are needed.
+    sub_cube = get_plot_cube(status)
+    set_global = plot_cube(sub_cube, status, fig)
+
+    return sub_cube, set_global
+
+
+def get_plot_cube(status):
+    """
+    Extracts the 1D or 2D sub-cube that will be plotted for the given status
+    of the interface.
+
+    Args:
+
+    * status
+        A dictionary representing the complete current state of the interface.
+        See update().
+
+    Returns:
+
+    * sub_cube
+        The reduced cube that is ready to be plotted.
+
+    """
     cube = status['cube']
+    dim_indices = status['dim indices']
+    slice_index = status['slice index']
+    collapsed_indices = status['collapsed indices']
+    preview = status.get('preview', False)
+    max_points = status.get('max points')
+    slice_reader = status.get('slice reader')
+
+    if cube.ndim <= 2:
+        # For 1D and 2D cubes, no extraction is required.
+        sub_cube = cube
+
+    else:
+        # The cube has at least 3 dimensions.
+        # We therefore need to extract a sub-cube to plot.
+        with span('extract'):
+            sub_cube = get_sub_cube(cube, dim_indices, collapsed_indices)
+            new_index = get_correct_index(dim_indices)
+            sub_cube = extract_cube(sub_cube, [new_index], [slice_index])
+        if slice_reader is not None:
+            keys = get_slice_keys(cube.ndim, dim_indices, slice_index,
+                                  collapsed_indices)
+            with span('read slice'):
+                data = slice_reader.read(keys)
+            if data is not None:
+                # The lazy data of the slice is never read.
+                sub_cube.data = data
+
+    if preview and sub_cube.ndim == 2:
+        # A quick, coarse plot is drawn while the user is still moving
+        # through the slices.
+        sub_cube = get_preview_cube(sub_cube)
+    elif max_points is not None and sub_cube.ndim == 2:
+        # The slice is too large to be contoured at full resolution.
+        sub_cube = get_preview_cube(sub_cube, max_points)
+
+    return sub_cube
+
+
+def plot_cube(sub_cube, status, fig):
+    """
+    Plots a sub-cube, as returned by get_plot_cube(), onto the given figure
+    using the options in the given status of the interface.
+
+    Args:
+
+    * sub_cube
+        The 1D or 2D cube to be plotted.
+
+    * status
+        A dictionary representing the complete current state of the interface.
+        See update().
+
+    * fig
+        The matplotlib.figure.Figure to draw the plot on. It is expected to
+        be empty.
+
+    Returns:
+
+    * set_global
+        Boolean representing whether or not set_global was called. See
+        check_extent().
+
+    """
+    # We begin by unpacking the elements of the dictionary that are needed.
     plot_method = status['plot method']
     plot_type = status['plot type']
     projection = status['projection']
@@ -83,46 +182,58 @@ def update(status):
     gridlines = status['gridlines']
     contour_labels = status['contour labels']
     colorbar_range = status['colorbar range']
-    dim_indices = status['dim indices']
-    slice_index = status['slice index']
-    collapsed_indices = status['collapsed indices']
     can_draw_map = status['can draw map']
     axis_labels = (status['dim 1 name'], status['dim 2 name'])
+    schema = status.get('schema')
+    dim_names = None if schema is None else schema.dim_names
 
-    if cube.ndim == 1:
-        # For a 1D cube, no extraction is needed.
-        sub_cube = cube
-        plot_1d(sub_cube, plot_method, gridlines)
+    if sub_cube.ndim == 1:
+        ax = plot_1d(fig, sub_cube, plot_method, gridlines)
 
     else:
-        if cube.ndim == 2:
-            # If the cube is 2D, no extraction is required.
-            sub_cube = cube
+        ax = plot_2d(fig, sub_cube, plot_method, plot_type, projection,
+                     central_longitude, cmap, num_contours, cartographic,
+                     gridlines, contour_labels, colorbar_range, axis_labels,
+                     can_draw_map, dim_names=dim_names)
 
-        else:
-            # The cube has at least 3 dimensions.
-            # We therefore need to extract a sub-cube to plot.
-            sub_cube = get_sub_cube(cube, dim_indices, collapsed_indices)
-            new_index = get_correct_index(dim_indices)
-            sub_cube = extract_cube(sub_cube, [new_index], [slice_index])
+    with span('check extent'):
+        set_global = check_extent(ax, plot_method, can_draw_map)
 
-        # The 2D cube can now be plotted.
-        plot_2d(sub_cube, plot_method, plot_type, projection,
-                central_longitude, cmap, num_contours, cartographic, gridlines,
-                contour_labels, colorbar_range, axis_labels)
+    return set_global
 
-    set_global = check_extent(plot_method, can_draw_map)
 
-    return sub_cube, set_global
+def new_figure(figsize=None, dpi=None):
+    """
+    Returns a new matplotlib.figure.Figure with an Agg canvas attached, for
+    rendering without the GUI. Unlike pyplot.figure(), the figure is not
+    registered with pyplot, so any number can be drawn at once in separate
+    threads or processes.
 
+    Kwargs:
+
+    * figsize
+        Tuple holding the width and height of the figure in inches.
+
+    * dpi
+        The resolution of the figure in dots per inch.
 
-def plot_1d(cube, plot_method, gridlines):
     """
-    Produces a plot object for 1D cubes using the quickplot.plot() method or
-    the matplotlib.pyplot.plot() method.
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def plot_1d(fig, cube, plot_method, gridlines):
+    """
+    Produces a plot of a 1D cube, either using iris.plot.plot() and labelling
+    it in the manner of quickplot, or plotting the data array with
+    Axes.plot().
 
     Args:
 
+    * fig
+        The matplotlib.figure.Figure to draw the plot on.
+
     * cube
         The 1D cube to be plotted.
 
@@ -133,23 +244,38 @@ def plot_1d(cube, plot_method, gridlines):
     * gridlines
         Boolean holding whether or not gridlines are desired.
 
+    Returns:
+
+    * ax
+        The axes that the plot was drawn on.
+
     """
-    if plot_method == "from data array":
-        plt.plot(cube.data)
-    else:
-        qplt.plot(cube)
+    ax = fig.add_subplot(1, 1, 1)
+    with span('plot'):
+        if plot_method == "from data array":
+            ax.plot(cube.data)
+        else:
+            iplt.plot(cube, axes=ax)
+            ax.set_title(get_title(cube, False))
+            ax.set_xlabel(get_title(get_plot_coord(cube, 0), True))
+            ax.set_ylabel(get_title(cube, True))
 
-    plt.gca().grid(gridlines)
+    ax.grid(gridlines)
+    return ax
 
 
-def plot_2d(cube, plot_method, plot_type, projection, central_longitude, cmap,
-            num_contours, cartographic, gridlines, contour_labels,
-            colorbar_range, axes_labels):
+def plot_2d(fig, cube, plot_method, plot_type, projection, central_longitude,
+            cmap, num_contours, cartographic, gridlines, contour_labels,
+            colorbar_range, axes_labels, can_draw_map, dim_names=None,
+            colorbar=True):
     """
     Manages the plotting of 2D cubes
 
     Args:
 
+    * fig
+        The matplotlib.figure.Figure to draw the plot on.
+
     * cube
         The 2D cube to be plotted.
 
@@ -194,29 +320,58 @@ def plot_2d(cube, plot_method, plot_type, projection, central_longitude, cmap,
     * axes_labels
         list holding the names of the x and y coordinates.
 
+    * can_draw_map
+        Boolean representing whether or not the plot is lat/long.
+
+    Kwargs:
+
+    * dim_names
+        The dimension names of the full cube, as held by its
+        gui_logic.CubeSchema. See sort_axis_labels().
+
+    * colorbar
+        Boolean holding whether a colorbar should be added. Panels that
+        share a single colorbar are drawn without one.
+
+    Returns:
+
+    * ax
+        The axes that the plot was drawn on.
+
     """
     if plot_method == "from data array":
-        set_plot_data(cube, plot_type, cmap, num_contours, contour_labels,
-                      colorbar_range, gridlines, axes_labels)
+        ax = fig.add_subplot(1, 1, 1)
+        set_plot_data(ax, cube, plot_type, cmap, num_contours, contour_labels,
+                      colorbar_range, gridlines, axes_labels,
+                      dim_names=dim_names, colorbar=colorbar)
 
     else:
-        set_projection(projection, central_longitude)
-        set_plot(cube, plot_type, cmap, num_contours, contour_labels,
-                 colorbar_range)
-        try:
-            set_cartographic(cartographic)
-        except AttributeError:
-            pass
-        set_gridlines(gridlines)
+        ax = set_projection(fig, cube, projection, central_longitude,
+                            can_draw_map)
+        set_plot(ax, cube, plot_type, cmap, num_contours, contour_labels,
+                 colorbar_range, colorbar=colorbar)
+        with span('cartographic'):
+            try:
+                set_cartographic(ax, cartographic)
+            except AttributeError:
+                pass
+        with span('gridlines'):
+            set_gridlines(ax, gridlines)
+
+    return ax
 
 
-def set_plot(cube, plot_type, cmap, num_contours, contour_labels,
-             colorbar_range):
+def set_plot(ax, cube, plot_type, cmap, num_contours, contour_labels,
+             colorbar_range, colorbar=True):
     """
-    Produces a plot object for the desired cube using quickplot.
+    Produces a plot object for the desired cube using iris.plot, and labels
+    it in the same way as quickplot.
 
     Args:
 
+    * ax
+        The axes to draw the plot on.
+
     * cube
         The cube to be plotted.
 
@@ -239,34 +394,126 @@ def set_plot(cube, plot_type, cmap, num_contours, contour_labels,
         Dictionary containing ints representing the max and min to
         which the colorbar will be set.
 
+    Kwargs:
+
+    * colorbar
+        Boolean holding whether a colorbar should be added.
+
     """
     # We unpack the colorbar_range dictionary
     colorbar_max = colorbar_range['max']
     colorbar_min = colorbar_range['min']
     # We obtain the levels used to define the contours.
-    levels = get_levels(cube, colorbar_max, colorbar_min, num_contours)
-
-    if plot_type == "Filled Contour":
-        qplt.contourf(cube, num_contours, cmap=get_colormap(cmap),
-                      levels=levels, vmax=colorbar_max, vmin=colorbar_min)
-    elif plot_type == "Contour":
-        contours = qplt.contour(cube, num_contours, cmap=get_colormap(cmap),
-                                levels=levels, vmax=colorbar_max,
-                                vmin=colorbar_min)
-        if contour_labels:
-            plt.clabel(contours, inline=1, fontsize=8)
-    else:
-        qplt.pcolormesh(cube, cmap=get_colormap(cmap), vmax=colorbar_max,
-                        vmin=colorbar_min)
+    with span('stats'):
+        levels = get_levels(cube, colorbar_max, colorbar_min, num_contours)
+
+    with span('plot'):
+        if plot_type == "Filled Contour":
+            result = iplt.contourf(cube, num_contours,
+                                   cmap=get_colormap(cmap), levels=levels,
+                                   vmax=colorbar_max, vmin=colorbar_min,
+                                   axes=ax)
+        elif plot_type == "Contour":
+            result = iplt.contour(cube, num_contours, cmap=get_colormap(cmap),
+                                  levels=levels, vmax=colorbar_max,
+                                  vmin=colorbar_min, axes=ax)
+            if contour_labels:
+                ax.clabel(result, inline=1, fontsize=8)
+        else:
+            result = iplt.pcolormesh(cube, cmap=get_colormap(cmap),
+                                     vmax=colorbar_max, vmin=colorbar_min,
+                                     axes=ax)
+
+        set_quickplot_labels(ax, cube, result if colorbar else None)
+
+
+def set_quickplot_labels(ax, cube, result):
+    """
+    Adds a colorbar, title and axis labels to a 2D plot, in the manner of
+    iris.quickplot. quickplot itself always draws on the current pyplot
+    figure, so it can not be used with an explicit figure.
+
+    Args:
 
+    * ax
+        The axes that the plot was drawn on.
 
-def set_plot_data(cube, plot_type, cmap, num_contours, contour_labels,
-                  colorbar_range, gridlines, axis_labels):
+    * cube
+        The 2D cube that was plotted.
+
+    * result
+        The mappable returned by the plotting function, or None if no
+        colorbar is wanted.
+
+    """
+    if result is not None:
+        colorbar = ax.figure.colorbar(result, ax=ax, orientation='horizontal')
+        colorbar.set_label(get_units_label(cube))
+    ax.set_title(get_title(cube, False))
+
+    # Map axes are labelled by the gridlines instead.
+    if not hasattr(ax, 'projection'):
+        ax.set_xlabel(get_title(get_plot_coord(cube, 1), True))
+        ax.set_ylabel(get_title(get_plot_coord(cube, 0), True))
+
+
+def get_plot_coord(cube, dim):
+    """
+    Returns the dimension coordinate of the cube which describes the given
+    dimension, or None if the dimension is anonymous.
+
+    """
+    coords = cube.coords(dimensions=dim, dim_coords=True)
+    return coords[0] if coords else None
+
+
+def get_title(cube_or_coord, with_units):
     """
-    Produces a plot object for the desired cube using matplotlib.pyplot methods
+    Returns the name of the cube or coordinate as it would be written by
+    quickplot, optionally followed by its units.
 
     Args:
 
+    * cube_or_coord
+        The cube or coordinate to name, or None.
+
+    * with_units
+        Boolean holding whether the units should be included.
+
+    """
+    if cube_or_coord is None:
+        return ''
+    title = cube_or_coord.name().replace('_', ' ').capitalize()
+    units = get_units_label(cube_or_coord)
+    if with_units and units:
+        title += ' / {}'.format(units)
+    return title
+
+
+def get_units_label(cube_or_coord):
+    """
+    Returns the units of the cube or coordinate as a String, or an empty
+    String if they are not worth showing.
+
+    """
+    units = cube_or_coord.units
+    if units.is_unknown() or units.is_no_unit() or units.is_dimensionless():
+        return ''
+    return str(units)
+
+
+def set_plot_data(ax, cube, plot_type, cmap, num_contours, contour_labels,
+                  colorbar_range, gridlines, axis_labels, dim_names=None,
+                  colorbar=True):
+    """
+    Produces a plot object for the desired cube from its data array, using
+    the methods of the matplotlib Axes.
+
+    Args:
+
+    * ax
+        The axes to draw the plot on.
+
     * cube
         The cube to be plotted.
 
@@ -292,45 +539,65 @@ def set_plot_data(cube, plot_type, cmap, num_contours, contour_labels,
     * axes_labels
         list holding the names of the x and y coordinates.
 
+    Kwargs:
+
+    * dim_names
+        The dimension names of the full cube. See sort_axis_labels().
+
+    * colorbar
+        Boolean holding whether a colorbar should be added.
+
     """
     # We unpack the colorbar_range dictionary
     colorbar_max = colorbar_range['max']
     colorbar_min = colorbar_range['min']
-    levels = get_levels(cube, colorbar_max, colorbar_min, num_contours)
-
-    if plot_type == "Filled Contour":
-        im = plt.contourf(cube.data, num_contours, cmap=get_colormap(cmap),
-                          levels=levels, vmax=colorbar_max, vmin=colorbar_min)
-        # We add a colorbar to the plot.
-        plt.colorbar(im)
-    elif plot_type == "Contour":
-        contours = plt.contour(cube.data, num_contours,
-                               cmap=get_colormap(cmap), levels=levels,
+    with span('stats'):
+        levels = get_levels(cube, colorbar_max, colorbar_min, num_contours)
+
+    with span('plot'):
+        if plot_type == "Filled Contour":
+            im = ax.contourf(cube.data, num_contours, cmap=get_colormap(cmap),
+                             levels=levels, vmax=colorbar_max,
+                             vmin=colorbar_min)
+            # We add a colorbar to the plot.
+            if colorbar:
+                ax.figure.colorbar(im, ax=ax)
+        elif plot_type == "Contour":
+            contours = ax.contour(cube.data, num_contours,
+                                  cmap=get_colormap(cmap), levels=levels,
+                                  vmax=colorbar_max, vmin=colorbar_min)
+            if contour_labels:
+                ax.clabel(contours, inline=1, fontsize=8)
+        else:
+            im = ax.pcolormesh(cube.data, cmap=get_colormap(cmap),
                                vmax=colorbar_max, vmin=colorbar_min)
-        if contour_labels:
-            plt.clabel(contours, inline=1, fontsize=8)
-    else:
-        im = plt.pcolormesh(cube.data, cmap=get_colormap(cmap),
-                            vmax=colorbar_max, vmin=colorbar_min)
-        plt.colorbar(im)
+            if colorbar:
+                ax.figure.colorbar(im, ax=ax)
 
     if gridlines:
-        plt.gca().grid(gridlines)
+        ax.grid(gridlines)
 
     # We ensure that the coord names correspond to the correct axis
-    xlabel, ylabel = sort_axis_labels(cube, axis_labels)
+    xlabel, ylabel = sort_axis_labels(cube, axis_labels, dim_names)
 
     # Label the axes
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
 
 
-def set_projection(projection, central_longitude):
+def set_projection(fig, cube, projection, central_longitude, can_draw_map):
     """
-    This function sets the projection to be used in the plot.
+    This function adds the axes for the plot to the figure, using the
+    projection chosen.
 
     Args:
 
+    * fig
+        The matplotlib.figure.Figure to add the axes to.
+
+    * cube
+        The 2D cube to be plotted.
+
     * projection
         String holding the projection to be used for the plot. Can be any of
         the projections usable in Cartopy, or Automatic.
@@ -339,11 +606,27 @@ def set_projection(projection, central_longitude):
         Double representing the longitude to be positioined in the centre of
         the plot.
 
+    * can_draw_map
+        Boolean representing whether or not the plot is lat/long.
+
+    Returns:
+
+    * ax
+        The new axes.
+
     """
+    if not can_draw_map:
+        # The data can not be put on a map, so plain axes are used.
+        return fig.add_subplot(1, 1, 1)
+
     if projection == "Automatic":
-        # If there is no selected projection, then we do not specify anything,
-        # and the natural projection of the data is used.
-        pass
+        # If there is no selected projection, then the natural projection of
+        # the data is used, as iris would do.
+        coord_system = cube.coord_system()
+        if coord_system is None:
+            crs = ccrs.PlateCarree()
+        else:
+            crs = coord_system.as_cartopy_projection()
     else:
         # Ensure that the projection is written as needed for use with Cartopy.
         projection = projection.replace(" ", "")
@@ -353,49 +636,45 @@ def set_projection(projection, central_longitude):
         no_central_long_arg = ['OSGB', 'OSNI', 'EuroPP', 'Gnomonic',
                                'RotatedPole', 'Automatic']
         if projection in no_central_long_arg:
-            plt.axes(projection=get_projection())
+            crs = get_projection()
         else:
-            plt.axes(projection=get_projection(
-                     central_longitude=central_longitude))
+            crs = get_projection(central_longitude=central_longitude)
 
+    return fig.add_subplot(1, 1, 1, projection=crs)
 
-def set_cartographic(cartographic):
+
+def set_cartographic(ax, cartographic):
     """
     Adds coastlines, country borders and rivers to the plot as desired.
+    They are read from the local store of Natural Earth features. See the
+    features module.
 
     Args:
 
+    * ax
+        The cartopy GeoAxes that the plot was drawn on.
+
     * cartographic
         dictionary containing Booleans for displaying coastlines, countries and
         rivers.
 
     """
-    # We unpack the cartographic dictionary
-    coastlines = cartographic['coastlines']
-    countries = cartographic['countries']
-    rivers = cartographic['rivers']
-
-    if coastlines:
-        plt.gca().coastlines()
-
-    if countries:
-        countries = cfeature.NaturalEarthFeature(category='cultural',
-                                                 name='admin_0_countries',
-                                                 scale='50m',
-                                                 facecolor='none')
-        plt.gca().add_feature(countries)
+    for option in ('coastlines', 'countries', 'rivers'):
+        if cartographic[option]:
+            with span('features'):
+                for feature in features.get_features(option):
+                    ax.add_feature(feature)
 
-    if rivers:
-        plt.gca().add_feature(cfeature.RIVERS)
-        plt.gca().add_feature(cfeature.LAKES)
 
-
-def set_gridlines(gridlines):
+def set_gridlines(ax, gridlines):
     """
     Adds gridlines to the plot as desired
 
     Args:
 
+    * ax
+        The axes that the plot was drawn on.
+
     * gridlines
         Boolean holding whether or not gridlines are desired.
 
@@ -405,7 +684,7 @@ def set_gridlines(gridlines):
         Quickplot does not add axis labels for lat/lon graphs.
         Therefore by preference, we attempt to draw gridlines with labels.
         This is done by using cartopy with the
-        plt.gca().gridlines(draw_labels=True) method. This method will also
+        ax.gridlines(draw_labels=True) method. This method will also
         be able to draw the correct gridlines on all projections.
 
         However, currently, this method will only work if the the graph is
@@ -424,12 +703,12 @@ def set_gridlines(gridlines):
     """
     if gridlines:
         try:
-            grid = plt.gca().gridlines(draw_labels=True)
+            grid = ax.gridlines(draw_labels=True)
             grid.xlabels_top = False
         except AttributeError:
-            plt.gca().grid(True)
+            ax.grid(True)
         except TypeError:
-            plt.gca().gridlines(draw_labels=False)
+            ax.gridlines(draw_labels=False)
 
 
 def get_colormap(cmap):
@@ -485,35 +764,159 @@ def set_fixed_colorbar(cube, dim_indices, collapsed_indices):
     """
     if cube.ndim > 2:
 
-        sub_cube = get_sub_cube(cube, dim_indices, collapsed_indices)
-
-        slice_max = []
-        slice_min = []
         sliced_dim_index = dim_indices['sliced dim index']
+        slice_max, slice_min = get_slices_max_min(
+            cube, dim_indices, collapsed_indices,
+            xrange(cube.shape[sliced_dim_index]))
+        max_cont, min_cont = combine_slice_ranges(slice_max, slice_min)
 
-        for slice_index in xrange(cube.shape[sliced_dim_index]):
-            new_index = get_correct_index(dim_indices)
-            cube_slice = extract_cube(sub_cube, [new_index], [slice_index])
-            try:
-                data_max, data_min = find_max_min(cube_slice)
-                slice_max.append(data_max)
-                slice_min.append(data_min)
-            except ValueError:
-                pass
+    else:
+        max_cont = None
+        min_cont = None
+
+    return max_cont, min_cont
+
+
+def get_slices_max_min(cube, dim_indices, collapsed_indices, slice_indices,
+                       max_points=None):
+    """
+    Returns lists of the maximum and minimum values of each of the given
+    slices along the sliced dimension. Slices holding no valid data are
+    left out.
+
+    Args:
+
+    * cube
+        The full cube, before it has been reduced.
+
+    * dim_indices
+        dictionary containing the index of the coordinates within the cube for
+        the axes dimensions and the sliced dimension. See set_fixed_colorbar().
+
+    * collapsed_indices
+        List of ints holding the indices chosen for all other dimensions.
+
+    * slice_indices
+        Iterable of ints holding the indices of the slices to be read.
+
+    Kwargs:
+
+    * max_points
+        If given, only every nth point along each dimension of a slice is
+        read, so that no dimension is longer than this. See
+        get_preview_cube().
+
+    Returns:
+
+    * slice_max, slice_min
+        Lists of the maximum and minimum values of the slices.
+
+    """
+    sub_cube = get_sub_cube(cube, dim_indices, collapsed_indices)
+    new_index = get_correct_index(dim_indices)
+
+    slice_max = []
+    slice_min = []
+    for slice_index in slice_indices:
+        cube_slice = extract_cube(sub_cube, [new_index], [slice_index])
+        if max_points is not None:
+            cube_slice = get_preview_cube(cube_slice, max_points)
         try:
-            max_cont = np.nanmax(slice_max)
-            min_cont = np.nanmin(slice_min)
+            data_max, data_min = find_max_min(cube_slice)
+            slice_max.append(data_max)
+            slice_min.append(data_min)
         except ValueError:
-            max_cont = None
-            min_cont = None
+            pass
+    return slice_max, slice_min
 
-    else:
+
+def combine_slice_ranges(slice_max, slice_min):
+    """
+    Returns the maximum and minimum across all of the slices, given lists of
+    the maximum and minimum of each, as returned by get_slices_max_min().
+    Both are None if there were no valid slices.
+
+    """
+    try:
+        max_cont = np.nanmax(slice_max)
+        min_cont = np.nanmin(slice_min)
+    except ValueError:
         max_cont = None
         min_cont = None
-
     return max_cont, min_cont
 
 
+def sample_fixed_colorbar(cube, dim_indices, collapsed_indices,
+                          num_slices=10, max_points=100, seed=None):
+    """
+    Estimates the range found by set_fixed_colorbar() from a sample of the
+    data, which is much quicker for a long sliced dimension.
+
+    The sliced dimension is split into num_slices equal strata, and one slice
+    is chosen at random from each, so that the whole dimension is covered.
+    Within each slice, only every nth point is read. See
+    get_slices_max_min().
+
+    Args:
+
+    * cube
+        The full cube, before it has been reduced.
+
+    * dim_indices, collapsed_indices
+        See set_fixed_colorbar().
+
+    Kwargs:
+
+    * num_slices
+        int holding the greatest number of slices to be read.
+
+    * max_points
+        int holding the greatest number of points to be read along each
+        dimension of a slice.
+
+    * seed
+        Seed for the choice of slices, so that it can be repeated.
+
+    Returns:
+
+    * max_cont, min_cont, confidence
+        The estimated maximum and minimum, and a dictionary describing how
+        much of the data they were found from. 'slices' holds the number of
+        slices read out of 'total slices', and 'fraction' the fraction of the
+        cells read. Neighbouring values are correlated, and extremes tend to
+        lie in a few slices, so nothing firmer can be said of the range of
+        the values that were not read. All are None if the cube has fewer
+        than 3 dimensions.
+
+    """
+    if cube.ndim <= 2:
+        return None, None, None
+
+    sliced_dim_index = dim_indices['sliced dim index']
+    num_total = cube.shape[sliced_dim_index]
+    random_state = np.random.RandomState(seed)
+    strata = np.array_split(np.arange(num_total), min(num_slices, num_total))
+    slice_indices = [int(random_state.choice(stratum)) for stratum in strata]
+
+    slice_max, slice_min = get_slices_max_min(
+        cube, dim_indices, collapsed_indices, slice_indices, max_points)
+    max_cont, min_cont = combine_slice_ranges(slice_max, slice_min)
+    if max_cont is None:
+        return None, None, None
+
+    slice_shape = [cube.shape[dim_indices['dim 1 index']],
+                   cube.shape[dim_indices['dim 2 index']]]
+    steps = get_preview_steps(slice_shape, max_points)
+    cells_read = len(slice_indices) * int(np.prod(
+        [int(np.ceil(float(length) / step))
+         for length, step in zip(slice_shape, steps)]))
+    confidence = {'slices': len(slice_indices),
+                  'total slices': num_total,
+                  'fraction': float(cells_read) /
+                  (num_total * np.prod(slice_shape))}
+    return max_cont, min_cont, confidence
+
+
 def find_max_min(cube):
     """
     Returns the maximum and minimum values of a given cube.
@@ -530,10 +933,11 @@ def find_max_min(cube):
         within the cube.
 
     """
-    values = np.ma.array(cube.data)
-    data = values.compressed()
-    data_max = np.nanmax(data)
-    data_min = np.nanmin(data)
+    with span('stats'):
+        values = np.ma.array(cube.data)
+        data = values.compressed()
+        data_max = np.nanmax(data)
+        data_min = np.nanmin(data)
 
     return data_max, data_min
 
@@ -638,7 +1042,7 @@ def get_correct_index(dim_indices):
     return new_index
 
 
-def check_extent(plot_method, can_draw_map):
+def check_extent(ax, plot_method, can_draw_map):
     """
     This function is a workaround for a bug in cartopy present at the time
     of writing in which the transformation of the data leads to the extent
@@ -654,6 +1058,9 @@ def check_extent(plot_method, can_draw_map):
 
     Args:
 
+    * ax
+        The axes that the plot was drawn on.
+
     * plot_method
         String holding the users choice of plotting using either quickplot or
         simply plotting from the data array.
@@ -671,20 +1078,20 @@ def check_extent(plot_method, can_draw_map):
     """
     set_global = False
     if plot_method == "using quickplot" and can_draw_map:
-        x_lims = np.fabs(plt.xlim())
-        y_lims = np.fabs(plt.ylim())
+        x_lims = np.fabs(ax.get_xlim())
+        y_lims = np.fabs(ax.get_ylim())
         data_extent = (x_lims, y_lims)
         data_extent = np.reshape(data_extent, 4)
 
-        x_lims = np.fabs(plt.gca().projection.x_limits)
-        y_lims = np.fabs(plt.gca().projection.y_limits)
+        x_lims = np.fabs(ax.projection.x_limits)
+        y_lims = np.fabs(ax.projection.y_limits)
         projection_extent = (x_lims, y_lims)
         projection_extent = np.reshape(projection_extent, 4)
 
         difference = list(projection_extent - data_extent)
 
         if any(value < 0 for value in difference):
-            plt.gca().set_global()
+            ax.set_global()
             set_global = True
 
     return set_global
@@ -775,7 +1182,160 @@ def extract_cube(cube, dim_nums, coord_indices):
     return new_cube
 
 
-def sort_axis_labels(cube, axis_labels):
+def get_slice_keys(ndim, dim_indices, slice_index, collapsed_indices):
+    """
+    Returns a tuple of keys which extract the plotted slice from a cube with
+    the given number of dimensions, the same as get_sub_cube() and
+    extract_cube() would: the index of the slice along each dimension other
+    than the two plotted, which are kept whole. These are read by the slice
+    readers, pp_index.FieldIndex and chunk_reader.ChunkReader.
+
+    """
+    plotted = [dim_indices['dim 1 index'], dim_indices['dim 2 index']]
+    collapsed = iter(collapsed_indices)
+    keys = []
+    for dim in xrange(ndim):
+        if dim in plotted:
+            keys.append(slice(None))
+        elif dim == dim_indices['sliced dim index']:
+            keys.append(slice_index)
+        else:
+            keys.append(next(collapsed))
+    return tuple(keys)
+
+
+def get_preview_cube(cube, max_points=200):
+    """
+    Returns a coarse version of a 2D cube, made by taking every nth point
+    along each dimension so that neither dimension is longer than
+    max_points. This is used to draw a quick preview of a slice.
+
+    Args:
+
+    * cube
+        The 2D cube to be reduced.
+
+    Kwargs:
+
+    * max_points
+        int holding the maximum number of points to keep along each dimension.
+
+    Returns:
+
+    * new_cube
+        The reduced cube, or the original cube if it is already small enough.
+
+    """
+    steps = get_preview_steps(cube.shape, max_points)
+    if all(step == 1 for step in steps):
+        new_cube = cube
+    else:
+        new_cube = cube[tuple(slice(None, None, step) for step in steps)]
+    return new_cube
+
+
+def get_preview_steps(shape, max_points):
+    """
+    Returns a list of ints holding the step taken along each dimension of the
+    given shape, so that no dimension has more than max_points points.
+
+    """
+    return [int(np.ceil(float(length) / max_points)) for length in shape]
+
+
+def get_pyramid_edges(cube, status):
+    """
+    Returns the edges of the cells of a 2D slice along its y and x axes, in
+    the units of the axes that it is drawn on, so that it can be redrawn from
+    a pyramid. See the pyramid module.
+
+    Args:
+
+    * cube
+        The 2D cube at full resolution.
+
+    * status
+        A dictionary representing the state of the interface that the slice
+        was drawn with. See update().
+
+    Returns:
+
+    * edges
+        A tuple holding the y edges, the x edges and the cartopy CRS of the
+        edges for a map, or None if the cells can not be placed on the axes
+        reliably. This is the case for contours, for maps in a projection
+        other than the native one of the data, and for coordinates that iris
+        would not plot with the first dimension along the y axis.
+
+    """
+    if status['plot type'] != "pcolormesh" or cube.ndim != 2:
+        return None
+
+    if status['plot method'] == "from data array":
+        # The cells are drawn at their indices in the slice as drawn, which
+        # may have been reduced. See get_preview_cube().
+        steps = [1, 1]
+        if status.get('max points') is not None:
+            steps = get_preview_steps(cube.shape, status['max points'])
+        y_edges, x_edges = [np.arange(length + 1) / float(step)
+                            for length, step in zip(cube.shape, steps)]
+        return y_edges, x_edges, None
+
+    if not status['can draw map'] or status['projection'] != "Automatic":
+        return None
+    coords = [get_plot_coord(cube, dim) for dim in (0, 1)]
+    if any(coord is None for coord in coords):
+        return None
+    if [iris.util.guess_coord_axis(coord) for coord in coords] != ['Y', 'X']:
+        return None
+    edges = []
+    for coord in coords:
+        bounds = None
+        if coord.has_bounds() and coord.is_contiguous():
+            bounds = coord.bounds
+        edges.append(pyramid.get_edges(coord.points, bounds))
+    # As used by iris.plot.
+    coord_system = cube.coord_system()
+    if coord_system is None:
+        crs = ccrs.PlateCarree()
+    else:
+        crs = coord_system.as_cartopy_crs()
+    return edges[0], edges[1], crs
+
+
+def get_cube_identity(cube):
+    """
+    Returns a list identifying a cube in the keys of results derived from it,
+    such as those of the disk cache and the pyramid and transcode stores. It
+    holds the metadata of the cube and a digest of the definitions, points
+    and bounds of its coordinates, so that two cubes of a file with the same
+    name and shape but on different grids or times are told apart.
+
+    """
+    digest = hashlib.sha1()
+    digest.update(repr(sorted((name, str(value)) for name, value in
+                              cube.attributes.items())))
+    for coord in cube.coords():
+        digest.update(repr((coord.name(), coord.var_name, str(coord.units),
+                            cube.coord_dims(coord),
+                            str(coord.coord_system))))
+        for values in (coord.points, coord.bounds):
+            if values is None:
+                digest.update('no bounds')
+                continue
+            values = np.ascontiguousarray(values)
+            digest.update(repr((str(values.dtype), values.shape)))
+            if values.dtype.kind == 'O':
+                digest.update(repr(values.tolist()))
+            else:
+                digest.update(values.tostring())
+    return [cube.name(), cube.var_name, str(cube.units), list(cube.shape),
+            str(cube.attributes.get('STASH', '')),
+            [str(method) for method in cube.cell_methods],
+            digest.hexdigest()]
+
+
+def sort_axis_labels(cube, axis_labels, dim_names=None):
     """
     Takes in the axis labels, and arranges them so that they are sorted into
     the form xlabel, ylabel.
@@ -789,8 +1349,16 @@ def sort_axis_labels(cube, axis_labels):
         List of Strings, representing the coordinate names of the x and y axes
         of the plot.
 
+    Kwargs:
+
+    * dim_names
+        The names of the dimensions of the cube, if they are already known
+        (for example from a gui_logic.CubeSchema). If None, they are found
+        with get_dim_names().
+
     """
-    dim_names = get_dim_names(cube)
+    if dim_names is None:
+        dim_names = get_dim_names(cube)
     sorted_list = []
     for name in dim_names:
         if name in axis_labels:
@@ -0,0 +1,147 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file contains the DeferredModule Class, which delays importing a module
+until it is first used.
+
+Iris, cartopy and matplotlib's pyplot take several seconds to import from a
+networked file system, and none of them are needed to draw an empty window.
+The modules that use them are imported with defer(), so that the window
+appears first. Those needed to load and draw a file are then imported when a
+file is opened, or earlier by preload_in_background() while the user is
+choosing one. The rest are only imported if they are used.
+
+"""
+import importlib
+import threading
+
+import thea.timing as timing
+
+
+# Every DeferredModule created by defer(), in the order they were created.
+_deferred = []
+
+
+class DeferredModule(object):
+    """
+    Stands in for a module until one of its attributes is used, when the
+    module is imported and the attribute looked up on it.
+
+    """
+    def __init__(self, name):
+        """
+        Args:
+
+        * name
+            String holding the full name of the module, such as
+            'thea.cube_logic'.
+
+        """
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded() else 'not loaded'
+        return '<deferred module {!r} ({})>'.format(self._name, state)
+
+    def is_loaded(self):
+        """
+        Returns whether the module has been imported.
+
+        """
+        return self._module is not None
+
+    def load(self):
+        """
+        Imports the module, if it has not been already, and returns it.
+
+        """
+        if self._module is None:
+            with timing.span('import'):
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+
+def defer(name):
+    """
+    Returns a DeferredModule standing in for the module with the given name.
+    The module is only imported once it is used, or by preload().
+
+    """
+    module = DeferredModule(name)
+    _deferred.append(module)
+    return module
+
+
+def preload(modules=None):
+    """
+    Imports the given deferred modules, if they have not yet been used. A
+    module which can not be imported is skipped, so that the ImportError is
+    raised where the module is used instead, if it is used at all.
+
+    Kwargs:
+
+    * modules
+        List of the DeferredModules to import, or None for every module
+        created by defer(), including those only needed by parts of Thea
+        that may never be used.
+
+    """
+    with timing.trace_span('preload'):
+        for module in _deferred if modules is None else modules:
+            try:
+                module.load()
+            except ImportError:
+                continue
+
+
+def preload_in_background(modules=None):
+    """
+    Starts importing the given deferred modules on a background thread,
+    returning the thread. See preload().
+
+    Python 2 holds a single lock while importing, so any import made by the
+    GUI thread in the meantime waits for the preload to finish. In practice
+    the window has nothing else to import until a file is opened, and the
+    file would need these modules anyway.
+
+    """
+    thread = threading.Thread(target=preload, args=(modules,),
+                              name='preload')
+    thread.daemon = True
+    thread.start()
+    return thread
@@ -0,0 +1,408 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file keeps a cache on disk of results derived from files, such as the
+slices extracted for plotting, the ranges of fixed colorbars and the images
+drawn by thea serve, so that later sessions can reuse them.
+
+Each result is stored under a key made by pyramid.get_key() from the
+identity of its file and the parameters of the operation. The identity is
+the path, size and modification time of the file, so results from a file
+that has since changed are never reused. Each result is pickled to its own
+file, named by its key. The file is written under a temporary name and then
+renamed into place, so several processes can share a cache. Results are
+pickled and written on a background thread by put_later(), so that those who
+derive them are not held up. Once the cache grows over its size limit, the
+results used least recently are removed. The cache is pruned after a share
+of its limit has been written, rather than after every result, as listing it
+grows slower with its size.
+
+As unpickling a result can run arbitrary code, a DiskCache is only read from
+or written to if its directory belongs to the user and can not be read or
+written by anyone else, and each result must belong to the user too. The
+directory is made so if the cache makes it. A cache can not be shared
+between users.
+
+The pyramid and transcode stores use the same layout, with one entry per
+key, so they share get_entries() and prune().
+
+"""
+import atexit
+import os
+import os.path
+import pickle
+import Queue
+import shutil
+import tempfile
+import threading
+import warnings
+
+
+# The cache used unless another directory is given, or by the THEA_CACHE_DIR
+# environment variable.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.thea', 'cache')
+
+# The size to which a cache is pruned.
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# The share of its size limit written to a cache between prunes.
+PRUNE_FRACTION = 0.05
+
+# The number of results waiting to be written by put_later() beyond which
+# any more are dropped, so that they do not build up in memory.
+MAX_PENDING = 8
+
+# The errors raised by a result which can not be read back, such as one
+# pickled by another version of a library.
+READ_ERRORS = (IOError, OSError, EOFError, ValueError, KeyError, IndexError,
+               TypeError, AttributeError, ImportError,
+               pickle.UnpicklingError)
+
+
+def is_private(stat):
+    """
+    Returns whether a file or directory, given by the result of os.stat(),
+    belongs to the user and can not be read or written by anyone else.
+
+    """
+    if not hasattr(os, 'getuid'):
+        # Not a POSIX system. Ownership is left to its access control lists.
+        return True
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o077
+
+
+def get_file_identity(filename):
+    """
+    Returns a list holding the absolute path, size and modification time of
+    a file, which identifies the contents of the file in keys.
+
+    """
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    return [path, stat.st_size, stat.st_mtime]
+
+
+def get_entry_size(path):
+    """
+    Returns the number of bytes held by an entry of a store, which is either
+    a file or a directory of files.
+
+    """
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name))
+               for name in os.listdir(path))
+
+
+def get_entries(directory, marker=None):
+    """
+    Returns a list of (last used, nbytes, key) tuples for each complete entry
+    in a store. Entries that are still being written have a '.' in their
+    names, and are left out.
+
+    Args:
+
+    * directory
+        String holding the directory of the store.
+
+    Kwargs:
+
+    * marker
+        The name of the file that marks an entry directory as complete.
+        Its modification time is when the entry was last used. Without a
+        marker, each entry is a single file, and its own modification time
+        is used.
+
+    """
+    entries = []
+    if not os.path.isdir(directory):
+        return entries
+    for key in os.listdir(directory):
+        if '.' in key:
+            continue
+        path = os.path.join(directory, key)
+        used_path = path if marker is None else os.path.join(path, marker)
+        try:
+            entries.append((os.path.getmtime(used_path),
+                            get_entry_size(path), key))
+        except OSError:
+            # Not complete, or removed by another process in the meantime.
+            continue
+    return entries
+
+
+def remove_entry(path):
+    """
+    Removes an entry of a store, ignoring one already removed by another
+    process.
+
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def prune(directory, max_bytes, keep=None, marker=None):
+    """
+    Removes the entries of a store used least recently until it is within its
+    size limit. The entry with the key given as keep is left alone.
+
+    Args:
+
+    * directory, marker
+        See get_entries().
+
+    * max_bytes
+        int holding the size to which the store is pruned, or None for no
+        limit.
+
+    Kwargs:
+
+    * keep
+        String holding the key of the entry which was just added.
+
+    """
+    if max_bytes is None:
+        return
+    entries = sorted(get_entries(directory, marker))
+    total = sum(nbytes for _, nbytes, _ in entries)
+    for _, nbytes, key in entries:
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        remove_entry(os.path.join(directory, key))
+        total -= nbytes
+
+
+def touch(path):
+    """
+    Marks an entry of a store as recently used. See prune().
+
+    """
+    try:
+        os.utime(path, None)
+    except OSError:
+        # Removed by another process since it was read.
+        pass
+
+
+class DiskCache(object):
+    """
+    A directory holding pickled results keyed by pyramid.get_key(), shared by
+    every Thea process of the user that uses it. Any picklable value other
+    than None can be stored. See is_private().
+
+    """
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Kwargs:
+
+        * directory
+            String holding the directory of the cache, or None for the
+            default.
+
+        * max_bytes
+            int holding the size to which the cache is pruned, or None for no
+            limit.
+
+        """
+        if directory is None:
+            directory = os.environ.get('THEA_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.warned = False
+        # The bytes written since the cache was last pruned, or None if it
+        # has not been pruned by this process yet.
+        self.unpruned_bytes = None
+        self.pending = Queue.Queue(MAX_PENDING)
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def check_directory(self, make=False):
+        """
+        Returns whether the directory of the cache is private to the user, so
+        can be used. A warning is given, once, if it is not.
+
+        Kwargs:
+
+        * make
+            Boolean holding whether to make the directory, private to the
+            user, if it does not exist yet.
+
+        """
+        if make and not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory, 0o700)
+            except OSError:
+                # Unless another process has just made it.
+                pass
+        try:
+            stat = os.stat(self.directory)
+        except OSError:
+            return False
+        if is_private(stat):
+            return True
+        if not self.warned:
+            self.warned = True
+            warnings.warn('The disk cache {} is not used, as it can be read '
+                          'or written by other users. Run chmod 700 on it '
+                          'to use it.'.format(self.directory))
+        return False
+
+    def get_path(self, key):
+        """
+        Returns the path of the file holding the result with the given key.
+
+        """
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """
+        Returns the result stored under the key, or None if there is none or
+        it can not be read.
+
+        """
+        if not self.check_directory():
+            return None
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as fh:
+                if not is_private(os.fstat(fh.fileno())):
+                    return None
+                value = pickle.load(fh)
+        except READ_ERRORS:
+            return None
+        touch(path)
+        return value
+
+    def put(self, key, value):
+        """
+        Stores a result under the key, and prunes the cache if enough has been
+        written since it was last pruned. Returns whether the result was
+        stored. A result is not stored if it can not be pickled, or if the
+        cache can not be written to, as it can always be derived again.
+
+        """
+        if not self.check_directory(make=True):
+            return False
+        try:
+            fd, temp_path = tempfile.mkstemp(prefix=key + '.',
+                                             dir=self.directory)
+        except OSError:
+            return False
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                pickle.dump(value, fh, pickle.HIGHEST_PROTOCOL)
+                nbytes = fh.tell()
+            os.rename(temp_path, self.get_path(key))
+        except (IOError, OSError, TypeError, pickle.PicklingError):
+            remove_entry(temp_path)
+            return False
+        with self.lock:
+            if self.unpruned_bytes is not None:
+                self.unpruned_bytes += nbytes
+            due = (self.max_bytes is not None and
+                   (self.unpruned_bytes is None or
+                    self.unpruned_bytes >= self.max_bytes * PRUNE_FRACTION))
+            if due:
+                self.unpruned_bytes = 0
+        if due:
+            self.prune(keep=key)
+        return True
+
+    def put_later(self, key, value):
+        """
+        Stores a result under the key on a background thread, returning
+        straight away. The result must not be changed afterwards. Returns
+        whether it was queued, which it is not if too many results are
+        already waiting to be written. See put().
+
+        """
+        with self.lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.write_pending,
+                                               name='disk cache')
+                self.writer.daemon = True
+                self.writer.start()
+                # Results still waiting are written before the process exits.
+                atexit.register(self.flush)
+        try:
+            self.pending.put_nowait((key, value))
+        except Queue.Full:
+            return False
+        return True
+
+    def write_pending(self):
+        """
+        Writes the results queued by put_later(), until the process exits.
+
+        """
+        while True:
+            key, value = self.pending.get()
+            try:
+                self.put(key, value)
+            except Exception:
+                # Any result that can not be written can be derived again,
+                # and the thread is kept for those that follow.
+                pass
+            finally:
+                self.pending.task_done()
+
+    def flush(self):
+        """
+        Waits until every result queued by put_later() has been written.
+
+        """
+        self.pending.join()
+
+    def get_entries(self):
+        """
+        Returns a list of (last used, nbytes, key) tuples for each result in
+        the cache.
+
+        """
+        return get_entries(self.directory)
+
+    def prune(self, keep=None):
+        """
+        Removes the results used least recently until the cache is within
+        its size limit. The result with the key given as keep is left alone.
+
+        """
+        prune(self.directory, self.max_bytes, keep)
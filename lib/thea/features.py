@@ -0,0 +1,267 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file keeps the Natural Earth features drawn on maps in a local store, so
+that drawing them does not depend on cartopy downloading them on first use.
+
+Cartopy is pointed at the store, so that any shapefile it needs is looked for
+and downloaded there. The geometries of each feature are also written to an
+index in the store, as well-known binary, which is much quicker to read than
+parsing the shapefile. The index holds only the length and bytes of each
+geometry, as the store may be shared between users. 'thea --prewarm-features'
+fills the store with every scale of every feature ahead of time, which is
+needed on machines without a connection to the internet. Otherwise each
+feature is added to the store the first time that it is drawn.
+
+"""
+import os
+import os.path
+import struct
+import tempfile
+import warnings
+
+import thea.deferred as deferred
+
+# Only needed once a map is drawn. See the deferred module.
+cartopy = deferred.defer('cartopy')
+ccrs = deferred.defer('cartopy.crs')
+cfeature = deferred.defer('cartopy.feature')
+shpreader = deferred.defer('cartopy.io.shapereader')
+wkb = deferred.defer('shapely.wkb')
+
+
+# The colour of water used by cartopy.feature.
+WATER = (152 / 256.0, 183 / 256.0, 226 / 256.0)
+
+# The Natural Earth features drawn for each of the cartographic options, as
+# (category, name, scale, style) tuples.
+FEATURES = {'coastlines': [('physical', 'coastline', '110m',
+                            {'edgecolor': 'black', 'facecolor': 'none'})],
+            'countries': [('cultural', 'admin_0_countries', '50m',
+                           {'edgecolor': 'black', 'facecolor': 'none'})],
+            'rivers': [('physical', 'rivers_lake_centerlines', '110m',
+                        {'edgecolor': WATER, 'facecolor': 'none'}),
+                       ('physical', 'lakes', '110m',
+                        {'edgecolor': 'face', 'facecolor': WATER})]}
+
+# The scales of each feature filled in by prewarm().
+SCALES = ['110m', '50m', '10m']
+
+# The start of every index, followed by the length and bytes of each
+# geometry.
+INDEX_MAGIC = b'THEA-WKB-1\n'
+LENGTH_FORMAT = '>I'
+
+# The store used unless another is given to set_store_dir(), or by the
+# THEA_FEATURE_STORE environment variable.
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser('~'), '.thea',
+                                 'natural_earth')
+
+# The directory of the store, once set_store_dir() has been called.
+_store_dir = None
+
+# The geometries of each feature read in this session, keyed by (category,
+# name, scale).
+_geometries = {}
+
+
+def set_store_dir(store_dir):
+    """
+    Sets the directory of the store. It may be shared between users, in
+    which case it should be filled by prewarm() first.
+
+    """
+    global _store_dir
+    _store_dir = store_dir
+
+
+def get_store_dir():
+    """
+    Returns the directory of the store.
+
+    """
+    if _store_dir is not None:
+        return _store_dir
+    return os.environ.get('THEA_FEATURE_STORE', DEFAULT_STORE_DIR)
+
+
+def use_store():
+    """
+    Points cartopy at the store, both for shapefiles which are already there
+    and for those which it downloads.
+
+    """
+    store_dir = get_store_dir()
+    cartopy.config['pre_existing_data_dir'] = store_dir
+    cartopy.config['data_dir'] = store_dir
+
+
+def get_index_path(category, name, scale):
+    """
+    Returns the path of the index of a feature within the store.
+
+    """
+    return os.path.join(get_store_dir(), 'index',
+                        '{}_{}_{}.wkb'.format(category, name, scale))
+
+
+def write_index(path, geometries_wkb):
+    """
+    Writes the index of a feature, a list of its geometries as well-known
+    binary. It is written to a temporary file first and then renamed, so that
+    a session reading the store never sees a partly written index.
+
+    """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(INDEX_MAGIC)
+            for data in geometries_wkb:
+                fh.write(struct.pack(LENGTH_FORMAT, len(data)))
+                fh.write(data)
+        os.rename(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
+def read_index(path):
+    """
+    Returns the list of geometries, as well-known binary, held by the index
+    at the given path. Raises IOError if it is not a complete index.
+
+    """
+    length_size = struct.calcsize(LENGTH_FORMAT)
+    geometries_wkb = []
+    with open(path, 'rb') as fh:
+        if fh.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise IOError('{} is not a feature index'.format(path))
+        while True:
+            prefix = fh.read(length_size)
+            if not prefix:
+                return geometries_wkb
+            data = b''
+            if len(prefix) == length_size:
+                length, = struct.unpack(LENGTH_FORMAT, prefix)
+                data = fh.read(length)
+            if len(prefix) != length_size or len(data) != length:
+                raise IOError('{} is truncated'.format(path))
+            geometries_wkb.append(data)
+
+
+def build_index(category, name, scale):
+    """
+    Reads the shapefile of a feature, downloading it into the store if it is
+    not already there, and writes its index. Returns the path of the index.
+
+    """
+    use_store()
+    shapefile = shpreader.natural_earth(resolution=scale, category=category,
+                                        name=name)
+    geometries = shpreader.Reader(shapefile).geometries()
+    path = get_index_path(category, name, scale)
+    write_index(path, (geometry.wkb for geometry in geometries))
+    return path
+
+
+def load_geometries(category, name, scale):
+    """
+    Returns the list of the geometries of a feature, reading them from its
+    index, which is built first if needed. If the feature cannot be found or
+    downloaded, a warning is given and the list is empty.
+
+    """
+    key = (category, name, scale)
+    if key not in _geometries:
+        path = get_index_path(category, name, scale)
+        try:
+            if not os.path.exists(path):
+                build_index(category, name, scale)
+            geometries = [wkb.loads(data) for data in read_index(path)]
+        except Exception as e:
+            warnings.warn('Unable to read the Natural Earth feature {} at '
+                          'scale {} ({}). Run thea --prewarm-features to '
+                          'fill the store.'.format(name, scale, e))
+            # Not cached, so that it is tried again once the store is filled.
+            return []
+        _geometries[key] = geometries
+    return _geometries[key]
+
+
+def get_features(option):
+    """
+    Returns a list of the cartopy features to be added to a map for one of
+    the cartographic options: 'coastlines', 'countries' or 'rivers'.
+
+    """
+    features = []
+    for category, name, scale, style in FEATURES[option]:
+        geometries = load_geometries(category, name, scale)
+        features.append(cfeature.ShapelyFeature(geometries, ccrs.PlateCarree(),
+                                                **style))
+    return features
+
+
+def prewarm(scales=None, report=None):
+    """
+    Fills the store with the index of every feature at every scale. Returns
+    a list of (category, name, scale, message) tuples describing any which
+    failed.
+
+    Kwargs:
+
+    * scales
+        List of the scales to be filled, by default SCALES.
+
+    * report
+        A function called with the category, name and scale of each feature
+        before it is filled.
+
+    """
+    failures = []
+    features = sorted(set((category, name)
+                          for specs in FEATURES.values()
+                          for category, name, _, _ in specs))
+    for category, name in features:
+        for scale in scales or SCALES:
+            if report is not None:
+                report(category, name, scale)
+            try:
+                build_index(category, name, scale)
+            except Exception as e:
+                failures.append((category, name, scale, str(e)))
+    return failures
@@ -37,8 +37,15 @@ obtain data to fill the combo boxes with, and to determin which elements
 of the interface should be enabled at any point in time.
 
 """
-import iris
-import iris.plot as iplt
+import sys
+
+import numpy as np
+
+import thea.deferred as deferred
+
+# Only needed once a cube has been loaded. See the deferred module.
+iris = deferred.defer('iris')
+iplt = deferred.defer('iris.plot')
 
 
 def get_dim_names(cube):
@@ -214,6 +221,7 @@ def get_enabled(status):
 
     else:
         cube = status['cube']
+        schema = status.get('schema')
         if cube.ndim < 3:
             state['third dim'] = False
             state['next'] = False
@@ -227,12 +235,17 @@ def get_enabled(status):
                 state['plot type'] = False
                 state['labels'] = False
 
-        try:
-            can_draw_map = get_can_draw_map(cube, status['dim 1 name'],
-                                            status['dim 2 name'])
-            state['cartographic'] = can_draw_map
-        except AttributeError:
-            state['cartographic'] = False
+        if schema is not None:
+            # The schema has already worked this out when the cube was loaded.
+            state['cartographic'] = schema.can_draw_map(status['dim 1 name'],
+                                                        status['dim 2 name'])
+        else:
+            try:
+                can_draw_map = get_can_draw_map(cube, status['dim 1 name'],
+                                                status['dim 2 name'])
+                state['cartographic'] = can_draw_map
+            except AttributeError:
+                state['cartographic'] = False
 
     if status['plot method'] == "from data array":
         state['cartographic'] = False
@@ -280,3 +293,120 @@ def get_can_draw_map(cube, dim_1_name, dim_2_name):
         can_draw_map = False
 
     return can_draw_map
+
+
+class CubeSchema(object):
+    """
+    An immutable summary of the parts of a cube that the interface needs to
+    poll repeatedly.
+
+    Working out the dimension names, coordinate values and whether a pair of
+    dimensions can be drawn as a map all require walking the coordinates of
+    the cube, which is slow for cubes with many auxiliary coordinates. The
+    schema does this work once, when the cube is first selected, so that the
+    combo boxes and the enabled state of the interface can be refreshed
+    cheaply on every click.
+
+    """
+    __slots__ = ('dim_names', 'shape', 'ndim', 'itemsize', 'summary',
+                 '_coord_values', '_coord_labels', '_can_draw_map')
+
+    def __init__(self, cube):
+        """
+        Builds the schema from the given cube.
+
+        Args:
+
+        * cube
+            The cube that the schema will describe.
+
+        """
+        dim_names = get_dim_names(cube)
+
+        coord_values = {}
+        coord_labels = {}
+        for dim_name in dim_names:
+            values = tuple(get_coord_values(cube, dim_name, dim_names))
+            coord_values[dim_name] = values
+            coord_labels[dim_name] = tuple(str(value) for value in values)
+
+        # get_can_draw_map already checks both orderings of the coordinates,
+        # so we only need to call it once for each pair.
+        can_draw_map = {}
+        for index, dim_1_name in enumerate(dim_names):
+            for dim_2_name in dim_names[index + 1:]:
+                result = get_can_draw_map(cube, dim_1_name, dim_2_name)
+                can_draw_map[(dim_1_name, dim_2_name)] = result
+                can_draw_map[(dim_2_name, dim_1_name)] = result
+
+        set_slot = super(CubeSchema, self).__setattr__
+        set_slot('dim_names', tuple(dim_names))
+        set_slot('shape', tuple(cube.shape))
+        set_slot('ndim', cube.ndim)
+        # The size of each value in bytes, used to estimate the cost of
+        # reading the data. Without a dtype, the worst case is assumed.
+        dtype = getattr(cube, 'dtype', None)
+        set_slot('itemsize', 8 if dtype is None else np.dtype(dtype).itemsize)
+        set_slot('summary', str(cube))
+        set_slot('_coord_values', coord_values)
+        set_slot('_coord_labels', coord_labels)
+        set_slot('_can_draw_map', can_draw_map)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CubeSchema objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CubeSchema objects are immutable")
+
+    def dim_index(self, dim_name):
+        """
+        Returns the index of the named dimension, or None if the cube has no
+        dimension of that name. See get_dim_index().
+
+        """
+        return get_dim_index(dim_name, self.dim_names)
+
+    def dim_size(self, dim_name):
+        """
+        Returns the length of the named dimension.
+
+        """
+        return self.shape[self.dim_index(dim_name)]
+
+    def coord_values(self, dim_name):
+        """
+        Returns a tuple of the values along the named dimension, as given by
+        get_coord_values().
+
+        """
+        return self._coord_values[dim_name]
+
+    def coord_labels(self, dim_name):
+        """
+        Returns a tuple of Strings, one for each value along the named
+        dimension, ready to be added to a combo box.
+
+        """
+        return self._coord_labels[dim_name]
+
+    def can_draw_map(self, dim_1_name, dim_2_name):
+        """
+        Returns whether the two named dimensions can be drawn as a map. See
+        get_can_draw_map().
+
+        """
+        return self._can_draw_map.get((dim_1_name, dim_2_name), False)
+
+    def nbytes(self):
+        """
+        Returns an estimate of the number of bytes held by the schema, most
+        of which is taken by the values and labels of long dimensions.
+
+        """
+        nbytes = sys.getsizeof(self.summary)
+        for dim_name in self.dim_names:
+            for items in (self._coord_values[dim_name],
+                          self._coord_labels[dim_name]):
+                nbytes += sys.getsizeof(items)
+                nbytes += sum(sys.getsizeof(item) for item in items)
+        return nbytes
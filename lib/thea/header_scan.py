@@ -0,0 +1,232 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file lists the variables held by a file from its headers alone, without
+loading its cubes with iris, so that only the variables chosen from a file
+with hundreds of them need to be loaded.
+
+The variables of a NetCDF file are read from its metadata, leaving out those
+which describe other variables, such as coordinates and bounds. The fields of
+a PP file are grouped by their STASH codes, and named from the table that
+iris uses. Each Variable gives the iris constraint which loads just its
+cubes.
+
+"""
+import collections
+import os.path
+
+import thea.chunk_reader as chunk_reader
+import thea.deferred as deferred
+import thea.pp_index as pp_index
+
+# Only needed once a file is scanned. See the deferred module.
+iris = deferred.defer('iris')
+netCDF4 = deferred.defer('netCDF4')
+um_cf_map = deferred.defer('iris.fileformats.um_cf_map')
+
+
+# Files with more variables than this are opened with a VariablePicker.
+PICKER_THRESHOLD = 20
+
+# The first bytes of a classic or 64-bit offset NetCDF file. NetCDF4 files
+# are HDF5 files.
+NETCDF_SIGNATURES = [b'CDF\x01', b'CDF\x02', b'CDF\x05']
+
+# The attributes of a NetCDF variable which name other variables that
+# describe it, so are not variables to be loaded themselves.
+REFERENCE_ATTRIBUTES = ['coordinates', 'bounds', 'climatology',
+                        'grid_mapping', 'cell_measures',
+                        'ancillary_variables', 'formula_terms']
+
+
+class Variable(object):
+    """
+    A variable of a file, as listed by scan_variables().
+
+    """
+    def __init__(self, name, shape, units, var_name=None, stash=None):
+        """
+        Args:
+
+        * name
+            String holding the name of the variable, as iris would give it.
+
+        * shape
+            String describing the shape of the variable.
+
+        * units
+            String holding the units of the variable.
+
+        Kwargs:
+
+        * var_name
+            String holding the name of the variable of a NetCDF file.
+
+        * stash
+            String holding the STASH code of the fields of a PP file.
+
+        """
+        self.name = name
+        self.shape = shape
+        self.units = units
+        self.var_name = var_name
+        self.stash = stash
+
+    @property
+    def key(self):
+        """
+        The String which identifies the variable within its file.
+
+        """
+        return self.var_name if self.var_name is not None else self.stash
+
+    def matches(self, text):
+        """
+        Returns whether the name, key or units of the variable contain the
+        given text, ignoring case.
+
+        """
+        text = text.lower()
+        return any(text in value.lower()
+                   for value in [self.name, self.key, self.units])
+
+    def get_constraint(self):
+        """
+        Returns the iris constraint which loads the cubes of this variable.
+
+        """
+        if self.stash is not None:
+            return iris.AttributeConstraint(STASH=self.stash)
+        if hasattr(iris, 'NameConstraint'):
+            # Newer versions of iris skip the other variables entirely.
+            return iris.NameConstraint(var_name=self.var_name)
+        var_name = self.var_name
+        return iris.Constraint(cube_func=lambda cube:
+                               cube.var_name == var_name)
+
+
+def is_netcdf_file(filename):
+    """
+    Returns whether the file is a NetCDF file, of any format.
+
+    """
+    if chunk_reader.is_hdf5_file(filename):
+        return True
+    try:
+        with open(filename, 'rb') as fh:
+            return fh.read(4) in NETCDF_SIGNATURES
+    except IOError:
+        return False
+
+
+def get_referenced_names(value):
+    """
+    Returns a list of the names of the variables in the value of one of the
+    REFERENCE_ATTRIBUTES, such as 'lat lon' or 'area: cell_area'.
+
+    """
+    if not isinstance(value, basestring):
+        return []
+    return [word for word in value.split() if not word.endswith(':')]
+
+
+def scan_netcdf(filename):
+    """
+    Returns a list of the Variables of a NetCDF file.
+
+    """
+    dataset = netCDF4.Dataset(filename)
+    try:
+        referenced = set(dataset.dimensions)
+        for nc_variable in dataset.variables.values():
+            for attribute in REFERENCE_ATTRIBUTES:
+                referenced.update(get_referenced_names(
+                    getattr(nc_variable, attribute, None)))
+        variables = []
+        for var_name, nc_variable in dataset.variables.items():
+            if var_name in referenced:
+                continue
+            name = (getattr(nc_variable, 'standard_name', None) or
+                    getattr(nc_variable, 'long_name', None) or var_name)
+            shape = ' x '.join(str(length) for length in nc_variable.shape)
+            variables.append(Variable(
+                name, shape or 'scalar',
+                str(getattr(nc_variable, 'units', '')), var_name=var_name))
+    finally:
+        dataset.close()
+    return variables
+
+
+def scan_pp(filename):
+    """
+    Returns a list of the Variables of a PP file, one for each STASH code in
+    the order first found.
+
+    """
+    fields = collections.OrderedDict()
+    for _, ints, _ in pp_index.scan_headers(filename):
+        stash = pp_index.get_stash(ints)
+        if stash not in fields:
+            fields[stash] = [0, ints[pp_index.LBROW], ints[pp_index.LBNPT]]
+        fields[stash][0] += 1
+    variables = []
+    for stash, (count, rows, columns) in fields.items():
+        cf_name = um_cf_map.STASH_TO_CF.get(stash)
+        name, units = stash, ''
+        if cf_name is not None:
+            name = cf_name.standard_name or cf_name.long_name or stash
+            units = cf_name.units or ''
+        shape = '{} fields of {} x {}'.format(count, rows, columns)
+        variables.append(Variable(name, shape, units, stash=stash))
+    return variables
+
+
+def scan_variables(filename):
+    """
+    Returns a list of the Variables of a NetCDF or PP file, or None if the
+    file is of another format or can not be scanned, in which case it should
+    be loaded whole.
+
+    """
+    if not os.path.isfile(filename):
+        return None
+    try:
+        if pp_index.is_pp_file(filename):
+            return scan_pp(filename)
+        if is_netcdf_file(filename):
+            return scan_netcdf(filename)
+    except (IOError, OSError, RuntimeError, ValueError, ImportError):
+        # Including a missing netCDF4, which iris may not need.
+        pass
+    return None
@@ -0,0 +1,169 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file contains the settings of large cube mode, and decides when it is
+used.
+
+A cube too large to be read or drawn in full quickly makes the interface
+unusable unless several settings are changed together. In large cube mode,
+the window keeps the data of other cubes unread, estimates a fixed colorbar
+from a sample of the slices, draws a reduced version of each slice, fills the
+table of data a page at a time and waits longer before reading ahead. The
+mode is chosen from the size of the cube, but can be forced on or off.
+
+"""
+import thea.memory as memory
+
+
+# The sizes above which a cube is treated as large: 'nbytes' the bytes of
+# data in the whole cube, and 'cells' its number of cells.
+DEFAULT_THRESHOLDS = {'nbytes': 2 * 1024 ** 3,
+                      'cells': 2 * 10 ** 8}
+
+# How large cube mode is chosen: from the size of the cube, or always on or
+# off.
+MODES = ('auto', 'on', 'off')
+
+# The greatest number of points drawn along each dimension of a slice.
+MAX_POINTS = 1000
+
+# The number of rows added to the table of data each time the user scrolls to
+# the end of it.
+TABLE_PAGE_ROWS = 500
+
+# The number of milliseconds that the render scheduler waits for the user to
+# pause before reading a slice.
+RENDER_DELAY = 150
+
+# The most milliseconds that the render scheduler waits before reading a
+# slice while the user keeps moving through the slices.
+RENDER_MAX_WAIT = 600
+
+# The number of slices read by each batch of the background calculation of a
+# fixed colorbar, so that renders are held up for less time.
+RANGE_BATCH_SLICES = 4
+
+
+def parse_threshold(text):
+    """
+    Reads a threshold given on the command line as NAME=VALUE, such as
+    'nbytes=4G' or 'cells=1e9', returning a (name, value) tuple.
+
+    """
+    name, _, value = text.partition('=')
+    if name not in DEFAULT_THRESHOLDS or not value:
+        raise ValueError('Thresholds are given as NAME=VALUE, where NAME is '
+                         'one of {}.'.format(
+                             ', '.join(sorted(DEFAULT_THRESHOLDS))))
+    if name == 'nbytes':
+        return name, memory.parse_size(value)
+    return name, int(float(value))
+
+
+def get_cells(schema):
+    """
+    Returns the number of cells in the cube described by the schema.
+
+    """
+    cells = 1
+    for size in schema.shape:
+        cells *= size
+    return cells
+
+
+def get_nbytes(schema):
+    """
+    Returns the number of bytes of data in the cube described by the schema.
+
+    """
+    return get_cells(schema) * schema.itemsize
+
+
+def is_large(schema, thresholds=None):
+    """
+    Returns whether the cube described by the schema is over either of the
+    thresholds.
+
+    Args:
+
+    * schema
+        The gui_logic.CubeSchema of the cube.
+
+    Kwargs:
+
+    * thresholds
+        Dictionary holding the thresholds, by default DEFAULT_THRESHOLDS.
+
+    """
+    if thresholds is None:
+        thresholds = DEFAULT_THRESHOLDS
+    cells = get_cells(schema)
+    return (cells > thresholds['cells'] or
+            cells * schema.itemsize > thresholds['nbytes'])
+
+
+def use_large_cube_mode(mode, schema, thresholds=None):
+    """
+    Returns whether large cube mode should be used for the given cube.
+
+    Args:
+
+    * mode
+        One of MODES.
+
+    * schema
+        The gui_logic.CubeSchema of the cube, or None if no cube is loaded.
+
+    Kwargs:
+
+    * thresholds
+        See is_large().
+
+    """
+    if mode == 'on':
+        return True
+    if mode == 'off' or schema is None:
+        return False
+    return is_large(schema, thresholds)
+
+
+def describe(schema):
+    """
+    Returns the text shown in the status bar while in large cube mode.
+
+    """
+    if schema is None:
+        return 'Large cube mode'
+    return 'Large cube mode ({})'.format(
+        memory.format_size(get_nbytes(schema)))
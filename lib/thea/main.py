@@ -44,15 +44,130 @@ import warnings
 warnings.filterwarnings("ignore")
 
 
+import argparse
 import os.path
 import sys
 
 # Ensures that the package is on the Python path.
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from PySide import QtGui
+import weakref
 
-import thea.main_window as main_window
+from PySide import QtCore, QtGui
+
+import thea.cost as cost
+import thea.deferred as deferred
+import thea.disk_cache as disk_cache
+import thea.features as features
+import thea.large_cube as large_cube
+import thea.memory as memory
+import thea.single_instance as single_instance
+import thea.timing as timing
+import thea.transcode as transcode
+import thea.worker_pool as worker_pool
+
+# Not imported until it is known that a window is needed, so that handing a
+# file to a running instance is quick.
+main_window = deferred.defer('thea.main_window')
+
+
+# The log written by --profile unless another is given with --profile-log.
+DEFAULT_PROFILE_LOG = 'thea_profile.jsonl'
+
+# The file written by --trace unless another is given with --trace-file.
+DEFAULT_TRACE_FILE = 'thea_trace.json'
+
+
+def parse_args(args):
+    """
+    Reads the command line arguments, returning an argparse.Namespace.
+
+    Args:
+
+    * args
+        List of Strings holding the arguments, not including the program name.
+
+    """
+    parser = argparse.ArgumentParser(
+        prog='thea',
+        description='A lightweight visualisation GUI for Iris cubes.')
+    parser.add_argument('filename', nargs='?', default=None,
+                        help='file to open')
+    parser.add_argument('--profile', action='store_true',
+                        help='write the time taken by each stage of loading '
+                        'and drawing to the profile log, as JSON lines')
+    parser.add_argument('--profile-log', metavar='LOG', default=None,
+                        help='the profile log, which implies --profile '
+                        '(default: {})'.format(DEFAULT_PROFILE_LOG))
+    parser.add_argument('--trace', action='store_true',
+                        help='record a timeline of the session, and write it '
+                        'to the trace file on exit for viewing in '
+                        'chrome://tracing or Perfetto')
+    parser.add_argument('--trace-file', metavar='FILE', default=None,
+                        help='the trace file, which implies --trace. A file '
+                        'which is not a trace is never overwritten '
+                        '(default: {})'.format(DEFAULT_TRACE_FILE))
+    parser.add_argument('--record', metavar='FILE', default=None,
+                        help='record a snapshot of the interface to FILE '
+                        'each time the plot is drawn, for replaying with '
+                        'python -m thea.benchmarks.replay')
+    parser.add_argument('--memory-budget', type=memory.parse_size,
+                        default=None, metavar='SIZE',
+                        help='release cached data to keep the memory used '
+                        'below SIZE, such as 2G or 512M')
+    parser.add_argument('--limit', type=cost.parse_limit, action='append',
+                        default=[], metavar='NAME=VALUE',
+                        help='ask before an operation estimated to cost more '
+                        'than VALUE, where NAME is one of scan or load (in '
+                        'bytes, such as 2G), or table or contour (in cells, '
+                        'such as 1e7). May be given more than once')
+    parser.add_argument('--large-cube', choices=large_cube.MODES,
+                        default='auto',
+                        help='use large cube mode, which keeps the interface '
+                        'quick on very large cubes, when the cube is over '
+                        'the thresholds (auto), always (on) or never (off) '
+                        '(default: %(default)s)')
+    parser.add_argument('--large-cube-threshold',
+                        type=large_cube.parse_threshold, action='append',
+                        default=[], metavar='NAME=VALUE',
+                        help='treat a cube as large when it is over VALUE, '
+                        'where NAME is nbytes (such as 4G) or cells (such '
+                        'as 1e9). May be given more than once')
+    parser.add_argument('--feature-store', metavar='DIR', default=None,
+                        help='the directory in which the Natural Earth '
+                        'coastlines, borders, rivers and lakes are kept '
+                        '(default: $THEA_FEATURE_STORE or {})'.format(
+                            features.DEFAULT_STORE_DIR))
+    parser.add_argument('--prewarm-features', action='store_true',
+                        help='download every scale of the Natural Earth '
+                        'features into the feature store and index them, '
+                        'then exit')
+    parser.add_argument('--transcode', action='store_true',
+                        help='copy each cube into a local store, laid out '
+                        'for stepping through the slices of the chosen '
+                        'dimensions, and read it from there once copied '
+                        '(store: $THEA_TRANSCODE_STORE or {})'.format(
+                            transcode.DEFAULT_STORE_DIR))
+    parser.add_argument('--disk-cache', metavar='DIR', default=None,
+                        help='the directory in which extracted slices and '
+                        'colorbar ranges are kept for later sessions, '
+                        'which may be shared by several of them but must '
+                        'be private to the user (default: '
+                        '$THEA_CACHE_DIR or {})'.format(
+                            disk_cache.DEFAULT_CACHE_DIR))
+    parser.add_argument('--disk-cache-size', type=memory.parse_size,
+                        default=disk_cache.DEFAULT_MAX_BYTES, metavar='SIZE',
+                        help='remove the results used least recently to '
+                        'keep the disk cache below SIZE, such as 10G '
+                        '(default: 2G)')
+    parser.add_argument('--no-disk-cache', action='store_true',
+                        help='do not keep results for later sessions')
+    parser.add_argument('--single-instance', action='store_true',
+                        help='open the file in a new window of a Thea '
+                        'already running with this option, sharing its '
+                        'loaded data, instead of starting another. The '
+                        'other options are then ignored')
+    return parser.parse_args(args)
 
 
 def main():
@@ -62,15 +177,115 @@ def main():
     with a file as an argument, and then opens a new main window for the
     program.
 
+    'thea serve' runs the HTTP service of thea.serve instead, unless there is
+    a file named serve in the current directory, which is opened as any
+    other. The service can then be run with 'python -m thea.serve'.
+
     """
+    if sys.argv[1:2] == ['serve'] and not os.path.exists('serve'):
+        # Imported here, as it chooses a matplotlib backend without a GUI.
+        import thea.serve as serve
+        sys.exit(serve.main(sys.argv[2:]))
+    # Forked before Qt, or anything else, starts a thread. See the
+    # worker_pool module.
+    worker_pool.start()
     app = QtGui.QApplication(sys.argv)
-    try:
-        _, filename = sys.argv
-    except ValueError:
-        filename = None
-    _ = main_window.MainWindow(filename)
+    args = parse_args(app.arguments()[1:])
+    if args.feature_store is not None:
+        features.set_store_dir(args.feature_store)
+    if args.prewarm_features:
+        sys.exit(prewarm_features())
+    if (args.single_instance and args.filename is not None and
+            single_instance.send_file(args.filename)):
+        # The running instance opens the file.
+        sys.exit(0)
+    trace_file = args.trace_file
+    if trace_file is None and args.trace:
+        trace_file = DEFAULT_TRACE_FILE
+    if trace_file is not None:
+        if (os.path.exists(trace_file) and
+                not timing.is_trace_file(trace_file)):
+            sys.stderr.write('{} exists and is not a trace, so would not be '
+                             'overwritten\n'.format(trace_file))
+            sys.exit(2)
+        trace = timing.start_trace()
+        app.aboutToQuit.connect(lambda: trace.save(trace_file))
+    profile_log = args.profile_log
+    if profile_log is None and args.profile:
+        profile_log = DEFAULT_PROFILE_LOG
+    options = {'profile_log': profile_log,
+               'record': args.record,
+               'memory_budget': args.memory_budget,
+               'limits': dict(args.limit),
+               'large_cube_mode': args.large_cube,
+               'large_cube_thresholds': dict(args.large_cube_threshold),
+               'loaded_files': weakref.WeakValueDictionary(),
+               'transcode_cubes': args.transcode,
+               'result_cache': None}
+    if not args.no_disk_cache:
+        options['result_cache'] = disk_cache.DiskCache(args.disk_cache,
+                                                       args.disk_cache_size)
+    windows = []
+    open_window(windows, args.filename, options)
+    if args.single_instance:
+        server = single_instance.InstanceServer(parent=app)
+        if server.listen():
+            server.file_requested.connect(
+                lambda filename: open_window(windows, filename, options))
+        elif single_instance.is_running():
+            # Started without a file, so it was not sent to the running
+            # instance, which keeps receiving those of later calls.
+            sys.stderr.write('Another instance of thea is listening for '
+                             'files from other calls of thea\n')
+        else:
+            sys.stderr.write('Unable to listen for files from other calls '
+                             'of thea: {}\n'.format(server.error()))
     sys.exit(app.exec_())
 
 
+def prewarm_features():
+    """
+    Fills the feature store, reporting progress on the terminal. Returns the
+    exit status: 1 if any feature could not be stored, otherwise 0.
+
+    """
+    def report(category, name, scale):
+        print('Storing {} {} at {}'.format(category, name, scale))
+        sys.stdout.flush()
+
+    print('Filling the feature store in {}'.format(features.get_store_dir()))
+    failures = features.prewarm(report=report)
+    for category, name, scale, message in failures:
+        print('Unable to store {} {} at {}: {}'.format(category, name, scale,
+                                                      message))
+    return 1 if failures else 0
+
+
+def open_window(windows, filename, options):
+    """
+    Opens a MainWindow for the file, and brings it to the front. The window
+    is kept in the list of windows until it is closed.
+
+    Args:
+
+    * windows
+        List of the open windows.
+
+    * filename
+        String holding the path to the file, or None.
+
+    * options
+        Dictionary of the keyword arguments passed to the MainWindow.
+
+    """
+    window = main_window.MainWindow(filename, **options)
+    window.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+    window.destroyed.connect(lambda: windows.remove(window))
+    windows.append(window)
+    window.raise_()
+    window.activateWindow()
+    return window
+
+
 if __name__ == '__main__':
     main()
@@ -35,28 +35,65 @@
 This file contains the MainWindow Class.
 
 """
+import functools
+import os
+import sys
+import time
+import weakref
+
 import matplotlib
 matplotlib.use('Qt4Agg')
 matplotlib.rcParams['backend.qt4'] = 'PySide'
 
-import iris
-import iris.plot as iplt
 from matplotlib.backends.backend_qt4agg \
     import NavigationToolbar2QTAgg as NavigationToolbar
-import matplotlib.pyplot as plt
+from matplotlib.collections import QuadMesh
 from PySide import QtGui, QtCore
 from PySide.QtGui import QApplication
 
 import thea.about_dialog as about_dialog
+import thea.chunk_reader as chunk_reader
 import thea.colorbar_dialog as colorbar_dialog
-import thea.cube_logic as cl
+import thea.cost as cost
+import thea.deferred as deferred
+import thea.disk_cache as disk_cache
 import thea.gui_logic as gl
+import thea.header_scan as header_scan
+import thea.large_cube as large_cube
 from thea.main_window_layout import Ui_MainWindow
-import thea.matplotlib_widget as matplotlib_widget
+import thea.memory as memory
+import thea.pp_index as pp_index
+import thea.profile_capture as profile_capture
+import thea.pyramid as pyramid
+import thea.render_scheduler as render_scheduler
+import thea.render_worker as render_worker
+import thea.session as session
 import thea.source_code_dialog as source_code_dialog
-import thea.source_code_generator as source_code_generator
 import thea.table_model as table_model
+import thea.timing as timing
+import thea.transcode as transcode
+import thea.variable_picker as variable_picker
+
+# Iris, cartopy and pyplot take seconds to import, and are not needed until a
+# file is opened, so the window is shown without them. See the deferred
+# module.
+iris = deferred.defer('iris')
+cl = deferred.defer('thea.cube_logic')
+pl = deferred.defer('thea.panel_logic')
+source_code_generator = deferred.defer('thea.source_code_generator')
+
+# The deferred modules needed to load and draw a file, which are imported
+# ahead of time. The others are imported when they are first used.
+PRELOADED = [iris, cl]
+
 
+# The number of slices read by each RangeTask when refining an approximate
+# colorbar range.
+RANGE_BATCH_SLICES = 16
+
+# The number of milliseconds between checks for the panels drawn by the
+# worker processes of panel_logic.
+PANEL_POLL_INTERVAL = 50
 
 
 class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
@@ -70,7 +107,11 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
     in other files.
 
     """
-    def __init__(self, filename):
+    def __init__(self, filename, profile_log=None, record=None,
+                 memory_budget=None, limits=None, large_cube_mode='auto',
+                 large_cube_thresholds=None, loaded_files=None,
+                 transcode_cubes=False, pick_variables=True,
+                 result_cache=None):
         """
         Initial setup of the window, including defining some instance
         variables, setting up the interface, and, if given, loading the
@@ -84,35 +125,205 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             open imediately (cubeviz path) in which case the filename is the
             path, or without (cubeviz) in which the filename is None.
 
+        Kwargs:
+
+        * profile_log
+            String holding the path of a file to which the time taken by each
+            stage of loading and drawing is written, or None.
+
+        * record
+            String holding the path of a file to which a snapshot of the
+            interface is written each time the plot is drawn, so that the
+            session can be replayed by benchmarks/replay.py, or None.
+
+        * memory_budget
+            int holding the number of bytes that the window should try to
+            stay within, or None for no limit. See track_memory().
+
+        * limits
+            Dictionary overriding any of cost.DEFAULT_LIMITS, above which the
+            user is asked before an expensive operation is started.
+
+        * large_cube_mode
+            One of large_cube.MODES, choosing whether large cube mode is used
+            from the size of the cube, or always on or off.
+
+        * large_cube_thresholds
+            Dictionary overriding any of large_cube.DEFAULT_THRESHOLDS, above
+            which a cube is treated as large.
+
+        * loaded_files
+            weakref.WeakValueDictionary shared between the windows of one
+            instance of Thea, so that a file opened in several of them is
+            only loaded once. See load_file().
+
+        * transcode_cubes
+            Boolean holding whether each cube is transcoded into a local
+            store laid out for the chosen dimensions, and read from there.
+            See start_transcode().
+
+        * pick_variables
+            Boolean holding whether the user chooses which variables to load
+            from a file with more than header_scan.PICKER_THRESHOLD of them.
+            See open_file().
+
+        * result_cache
+            disk_cache.DiskCache in which the extracted slices and the
+            ranges of fixed colorbars are kept between sessions, or None.
+            See get_cache_parts().
+
         """
         super(MainWindow, self).__init__()
         # define the dialogs to be used.
         self.colorbar_dialog = colorbar_dialog.ColorbarOptions()
         self.code_view = source_code_dialog.Viewer()
         self.about = about_dialog.About()
+        self.variable_picker = variable_picker.VariablePicker()
 
         # define some variables for this instance of the program
 
-        # fixed_colorbar holds whether the calculation required to fix the
-        # colorbar across all slices has been performed for this cube.
-        self.filename = filename
-        self.fixed_colorbar = False
-        # colorbar_max/min define the range over which the colorbar is set.
+        # filename is the path of the file shown, set by load_file().
+        self.filename = None
+        # fixed_colorbar_ranges caches the results of the calculation required
+        # to fix the colorbar across all slices, keyed by the cube and the
+        # chosen dimensions. See get_fixed_colorbar().
+        self.fixed_colorbar_ranges = {}
+        # approximate_colorbar_ranges caches the estimates of the same ranges
+        # made from a sample of the slices, with their confidence, and
+        # range_refinements holds the exact calculations of them which are
+        # running in the background. See get_approximate_colorbar().
+        self.approximate_colorbar_ranges = {}
+        self.range_refinements = {}
         self.cube_loaded = False
         self.set_global = None
+        # plotted_cube is the slice last drawn by render_finished(), or None
+        # if no slice of the current file has been drawn.
+        self.plotted_cube = None
         self.can_draw_map = None
+        # schemas maps the index of each loaded cube to its
+        # gui_logic.CubeSchema.
+        self.schemas = {}
+        self.schema = None
         # holds the number of dimensions of the current cube.
         self.ndim = 3
         # self.num_collapsed_dims ( = self.ndim - 3) holds the current no. of
         # collapsed dimension slots are required.
         self.num_collapsed_dims = 0
+        # render_scheduler coalesces the redraws requested while the user
+        # moves quickly through the slices.
+        self.render_scheduler = render_scheduler.RenderScheduler(
+            self.scheduled_update, parent=self)
+        # Sub cubes are extracted by RenderTasks run in render_pool. Only one
+        # task runs at a time, as the file may not be safe to read from
+        # several threads. render_generation identifies the latest render.
+        self.render_pool = QtCore.QThreadPool(self)
+        self.render_pool.setMaxThreadCount(1)
+        self.render_task = None
+        self.render_generation = 0
+        # Large 2D slices are redrawn from a pyramid of reduced copies as
+        # they are zoomed and panned. pyramid_task builds the pyramid of the
+        # plotted slice, and pyramid_view redraws it. See start_pyramid().
+        self.pyramid_store = pyramid.PyramidStore()
+        self.pyramid_task = None
+        self.pyramid_view = None
+        self.pyramid_timer = QtCore.QTimer(self)
+        self.pyramid_timer.setSingleShot(True)
+        self.pyramid_timer.setInterval(pyramid.REDRAW_DELAY)
+        self.pyramid_timer.timeout.connect(self.redraw_pyramid)
+        # panel_task prepares the panels, and panels holds those being drawn
+        # by the worker processes of panel_logic, which panel_timer checks
+        # for. See show_panels().
+        self.panel_task = None
+        self.panels = None
+        self.panel_timer = QtCore.QTimer(self)
+        self.panel_timer.setInterval(PANEL_POLL_INTERVAL)
+        self.panel_timer.timeout.connect(self.check_panels)
+        # transcoder writes the current cube into transcode_store a batch at
+        # a time, run by transcode_task. transcoded maps the index of each
+        # cube read from the store to its key. See start_transcode().
+        self.transcode_cubes = transcode_cubes
+        self.transcode_store = transcode.TranscodeStore()
+        self.transcoder = None
+        self.transcode_key = None
+        self.transcode_index = None
+        self.transcode_identity = None
+        self.transcode_task = None
+        self.transcoded = {}
+        # slice_readers maps the index of each cube to an object which reads
+        # its slices more quickly than iris: a pp_index.FieldIndex, once the
+        # index of a PP file has been read or built by index_task, or a
+        # chunk_reader.ChunkReader for a compressed NetCDF4 variable.
+        # Building a field index only reads the headers of the fields, which
+        # is safe alongside a RenderTask, so it has its own pool. See
+        # start_slice_readers().
+        self.slice_readers = {}
+        self.index_task = None
+        self.index_pool = QtCore.QThreadPool(self)
+        self.index_pool.setMaxThreadCount(1)
+        # timing_log records how long each stage of the slow operations took.
+        self.timing_log = None
+        if profile_log is not None:
+            self.timing_log = timing.TimingLog(profile_log)
+        # profile_capture is the profile_capture.ProfileCapture running over
+        # the next few updates, if the user has asked for one.
+        self.profile_capture = None
+        # session_recorder records the session for replaying later.
+        self.session_recorder = None
+        if record is not None:
+            self.session_recorder = session.SessionRecorder(record)
+        # memory accounts for the large objects held by the window, and
+        # releases them to stay within the budget.
+        self.memory = memory.MemoryManager(memory_budget,
+                                           on_change=self.show_memory_usage)
+        # cost_limits holds the estimated costs above which the user is
+        # asked before starting an expensive operation. The user's answers
+        # are remembered until the choices that led to them change.
+        self.cost_limits = dict(cost.DEFAULT_LIMITS)
+        self.cost_limits.update(limits or {})
+        self.declined_scans = set()
+        self.declined_table_shape = None
+        # large_cube_setting holds how large cube mode is chosen, and
+        # large_cube_mode whether it is in use for the current cube. See
+        # update_large_cube_mode().
+        self.large_cube_setting = large_cube_mode
+        self.large_cube_thresholds = dict(large_cube.DEFAULT_THRESHOLDS)
+        self.large_cube_thresholds.update(large_cube_thresholds or {})
+        self.large_cube_mode = False
+        # loaded_files maps the path and modification time of each file open
+        # in any window to its cubes, which are kept alive by held_cubes.
+        # Each window has a list of its own of the cubes, in which it swaps
+        # cubes without affecting other windows. See release_cube_data().
+        self.loaded_files = loaded_files
+        self.held_cubes = None
+        self.cubes = []
+        # lazy_cubes maps the index of each cube to a copy of it made before
+        # any of its data was read. See release_cube_data().
+        self.lazy_cubes = {}
+        if self.loaded_files is None:
+            self.loaded_files = weakref.WeakValueDictionary()
+        # When only the chosen variables of a file are loaded, the cubes of
+        # the others are None until they are selected. cube_variables maps
+        # the index of each cube to its header_scan.Variable and its
+        # position among the cubes of the variable, and held_variables keeps
+        # the cubes loaded for each variable. See load_file().
+        self.pick_variables = pick_variables
+        self.cube_variables = {}
+        self.held_variables = {}
+        self.result_cache = result_cache
+        # A weak reference to the cube last identified, with its identity.
+        # See get_cube_identity().
+        self.cube_identity = None
         self.init_ui()
         self.set_enabled()
         self.set_actions()
+        # The window is drawn before anything slow is started, by waiting
+        # for the event loop.
         if not filename is None:
-            self.load_file(filename)
-            self.set_dimension_combos()
-            self.update()
+            QtCore.QTimer.singleShot(0, functools.partial(self.open_file,
+                                                          filename))
+        else:
+            QtCore.QTimer.singleShot(0, functools.partial(
+                deferred.preload_in_background, PRELOADED))
 
     def init_ui(self):
         """
@@ -133,6 +344,16 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.data_table.setAlternatingRowColors(True)
         self.gridLayout_8.addWidget(self.data_table, 0, 0, 1, 1)
 
+        # shows the memory used by the session in the status bar.
+        self.memory_label = QtGui.QLabel(self.statusBar())
+        self.statusBar().addPermanentWidget(self.memory_label)
+        self.show_memory_usage()
+
+        # shows whether large cube mode is in use.
+        self.large_cube_label = QtGui.QLabel(self.statusBar())
+        self.statusBar().addPermanentWidget(self.large_cube_label)
+        self.large_cube_label.hide()
+
         self.show()
 
     def set_actions(self):
@@ -163,6 +384,9 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.action_previous_slice.triggered.connect(self.previous_slice)
         self.action_about.triggered.connect(self.open_about_dialog)
         self.action_source_code.triggered.connect(self.generate_source_code)
+        self.action_show_panels.triggered.connect(self.show_panels)
+        self.action_profile.toggled.connect(self.toggle_profile_capture)
+        self.action_large_cube.triggered.connect(self.toggle_large_cube_mode)
 
         # set up signals from plot menu.
         self.select_plot_method.activated.connect(self.set_enabled)
@@ -181,6 +405,14 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             self.state_changed_fix_colorbar)
         self.select_slice_combo.currentIndexChanged.connect(self.set_enabled)
 
+        # moving through the slices redraws the plot once the user pauses.
+        self.select_slice_combo.activated.connect(
+            self.render_scheduler.request)
+        self.select_slice_scroll.actionTriggered.connect(
+            self.render_scheduler.request)
+        self.select_slice_scroll.sliderReleased.connect(
+            self.render_scheduler.request)
+
         self.select_dimension_1.activated.connect(self.arrange_coords_1)
         self.select_dimension_2.activated.connect(self.arrange_coords_2)
         self.select_sliced_dim.activated.connect(self.arrange_coords_3)
@@ -190,6 +422,8 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             self.set_enabled)
         self.colorbar_dialog.fixed_colorbar.clicked.connect(
             self.state_changed_fix_colorbar)
+        self.colorbar_dialog.approximate_colorbar.clicked.connect(
+            self.state_changed_fix_colorbar)
         self.colorbar_dialog.min_contour.valueChanged.connect(
             self.set_enabled)
         self.colorbar_dialog.max_contour.valueChanged.connect(
@@ -198,6 +432,8 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             self.update_max_min)
         self.colorbar_dialog.fixed_colorbar.clicked.connect(
             self.update_max_min)
+        self.colorbar_dialog.approximate_colorbar.clicked.connect(
+            self.update_max_min)
         self.colorbar_dialog.manual_range.clicked.connect(self.update_max_min)
 
         self.cube_info_tab.currentChanged.connect(self.show_data)
@@ -209,13 +445,20 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         called whenever the cube is changed.
 
         """
+        cube_index = self.select_cube.currentIndex()
+        if (self.cubes[cube_index] is None and
+                not self.load_selected_variable(cube_index)):
+            return
+
         QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
 
         self.clear_dims()
 
         # Cube is set and the summary is printed to the information tab.
         self.cube = self.get_current_cube()
-        self.print_cube_browser.setText(str(self.cube))
+        self.schema = self.get_current_schema()
+        self.print_cube_browser.setText(self.schema.summary)
+        self.update_large_cube_mode()
 
         # we check to see if we need to add or remove collapsed dim slots
         old_ndim = self.ndim if self.ndim > 3 else 3
@@ -236,8 +479,8 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
                 self.num_collapsed_dims -= 1
 
         # Set some instance variables about the cube.
-        self.dim_names = gl.get_dim_names(self.cube)
-        self.ndim = self.cube.ndim
+        self.dim_names = list(self.schema.dim_names)
+        self.ndim = self.schema.ndim
 
         # Fill the combo boxes
         self.fill_combo("select_dimension_1", self.dim_names, True)
@@ -250,7 +493,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
             # get data on the coord points, and fill the combo box.
             dim = self.select_sliced_dim.currentText()
-            data = gl.get_coord_values(self.cube, dim, self.dim_names)
+            data = self.schema.coord_labels(dim)
             self.fill_combo("select_slice_combo", data, True)
             self.set_slice_scroll()
             self.select_slice_scroll.setEnabled(True)
@@ -280,40 +523,853 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         This method is called whenever a new cube is loaded, or when the
         update button is pressed. It is responsible for gathering the
         information needed to plot the cube from the interface, and passing
-        it to the update function in cubeLogic. It also calls for the
-        information about the sub cube to be displayed.
+        it to a RenderTask to extract the sub cube. Once this is done,
+        render_finished() plots the sub cube and displays information about
+        it.
 
         """
-        QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        if (self.profile_capture is not None and
+                not self.profile_capture.running):
+            # Started here rather than when it was asked for, so that the
+            # capture holds the updates and not the idle time before them.
+            self.profile_capture.start()
+        with timing.trace_span('update'):
+            self.update_button.setEnabled(False)
+            self.start_render(preview=False)
 
-        self.update_button.setEnabled(False)
+    def scheduled_update(self):
+        """
+        Called by the render_scheduler once the user has paused, or has kept
+        moving for its maximum wait. While the slice scrollbar is still held
+        down, or the user is still moving, only a quick, coarse preview is
+        drawn. The full plot follows when the scrollbar is released or the
+        user pauses.
 
-        interface_status = self.get_status()
+        """
+        if (self.select_slice_scroll.isSliderDown() or
+                self.render_scheduler.overdue):
+            self.update_preview()
+        else:
+            self.update()
 
-        self.clear_fig()
+    def update_preview(self):
+        """
+        Draws a coarse version of the current slice. Unlike update(), the
+        summary and data of the plotted cube are left alone, and failures are
+        only reported in the status bar.
+
+        """
+        self.start_render(preview=True)
+
+    def start_render(self, preview):
+        """
+        Cancels any render that is still in progress, and starts a new
+        RenderTask for the current state of the interface. The interface can
+        still be used while the task is running.
+
+        Args:
+
+        * preview
+            Boolean holding whether only a coarse preview should be drawn.
+
+        """
+        # This render supersedes any that are waiting to be drawn.
+        self.cancel_render()
+
+        timings = timing.Timings('preview' if preview else 'update')
+        with timing.recording(timings):
+            # A scan for a fixed colorbar is left to the RenderTask.
+            interface_status = self.resolve_status(self.get_status(),
+                                                   defer_scan=True)
+        interface_status['preview'] = preview
+        if interface_status['cube loaded'] and not preview:
+            estimate = cost.estimate_contour(
+                interface_status['schema'], interface_status['dim indices'],
+                interface_status['plot type'],
+                interface_status['num contours'])
+            if cost.is_over_limit(estimate, self.cost_limits):
+                interface_status['max points'] = cost.get_downsample_points(
+                    estimate, self.cost_limits)
+            if self.large_cube_mode:
+                interface_status['max points'] = min(
+                    interface_status.get('max points') or
+                    large_cube.MAX_POINTS, large_cube.MAX_POINTS)
+            if self.transcode_cubes:
+                self.start_transcode(interface_status)
+        if interface_status['cube loaded']:
+            # The RenderTask reuses the sub cube extracted by an earlier
+            # session, or stores it for later ones.
+            interface_status['result cache'] = self.result_cache
+            interface_status['cache key'] = self.get_slice_cache_key(
+                interface_status)
+        if (self.session_recorder is not None and not preview and
+                interface_status['cube loaded']):
+            self.session_recorder.record(interface_status)
+
+        self.render_task = render_worker.RenderTask(
+            self.render_generation, interface_status, timings,
+            capture=self.profile_capture,
+            figure_size=self.matplotlib_display.get_figure_size())
+        self.render_task.signals.finished.connect(self.render_finished)
+        self.render_task.signals.failed.connect(self.render_failed)
+        self.render_task.signals.colorbar_fixed.connect(self.colorbar_fixed)
+
+        self.matplotlib_display.setCursor(QtCore.Qt.BusyCursor)
         self.statusBar().showMessage('Drawing Cube')
+        self.render_pool.start(self.render_task)
+
+    def cancel_render(self):
+        """
+        Drops any render that is waiting to be drawn, and cancels the
+        RenderTask in progress. Any result it still sends will be ignored, as
+        will any panels still being prepared or drawn.
+
+        """
+        self.render_scheduler.cancel()
+        if self.panel_task is not None or self.panels is not None:
+            if self.panel_task is not None:
+                self.panel_task.cancel()
+            self.panel_task = None
+            self.panels = None
+            self.panel_timer.stop()
+            QApplication.restoreOverrideCursor()
+        if self.render_task is not None:
+            self.render_task.cancel()
+            self.render_task = None
+        self.render_generation += 1
 
+    def render_finished(self, generation, sub_cube, rendered):
+        """
+        Called when a RenderTask has extracted its sub cube and drawn it. The
+        image drawn is shown, and unless this is a preview, a summary of the
+        sub cube is printed and its data shown.
+
+        Args:
+
+        * generation
+            int identifying the render. Results from renders other than the
+            latest are ignored.
+
+        * sub_cube
+            The cube that was plotted.
+
+        * rendered
+            The render_worker.Rendered figure.
+
+        """
+        if generation != self.render_generation:
+            return
+        trace = timing.get_trace()
+        if trace is not None:
+            # The time the result spent waiting for the event loop.
+            emitted = self.render_task.emitted
+            trace.add_event('delivered', emitted, time.time() - emitted,
+                            category='wait')
+        interface_status = self.render_task.status
+        timings = self.render_task.timings
+        preview = interface_status['preview']
+        self.render_task = None
+
+        # The old plot stays on screen until the new one is shown.
+        self.cancel_pyramid()
+        with timing.recording(timings), timing.span('show'):
+            self.matplotlib_display.show_rendered(rendered.figure,
+                                                  rendered.image)
+        set_global = rendered.set_global
+        self.matplotlib_display.unsetCursor()
+
+        if preview:
+            self.report_timings(timings, 'Preview', interface_status)
+            return
+
+        # use the data from the plotted cube to print a summary of the cube
+        # and show its data.
+        self.plotted_cube, self.set_global = sub_cube, set_global
+        self.print_cube_slice_browser.setText(str(self.plotted_cube))
+        self.track_memory()
+        self.show_data()
+        message = 'Ready'
+        if self.large_cube_mode:
+            message = 'Ready (downsampled for large cube mode)'
+        elif interface_status.get('max points') is not None:
+            message = 'Ready (downsampled for contouring)'
+        confidence = interface_status.get('colorbar confidence')
+        if confidence is not None:
+            message += (' (colorbar estimated from {} of {} slices, {:.2%} '
+                        'of values read; refining)'.format(
+                            confidence['slices'], confidence['total slices'],
+                            confidence['fraction']))
+        self.report_timings(timings, message, interface_status)
+        self.start_pyramid(interface_status)
+
+        if (self.profile_capture is not None and
+                self.profile_capture.running and
+                self.profile_capture.update_finished(interface_status)):
+            self.finish_profile_capture()
+
+    def start_pyramid(self, status):
+        """
+        Starts a PyramidTask for the plotted slice if it is a large 2D
+        pcolormesh, so that it can be redrawn at the resolution of the screen
+        once it is zoomed or panned. The task is run at a low priority, after
+        any render.
+
+        Args:
+
+        * status
+            A dictionary representing the state of the interface that the
+            slice was drawn with.
+
+        """
+        if (self.plotted_cube.ndim != 2 or
+                status['plot type'] != "pcolormesh" or
+                cost.get_plotted_cells(status['schema'],
+                                       status['dim indices']) <
+                pyramid.MIN_CELLS):
+            return
+        identity = self.get_cube_identity(status)
+        if identity is None:
+            return
+        dim_indices = status['dim indices']
+        key = pyramid.get_key(identity + ['pyramid',
+                                          sorted(dim_indices.items()),
+                                          status['slice index'],
+                                          status['collapsed indices'],
+                                          status['plot method'],
+                                          status.get('max points')])
+        self.pyramid_task = render_worker.PyramidTask(
+            self.render_generation, status, self.pyramid_store, key)
+        self.pyramid_task.signals.finished.connect(self.pyramid_finished)
+        self.pyramid_task.signals.failed.connect(self.pyramid_failed)
+        self.render_pool.start(self.pyramid_task, -1)
+
+    def pyramid_finished(self, task, slice_pyramid, crs):
+        """
+        Called when a PyramidTask has built or opened the pyramid of the
+        plotted slice. The slice is redrawn from it at the resolution of the
+        screen, and again whenever the view changes.
+
+        Args:
+
+        * task
+            The PyramidTask. Results of tasks other than the current one are
+            ignored.
+
+        * slice_pyramid
+            The pyramid.Pyramid of the slice.
+
+        * crs
+            The cartopy CRS of the edges of the pyramid, or None.
+
+        """
+        if task is not self.pyramid_task:
+            return
+        self.pyramid_task = None
+        ax = self.matplotlib_display.figure.axes[0]
+        meshes = [artist for artist in ax.collections
+                  if isinstance(artist, QuadMesh)]
+        if not meshes:
+            return
+        self.pyramid_view = pyramid.PyramidView(
+            ax, meshes[0], slice_pyramid, transform=crs,
+            schedule=self.pyramid_timer.start)
+        self.redraw_pyramid()
+
+    def pyramid_failed(self, task, message):
+        """
+        Called when a PyramidTask fails. The slice stays as it was drawn.
+
+        """
+        if task is not self.pyramid_task:
+            return
+        self.pyramid_task = None
+        self.statusBar().showMessage('Unable to Build Pyramid: ' + message)
+
+    def redraw_pyramid(self):
+        """
+        Redraws the plotted slice from its pyramid for the current view. See
+        pyramid.PyramidView.
+
+        """
+        if self.pyramid_view is None:
+            return
+        with timing.trace_span('pyramid redraw'):
+            level = self.pyramid_view.redraw()
+        if level is not None:
+            self.statusBar().showMessage(
+                'Showing 1/{} of full resolution'.format(2 ** level)
+                if level else 'Showing full resolution')
+
+    def cancel_pyramid(self):
+        """
+        Abandons the pyramid of the plotted slice, and any PyramidTask
+        building it.
+
+        """
+        self.pyramid_timer.stop()
+        if self.pyramid_task is not None:
+            self.pyramid_task.cancel()
+            self.pyramid_task = None
+        if self.pyramid_view is not None:
+            self.pyramid_view.disconnect()
+            self.pyramid_view = None
+
+    def start_transcode(self, status):
+        """
+        Replaces the current cube with its transcoded copy if it is already
+        in the store for the chosen dimensions, and otherwise starts
+        transcoding it in the background. See the transcode module. Cubes too
+        large for the store are left alone.
+
+        Args:
+
+        * status
+            A dictionary representing the state of the interface.
+
+        """
+        cube_index = status['cube index']
+        layout = transcode.get_layout(status['cube'].ndim,
+                                      status['dim indices'])
+        if layout is None:
+            return
+        identity = self.get_cube_identity(status)
+        if identity is None:
+            return
+        key = pyramid.get_key(identity + ['transcode', layout])
+        if key in (self.transcoded.get(cube_index), self.transcode_key):
+            return
+        max_bytes = self.transcode_store.max_bytes
+        if (max_bytes is not None and
+                large_cube.get_nbytes(status['schema']) > max_bytes):
+            return
+        cube = self.transcode_store.open(key, status['cube'], identity)
+        if cube is not None:
+            self.use_transcoded(cube_index, key, cube)
+            return
+        self.cancel_transcode()
+        self.transcoder = self.transcode_store.start(key, status['cube'],
+                                                     layout, identity)
+        self.transcode_key = key
+        self.transcode_index = cube_index
+        self.transcode_identity = identity
+        self.start_transcode_task()
+
+    def start_transcode_task(self):
+        """
+        Starts a TranscodeTask for the next batch of fields of the cube being
+        transcoded.
+
+        """
+        self.transcode_task = render_worker.TranscodeTask(self.transcoder)
+        self.transcode_task.signals.finished.connect(
+            self.transcode_task_finished)
+        self.transcode_task.signals.failed.connect(self.transcode_task_failed)
+        self.render_pool.start(self.transcode_task, -1)
+
+    def transcode_task_finished(self, task):
+        """
+        Called when a TranscodeTask has written its batch. Starts the next
+        batch, or once every field has been written, reads the cube from the
+        store from then on.
+
+        Args:
+
+        * task
+            The TranscodeTask. The work of a transcoder that has since been
+            cancelled is removed.
+
+        """
+        if task is not self.transcode_task:
+            task.transcoder.abandon()
+            return
+        if not self.transcoder.is_complete():
+            self.start_transcode_task()
+            return
+        key, cube_index = self.transcode_key, self.transcode_index
+        identity = self.transcode_identity
+        self.transcoder = self.transcode_key = self.transcode_task = None
+        self.transcode_identity = None
+        self.transcode_store.prune(keep=key)
+        cube = self.transcode_store.open(key, self.cubes[cube_index],
+                                         identity)
+        if cube is not None:
+            self.use_transcoded(cube_index, key, cube)
+            self.statusBar().showMessage('Transcoded Cube to Local Store')
+
+    def transcode_task_failed(self, task, message):
+        """
+        Called when a TranscodeTask fails. The cube is read from its file as
+        before.
+
+        """
+        if task is not self.transcode_task:
+            return
+        self.transcoder = self.transcode_key = self.transcode_task = None
+        self.statusBar().showMessage('Unable to Transcode Cube: ' + message)
+
+    def use_transcoded(self, cube_index, key, cube):
+        """
+        Replaces a loaded cube with its copy read from the transcode store.
+
+        """
+        self.cubes[cube_index] = cube
+        self.transcoded[cube_index] = key
+        if cube_index == self.select_cube.currentIndex():
+            self.cube = cube
+
+    def cancel_transcode(self):
+        """
+        Abandons the cube being transcoded. The fields written so far are
+        removed by the next TranscodeTask of it to run, or once the running
+        one has finished.
+
+        """
+        if self.transcoder is not None:
+            self.transcoder.cancel()
+        self.transcoder = self.transcode_key = self.transcode_task = None
+        self.transcode_identity = None
+
+    def track_memory(self):
+        """
+        Updates the memory tracked for the data of the loaded cubes, the
+        plotted slice and the drawn figure. If this takes the session over
+        its budget, the table of data, cached statistics and the data of
+        cubes other than the current one are released, in that order.
+
+        """
+        current = self.select_cube.currentIndex()
+        for index, cube in enumerate(self.cubes):
+            key = 'cube {}'.format(index)
+            nbytes = memory.get_cube_nbytes(cube)
+            if nbytes and self.large_cube_mode and index != current:
+                # In large cube mode, only the current cube is kept in
+                # memory.
+                self.release_cube_data(index)
+                nbytes = 0
+            if nbytes == 0:
+                self.memory.release(key)
+                continue
+            evict = None
+            if index != current:
+                evict = functools.partial(self.release_cube_data, index)
+            self.memory.track(key, nbytes, memory.DATA, evict)
+
+        # A 1D or 2D cube is plotted as it is, so is already counted above.
+        if (self.plotted_cube is not None and
+                self.plotted_cube is not self.cubes[current]):
+            self.memory.track('slice',
+                              memory.get_cube_nbytes(self.plotted_cube))
+        else:
+            self.memory.release('slice')
+
+        # The Agg renderer holds 4 bytes for each pixel of the figure.
+        width, height = self.matplotlib_display.canvas.get_width_height()
+        self.memory.track('figure', width * height * 4)
+
+    def show_memory_usage(self):
+        """
+        Shows the memory used by the session in the status bar.
+
+        """
+        text = self.memory.summary()
+        if self.memory.is_over_budget():
+            text += ' (over budget)'
+        self.memory_label.setText(text)
+
+    def keep_lazy_copy(self, index):
+        """
+        Keeps a copy of the cube at the given index of the list of cubes, to
+        be swapped in by release_cube_data(), if none of its data has been
+        read yet. A copy of a lazy cube shares its proxies for the data, so
+        is cheap.
+
+        """
+        cube = self.cubes[index]
+        if cube is not None and memory.has_lazy_data(cube):
+            self.lazy_cubes[index] = cube.copy()
+        else:
+            self.lazy_cubes.pop(index, None)
+
+    def get_lazy_cube(self, index):
+        """
+        Returns the cube at the given index of the list of cubes, or the copy
+        of it kept by keep_lazy_copy() if some of its data has been read, so
+        that it is cheap to send to another process.
+
+        """
+        cube = self.cubes[index]
+        if cube is None or memory.has_lazy_data(cube):
+            return cube
+        return self.lazy_cubes.get(index, cube)
+
+    def release_cube_data(self, index):
+        """
+        Releases the data of a loaded cube that has been read into memory.
+        Iris cannot discard data once it has been read, so the cube is
+        replaced by the copy kept before its data was read, and its data is
+        read lazily when next needed. Without a copy, such as for a cube
+        whose data another window had read, the cube is loaded again from
+        the file.
+
+        Args:
+
+        * index
+            int holding the index of the cube in the list of loaded cubes.
+
+        """
+        lazy_cube = self.lazy_cubes.get(index)
+        if lazy_cube is not None:
+            self.cubes[index] = lazy_cube
+            self.keep_lazy_copy(index)
+        elif index in self.cube_variables:
+            variable, position = self.cube_variables[index]
+            self.cubes[index] = self.load_variable_cubes(
+                variable, fresh=True)[position]
+        else:
+            self.cubes[index] = iris.load(self.filename)[index]
+        if lazy_cube is None:
+            # So that the file is not loaded again next time.
+            self.keep_lazy_copy(index)
+        self.transcoded.pop(index, None)
+
+    def release_table(self):
+        """
+        Removes the table of data, releasing the copy of the data that it
+        holds. It is filled again by show_data().
+
+        """
+        model = self.data_table.model()
+        self.data_table.setModel(None)
+        if model is not None:
+            model.deleteLater()
+        self.memory.release('table')
+
+    def confirm_cost(self, estimate):
+        """
+        Returns whether an operation should go ahead. If its estimated cost
+        is over the limit, the user is asked.
+
+        Args:
+
+        * estimate
+            Dictionary holding the estimated cost, from the cost module.
+
+        """
+        if not cost.is_over_limit(estimate, self.cost_limits):
+            return True
+        buttons = (QtGui.QMessageBox.StandardButton.Yes |
+                   QtGui.QMessageBox.StandardButton.No)
+        answer = QtGui.QMessageBox.question(
+            self, 'This may take a long time',
+            cost.describe(estimate) + ' Do you want to continue?', buttons,
+            QtGui.QMessageBox.StandardButton.No)
+        return answer == QtGui.QMessageBox.StandardButton.Yes
+
+    def report_timings(self, timings, message, status=None):
+        """
+        Shows the time taken by each stage of an operation in the status bar,
+        and writes it to the timing log if there is one.
+
+        Args:
+
+        * timings
+            The timing.Timings of the operation.
+
+        * message
+            String to be shown in the status bar before the timings.
+
+        Kwargs:
+
+        * status
+            The status of the interface used for the operation, from which
+            the cube and slice are recorded in the log.
+
+        """
+        trace = timing.get_trace()
+        if trace is not None:
+            # Covers the whole operation, including any time spent waiting.
+            trace.add_event(timings.operation, timings.start,
+                            time.time() - timings.start,
+                            args=dict(timings.stages))
+        self.statusBar().showMessage(
+            '{} ({:.2f}s: {})'.format(message, timings.total(),
+                                      timings.summary()))
+        if self.timing_log is None:
+            return
+        details = {'filename': self.filename}
+        if status is not None and status['cube loaded']:
+            details['cube index'] = status['cube index']
+            details['cube'] = status['cube'].name()
+            details['dim indices'] = status['dim indices']
+            details['slice index'] = status['slice index']
+            details['collapsed indices'] = status['collapsed indices']
         try:
-            # passes information to the plotting function.
-            self.plotted_cube, self.set_global = cl.update(interface_status)
+            self.timing_log.write(timings, **details)
+        except IOError:
+            # Failing to write the log should never stop the program.
+            pass
 
-        # Should anything fail during the plotting that was not explicitly
-        # caught, the program produces dialog box containg the error message.
-        except Exception as e:
+    def render_failed(self, generation, message, preview=False):
+        """
+        Called when a render could not be completed.
+
+        Args:
+
+        * generation
+            int identifying the render. Failures of renders other than the
+            latest are ignored.
+
+        * message
+            String describing the error.
+
+        Kwargs:
+
+        * preview
+            Boolean holding whether the render was a preview, in which case
+            the failure is only reported in the status bar.
+
+        """
+        if generation != self.render_generation:
+            return
+        if self.render_task is not None:
+            preview = self.render_task.status['preview']
+            self.render_task = None
+        self.matplotlib_display.unsetCursor()
+
+        if preview:
+            self.statusBar().showMessage('Failed to Plot Preview')
+        else:
+            # The last slice drawn no longer matches the interface.
+            self.plotted_cube = None
+            self.print_cube_slice_browser.clear()
+            self.release_table()
+            self.memory.release('slice')
             flags = QtGui.QMessageBox.StandardButton.Ok
             QtGui.QMessageBox.critical(
-                self, 'Unable to plot cube!', str(e), flags)
+                self, 'Unable to plot cube!', message, flags)
             self.statusBar().showMessage('Failed to Plot Cube')
-            QApplication.restoreOverrideCursor()
 
-        # update the display and use the data from the plotted cube to print a
-        # summary of the cube and show its data.
-        self.display()
-        self.print_cube_slice_browser.setText(str(self.plotted_cube))
-        self.show_data()
+    def show_panels(self):
+        """
+        Replaces the plot with a grid of panels, each showing a different
+        slice of the cube, with a single shared colorbar. The user chooses
+        the dimension to step along, either the sliced dimension or one of
+        the collapsed dimensions, and the number of panels. The panels are
+        prepared by a render_worker.PanelTask, drawn in parallel by
+        panel_logic, and shown by check_panels() once they are all drawn.
+
+        """
+        dim_names = [self.select_sliced_dim.currentText()]
+        for i in xrange(self.ndim - 3):
+            label_name = "collapsed_dim_" + str(i + 1)
+            label = self.findChild(QtGui.QLabel, label_name)
+            dim_names.append(label.text())
+        dim_name, ok = QtGui.QInputDialog.getItem(
+            self, 'Panels', 'Step along:', dim_names, 0, False)
+        if not ok:
+            return
+        dim_size = self.schema.dim_size(dim_name)
+        num_panels, ok = QtGui.QInputDialog.getInt(
+            self, 'Panels', 'Number of panels:', min(4, dim_size), 1,
+            dim_size)
+        if not ok:
+            return
+
+        # The panels replace whatever render is still in progress.
+        self.cancel_render()
+        QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        self.statusBar().showMessage('Drawing Panels')
+
+        # A scan for a fixed colorbar is left to the PanelTask, as is
+        # reading the data of the panels for their shared range.
+        status = self.resolve_status(self.get_status(), defer_scan=True)
+        fig = self.matplotlib_display.figure
+        self.panel_task = render_worker.PanelTask(
+            self.render_generation, status,
+            self.get_lazy_cube(status['cube index']),
+            self.schema.dim_index(dim_name), num_panels,
+            self.schema.coord_labels(dim_name), fig.get_size_inches(),
+            fig.dpi)
+        self.panel_task.signals.finished.connect(self.start_panels)
+        self.panel_task.signals.failed.connect(self.panel_task_failed)
+        self.panel_task.signals.colorbar_fixed.connect(self.colorbar_fixed)
+        self.render_pool.start(self.panel_task)
+
+    def start_panels(self, generation, jobs, colorbar_range, colormap):
+        """
+        Called when a PanelTask has prepared the panels, which are then
+        drawn by the worker processes of panel_logic.
+
+        Args:
+
+        * generation
+            int identifying the panels. Panels superseded by a render are
+            ignored.
+
+        * jobs, colorbar_range, colormap
+            As returned by panel_logic.get_panel_jobs().
+
+        """
+        if generation != self.render_generation:
+            return
+        status = self.panel_task.status
+        self.panel_task = None
+        try:
+            result = pl.start_panels(jobs)
+        except Exception as e:
+            self.panels_failed(str(e))
+            return
+        self.panels = {'result': result,
+                       'colorbar range': colorbar_range,
+                       'colormap': colormap,
+                       'cube': status['cube']}
+        self.panel_timer.start()
+
+    def panel_task_failed(self, generation, message):
+        """
+        Called when a PanelTask was unable to prepare the panels.
+
+        """
+        if generation != self.render_generation:
+            return
+        self.panel_task = None
+        self.panels_failed(message)
+
+    def check_panels(self):
+        """
+        Called by panel_timer while panels are being drawn. Once they are all
+        drawn, they are arranged on the figure with their shared colorbar.
+
+        """
+        panels = self.panels
+        if panels is None or not panels['result'].ready():
+            return
+        self.panels = None
+        self.panel_timer.stop()
+        fig = self.matplotlib_display.figure
+        try:
+            images = panels['result'].get()
+            fig.clf()
+            pl.composite_panels(fig, images, panels['colorbar range'],
+                                panels['colormap'], panels['cube'])
+        except Exception as e:
+            self.panels_failed(str(e))
+            return
         self.statusBar().showMessage('Ready')
+        self.display()
         QApplication.restoreOverrideCursor()
 
+    def panels_failed(self, message):
+        """
+        Reports panels which could not be drawn. The figure is left as it
+        was.
+
+        """
+        QApplication.restoreOverrideCursor()
+        flags = QtGui.QMessageBox.StandardButton.Ok
+        QtGui.QMessageBox.critical(
+            self, 'Unable to draw panels!', message, flags)
+        self.statusBar().showMessage('Failed to Draw Panels')
+        self.display()
+
+    def toggle_profile_capture(self, checked):
+        """
+        Profiles the next few updates when the profile action is checked,
+        asking the user how many updates to capture and where to save the
+        results. The capture starts with the next update(). Unchecking the
+        action saves the capture early.
+
+        Args:
+
+        * checked
+            Boolean holding whether the profile action is checked.
+
+        """
+        if not checked:
+            if self.profile_capture is not None:
+                self.finish_profile_capture()
+            return
+
+        num_updates, ok = QtGui.QInputDialog.getInt(
+            self, 'Profile', 'Number of updates to profile:', 5, 1, 1000)
+        directory = ''
+        if ok:
+            directory = QtGui.QFileDialog.getExistingDirectory(
+                self, 'Save Profiles To', os.getcwd())
+        if not directory:
+            self.action_profile.setChecked(False)
+            return
+
+        self.profile_capture = profile_capture.ProfileCapture(num_updates,
+                                                              directory)
+        self.statusBar().showMessage(
+            'Profiling the next {} updates'.format(num_updates))
+
+    def finish_profile_capture(self):
+        """
+        Stops the profile capture and saves its files.
+
+        """
+        capture, self.profile_capture = self.profile_capture, None
+        self.action_profile.setChecked(False)
+        try:
+            paths = capture.stop()
+        except (IOError, OSError) as e:
+            flags = QtGui.QMessageBox.StandardButton.Ok
+            QtGui.QMessageBox.critical(
+                self, 'Unable to save profile!', str(e), flags)
+            return
+        if not paths:
+            # Unchecked before any update.
+            self.statusBar().showMessage('Profile Cancelled')
+            return
+        self.statusBar().showMessage(
+            'Profile saved to {}'.format(', '.join(paths)))
+
+    def update_large_cube_mode(self):
+        """
+        Decides whether large cube mode is used for the current cube, from
+        its size unless the user has chosen, and applies the settings of the
+        mode. See the large_cube module.
+
+        """
+        schema = self.get_current_schema() if self.cube_loaded else None
+        enabled = large_cube.use_large_cube_mode(
+            self.large_cube_setting, schema, self.large_cube_thresholds)
+        if enabled != self.large_cube_mode:
+            # The colorbar scheme in use may change.
+            self.declined_scans.clear()
+        self.large_cube_mode = enabled
+        self.action_large_cube.setChecked(enabled)
+
+        delay = render_scheduler.DEFAULT_DELAY
+        max_wait = render_scheduler.DEFAULT_MAX_WAIT
+        if enabled:
+            delay = large_cube.RENDER_DELAY
+            max_wait = large_cube.RENDER_MAX_WAIT
+        self.render_scheduler.set_delay(delay, max_wait)
+
+        self.large_cube_label.setText(large_cube.describe(schema))
+        self.large_cube_label.setVisible(enabled)
+
+    def toggle_large_cube_mode(self, checked):
+        """
+        Called when the user turns large cube mode on or off, overriding the
+        choice made from the size of the cube. The plot is redrawn with the
+        new settings.
+
+        Args:
+
+        * checked
+            Boolean holding whether large cube mode should be used.
+
+        """
+        self.large_cube_setting = 'on' if checked else 'off'
+        self.update_large_cube_mode()
+        if self.cube_loaded:
+            self.release_table()
+            self.update()
+
     def show_open_dialog(self):
         """
         Handles the loading of a file, and calls functions to
@@ -322,17 +1378,50 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         this to default to the last folder that the program was in.
 
         """
-        self.filename, _ = QtGui.QFileDialog.getOpenFileName(self, 'Open File')
+        filename, _ = QtGui.QFileDialog.getOpenFileName(self, 'Open File')
+        if not filename or not self.confirm_cost(cost.estimate_load(filename)):
+            return
+        self.open_file(filename)
+
+    def open_file(self, filename):
+        """
+        Loads the file, sets up the interface for its first cube and draws
+        it.
+
+        If the headers of the file list more than
+        header_scan.PICKER_THRESHOLD variables, the user first chooses which
+        of them to load from the variable picker.
+
+        Args:
+
+        * filename
+            String containing the path to the file that should be opened.
+
+        """
+        variables, chosen = None, None
+        if self.pick_variables:
+            variables = header_scan.scan_variables(filename)
+            if (variables is not None and
+                    len(variables) <= header_scan.PICKER_THRESHOLD):
+                variables = None
+        if variables is not None:
+            chosen = self.variable_picker.pick(filename, variables)
+            if chosen is None:
+                self.statusBar().showMessage('Load Cancelled')
+                return
 
         QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
         self.statusBar().showMessage('Loading Cube')
 
-        self.load_file(self.filename)
+        if not self.load_file(filename, variables, chosen):
+            # The error has been reported, and the cursor restored.
+            return
 
         QApplication.restoreOverrideCursor()
 
         self.set_dimension_combos()
-        self.update()
+        if self.cube_loaded:
+            self.update()
 
     def open_about_dialog(self):
         """
@@ -352,7 +1441,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.statusBar().showMessage('Saving')
 
         try:
-            plt.savefig(filename)
+            self.matplotlib_display.figure.savefig(filename)
         except Exception as e:
             flags = QtGui.QMessageBox.StandardButton.Ok
             QtGui.QMessageBox.critical(
@@ -370,6 +1459,24 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         cube_index = self.select_cube.currentIndex()
         return self.cubes[cube_index]
 
+    def get_current_schema(self):
+        """
+        Fetches the gui_logic.CubeSchema of the current cube, building it the
+        first time that the cube is selected.
+
+        """
+        cube_index = self.select_cube.currentIndex()
+        if cube_index not in self.schemas:
+            with timing.span('schema'):
+                self.schemas[cube_index] = gl.CubeSchema(
+                    self.cubes[cube_index])
+            # A schema can be rebuilt, so it is released before the data.
+            self.memory.track('schema {}'.format(cube_index),
+                              self.schemas[cube_index].nbytes(), memory.STATS,
+                              functools.partial(self.schemas.pop, cube_index,
+                                                None))
+        return self.schemas[cube_index]
+
     def show_colorbar_dialog(self):
         """
         Brings up a new window containg options about the colorbar range.
@@ -382,42 +1489,42 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         """
         Called whenever a fixed colorbar would need to be recalculated.
 
+        The calculation itself is not done here. It is deferred until the
+        range is actually needed, by get_fixed_colorbar(). The user is asked
+        again about any scan they had declined.
+
         """
+        self.declined_scans.clear()
         self.set_enabled()
-        self.fixed_colorbar = False
 
+    @timing.traced('update_max_min')
     def update_max_min(self):
         """
         Updates the max and min boxes in colorbar dialog.
 
-        There should be code in here which stops this process on large cubes...
-        The time taken in this case is too large for the small reward.
+        Fixing the colorbar can require a scan through the whole cube, so the
+        user is asked first if it is large. See get_fixed_colorbar().
 
         """
         QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
-        scheme = self.colorbar_dialog.get_colorbar_scheme()
+        scheme = self.get_colorbar_scheme()
 
-        if scheme is "auto":
-            colorbar_max, colorbar_min = cl.find_max_min(self.plotted_cube)
-            self.colorbar_dialog.set_max_min(colorbar_max, colorbar_min)
+        if scheme == "auto":
+            # Until a slice has been drawn, there is no range to show.
+            if self.plotted_cube is not None:
+                colorbar_max, colorbar_min = cl.find_max_min(
+                    self.plotted_cube)
+                self.colorbar_dialog.set_max_min(colorbar_max, colorbar_min)
 
-        elif scheme is "fixed":
+        elif scheme == "fixed":
             # want to fix the colorbar across all of the slices.
-            cube = self.cube
-            dim_1_index = self.select_dimension_1.currentIndex()
-            dim_2_index = self.select_dimension_2.currentIndex()
-            sliced_dim_index = self.select_sliced_dim.currentIndex()
-            dim_indices = {'dim 1 index': dim_1_index,
-                           'dim 2 index': dim_2_index,
-                           'sliced dim index': sliced_dim_index}
-            collapsed_indices = []
-            for i in xrange(self.ndim - 3):
-                box_name = "select_slice_index_" + str(i+1)
-                box = self.findChild(QtGui.QComboBox, box_name)
-                collapsed_indices.append(box.currentIndex())
+            colorbar_max, colorbar_min = self.get_fixed_colorbar(
+                self.get_status())
+            self.colorbar_dialog.set_max_min(colorbar_max, colorbar_min)
 
-            colorbar_max, colorbar_min = cl.set_fixed_colorbar(
-                cube, dim_indices, collapsed_indices)
+        elif scheme == "approximate":
+            colorbar_max, colorbar_min, _ = \
+                self.get_approximate_colorbar(self.get_status())
             self.colorbar_dialog.set_max_min(colorbar_max, colorbar_min)
 
         QApplication.restoreOverrideCursor()
@@ -443,6 +1550,8 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.clear_dims()
         self.clear_fig()
         self.select_cube.clear()
+        self.plotted_cube = None
+        self.memory.release('slice')
         self.action_next_slice.setEnabled(False)
         self.action_previous_slice.setEnabled(False)
 
@@ -465,8 +1574,6 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.action_next_slice.setEnabled(False)
         self.action_previous_slice.setEnabled(False)
 
-        self.fixed_colorbar = False
-
         self.clear_collapsed_dims()
 
     def clear_fig(self):
@@ -474,7 +1581,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         Clears the embedded figure to leave a blank canvas.
 
         """
-        plt.clf()
+        self.matplotlib_display.figure.clf()
         self.display()
 
     def clear_collapsed_dims(self):
@@ -498,7 +1605,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         """
         i = self.select_slice_combo.currentIndex()
         self.select_slice_combo.setCurrentIndex(i+1)
-        self.update()
+        self.render_scheduler.request()
 
     def previous_slice(self):
         """
@@ -509,7 +1616,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         if i == 0:
             i = self.select_slice_combo.count()
         self.select_slice_combo.setCurrentIndex(i-1)
-        self.update()
+        self.render_scheduler.request()
 
     def arrange_coords_1(self):
         """
@@ -537,7 +1644,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         if self.ndim > 2:
             dim = self.select_sliced_dim.currentText()
-            data = gl.get_coord_values(self.cube, dim, self.dim_names)
+            data = self.schema.coord_labels(dim)
             self.fill_combo("select_slice_combo", data, True)
             self.set_slice_scroll()
             self.set_collapsed_dims()
@@ -563,7 +1670,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         if self.ndim > 2:
             dim = self.select_sliced_dim.currentText()
-            data = gl.get_coord_values(self.cube, dim, self.dim_names)
+            data = self.schema.coord_labels(dim)
             self.fill_combo("select_slice_combo", data, True)
             self.set_slice_scroll()
             self.set_collapsed_dims()
@@ -588,7 +1695,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         if self.ndim > 2:
             dim = self.select_sliced_dim.currentText()
-            data = gl.get_coord_values(self.cube, dim, self.dim_names)
+            data = self.schema.coord_labels(dim)
             self.fill_combo("select_slice_combo", data, True)
             self.set_slice_scroll()
             self.set_collapsed_dims()
@@ -614,8 +1721,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
                 label = self.findChild(QtGui.QLabel, label_name)
                 label.setText(unused_dims[i])
 
-                data = gl.get_coord_values(self.cube, unused_dims[i],
-                                           self.dim_names)
+                data = self.schema.coord_labels(unused_dims[i])
                 self.fill_combo(box_name, data, True)
 
     def add_collapsed_dim(self, num):
@@ -693,8 +1799,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         """
         sliced_coord = self.select_sliced_dim.currentText()
-        data = gl.get_coord_values(self.cube, sliced_coord, self.dim_names)
-        max_slice = len(data)
+        max_slice = self.schema.dim_size(sliced_coord)
         self.select_slice_scroll.setMaximum(max_slice - 1)
 
     def fill_combo(self, box_name, data, enabled):
@@ -724,6 +1829,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         else:
             combo_box.setEnabled(False)
 
+    @timing.traced('show_data')
     def show_data(self):
         """
         Here we take the currently plotted cube (in general NOT the full
@@ -731,8 +1837,30 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         """
         if self.cube_info_tab.currentIndex() == 2:
-            QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
             self.data_table.clearSpans()
+            # The old table is parented to the tab, so would otherwise
+            # be kept alive.
+            self.release_table()
+            if self.plotted_cube is None:
+                # Shown once a slice has been drawn. See render_finished().
+                return
+
+            shape = self.plotted_cube.shape
+            # In large cube mode the table is filled a page at a time, so
+            # is quick to show however large the slice.
+            page_rows = None
+            if self.large_cube_mode:
+                page_rows = large_cube.TABLE_PAGE_ROWS
+            if page_rows is None and (
+                    shape == self.declined_table_shape or
+                    not self.confirm_cost(cost.estimate_table(shape))):
+                # Not asked again until a slice of another shape is
+                # plotted.
+                self.declined_table_shape = shape
+                self.statusBar().showMessage('Data not shown')
+                return
+            self.declined_table_shape = None
+            QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
 
             if self.ndim == 1:
                 coord_1 = None
@@ -756,15 +1884,22 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
                     horiz_headers = [i for i in xrange(
                         self.plotted_cube.shape[1])]
 
-            data = self.plotted_cube.data.tolist()
+            data = self.plotted_cube.data
+            if page_rows is None:
+                data = data.tolist()
             try:
                 vert_headers = self.cube.coord(coord_1).points
             except iris.exceptions.CoordinateNotFoundError:
-                vert_headers = [i for i in xrange(self.plotted_cube.shape[0])]
+                vert_headers = [i for i in xrange(
+                    self.plotted_cube.shape[0])]
 
             table = table_model.TableModel(data, horiz_headers,
-                                           vert_headers, self.data_tab)
+                                           vert_headers, self.data_tab,
+                                           page_rows)
             self.data_table.setModel(table)
+            self.memory.track(
+                'table', memory.get_table_nbytes(self.plotted_cube.shape),
+                memory.TABLE, self.release_table)
             QApplication.restoreOverrideCursor()
 
     def generate_source_code(self):
@@ -774,7 +1909,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         a new window to be viewed.
 
         """
-        status = self.get_status()
+        status = self.resolve_status(self.get_status())
 
         coord_indices = []
         counter = 1
@@ -796,6 +1931,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.code_view.set_code(code)
         self.code_view.show()
 
+    @timing.traced('set_enabled')
     def set_enabled(self):
         """
         This function controls which objects in the main window are enabled
@@ -817,13 +1953,15 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.action_previous_slice.setEnabled(state['previous'])
         self.action_next_slice.setEnabled(state['next'])
         self.action_source_code.setEnabled(state['source code'])
+        self.action_show_panels.setEnabled(state['third dim'])
         self.action_coastlines.setEnabled(state['cartographic'])
         self.action_contour_labels.setEnabled(state['labels'])
         self.action_country_boundaries.setEnabled(state['cartographic'])
         self.action_rivers_and_lakes.setEnabled(state['cartographic'])
         self.action_colorbar.setEnabled(state['colorbar'])
         self.select_projection.setEnabled(state['cartographic'])
-        self.select_central_longitude.setEnabled(state['central longitude'])
+        self.select_central_longitude.setEnabled(
+            state['central longitude'])
         self.select_plot_type.setEnabled(state['plot type'])
         self.select_colormap.setEnabled(state['colormap'])
         self.contour_slider.setEnabled(state['contour slider'])
@@ -833,11 +1971,16 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self.select_slice_scroll.setEnabled(state['third dim'])
         self.update_button.setEnabled(state['update'])
 
+    @timing.traced('get_status')
     def get_status(self):
         """
         This method gathers information from around the interface, and then
         packages it up into a dictionary which can be neatly passed around.
 
+        It is called on nearly every change to the interface, so it only reads
+        the current state of the widgets. Anything that requires a calculation
+        over the data is left to resolve_status().
+
         """
         cube_loaded = self.cube_loaded
         if cube_loaded:
@@ -845,6 +1988,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             cube_index = self.select_cube.currentIndex()
             set_global = self.set_global
             cube = self.get_current_cube()
+            schema = self.get_current_schema()
             dim_1_index = self.select_dimension_1.currentIndex()
             dim_2_index = self.select_dimension_2.currentIndex()
             sliced_dim_index = self.select_sliced_dim.currentIndex()
@@ -860,28 +2004,29 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             can_draw_map = self.can_draw_map
             dim_1_name = self.select_dimension_1.currentText()
             dim_2_name = self.select_dimension_2.currentText()
-            scheme = self.colorbar_dialog.get_colorbar_scheme()
-            if scheme == "auto":
-                self.colorbar_max = None
-                self.colorbar_min = None
-            elif scheme == "fixed":
-                if not self.fixed_colorbar:
-                    self.colorbar_max, self.colorbar_min = \
-                        cl.set_fixed_colorbar(cube, dim_indices,
-                                              collapsed_indices)
-                    self.fixed_colorbar = True
+            scheme = self.get_colorbar_scheme()
+            if scheme == "manual":
+                colorbar_max, colorbar_min = \
+                    self.colorbar_dialog.get_max_min()
             else:
-                self.colorbar_max = self.colorbar_dialog.max_contour.value()
-                self.colorbar_min = self.colorbar_dialog.min_contour.value()
-            colorbar_range = {'max': self.colorbar_max,
-                              'min': self.colorbar_min}
+                # The fixed range is filled in by resolve_status(), as it
+                # requires a scan through the whole sliced dimension.
+                colorbar_max = colorbar_min = None
+            colorbar_range = {'max': colorbar_max,
+                              'min': colorbar_min}
             slice_index = self.select_slice_scroll.value()
+            # A transcoded cube is quicker to read from the store.
+            slice_reader = None
+            if cube_index not in self.transcoded:
+                slice_reader = self.slice_readers.get(cube_index)
         else:
-            filename = cube_index = set_global = cube = None
+            filename = cube_index = set_global = cube = schema = None
+            scheme = None
             dim_indices = collapsed_indices = can_draw_map = None
             dim_1_name = dim_2_name = colorbar_range = None
             slice_index = None
             central_longitude = None
+            slice_reader = None
 
         plot_method = self.select_plot_method.currentText()
         plot_type = self.select_plot_type.currentText()
@@ -899,6 +2044,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
         interface_status = {'cube loaded': cube_loaded,
                             'cube': cube,
+                            'schema': schema,
                             'plot method': plot_method,
                             'plot type': plot_type,
                             'projection': projection,
@@ -908,6 +2054,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
                             'cartographic': cartographic,
                             'gridlines': gridlines,
                             'contour labels': contour_labels,
+                            'colorbar scheme': scheme,
                             'colorbar range': colorbar_range,
                             'dim indices': dim_indices,
                             'slice index': slice_index,
@@ -916,52 +2063,695 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
                             'set global': set_global,
                             'filename': filename,
                             'cube index': cube_index,
+                            'slice reader': slice_reader,
                             'dim 1 name': dim_1_name,
                             'dim 2 name': dim_2_name}
 
         return interface_status
 
-    def load_file(self, filename):
+    def resolve_status(self, status, defer_scan=False):
+        """
+        Fills in the parts of the status that require calculations over the
+        data, and returns the completed status. This should only be called
+        when those values are actually needed, such as before plotting.
+
+        Args:
+
+        * status
+            A dictionary as returned by get_status().
+
+        Kwargs:
+
+        * defer_scan
+            Boolean holding whether a scan for a fixed colorbar range is left
+            to the RenderTask or PanelTask given the status. See
+            get_fixed_colorbar().
+
+        """
+        if not status['cube loaded']:
+            return status
+        if status['colorbar scheme'] == "fixed":
+            colorbar_max, colorbar_min = self.get_fixed_colorbar(
+                status, defer_scan)
+            status['colorbar range'] = {'max': colorbar_max,
+                                        'min': colorbar_min}
+        elif status['colorbar scheme'] == "approximate":
+            colorbar_max, colorbar_min, confidence = \
+                self.get_approximate_colorbar(status)
+            status['colorbar range'] = {'max': colorbar_max,
+                                        'min': colorbar_min}
+            status['colorbar confidence'] = confidence
+        return status
+
+    def get_colorbar_scheme(self):
+        """
+        Returns the colorbar scheme chosen in the colorbar dialog. In large
+        cube mode, a fixed colorbar is estimated from a sample of the slices
+        rather than found from all of them. See get_approximate_colorbar().
+
+        """
+        scheme = self.colorbar_dialog.get_colorbar_scheme()
+        if scheme == "fixed" and self.large_cube_mode:
+            scheme = "approximate"
+        return scheme
+
+    def get_colorbar_key(self, status):
+        """
+        Returns the key under which the fixed colorbar range for the given
+        status is cached: the cube, the chosen dimensions and the collapsed
+        indices.
+
+        """
+        return (status['cube index'],
+                tuple(sorted(status['dim indices'].items())),
+                tuple(status['collapsed indices']))
+
+    def get_fixed_colorbar(self, status, defer_scan=False):
+        """
+        Returns the maximum and minimum of the data across all of the slices
+        along the sliced dimension, as found by cube_logic.set_fixed_colorbar.
+
+        The result is cached for each combination of cube, dimensions and
+        collapsed indices, so that the scan is only performed once for each.
+
+        Args:
+
+        * status
+            A dictionary as returned by get_status().
+
+        Kwargs:
+
+        * defer_scan
+            Boolean holding whether a scan is left to the RenderTask or
+            PanelTask given the status, rather than run on the GUI thread.
+            The key of the range is then added to the status as 'colorbar
+            key', and None is returned for the range until the task has found
+            it.
+
+        """
+        dim_indices = status['dim indices']
+        collapsed_indices = status['collapsed indices']
+        key = self.get_colorbar_key(status)
+        if not self.load_fixed_colorbar(key, status):
+            estimate = cost.estimate_fixed_colorbar(status['schema'],
+                                                    dim_indices)
+            if key in self.declined_scans or not self.confirm_cost(estimate):
+                # The range of each slice is used instead.
+                self.declined_scans.add(key)
+                return None, None
+            if defer_scan:
+                status['colorbar key'] = key
+                return None, None
+            self.statusBar().showMessage('Fixing Colorbar')
+            self.store_fixed_colorbar(key, status, cl.set_fixed_colorbar(
+                status['cube'], dim_indices, collapsed_indices))
+        return self.fixed_colorbar_ranges[key]
+
+    def colorbar_fixed(self, status, colorbar_range):
+        """
+        Called when a RenderTask or PanelTask has found the range of a fixed
+        colorbar, left to it by get_fixed_colorbar(), even if the task has
+        since been superseded.
+
+        """
+        self.store_fixed_colorbar(status['colorbar key'], status,
+                                  colorbar_range)
+
+    def store_fixed_colorbar(self, key, status, colorbar_range):
+        """
+        Keeps the range of a fixed colorbar, once found, in memory and in
+        the result cache.
+
+        Args:
+
+        * key
+            The key of the range, as returned by get_colorbar_key().
+
+        * status
+            A dictionary as returned by get_status().
+
+        * colorbar_range
+            Tuple holding the maximum and minimum.
+
+        """
+        self.fixed_colorbar_ranges[key] = colorbar_range
+        self.save_fixed_colorbar(key, status)
+        self.memory.track('colorbar ranges',
+                          sys.getsizeof(self.fixed_colorbar_ranges),
+                          memory.STATS, self.fixed_colorbar_ranges.clear)
+
+    def get_approximate_colorbar(self, status):
+        """
+        Returns the range of a fixed colorbar quickly, estimated by
+        cube_logic.sample_fixed_colorbar() from a sample of the slices, with
+        a dictionary describing its confidence. The exact range is then
+        calculated in the background, and used once it is known, in which
+        case the confidence returned is None.
+
+        Args:
+
+        * status
+            A dictionary as returned by get_status().
+
+        """
+        key = self.get_colorbar_key(status)
+        if self.load_fixed_colorbar(key, status):
+            colorbar_max, colorbar_min = self.fixed_colorbar_ranges[key]
+            return colorbar_max, colorbar_min, None
+        if key not in self.approximate_colorbar_ranges:
+            with timing.span('sample'):
+                self.approximate_colorbar_ranges[key] = \
+                    cl.sample_fixed_colorbar(status['cube'],
+                                             status['dim indices'],
+                                             status['collapsed indices'],
+                                             seed=0)
+            self.refine_colorbar(key, status)
+        return self.approximate_colorbar_ranges[key]
+
+    def refine_colorbar(self, key, status):
+        """
+        Starts calculating the exact range of a fixed colorbar in the
+        background, in batches of RANGE_BATCH_SLICES slices, or fewer in
+        large cube mode. Each batch is run at a lower priority than the
+        renders, so that the interface stays responsive.
+
+        Args:
+
+        * key
+            The key of the range, as returned by get_colorbar_key().
+
+        * status
+            A dictionary as returned by get_status().
+
+        """
+        cube = status['cube']
+        if cube.ndim <= 2 or key in self.range_refinements:
+            return
+        num_slices = cube.shape[status['dim indices']['sliced dim index']]
+        batch_slices = RANGE_BATCH_SLICES
+        if self.large_cube_mode:
+            batch_slices = large_cube.RANGE_BATCH_SLICES
+        batches = [xrange(start, min(start + batch_slices, num_slices))
+                   for start in xrange(0, num_slices, batch_slices)]
+        self.range_refinements[key] = {'status': status,
+                                       'batches': batches,
+                                       'max': [],
+                                       'min': [],
+                                       'task': None}
+        self.start_range_task(key)
+
+    def start_range_task(self, key):
+        """
+        Starts a RangeTask for the next batch of slices of a refinement.
+
+        """
+        refinement = self.range_refinements[key]
+        status = refinement['status']
+        task = render_worker.RangeTask(
+            key, status['cube'], status['dim indices'],
+            status['collapsed indices'], refinement['batches'].pop(0))
+        task.signals.finished.connect(self.range_task_finished)
+        task.signals.failed.connect(self.range_task_failed)
+        refinement['task'] = task
+        # RenderTasks have the default priority of 0, so run first.
+        self.render_pool.start(task, -1)
+
+    def range_task_finished(self, task, slice_max, slice_min):
+        """
+        Called when a RangeTask has read its batch of slices. Once every
+        batch has been read, the exact range replaces the approximate one,
+        and the plot is redrawn if it is using it.
+
+        """
+        refinement = self.range_refinements.get(task.key)
+        if refinement is None or refinement['task'] is not task:
+            # The refinement has been abandoned.
+            return
+        refinement['max'].extend(slice_max)
+        refinement['min'].extend(slice_min)
+        if refinement['batches']:
+            self.start_range_task(task.key)
+            return
+
+        del self.range_refinements[task.key]
+        self.store_fixed_colorbar(task.key, refinement['status'],
+                                  cl.combine_slice_ranges(refinement['max'],
+                                                          refinement['min']))
+        self.approximate_colorbar_ranges.pop(task.key, None)
+
+        status = self.get_status()
+        if (status['cube loaded'] and
+                status['colorbar scheme'] == "approximate" and
+                self.get_colorbar_key(status) == task.key):
+            self.statusBar().showMessage('Colorbar Range Refined')
+            self.render_scheduler.request()
+
+    def range_task_failed(self, task, message):
+        """
+        Called when a RangeTask could not read its slices. The approximate
+        range is kept.
+
+        """
+        refinement = self.range_refinements.get(task.key)
+        if refinement is not None and refinement['task'] is task:
+            del self.range_refinements[task.key]
+            self.statusBar().showMessage(
+                'Unable to Refine Colorbar Range: ' + message)
+
+    def cancel_range_refinements(self):
+        """
+        Abandons all of the refinements running in the background.
+
+        """
+        for refinement in self.range_refinements.values():
+            refinement['task'].cancel()
+        self.range_refinements = {}
+
+    def get_cube_identity(self, status):
+        """
+        Returns a list identifying the cube of the given status in the keys
+        of results derived from it, kept in the result cache and the pyramid
+        and transcode stores, or None if it was not loaded from a file. It
+        holds the identity of the file and cube_logic.get_cube_identity(),
+        which is kept for the cube last identified, as it reads every
+        coordinate.
+
+        Args:
+
+        * status
+            A dictionary as returned by get_status().
+
+        """
+        if not os.path.isfile(status['filename']):
+            return None
+        cube = status['cube']
+        if (self.cube_identity is None or
+                self.cube_identity[0]() is not cube):
+            self.cube_identity = (weakref.ref(cube),
+                                  cl.get_cube_identity(cube))
+        return ([disk_cache.get_file_identity(status['filename'])] +
+                self.cube_identity[1])
+
+    def get_cache_parts(self, status):
+        """
+        Returns a list identifying the cube of the given status in the keys
+        of the result cache, or None if its results are not cached. The cube
+        is identified by its file, its metadata and its coordinates rather
+        than its index, so that results are shared whichever of its variables
+        were loaded. See get_cube_identity(). The version of iris is
+        included, as the cubes stored are pickled by it.
+
+        Args:
+
+        * status
+            A dictionary as returned by get_status().
+
+        """
+        if self.result_cache is None:
+            return None
+        identity = self.get_cube_identity(status)
+        if identity is None:
+            return None
+        return identity + [iris.__version__]
+
+    def get_slice_cache_key(self, status):
+        """
+        Returns the key under which the sub cube extracted for the given
+        status is kept in the result cache, or None if it is not cached.
+        A 1D or 2D cube is plotted as it is, so is not.
+
+        """
+        parts = self.get_cache_parts(status)
+        if parts is None or status['cube'].ndim <= 2:
+            return None
+        return pyramid.get_key(parts + ['slice',
+                                        sorted(status['dim indices'].items()),
+                                        status['slice index'],
+                                        status['collapsed indices'],
+                                        status['preview'],
+                                        status.get('max points')])
+
+    def get_colorbar_cache_key(self, status):
+        """
+        Returns the key under which the fixed colorbar range for the given
+        status is kept in the result cache, or None if it is not cached.
+
+        """
+        parts = self.get_cache_parts(status)
+        if parts is None:
+            return None
+        return pyramid.get_key(parts + ['colorbar range',
+                                        sorted(status['dim indices'].items()),
+                                        status['collapsed indices']])
+
+    def load_fixed_colorbar(self, key, status):
+        """
+        Returns whether the fixed colorbar range with the given key is known,
+        reading it from the result cache if an earlier session found it.
+
+        Args:
+
+        * key
+            The key of the range, as returned by get_colorbar_key().
+
+        * status
+            A dictionary as returned by get_status().
+
+        """
+        if key in self.fixed_colorbar_ranges:
+            return True
+        cache_key = self.get_colorbar_cache_key(status)
+        if cache_key is None:
+            return False
+        colorbar_range = self.result_cache.get(cache_key)
+        if colorbar_range is None:
+            return False
+        self.fixed_colorbar_ranges[key] = colorbar_range
+        return True
+
+    def save_fixed_colorbar(self, key, status):
+        """
+        Keeps the fixed colorbar range with the given key in the result
+        cache, for later sessions. See load_fixed_colorbar().
+
+        """
+        cache_key = self.get_colorbar_cache_key(status)
+        if cache_key is not None:
+            self.result_cache.put_later(cache_key,
+                                        self.fixed_colorbar_ranges[key])
+
+    def load_file(self, filename, variables=None, chosen=None):
         """
         Loads a file into memory using the iris.load() method.
         Adds the names of the cube to the select cube combo_box.
         Sets cube_loaded to true.
 
+        Returns whether the file was loaded. If not, the error is reported,
+        the override cursor restored, and the file loaded before, if any, is
+        left as it was.
+
         Args:
 
         * filename
             String containing the path to the file that should be opened.
 
+        Kwargs:
+
+        * variables
+            List of the header_scan.Variables of the file, if only some of
+            them are to be loaded, or None to load the whole file.
+
+        * chosen
+            List of the indices of the variables to load. The others are
+            loaded when they are selected. See load_selected_variable().
+
         """
+        timings = timing.Timings('load')
+        # Each of these is replaced rather than changed in place, so they can
+        # be put back if the file cannot be loaded.
+        previous = (self.filename, self.held_variables, self.lazy_cubes,
+                    self.held_cubes, self.cubes, self.cube_variables)
         try:
-            self.cubes = iris.load(filename)
-        except ValueError as e:
+            with timing.recording(timings):
+                # Anything needed that is not yet imported is imported here,
+                # on the GUI thread, rather than by the first RenderTask.
+                deferred.preload(PRELOADED)
+                with timing.span('parse'):
+                    self.filename = filename
+                    self.held_variables = {}
+                    self.lazy_cubes = {}
+                    if variables is None:
+                        self.held_cubes = self.load_cubes(filename)
+                        self.cubes = list(self.held_cubes)
+                        self.cube_variables = {}
+                        for index in xrange(len(self.cubes)):
+                            self.keep_lazy_copy(index)
+                    else:
+                        self.held_cubes = None
+                        self.cubes = [None] * len(variables)
+                        self.cube_variables = dict(
+                            (index, (variable, 0))
+                            for index, variable in enumerate(variables))
+                        for index in chosen:
+                            self.load_variable(index)
+        except (ValueError, ImportError) as e:
+            (self.filename, self.held_variables, self.lazy_cubes,
+             self.held_cubes, self.cubes, self.cube_variables) = previous
+            if isinstance(e, ImportError):
+                # Such as a library needed by iris for the format of the
+                # file.
+                title = 'Unable to Load Cube: A module could not be imported'
+            else:
+                title = 'Unable to Load Cube: File type could not be read'
+            QApplication.restoreOverrideCursor()
             flags = QtGui.QMessageBox.StandardButton.Ok
-            QtGui.QMessageBox.critical(
-                self, 'Unable to Load Cube: File type could not be read',
-                str(e), flags)
+            QtGui.QMessageBox.critical(self, title, str(e), flags)
             self.statusBar().showMessage('Load Failed')
-            QApplication.restoreOverrideCursor()
+            return False
 
         # Clear everything, to allow for objects to be rewritten for the
         # new cube.
         self.clear_all()
+        self.release_table()
+        self.cancel_range_refinements()
+        self.cancel_pyramid()
+        self.cancel_transcode()
+        self.transcoded = {}
+        self.fixed_colorbar_ranges = {}
+        self.approximate_colorbar_ranges = {}
+        self.memory.clear()
 
         # fill the select cube bow with the cube names in the cube list.
         # enable this box iff there is more than one cube to choose from.
-        for self.cube in self.cubes:
-            self.select_cube.addItem(self.cube.name())
+        for index in xrange(len(self.cubes)):
+            self.select_cube.addItem(self.get_cube_name(index))
+        if chosen:
+            self.select_cube.setCurrentIndex(chosen[0])
+        # The schema of each cube is built when it is first selected.
+        self.schemas = {}
         if len(self.cubes) == 1:
             self.select_cube.setEnabled(False)
         else:
             self.select_cube.setEnabled(True)
 
         self.cube_loaded = True
+        self.start_slice_readers(filename)
+        self.report_timings(timings, 'Loaded')
+        return True
+
+    def start_slice_readers(self, filename):
+        """
+        Sets up the readers of the slices of the loaded cubes which are
+        quicker than iris, where the file has them.
+
+        Compressed variables of a NetCDF4 file are read with their chunks
+        decompressed in parallel. See the chunk_reader module.
+
+        For a PP file, the field index is read, so that the field of each
+        slice can be read directly. If the file has not been indexed, or has
+        changed since, an IndexTask is started to build the index. See the
+        pp_index module.
+
+        Args:
+
+        * filename
+            String containing the path to the loaded file.
+
+        """
+        self.slice_readers = {}
+        self.index_task = None
+        if not os.path.isfile(filename):
+            return
+        if chunk_reader.is_hdf5_file(filename):
+            self.slice_readers = chunk_reader.get_chunk_readers(filename,
+                                                                self.cubes)
+            return
+        if not pp_index.is_pp_file(filename):
+            return
+        stashes = None
+        if self.cube_variables:
+            # Only the fields of the loaded variables are indexed, and the
+            # index is not kept, as it does not cover the whole file.
+            stashes = set(self.cube_variables[index][0].stash
+                          for index, cube in enumerate(self.cubes)
+                          if cube is not None)
+        else:
+            index = pp_index.read_index(filename)
+            if index is not None:
+                self.slice_readers = pp_index.get_field_indices(
+                    filename, index, self.cubes)
+                return
+        self.index_task = render_worker.IndexTask(filename, self.cubes,
+                                                  stashes)
+        self.index_task.signals.finished.connect(self.index_task_finished)
+        self.index_task.signals.failed.connect(self.index_task_failed)
+        self.index_pool.start(self.index_task)
+
+    def index_task_finished(self, task, index):
+        """
+        Called when an IndexTask has built the field index of the loaded
+        file. Slices are read using it from then on.
+
+        """
+        if task is not self.index_task:
+            return
+        self.index_task = None
+        self.slice_readers = pp_index.get_field_indices(task.filename, index,
+                                                        self.cubes)
+
+    def index_task_failed(self, task, message):
+        """
+        Called when an IndexTask fails. Slices are read through iris as
+        before.
+
+        """
+        if task is not self.index_task:
+            return
+        self.index_task = None
+        self.statusBar().showMessage('Unable to Index Fields: ' + message)
+
+    def load_cubes(self, filename):
+        """
+        Returns the cubes held in the file. If another window already has
+        the file open, its cubes are shared, along with any of their data
+        that has been read. Otherwise the file is loaded with iris.load().
+
+        Args:
+
+        * filename
+            String containing the path to the file.
+
+        """
+        path = os.path.abspath(filename)
+        if not os.path.isfile(path):
+            # Such as a pattern matching several files, which iris.load()
+            # also accepts.
+            return iris.load(filename)
+        # A file which has been changed since it was loaded is loaded again.
+        key = (path, os.path.getmtime(path))
+        cubes = self.loaded_files.get(key)
+        if cubes is None:
+            cubes = iris.load(filename)
+            self.loaded_files[key] = cubes
+        return cubes
+
+    def load_variable(self, index):
+        """
+        Loads the cube at the given index of the list of cubes, from its
+        variable. The first time a variable is loaded, any further cubes
+        that iris makes of it are added to the end of the list. Returns a
+        list of the indices of the cubes added.
+
+        Args:
+
+        * index
+            int holding the index of the cube in the list of cubes.
+
+        """
+        variable, position = self.cube_variables[index]
+        first_load = variable.key not in self.held_variables
+        cubes = self.load_variable_cubes(variable)
+        if len(cubes) <= position:
+            raise ValueError('No cubes could be loaded for ' + variable.name)
+        self.cubes[index] = cubes[position]
+        self.keep_lazy_copy(index)
+        added = []
+        if first_load:
+            for position in xrange(1, len(cubes)):
+                added.append(len(self.cubes))
+                self.cube_variables[len(self.cubes)] = (variable, position)
+                self.cubes.append(cubes[position])
+                self.keep_lazy_copy(added[-1])
+        return added
+
+    def load_variable_cubes(self, variable, fresh=False):
+        """
+        Returns the cubes of one variable of the open file, loaded with its
+        constraint. As in load_cubes(), the cubes are shared with any other
+        window which has loaded the same variable.
+
+        Args:
+
+        * variable
+            The header_scan.Variable to load.
+
+        Kwargs:
+
+        * fresh
+            Boolean holding whether the variable is loaded again from the
+            file, without sharing, so that any data read is released.
+
+        """
+        if fresh:
+            return iris.load(self.filename, variable.get_constraint())
+        path = os.path.abspath(self.filename)
+        key = (path, os.path.getmtime(path), variable.key)
+        cubes = self.loaded_files.get(key)
+        if cubes is None:
+            cubes = iris.load(self.filename, variable.get_constraint())
+            self.loaded_files[key] = cubes
+        self.held_variables[variable.key] = cubes
+        return cubes
+
+    def load_selected_variable(self, index):
+        """
+        Loads the cube chosen in select_cube, whose variable was not chosen
+        when the file was opened. Returns whether it was loaded. If not, the
+        cube shown before is selected again, or if no cube of the file has
+        been loaded, cube_loaded is set to False.
+
+        Args:
+
+        * index
+            int holding the index of the cube in the list of cubes.
+
+        """
+        QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        self.statusBar().showMessage('Loading Cube')
+        try:
+            added = self.load_variable(index)
+        except (IOError, ValueError) as e:
+            QApplication.restoreOverrideCursor()
+            flags = QtGui.QMessageBox.StandardButton.Ok
+            QtGui.QMessageBox.critical(self, 'Unable to Load Cube', str(e),
+                                       flags)
+            self.statusBar().showMessage('Load Failed')
+            loaded = [i for i, cube in enumerate(self.cubes)
+                      if cube is not None]
+            if loaded:
+                shown = [i for i in loaded if self.cubes[i] is self.cube]
+                self.select_cube.setCurrentIndex((shown or loaded)[0])
+            else:
+                # No cube of the file could be loaded, so there is nothing
+                # to show.
+                self.cube_loaded = False
+                self.clear_dims()
+                self.clear_fig()
+                self.set_enabled()
+            return False
+        self.select_cube.setItemText(index, self.get_cube_name(index))
+        for added_index in added:
+            self.select_cube.addItem(self.get_cube_name(added_index))
+        self.start_slice_readers(self.filename)
+        QApplication.restoreOverrideCursor()
+        self.statusBar().showMessage('Loaded')
+        return True
+
+    def get_cube_name(self, index):
+        """
+        Returns the name of the cube at the given index of the list of
+        cubes, or of its variable if it has not been loaded.
+
+        """
+        cube = self.cubes[index]
+        if cube is None:
+            return self.cube_variables[index][0].name
+        return cube.name()
 
     def display(self):
         """
-        Passes the current figure to the matplotlib display.
+        Redraws the figure of the matplotlib display.
 
         """
-        matplotlib_widget.fig = plt.gcf()
-        self.matplotlib_display.canvas.draw()
+        with timing.span('draw'):
+            self.matplotlib_display.canvas.draw()
@@ -34,11 +34,94 @@
 """
 This file defines how the matplotlibWidget object works.
 
+Plots are drawn and rasterised by RenderTasks away from the GUI thread, and
+the widget is handed the finished image along with the figure. See
+get_image() and Canvas.show_rendered().
+
 """
+import sys
+
 from PySide import QtGui
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt4agg \
     import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+import numpy as np
+
+
+def get_image(figure):
+    """
+    Returns a QtGui.QImage holding a copy of a figure that has been drawn on
+    an Agg canvas. QImages, unlike QPixmaps, may be made on any thread.
+
+    """
+    width, height = figure.canvas.get_width_height()
+    rgba = np.frombuffer(figure.canvas.buffer_rgba(), np.uint8)
+    rgba = rgba.reshape(height, width, 4)
+    # Format_ARGB32 holds each pixel as a native 32-bit int, so is BGRA in
+    # memory on a little endian machine.
+    if sys.byteorder == 'little':
+        pixels = rgba[..., [2, 1, 0, 3]]
+    else:
+        pixels = rgba[..., [3, 0, 1, 2]]
+    data = np.ascontiguousarray(pixels).tostring()
+    # The QImage does not own the String it is made from, so is copied.
+    return QtGui.QImage(data, width, height,
+                        QtGui.QImage.Format_ARGB32).copy()
+
+
+class Canvas(FigureCanvas):
+    """
+    The canvas of a MatplotlibWidget, which can show a figure that has
+    already been rasterised on another thread, until it next needs drawing,
+    such as when it is zoomed, panned or resized.
+
+    """
+    def __init__(self, figure):
+        FigureCanvas.__init__(self, figure)
+        self.rendered = None
+
+    def show_rendered(self, figure, image):
+        """
+        Replaces the figure of the canvas with one drawn elsewhere, and shows
+        the image rasterised from it. If the canvas has been resized since,
+        the figure is drawn again at the new size.
+
+        Args:
+
+        * figure
+            The matplotlib.figure.Figure, which was drawn on an Agg canvas.
+
+        * image
+            QtGui.QImage holding the drawn figure, as made by get_image().
+
+        """
+        self.figure = figure
+        figure.set_canvas(self)
+        if (image.width(), image.height()) != (self.width(),
+                                               self.height()):
+            figure.set_size_inches(self.width() / figure.dpi,
+                                   self.height() / figure.dpi)
+            self.draw()
+            return
+        self.rendered = image
+        self.update()
+
+    def draw(self):
+        """
+        Draws the figure on the GUI thread, replacing any rasterised image.
+
+        """
+        self.rendered = None
+        FigureCanvas.draw(self)
+
+    def paintEvent(self, event):
+        # Painted as soon as the base class is set up.
+        if getattr(self, 'rendered', None) is None:
+            FigureCanvas.paintEvent(self, event)
+            return
+        painter = QtGui.QPainter(self)
+        painter.drawImage(0, 0, self.rendered)
+        painter.end()
 
 
 class MatplotlibWidget(QtGui.QWidget):
@@ -50,15 +133,34 @@ class MatplotlibWidget(QtGui.QWidget):
     """
     def __init__(self, parent=None):
         """
-        This class functions by first setting a figure to be the current
-        figure, then creating a canvas instance, then making a layout, adding
-        the widget to the layout and finally applying the layout.
+        This class functions by first creating a figure of its own, then
+        creating a canvas instance, then making a layout, adding the widget to
+        the layout and finally applying the layout.
 
-        """
-        fig = plt.gcf()
+        The figure is not registered with pyplot, so nothing else can draw on
+        it by accident.
 
+        """
         QtGui.QWidget.__init__(self, parent)
-        self.canvas = FigureCanvas(fig)
+        self.figure = Figure()
+        self.canvas = Canvas(self.figure)
         self.vbl = QtGui.QVBoxLayout()
         self.vbl.addWidget(self.canvas)
         self.setLayout(self.vbl)
+
+    def show_rendered(self, figure, image):
+        """
+        Shows a figure drawn and rasterised by a RenderTask. See
+        Canvas.show_rendered().
+
+        """
+        self.figure = figure
+        self.canvas.show_rendered(figure, image)
+
+    def get_figure_size(self):
+        """
+        Returns a tuple holding the width and height in pixels and the dpi of
+        a figure drawn to fill the canvas.
+
+        """
+        return self.canvas.width(), self.canvas.height(), self.figure.dpi
@@ -0,0 +1,281 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file contains the MemoryManager Class, which accounts for the memory held
+by a session and keeps it within a budget set by the user.
+
+Several sessions are often run on one machine, so a session should not be
+able to use all of its memory. Each large object that a session holds, such
+as the data of a cube, a slice, the table of data or the drawn figure, is
+tracked with its size in bytes and a priority. Whenever the total goes over
+the budget, the objects of lowest priority are released until it fits again.
+
+"""
+import collections
+import mmap
+import re
+import sys
+
+import numpy as np
+
+
+# Priorities, in the order in which objects are evicted.
+TABLE = 0
+STATS = 1
+DATA = 2
+
+# The bytes taken by each float in a Python list, counting the pointer and
+# the float object.
+LIST_ITEM_NBYTES = 8 + sys.getsizeof(0.0)
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(text):
+    """
+    Returns the number of bytes represented by a String such as '512M',
+    '2G' or '1.5GB'. A plain number is taken to be in bytes.
+
+    """
+    match = re.match(r'^\s*([0-9.]+)\s*([KMGT]?)B?\s*$', text.upper())
+    if match is None:
+        raise ValueError('Could not read the size {!r}. Use a number of '
+                         'bytes, optionally followed by K, M, G or '
+                         'T.'.format(text))
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+
+def format_size(nbytes):
+    """
+    Returns a short String describing a number of bytes, such as '1.2 GB'.
+
+    """
+    if nbytes < 1024:
+        return '{} B'.format(int(nbytes))
+    for unit in ['KB', 'MB', 'GB', 'TB']:
+        nbytes /= 1024.0
+        if nbytes < 1024 or unit == 'TB':
+            return '{:.1f} {}'.format(nbytes, unit)
+
+
+def get_cube_nbytes(cube):
+    """
+    Returns the number of bytes held in memory by the data of a cube. Data
+    that has not yet been read from disk takes none, and nor does data mapped
+    from a file. See is_mapped().
+
+    """
+    has_lazy_data = getattr(cube, 'has_lazy_data', None)
+    if has_lazy_data is not None:
+        if has_lazy_data():
+            return 0
+        data = cube.data
+    else:
+        # Older versions of iris hold the data, whether read or not, here.
+        # Accessing cube.data would read it.
+        data = getattr(cube, '_my_data', None)
+    if not isinstance(data, np.ndarray) or is_mapped(data):
+        return 0
+    return data.nbytes
+
+
+def has_lazy_data(cube):
+    """
+    Returns whether none of the data of a cube has been read from disk yet,
+    in which case a copy of the cube reads its data lazily too.
+
+    """
+    has_lazy_data = getattr(cube, 'has_lazy_data', None)
+    if has_lazy_data is not None:
+        return has_lazy_data()
+    # See get_cube_nbytes().
+    return not isinstance(getattr(cube, '_my_data', None), np.ndarray)
+
+
+def is_mapped(data):
+    """
+    Returns whether an array is a view of a file mapped into memory, such as
+    the data of a transcoded cube. The operating system reads its pages when
+    they are needed and drops them when memory is short, so it is not
+    counted against the budget.
+
+    """
+    base = np.ma.getdata(data)
+    while base is not None:
+        if isinstance(base, mmap.mmap):
+            return True
+        base = getattr(base, 'base', None)
+    return False
+
+
+def get_table_nbytes(shape):
+    """
+    Returns an estimate of the bytes held by the data of a cube with the
+    given shape once converted to nested lists for the table of data.
+
+    """
+    rows = shape[0] if shape else 1
+    columns = shape[1] if len(shape) > 1 else 1
+    row_nbytes = sys.getsizeof([]) + columns * LIST_ITEM_NBYTES
+    return sys.getsizeof([]) + rows * (8 + row_nbytes)
+
+
+class MemoryManager(object):
+    """
+    The MemoryManager holds the size and priority of every object tracked,
+    keyed by a String chosen by the caller.
+
+    Objects tracked with a function to evict them may be released to stay
+    within the budget, lowest priority first and, within a priority, least
+    recently tracked first. Objects tracked without one, such as the slice
+    currently shown, are counted but never evicted.
+
+    """
+    def __init__(self, budget=None, on_change=None):
+        """
+        Kwargs:
+
+        * budget
+            int holding the most bytes that should be held, or None for no
+            limit.
+
+        * on_change
+            A function called with no arguments whenever the total changes,
+            such as to update a display of the usage.
+
+        """
+        self.budget = budget
+        self.on_change = on_change
+        # Maps each key to a (nbytes, priority, evict) tuple, in the order
+        # in which they were last tracked.
+        self.entries = collections.OrderedDict()
+
+    def track(self, key, nbytes, priority=None, evict=None):
+        """
+        Records the size of an object, replacing any previous record with the
+        same key, and evicts objects if the budget is exceeded. Returns the
+        list of keys evicted.
+
+        Args:
+
+        * key
+            String identifying the object.
+
+        * nbytes
+            int holding the size of the object in bytes.
+
+        Kwargs:
+
+        * priority
+            int holding the priority of the object. One of TABLE, STATS or
+            DATA.
+
+        * evict
+            A function called with no arguments to release the object, or
+            None if it must be kept.
+
+        """
+        self.entries.pop(key, None)
+        self.entries[key] = (nbytes, priority, evict)
+        evicted = self.enforce()
+        self.changed()
+        return evicted
+
+    def release(self, key):
+        """
+        Stops tracking an object, which has been released by its owner.
+
+        """
+        if self.entries.pop(key, None) is not None:
+            self.changed()
+
+    def clear(self):
+        """
+        Stops tracking all objects.
+
+        """
+        self.entries.clear()
+        self.changed()
+
+    def total(self):
+        """
+        Returns the total number of bytes tracked.
+
+        """
+        return sum(nbytes for nbytes, _, _ in self.entries.values())
+
+    def is_over_budget(self):
+        """
+        Returns whether more than the budget is tracked, which happens when
+        the objects that must be kept do not fit.
+
+        """
+        return self.budget is not None and self.total() > self.budget
+
+    def enforce(self):
+        """
+        Evicts objects until the total fits within the budget, or nothing
+        more can be evicted. Returns the list of keys evicted.
+
+        """
+        evicted = []
+        if self.budget is None:
+            return evicted
+        candidates = []
+        for order, (key, entry) in enumerate(self.entries.items()):
+            _, priority, evict = entry
+            if evict is not None:
+                candidates.append((priority, order, key))
+        for _, _, key in sorted(candidates):
+            if self.total() <= self.budget:
+                break
+            _, _, evict = self.entries.pop(key)
+            evict()
+            evicted.append(key)
+        return evicted
+
+    def changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def summary(self):
+        """
+        Returns a short String describing the memory used, suitable for the
+        status bar.
+
+        """
+        text = 'Memory: ' + format_size(self.total())
+        if self.budget is not None:
+            text += ' / ' + format_size(self.budget)
+        return text
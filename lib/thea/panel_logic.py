@@ -0,0 +1,379 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file contains a Library of functions used to draw a grid of panels, each
+showing a different slice of the cube, with a single shared colorbar.
+
+Each panel is drawn on a figure of its own in a separate process, so that the
+panels are drawn in parallel. The processes are sent the lazy cube and the
+indices of each panel, and read the data of their panels themselves. The
+finished images are then arranged on the figure of the main window. The
+worker processes are those of the worker_pool module, started by main()
+before any threads, and kept for the rest of the session.
+
+"""
+import iris.palette
+import matplotlib.cm as cm
+import matplotlib.colors as mcolors
+import numpy as np
+
+import thea.cube_logic as cl
+import thea.worker_pool as worker_pool
+
+
+# The parts of the status of the interface used by render_panel(). Only these
+# are sent to the worker processes.
+PANEL_KEYS = ('dim indices', 'slice index', 'collapsed indices',
+              'dim 1 name', 'dim 2 name', 'plot method', 'plot type',
+              'projection', 'central longitude', 'cmap', 'num contours',
+              'cartographic', 'gridlines', 'contour labels', 'can draw map')
+
+
+def get_panel_statuses(status, dim_index, num_panels):
+    """
+    Returns a copy of the status of the interface for each panel, stepping
+    along the chosen dimension from its current index.
+
+    Args:
+
+    * status
+        A dictionary representing the complete current state of the interface.
+        See cube_logic.update().
+
+    * dim_index
+        int holding the index of the dimension to step along. This must be
+        either the sliced dimension or one of the collapsed dimensions.
+
+    * num_panels
+        int holding the number of panels wanted. Fewer are returned if the
+        end of the dimension is reached first.
+
+    Returns:
+
+    * statuses
+        List of dictionaries, one for each panel.
+
+    * indices
+        List of ints holding the index along the dimension of each panel.
+
+    """
+    cube = status['cube']
+    dim_indices = status['dim indices']
+
+    if dim_index == dim_indices['sliced dim index']:
+        key, position = 'slice index', None
+        start = status['slice index']
+    else:
+        # The collapsed indices are held in the order of their dimensions.
+        used_dims = dim_indices.values()
+        collapsed_dims = [dim for dim in xrange(cube.ndim)
+                          if dim not in used_dims]
+        key, position = 'collapsed indices', collapsed_dims.index(dim_index)
+        start = status['collapsed indices'][position]
+
+    stop = min(start + num_panels, cube.shape[dim_index])
+    indices = range(start, stop)
+    statuses = []
+    for index in indices:
+        panel_status = dict(status)
+        if position is None:
+            panel_status[key] = index
+        else:
+            collapsed_indices = list(status[key])
+            collapsed_indices[position] = index
+            panel_status[key] = collapsed_indices
+        statuses.append(panel_status)
+    return statuses, indices
+
+
+def get_shared_range(sub_cubes, colorbar_range):
+    """
+    Returns the colorbar range to be shared by all of the panels. If no range
+    has been chosen, the range of the data across all of the panels is used.
+
+    Args:
+
+    * sub_cubes
+        Iterable of the cubes to be drawn on the panels.
+
+    * colorbar_range
+        Dictionary holding the max and min chosen by the user, which may be
+        None.
+
+    """
+    if colorbar_range['max'] is not None:
+        return dict(colorbar_range)
+    maxima = []
+    minima = []
+    for sub_cube in sub_cubes:
+        try:
+            data_max, data_min = cl.find_max_min(sub_cube)
+        except ValueError:
+            continue
+        maxima.append(data_max)
+        minima.append(data_min)
+    if not maxima:
+        return {'max': None, 'min': None}
+    return {'max': np.nanmax(maxima), 'min': np.nanmin(minima)}
+
+
+def get_grid_shape(num_panels):
+    """
+    Returns the number of rows and columns of the smallest, roughly square
+    grid that holds the given number of panels.
+
+    """
+    num_cols = int(np.ceil(np.sqrt(num_panels)))
+    num_rows = int(np.ceil(float(num_panels) / num_cols))
+    return num_rows, num_cols
+
+
+def get_panel_colormap(cmap, plot_method, cube):
+    """
+    Returns the matplotlib colormap that every panel is drawn with, and that
+    their shared colorbar is built from. Automatic is resolved as it would be
+    for a single plot: from coordinates, iris picks a palette from the name
+    of the cube, while from the data array, or when iris has no palette for
+    the cube, matplotlib's default colormap is used.
+
+    Args:
+
+    * cmap
+        String holding the colormap chosen by the user, or Automatic.
+
+    * plot_method
+        String holding the plot method chosen by the user.
+
+    * cube
+        The cube being plotted.
+
+    """
+    colormap = cl.get_colormap(cmap)
+    if colormap is None and plot_method != "from data array":
+        colormap, _ = iris.palette.cmap_norm(cube)
+    return cm.get_cmap(colormap)
+
+
+def render_panel(job):
+    """
+    Extracts the slice of a single panel, draws it on a figure of its own,
+    and returns the image.
+
+    This is run in a worker process by start_panels(), so takes a single
+    picklable argument.
+
+    Args:
+
+    * job
+        Dictionary holding the 'cube' to extract the slice from, the 'status'
+        of the interface for the panel without the cube, the panel 'title',
+        and the 'figsize' and 'dpi' of the image.
+
+    Returns:
+
+    * image
+        numpy array of shape (height, width, 4) holding the RGBA image.
+
+    """
+    status = job['status']
+    sub_cube = cl.get_plot_cube(dict(status, cube=job['cube']))
+    fig = cl.new_figure(figsize=job['figsize'], dpi=job['dpi'])
+    axis_labels = (status['dim 1 name'], status['dim 2 name'])
+
+    ax = cl.plot_2d(fig, sub_cube, status['plot method'],
+                    status['plot type'], status['projection'],
+                    status['central longitude'], status['cmap'],
+                    status['num contours'], status['cartographic'],
+                    status['gridlines'], status['contour labels'],
+                    status['colorbar range'], axis_labels,
+                    status['can draw map'], dim_names=job['dim names'],
+                    colorbar=False)
+    cl.check_extent(ax, status['plot method'], status['can draw map'])
+    ax.set_title(job['title'])
+
+    fig.canvas.draw()
+    width, height = fig.canvas.get_width_height()
+    image = np.frombuffer(fig.canvas.buffer_rgba(), np.uint8)
+    return image.reshape(height, width, 4).copy()
+
+
+def start_panels(jobs):
+    """
+    Starts drawing each of the panels in the pool of worker processes, and
+    returns straight away. The images, in the same order as the jobs, are
+    given by the get() method of the multiprocessing.pool.AsyncResult
+    returned, once its ready() method returns True.
+
+    Args:
+
+    * jobs
+        List of dictionaries, as taken by render_panel().
+
+    """
+    return worker_pool.get_pool().map_async(render_panel, jobs)
+
+
+def get_panel_options(status, colorbar_range):
+    """
+    Returns the parts of the status of the interface sent to the worker
+    processes with a panel, holding only PANEL_KEYS. The cube and anything
+    else held by the status are left behind, as they can be large or
+    unpicklable.
+
+    Args:
+
+    * status
+        A dictionary representing the state of the interface for the panel,
+        as returned by get_panel_statuses().
+
+    * colorbar_range
+        Dictionary holding the max and min shared by all of the panels.
+
+    """
+    panel_options = dict((key, status[key]) for key in PANEL_KEYS)
+    panel_options['colorbar range'] = colorbar_range
+    return panel_options
+
+
+def get_panel_jobs(status, cube, dim_index, num_panels, titles, figsize,
+                   dpi):
+    """
+    Returns the jobs to be passed to start_panels(), together with the shared
+    colorbar range. Unless a range has been chosen, the data of every panel
+    is read to find it, so this is run by a render_worker.PanelTask rather
+    than on the GUI thread.
+
+    Args:
+
+    * status
+        A dictionary representing the complete current state of the interface.
+
+    * cube
+        The cube sent to the worker processes to extract the panels from.
+        This should be a copy of the cube of the status from before any of
+        its data was read, if there is one, so that it is cheap to send.
+
+    * dim_index
+        int holding the index of the dimension to step along.
+
+    * num_panels
+        int holding the number of panels wanted.
+
+    * titles
+        Sequence of Strings labelling each point along the chosen dimension.
+
+    * figsize
+        Tuple holding the width and height in inches of the whole grid.
+
+    * dpi
+        The resolution of the panels in dots per inch.
+
+    Returns:
+
+    * jobs, colorbar_range
+
+    * colormap
+        The colormap of the panels, as returned by get_panel_colormap().
+
+    """
+    statuses, indices = get_panel_statuses(status, dim_index, num_panels)
+    # Only extracted if the range is to be found, one at a time.
+    sub_cubes = (cl.get_plot_cube(panel_status) for panel_status in statuses)
+    colorbar_range = get_shared_range(sub_cubes, status['colorbar range'])
+
+    num_rows, num_cols = get_grid_shape(len(statuses))
+    panel_size = (float(figsize[0]) / num_cols, float(figsize[1]) / num_rows)
+
+    schema = status.get('schema')
+    dim_names = None if schema is None else list(schema.dim_names)
+
+    # The panels and the colorbar are given the same colormap, rather than
+    # each resolving Automatic.
+    colormap = get_panel_colormap(status['cmap'], status['plot method'],
+                                  cube)
+
+    jobs = []
+    for index, panel_status in zip(indices, statuses):
+        panel_options = get_panel_options(panel_status, colorbar_range)
+        panel_options['cmap'] = colormap
+        jobs.append({'cube': cube,
+                     'status': panel_options,
+                     'title': str(titles[index]),
+                     'dim names': dim_names,
+                     'figsize': panel_size,
+                     'dpi': dpi})
+    return jobs, colorbar_range, colormap
+
+
+def composite_panels(fig, images, colorbar_range, colormap, cube):
+    """
+    Arranges the panel images in a grid on the given figure, and adds a single
+    colorbar shared by all of them.
+
+    Args:
+
+    * fig
+        The matplotlib.figure.Figure to draw on. It is expected to be empty.
+
+    * images
+        List of RGBA images, as drawn by start_panels().
+
+    * colorbar_range
+        Dictionary holding the max and min shared by all of the panels.
+
+    * colormap
+        The colormap that the panels were drawn with, as returned by
+        get_panel_jobs().
+
+    * cube
+        The cube that was plotted, used to label the colorbar.
+
+    """
+    num_rows, num_cols = get_grid_shape(len(images))
+    axes = []
+    for number, image in enumerate(images):
+        ax = fig.add_subplot(num_rows, num_cols, number + 1)
+        ax.imshow(image, interpolation='nearest')
+        ax.set_axis_off()
+        axes.append(ax)
+
+    if colorbar_range['max'] is None:
+        return
+
+    norm = mcolors.Normalize(vmin=colorbar_range['min'],
+                             vmax=colorbar_range['max'])
+    mappable = cm.ScalarMappable(norm=norm, cmap=colormap)
+    mappable.set_array(np.array([]))
+    colorbar = fig.colorbar(mappable, ax=axes, orientation='horizontal')
+    colorbar.set_label(cl.get_title(cube, True))
@@ -0,0 +1,413 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file keeps an index of the byte offset of each 2D field of a PP file,
+keyed by the position of the field in the merged cube that it belongs to, so
+that the field of a slice can be read with a single seek and read instead of
+through iris.
+
+The index is built once, from the headers of the fields and the unmerged
+cubes that iris makes of them, and is written alongside the file, or under
+~/.thea/pp_index if the directory of the file can not be written to. Only
+unpacked 32-bit fields are indexed. Packed fields are still read by iris.
+
+The index is written as JSON, and checked as it is read, as the file or the
+directory under which it is kept may be shared with other users.
+
+"""
+import hashlib
+import json
+import os
+import os.path
+import struct
+import tempfile
+
+import numpy as np
+
+import thea.deferred as deferred
+
+# Only needed to build an index. See the deferred module.
+iris = deferred.defer('iris')
+
+
+# The suffix of an index written alongside its file.
+INDEX_SUFFIX = '.thea-index'
+
+# Where an index is written when the directory of its file can not be
+# written to.
+FALLBACK_DIR = os.path.join(os.path.expanduser('~'), '.thea', 'pp_index')
+
+# The length of the header of each field, of 45 ints followed by 19 reals,
+# in a 32-bit PP file.
+HEADER_BYTES = 64 * 4
+
+# The positions of the header words used, counting from 0, among the ints
+# and the reals.
+LBLREC = 14
+LBROW = 17
+LBNPT = 18
+LBPACK = 20
+LBUSER1 = 38
+LBUSER4 = 41
+LBUSER7 = 44
+BMDI = 17
+
+# The dtype of the data of a field, by the value of LBUSER1.
+DTYPES = {1: '>f4', 2: '>i4'}
+
+# The errors that mean an index can not be read, and is ignored.
+READ_ERRORS = (IOError, OSError, EOFError, ValueError, KeyError, IndexError,
+               TypeError)
+
+
+def is_pp_file(filename):
+    """
+    Returns whether the file starts with the record of a 32-bit PP field
+    header.
+
+    """
+    try:
+        with open(filename, 'rb') as fh:
+            start = fh.read(4)
+    except IOError:
+        return False
+    return len(start) == 4 and struct.unpack('>i', start)[0] == HEADER_BYTES
+
+
+def scan_headers(filename):
+    """
+    Yields a tuple for each field of a 32-bit PP file, in order, holding the
+    byte offset of its data, and the ints and reals of its header.
+
+    """
+    with open(filename, 'rb') as fh:
+        while True:
+            record = fh.read(HEADER_BYTES + 12)
+            if len(record) < HEADER_BYTES + 12:
+                return
+            if struct.unpack('>i', record[:4])[0] != HEADER_BYTES:
+                raise ValueError('{} is not a 32-bit PP file'.format(
+                    filename))
+            ints = struct.unpack('>45i', record[4:184])
+            reals = struct.unpack('>19f', record[184:260])
+            data_bytes = struct.unpack('>i', record[264:268])[0]
+            yield fh.tell(), ints, reals
+            # Past the data and the length that closes its record.
+            fh.seek(data_bytes + 4, os.SEEK_CUR)
+
+
+def scan_fields(filename, stashes=None):
+    """
+    Yields a tuple for each field of a 32-bit PP file, in order, holding the
+    byte offset of its data, the number of rows and columns, the packing, the
+    dtype of its data (None if not supported) and the missing data value.
+    If a set of STASH codes is given, only the fields with those codes are
+    yielded.
+
+    """
+    for offset, ints, reals in scan_headers(filename):
+        if stashes is not None and get_stash(ints) not in stashes:
+            continue
+        yield (offset, ints[LBROW], ints[LBNPT], ints[LBPACK],
+               DTYPES.get(ints[LBUSER1]), reals[BMDI])
+
+
+def get_stash(ints):
+    """
+    Returns the STASH code of a field, from the ints of its header, written
+    as iris writes it, such as m01s03i236.
+
+    """
+    section, item = divmod(ints[LBUSER4], 1000)
+    return 'm{:02d}s{:02d}i{:03d}'.format(ints[LBUSER7], section, item)
+
+
+def is_readable(field):
+    """
+    Returns whether a field, as yielded by scan_fields(), can be read
+    directly.
+
+    """
+    _, rows, columns, lbpack, dtype, _ = field
+    return lbpack == 0 and dtype is not None and rows > 0 and columns > 0
+
+
+def locate(raw_cube, cube):
+    """
+    Returns a tuple holding the index of the field of an unmerged cube along
+    each dimension of a merged cube other than its last two, or None if the
+    field is not part of the merged cube.
+
+    """
+    if (raw_cube.name() != cube.name() or
+            raw_cube.attributes.get('STASH') != cube.attributes.get('STASH')
+            or raw_cube.shape != cube.shape[-2:]):
+        return None
+    position = []
+    for dim in xrange(cube.ndim - 2):
+        coords = cube.coords(dimensions=dim, dim_coords=True)
+        if not coords:
+            return None
+        raw_coords = raw_cube.coords(coords[0].name())
+        if not raw_coords:
+            return None
+        matches = np.flatnonzero(coords[0].points ==
+                                 raw_coords[0].points[0])
+        if len(matches) != 1:
+            return None
+        position.append(int(matches[0]))
+    return tuple(position)
+
+
+def build_index(filename, cubes, stashes=None):
+    """
+    Returns the index of a PP file, a list holding for each of the merged
+    cubes loaded from it a dictionary of its name, shape and fields. The
+    fields map the position of each readable field to its description, as
+    yielded by scan_fields().
+
+    Args:
+
+    * filename
+        String holding the path of the PP file.
+
+    * cubes
+        The list of cubes returned by iris.load() for the file. Cubes which
+        have not been loaded are None, and have empty entries.
+
+    Kwargs:
+
+    * stashes
+        Set of the STASH codes of the fields that the cubes were loaded
+        from, if only some of the variables of the file were loaded. Only
+        these fields are read.
+
+    """
+    fields = list(scan_fields(filename, stashes))
+    if stashes is None:
+        raw_cubes = iris.load_raw(filename)
+    else:
+        # A single constraint keeps the unmerged cubes in the order of
+        # their fields.
+        raw_cubes = iris.load_raw(filename, iris.AttributeConstraint(
+            STASH=lambda stash: str(stash) in stashes))
+    index = [{'name': cube.name(), 'shape': cube.shape, 'fields': {}}
+             if cube is not None else
+             {'name': None, 'shape': (), 'fields': {}}
+             for cube in cubes]
+    if len(raw_cubes) != len(fields):
+        # The fields and the unmerged cubes can not be matched up.
+        return index
+    for field, raw_cube in zip(fields, raw_cubes):
+        if not is_readable(field) or raw_cube.shape != field[1:3]:
+            continue
+        for cube, entry in zip(cubes, index):
+            if cube is None:
+                continue
+            position = locate(raw_cube, cube)
+            if position is not None:
+                entry['fields'][position] = field
+                break
+    return index
+
+
+def get_index_paths(filename):
+    """
+    Returns a list of the paths at which the index of a file may be written,
+    in order of preference.
+
+    """
+    path = os.path.abspath(filename)
+    digest = hashlib.sha1(path).hexdigest()
+    return [path + INDEX_SUFFIX, os.path.join(FALLBACK_DIR, digest)]
+
+
+def encode_index(index):
+    """
+    Returns the index of a file as plain lists and dictionaries that can be
+    written as JSON. The fields of each entry become a list of pairs, as the
+    keys of a JSON object can only be strings.
+
+    """
+    return [{'name': entry['name'], 'shape': list(entry['shape']),
+             'fields': [[list(position), list(field)]
+                        for position, field in entry['fields'].items()]}
+            for entry in index]
+
+
+def decode_index(contents):
+    """
+    Returns the index of a file from the lists and dictionaries written by
+    encode_index(), checking the type of every value. Raises one of
+    READ_ERRORS if the contents are not an index.
+
+    """
+    index = []
+    for entry in contents:
+        fields = {}
+        for position, field in entry['fields']:
+            offset, rows, columns, lbpack, dtype, bmdi = field
+            if dtype not in DTYPES.values():
+                raise ValueError('unknown dtype {!r}'.format(dtype))
+            fields[tuple(int(i) for i in position)] = (
+                int(offset), int(rows), int(columns), int(lbpack), str(dtype),
+                float(bmdi))
+        name = entry['name']
+        if name is not None and not isinstance(name, basestring):
+            raise TypeError('name is not a string')
+        index.append({'name': name,
+                      'shape': tuple(int(i) for i in entry['shape']),
+                      'fields': fields})
+    return index
+
+
+def write_index(filename, index):
+    """
+    Writes the index of a file, along with the size and modification time of
+    the file, to the first of its paths that can be written to. It is written
+    to a temporary file first and then renamed, so that a session reading the
+    index never sees a partly written one. Returns the path written, or None.
+
+    """
+    stat = os.stat(filename)
+    contents = {'size': stat.st_size, 'mtime': stat.st_mtime,
+                'index': encode_index(index)}
+    for path in get_index_paths(filename):
+        directory = os.path.dirname(path)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        except OSError:
+            continue
+        try:
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(contents, fh)
+            os.rename(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return path
+    return None
+
+
+def read_index(filename):
+    """
+    Returns the index of a file, or None if there is none, or the file has
+    changed since it was written. An index that can not be read for any
+    reason, including one written by an older version, is ignored.
+
+    """
+    stat = os.stat(filename)
+    for path in get_index_paths(filename):
+        try:
+            with open(path, 'r') as fh:
+                contents = json.load(fh)
+            if (contents['size'], contents['mtime']) != (stat.st_size,
+                                                         stat.st_mtime):
+                continue
+            return decode_index(contents['index'])
+        except READ_ERRORS:
+            continue
+    return None
+
+
+def get_field_indices(filename, index, cubes):
+    """
+    Returns a dictionary mapping the index of each cube with fields in the
+    index to its FieldIndex. Cubes that do not match their entry in the index
+    are left out.
+
+    """
+    field_indices = {}
+    for cube_index, (cube, entry) in enumerate(zip(cubes, index)):
+        if cube is None:
+            continue
+        if (entry['fields'] and entry['name'] == cube.name() and
+                tuple(entry['shape']) == cube.shape):
+            field_indices[cube_index] = FieldIndex(filename, entry['fields'])
+    return field_indices
+
+
+class FieldIndex(object):
+    """
+    The fields of one merged cube of a PP file, which can be read directly.
+
+    """
+    def __init__(self, filename, fields):
+        """
+        Args:
+
+        * filename
+            String holding the path of the PP file.
+
+        * fields
+            Dictionary mapping the position of each readable field, along the
+            dimensions of the cube other than its last two, to its
+            description. See build_index().
+
+        """
+        self.filename = filename
+        self.fields = fields
+
+    def read(self, keys):
+        """
+        Returns the data of the slice given by keys, as a masked array, or
+        None if it is not a field that can be read directly.
+
+        Args:
+
+        * keys
+            Tuple holding an index or slice(None) for each dimension of the
+            cube. See cube_logic.get_slice_keys().
+
+        """
+        position = keys[:-2]
+        if (any(isinstance(key, slice) for key in position) or
+                any(key != slice(None) for key in keys[-2:])):
+            return None
+        field = self.fields.get(tuple(position))
+        if field is None:
+            return None
+        offset, rows, columns, _, dtype, bmdi = field
+        with open(self.filename, 'rb') as fh:
+            fh.seek(offset)
+            data = np.fromfile(fh, dtype=dtype, count=rows * columns)
+        if data.size != rows * columns:
+            return None
+        data = data.astype(data.dtype.newbyteorder('=')).reshape(rows,
+                                                                 columns)
+        if data.dtype.kind == 'f':
+            data = np.ma.masked_values(data, bmdi, copy=False)
+        return data
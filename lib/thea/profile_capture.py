@@ -0,0 +1,195 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file contains the ProfileCapture Class, which profiles a running session
+so that a slow dataset can be investigated without restarting Thea under a
+profiler.
+
+"""
+import contextlib
+import cProfile
+import os.path
+import pstats
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # tracemalloc is only available from Python 3.4. Without it, only the
+    # time spent is captured.
+    tracemalloc = None
+
+
+def get_capture_name(status):
+    """
+    Returns a String naming the files of a capture after the file, cube and
+    slice shown when it started, so that captures of different datasets can
+    be told apart.
+
+    Args:
+
+    * status
+        A dictionary representing the state of the interface.
+
+    """
+    if not status['cube loaded']:
+        return 'thea_profile'
+    filename = os.path.splitext(os.path.basename(status['filename']))[0]
+    parts = [filename, 'cube{}'.format(status['cube index'])]
+    if status['cube'].ndim >= 3:
+        parts.append('slice{}'.format(status['slice index']))
+    for i, index in enumerate(status['collapsed indices']):
+        parts.append('dim{}-{}'.format(i + 4, index))
+    # Characters which are awkward in filenames are replaced.
+    name = '_'.join(parts)
+    return ''.join(c if c.isalnum() or c in '-_.' else '-' for c in name)
+
+
+class ProfileCapture(object):
+    """
+    A ProfileCapture runs cProfile, and tracemalloc where it is available,
+    over the next few updates of the plot.
+
+    The main thread is profiled from start() until stop(). Work done on other
+    threads, such as by a RenderTask, is profiled by running it inside
+    profiling(), and is added to the same statistics.
+
+    """
+    def __init__(self, num_updates, directory):
+        """
+        Args:
+
+        * num_updates
+            int holding the number of updates to capture.
+
+        * directory
+            String holding the directory in which the files are saved.
+
+        """
+        self.num_updates = num_updates
+        self.directory = directory
+        self.updates = 0
+        self.name = None
+        self.profile = cProfile.Profile()
+        self.thread_profiles = []
+        self.lock = threading.Lock()
+        self.started_tracemalloc = False
+        self.running = False
+
+    def start(self):
+        """
+        Starts profiling the current thread, and tracing memory allocations.
+
+        """
+        if tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        self.profile.enable()
+        self.running = True
+
+    @contextlib.contextmanager
+    def profiling(self):
+        """
+        Profiles the body of the with statement, which may be run on any
+        thread, as part of the capture.
+
+        """
+        if not self.running:
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # From Python 3.12 only one profiler can be enabled at a time,
+            # and the one started on the main thread covers every thread.
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self.lock:
+                self.thread_profiles.append(profile)
+
+    def update_finished(self, status):
+        """
+        Counts an update as captured. Returns whether all of the updates
+        asked for have now been captured.
+
+        Args:
+
+        * status
+            A dictionary representing the state of the interface used for the
+            update. The first is used to name the files.
+
+        """
+        if self.name is None:
+            self.name = get_capture_name(status)
+        self.updates += 1
+        return self.updates >= self.num_updates
+
+    def stop(self):
+        """
+        Stops the capture and saves its files. Returns a list of Strings
+        holding the paths of the files saved, which is empty if the capture
+        was never started.
+
+        The profile is saved as NAME.prof, to be read with pstats or a viewer
+        such as snakeviz, and the memory snapshot as NAME.snapshot, to be read
+        with tracemalloc.Snapshot.load().
+
+        """
+        if not self.running:
+            return []
+        self.profile.disable()
+        self.running = False
+        base = os.path.join(self.directory, '{}_{}'.format(
+            self.name or 'thea_profile', time.strftime('%Y%m%d-%H%M%S')))
+        paths = []
+
+        stats = pstats.Stats(self.profile)
+        with self.lock:
+            for profile in self.thread_profiles:
+                stats.add(profile)
+        stats.dump_stats(base + '.prof')
+        paths.append(base + '.prof')
+
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            tracemalloc.take_snapshot().dump(base + '.snapshot')
+            paths.append(base + '.snapshot')
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+        return paths
@@ -0,0 +1,591 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file keeps a pyramid of reduced copies of large 2D slices on disk, so
+that zooming and panning around one of them does not require reading or
+drawing it at full resolution.
+
+Each level of a pyramid is half the size of the one below along both axes,
+with each cell holding the mean of the unmasked cells of the 2x2 block below
+it. The levels are written as .npy files and opened as memory maps, so only
+the part of a level covering the view is read from disk. A PyramidView
+redraws the pcolormesh of a slice from the coarsest level that still has a
+cell for every pixel of the axes, whenever the view is zoomed or panned.
+
+"""
+import hashlib
+import json
+import os
+import os.path
+import shutil
+import tempfile
+
+import numpy as np
+
+import thea.disk_cache as disk_cache
+
+
+# Slices with fewer cells than this are drawn at full resolution anyway.
+MIN_CELLS = 2 ** 22
+
+# Levels are added until neither axis is longer than this.
+MIN_LEVEL_SIZE = 256
+
+# The number of cells read or reduced at once while building a pyramid,
+# which bounds the memory used to build one.
+STRIP_CELLS = 2 ** 24
+
+# The time in milliseconds for which the view must stay still before it is
+# redrawn.
+REDRAW_DELAY = 100
+
+# The store used unless another directory is given, or by the
+# THEA_PYRAMID_STORE environment variable.
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser('~'), '.thea',
+                                 'pyramids')
+
+# The size to which a store is pruned after each new pyramid.
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+
+# Written last when building a pyramid, so its presence marks one that is
+# complete.
+LEVELS_FILE = 'levels.json'
+
+
+def get_key(parts):
+    """
+    Returns a string identifying a slice, made from a hash of the given parts.
+
+    Args:
+
+    * parts
+        A list of values which can be written as JSON, such as the name and
+        modification time of the file and the indices of the slice.
+
+    """
+    return hashlib.sha1(json.dumps(parts, sort_keys=True)).hexdigest()
+
+
+def block_reduce(data):
+    """
+    Returns a masked array half the length of the given 2D array along each
+    axis, with each cell holding the mean of the unmasked cells of a 2x2
+    block. A block with no unmasked cells is masked. An odd length is padded
+    with masked cells, so the last block along it holds a single row or
+    column.
+
+    """
+    data = np.ma.asarray(data)
+    rows, cols = data.shape
+    padded = np.ma.masked_all((rows + rows % 2, cols + cols % 2),
+                              dtype=np.result_type(data.dtype, np.float32))
+    padded[:rows, :cols] = data
+    blocks = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2)
+    total = blocks.sum(axis=3).sum(axis=1).filled(0)
+    count = blocks.count(axis=3).sum(axis=1)
+    return np.ma.masked_array(total / np.maximum(count, 1), mask=count == 0)
+
+
+def get_level_shapes(shape, min_size=MIN_LEVEL_SIZE):
+    """
+    Returns a list of the shapes of each level of a pyramid of a slice of the
+    given shape, starting with the slice itself.
+
+    """
+    shapes = [tuple(shape)]
+    while max(shapes[-1]) > min_size:
+        shapes.append(tuple((length + 1) // 2 for length in shapes[-1]))
+    return shapes
+
+
+def get_edges(points, bounds=None):
+    """
+    Returns a 1D array of the edges of the cells along one axis, which has
+    one more value than there are cells. The edges are taken from the bounds
+    where given, and otherwise lie halfway between the points, with the outer
+    edges as far beyond the first and last points as the next edge inside.
+
+    Args:
+
+    * points
+        1D array holding the centre of each cell.
+
+    Kwargs:
+
+    * bounds
+        Array of shape (n, 2) holding the bounds of each cell, or None.
+
+    """
+    if bounds is not None:
+        bounds = np.asarray(bounds, dtype=np.float64)
+        return np.append(bounds[:, 0], bounds[-1, 1])
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) == 1:
+        return np.array([points[0] - 0.5, points[0] + 0.5])
+    middles = (points[:-1] + points[1:]) / 2.0
+    return np.concatenate([[2 * points[0] - middles[0]], middles,
+                           [2 * points[-1] - middles[-1]]])
+
+
+def get_level_edges(edges, level, start, stop):
+    """
+    Returns the edges of cells start to stop of the given level, from the
+    edges of the full resolution cells along the same axis.
+
+    """
+    scale = 2 ** level
+    indices = np.minimum(np.arange(start, stop + 1) * scale, len(edges) - 1)
+    return edges[indices]
+
+
+def get_index_range(edges, low, high):
+    """
+    Returns a tuple holding the first index and one past the last index of the
+    cells which lie at least partly between low and high, along an axis with
+    the given edges. The edges may run in either direction. The range is
+    empty if no cell lies between them.
+
+    """
+    low, high = min(low, high), max(low, high)
+    cells = len(edges) - 1
+    ascending = edges[-1] >= edges[0]
+    if not ascending:
+        edges = edges[::-1]
+    start = max(np.searchsorted(edges, low, side='right') - 1, 0)
+    stop = min(np.searchsorted(edges, high, side='left'), cells)
+    start, stop = min(start, stop), stop
+    if not ascending:
+        start, stop = cells - stop, cells - start
+    return int(start), int(stop)
+
+
+def choose_level(cells, pixels, num_levels):
+    """
+    Returns the coarsest level which still has at least one cell for each
+    pixel along both axes.
+
+    Args:
+
+    * cells
+        Tuple holding the number of full resolution cells in view along each
+        axis.
+
+    * pixels
+        Tuple holding the number of pixels along the same axes.
+
+    * num_levels
+        int holding the number of levels in the pyramid.
+
+    """
+    ratio = min(float(c) / max(p, 1) for c, p in zip(cells, pixels))
+    if ratio < 2:
+        return 0
+    return min(int(np.floor(np.log2(ratio))), num_levels - 1)
+
+
+def get_level_window(level, rows, cols, shape, margin=1):
+    """
+    Returns a tuple of two (start, stop) tuples holding the rows and columns
+    of the given level covering the given full resolution rows and columns,
+    widened by margin cells on each side.
+
+    Args:
+
+    * level
+        int holding the level.
+
+    * rows, cols
+        Tuples holding the first and one past the last full resolution row and
+        column in view.
+
+    * shape
+        Tuple holding the shape of the level.
+
+    """
+    scale = 2 ** level
+    window = []
+    for (start, stop), length in zip([rows, cols], shape):
+        start = max(start // scale - margin, 0)
+        stop = min(-(-stop // scale) + margin, length)
+        window.append((start, stop))
+    return tuple(window)
+
+
+class Pyramid(object):
+    """
+    A pyramid held in a directory of a PyramidStore. The levels are memory
+    maps, so opening one reads nothing but its description.
+
+    """
+    def __init__(self, path):
+        """
+        Args:
+
+        * path
+            String holding the directory of the pyramid.
+
+        """
+        self.path = path
+        with open(os.path.join(path, LEVELS_FILE)) as levels_file:
+            self.description = json.load(levels_file)
+        self.levels = []
+        self.masks = []
+        for level in xrange(self.description['levels']):
+            self.levels.append(np.load(get_level_path(path, level),
+                                       mmap_mode='r'))
+            self.masks.append(np.load(get_level_path(path, level, 'mask'),
+                                      mmap_mode='r'))
+        self.y_edges = np.load(os.path.join(path, 'y_edges.npy'))
+        self.x_edges = np.load(os.path.join(path, 'x_edges.npy'))
+
+    @property
+    def shape(self):
+        """
+        The shape of the full resolution slice.
+
+        """
+        return self.levels[0].shape
+
+    def get_window(self, level, rows, cols):
+        """
+        Returns a tuple holding the data of the given rows and columns of a
+        level as a masked array, and the edges of its cells along the y and x
+        axes. Only these cells are read from disk.
+
+        Args:
+
+        * level
+            int holding the level.
+
+        * rows, cols
+            Tuples holding the first and one past the last row and column of
+            the level.
+
+        """
+        window = (slice(*rows), slice(*cols))
+        data = np.ma.masked_array(np.array(self.levels[level][window]),
+                                  mask=np.array(self.masks[level][window]))
+        y_edges = get_level_edges(self.y_edges, level, *rows)
+        x_edges = get_level_edges(self.x_edges, level, *cols)
+        return data, y_edges, x_edges
+
+
+def get_level_path(path, level, kind='data'):
+    """
+    Returns the path of the file holding the data or mask of a level.
+
+    """
+    return os.path.join(path, '{}_{}.npy'.format(kind, level))
+
+
+def write_levels(path, read_rows, shape, dtype, min_size=MIN_LEVEL_SIZE,
+                 strip_cells=STRIP_CELLS):
+    """
+    Writes each level of a pyramid to the given directory, working through
+    the slice a strip of rows at a time so that it is never all in memory.
+    Returns the number of levels.
+
+    Args:
+
+    * path
+        String holding the directory to write to.
+
+    * read_rows
+        A function taking the first and one past the last row of the slice,
+        which returns those rows as a 2D array. Each row is read once.
+
+    * shape
+        Tuple holding the shape of the slice.
+
+    * dtype
+        The numpy dtype of the slice.
+
+    """
+    shapes = get_level_shapes(shape, min_size)
+    dtype = np.result_type(dtype, np.float32)
+    data = np.lib.format.open_memmap(get_level_path(path, 0), 'w+', dtype,
+                                     shapes[0])
+    mask = np.lib.format.open_memmap(get_level_path(path, 0, 'mask'), 'w+',
+                                     np.bool_, shapes[0])
+    strip_rows = max(strip_cells // max(shape[1], 1), 1)
+    for start in xrange(0, shape[0], strip_rows):
+        stop = min(start + strip_rows, shape[0])
+        rows = np.ma.asarray(read_rows(start, stop))
+        data[start:stop] = rows.filled(0)
+        mask[start:stop] = np.ma.getmaskarray(rows)
+    for level, level_shape in enumerate(shapes[1:], 1):
+        below = np.ma.masked_array(data, mask=mask)
+        data = np.lib.format.open_memmap(get_level_path(path, level), 'w+',
+                                         dtype, level_shape)
+        mask = np.lib.format.open_memmap(get_level_path(path, level, 'mask'),
+                                         'w+', np.bool_, level_shape)
+        # An even number of rows below, so that no block is split.
+        strip_rows = max(strip_cells // max(below.shape[1], 1) // 2, 1)
+        for start in xrange(0, level_shape[0], strip_rows):
+            stop = min(start + strip_rows, level_shape[0])
+            reduced = block_reduce(below[2 * start:2 * stop])
+            data[start:stop] = reduced.filled(0)
+            mask[start:stop] = np.ma.getmaskarray(reduced)
+    del data, mask
+    return len(shapes)
+
+
+class PyramidStore(object):
+    """
+    A directory holding a pyramid for each slice that has been visited, keyed
+    by get_key(). Pyramids are built in a temporary directory and moved into
+    place once complete, so a store may be shared between processes. The
+    pyramids used least recently are removed once the store grows over its
+    size limit.
+
+    """
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Kwargs:
+
+        * directory
+            String holding the directory of the store, or None for the
+            default.
+
+        * max_bytes
+            int holding the size to which the store is pruned, or None for no
+            limit.
+
+        """
+        if directory is None:
+            directory = os.environ.get('THEA_PYRAMID_STORE',
+                                       DEFAULT_STORE_DIR)
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def get_path(self, key):
+        """
+        Returns the directory of the pyramid with the given key.
+
+        """
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        """
+        Returns the Pyramid with the given key, or None if it has not been
+        built.
+
+        """
+        path = self.get_path(key)
+        levels_path = os.path.join(path, LEVELS_FILE)
+        if not os.path.exists(levels_path):
+            return None
+        try:
+            pyramid = Pyramid(path)
+        except (IOError, OSError, ValueError):
+            return None
+        # Marks the pyramid as recently used. See prune().
+        disk_cache.touch(levels_path)
+        return pyramid
+
+    def build(self, key, read_rows, shape, dtype, y_edges, x_edges):
+        """
+        Builds the pyramid with the given key unless it is already in the
+        store, and returns it as a Pyramid.
+
+        Args:
+
+        * key
+            String returned by get_key().
+
+        * read_rows, shape, dtype
+            See write_levels().
+
+        * y_edges, x_edges
+            1D arrays holding the edges of the full resolution cells along
+            each axis, in the units of the axes they are drawn on.
+
+        """
+        pyramid = self.load(key)
+        if pyramid is not None:
+            return pyramid
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        temp_path = tempfile.mkdtemp(prefix=key + '.', dir=self.directory)
+        try:
+            levels = write_levels(temp_path, read_rows, shape, dtype)
+            np.save(os.path.join(temp_path, 'y_edges.npy'), y_edges)
+            np.save(os.path.join(temp_path, 'x_edges.npy'), x_edges)
+            levels_path = os.path.join(temp_path, LEVELS_FILE)
+            with open(levels_path, 'w') as levels_file:
+                json.dump({'levels': levels, 'shape': list(shape)},
+                          levels_file)
+            try:
+                os.rename(temp_path, self.get_path(key))
+            except OSError:
+                # Another process has built the same pyramid in the meantime.
+                pass
+        finally:
+            if os.path.exists(temp_path):
+                shutil.rmtree(temp_path, ignore_errors=True)
+        self.prune(keep=key)
+        return self.load(key)
+
+    def get_entries(self):
+        """
+        Returns a list of (last used, nbytes, key) tuples for each complete
+        pyramid in the store.
+
+        """
+        return disk_cache.get_entries(self.directory, LEVELS_FILE)
+
+    def prune(self, keep=None):
+        """
+        Removes the pyramids used least recently until the store is within
+        its size limit. The pyramid with the key given as keep is left alone.
+
+        """
+        disk_cache.prune(self.directory, self.max_bytes, keep, LEVELS_FILE)
+
+
+class PyramidView(object):
+    """
+    Redraws the pcolormesh of a 2D slice from a Pyramid each time the limits
+    of its axes change, using the coarsest level that still has a cell for
+    each pixel, and only the cells in view.
+
+    """
+    def __init__(self, ax, mesh, pyramid, transform=None, schedule=None):
+        """
+        Args:
+
+        * ax
+            The axes that the slice is drawn on.
+
+        * mesh
+            The matplotlib QuadMesh drawn for the slice. Its colormap, norm
+            and zorder are used for each redraw, and it is replaced by the
+            first.
+
+        * pyramid
+            The Pyramid of the slice, with edges in the units of the axes.
+
+        Kwargs:
+
+        * transform
+            The cartopy CRS of the edges, for a map, or None.
+
+        * schedule
+            A function which arranges for redraw() to be called later, so
+            that a drag through many limits is only redrawn once it stops. If
+            None, redraw() is called at once.
+
+        """
+        self.ax = ax
+        self.mesh = mesh
+        self.pyramid = pyramid
+        self.transform = transform
+        self.schedule = schedule
+        self.level = None
+        self.window = None
+        self.redrawing = False
+        self.callback_ids = [
+            ax.callbacks.connect('xlim_changed', self.limits_changed),
+            ax.callbacks.connect('ylim_changed', self.limits_changed)]
+
+    def disconnect(self):
+        """
+        Stops following the limits of the axes.
+
+        """
+        for callback_id in self.callback_ids:
+            self.ax.callbacks.disconnect(callback_id)
+        self.callback_ids = []
+
+    def limits_changed(self, ax):
+        """
+        Called by matplotlib when the limits of the axes change.
+
+        """
+        if self.redrawing:
+            return
+        if self.schedule is None:
+            self.redraw()
+        else:
+            self.schedule()
+
+    def get_view(self):
+        """
+        Returns a tuple holding the (start, stop) full resolution rows and
+        columns in view.
+
+        """
+        x_low, x_high = self.ax.get_xlim()
+        y_low, y_high = self.ax.get_ylim()
+        rows = get_index_range(self.pyramid.y_edges, y_low, y_high)
+        cols = get_index_range(self.pyramid.x_edges, x_low, x_high)
+        return rows, cols
+
+    def redraw(self):
+        """
+        Replaces the mesh with one drawn from the level and window of the
+        pyramid covering the view. Returns the level drawn, or None if
+        nothing of the slice is in view.
+
+        """
+        rows, cols = self.get_view()
+        if rows[0] == rows[1] or cols[0] == cols[1]:
+            return None
+        bbox = self.ax.bbox
+        level = choose_level((rows[1] - rows[0], cols[1] - cols[0]),
+                             (bbox.height, bbox.width),
+                             len(self.pyramid.levels))
+        window = get_level_window(level, rows, cols,
+                                  self.pyramid.levels[level].shape)
+        if (level, window) == (self.level, self.window):
+            return level
+        data, y_edges, x_edges = self.pyramid.get_window(level, *window)
+        kwargs = {'cmap': self.mesh.get_cmap(), 'norm': self.mesh.norm,
+                  'zorder': self.mesh.get_zorder()}
+        if self.transform is not None:
+            kwargs['transform'] = self.transform
+        xlim, ylim = self.ax.get_xlim(), self.ax.get_ylim()
+        self.redrawing = True
+        try:
+            mesh = self.ax.pcolormesh(x_edges, y_edges, data, **kwargs)
+            self.mesh.remove()
+            self.mesh = mesh
+            # Drawing the new mesh must not move the view.
+            self.ax.set_xlim(xlim)
+            self.ax.set_ylim(ylim)
+        finally:
+            self.redrawing = False
+        self.level, self.window = level, window
+        self.ax.figure.canvas.draw_idle()
+        return level
@@ -0,0 +1,168 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file contains the RenderScheduler Class.
+
+"""
+import time
+
+from PySide import QtCore
+
+import thea.timing as timing
+
+
+# The number of milliseconds to wait after the last request before rendering.
+DEFAULT_DELAY = 40
+
+# The most milliseconds to wait after the first request before rendering,
+# however quickly further requests arrive.
+DEFAULT_MAX_WAIT = 200
+
+
+class RenderScheduler(QtCore.QObject):
+    """
+    The RenderScheduler collects requests to redraw the plot and passes them
+    on to a render function only once the requests have stopped arriving for
+    a short time.
+
+    Dragging the slice scrollbar or holding down the next slice shortcut can
+    produce many requests while a single plot is being drawn. Every request
+    restarts the timer, so that however many arrive, only the latest state of
+    the interface is drawn. So that the plot still follows the user while
+    they keep moving, the timer is never left to run past max_wait after the
+    first request that has not been rendered.
+
+    """
+    def __init__(self, render, delay=DEFAULT_DELAY, max_wait=DEFAULT_MAX_WAIT,
+                 parent=None):
+        """
+        Args:
+
+        * render
+            The function to be called, without arguments, once the requests
+            have settled.
+
+        Kwargs:
+
+        * delay
+            int holding the number of milliseconds to wait after the last
+            request before rendering.
+
+        * max_wait
+            int holding the most milliseconds to wait after the first request
+            that has not been rendered.
+
+        * parent
+            The parent QObject.
+
+        """
+        super(RenderScheduler, self).__init__(parent)
+        self.render = render
+        self.delay = delay
+        self.max_wait = max_wait
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.render_now)
+        # The time of the first request since the last render, which limits
+        # the wait, and the time spent waiting can be traced.
+        self.first_request = None
+        # Whether the pending render was brought forward by max_wait, while
+        # requests were still arriving.
+        self.overdue = False
+
+    def request(self):
+        """
+        Asks for a render. Any request that has not yet been rendered is
+        superseded by this one.
+
+        """
+        now = time.time()
+        if self.first_request is None:
+            self.first_request = now
+        waited = int((now - self.first_request) * 1000)
+        self.overdue = self.max_wait - waited < self.delay
+        self.timer.start(max(0, min(self.delay, self.max_wait - waited)))
+
+    def cancel(self):
+        """
+        Drops any request that has not yet been rendered.
+
+        """
+        self.timer.stop()
+        self.first_request = None
+        self.overdue = False
+
+    def set_delay(self, delay, max_wait=None):
+        """
+        Changes the number of milliseconds to wait after the last request
+        before rendering, and optionally the most to wait after the first.
+
+        """
+        self.delay = delay
+        if max_wait is not None:
+            self.max_wait = max_wait
+        self.timer.setInterval(delay)
+
+    def is_pending(self):
+        """
+        Returns whether there is a request waiting to be rendered.
+
+        """
+        return self.timer.isActive()
+
+    def render_now(self):
+        """
+        Renders immediately, dropping any pending request. While render is
+        called, overdue holds whether the render was brought forward by
+        max_wait. If it was, another render follows after the delay, unless
+        a request restarts the wait first, so that the last state requested
+        is drawn once the requests stop.
+
+        """
+        self.timer.stop()
+        trace = timing.get_trace()
+        if trace is not None and self.first_request is not None:
+            trace.add_event('debounce', self.first_request,
+                            time.time() - self.first_request,
+                            category='wait')
+        self.first_request = None
+        # The render may cancel() any pending request.
+        overdue = self.overdue
+        with timing.trace_span('scheduled render'):
+            self.render()
+        self.overdue = False
+        if overdue:
+            self.first_request = time.time()
+            self.timer.start(self.delay)
@@ -0,0 +1,638 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file contains the RenderTask Class, which draws a plot away from the
+GUI thread, and the tasks which do work in the background between renders:
+the RangeTask Class, which refines the range of a fixed colorbar, the
+PyramidTask Class, which builds the pyramid of a large slice, and the
+TranscodeTask Class, which transcodes a cube into a local store. The
+IndexTask Class builds the field index of a PP file, and the PanelTask Class
+prepares the panels drawn by panel_logic.
+
+"""
+import time
+
+from PySide import QtCore
+
+import thea.deferred as deferred
+import thea.matplotlib_widget as matplotlib_widget
+import thea.pp_index as pp_index
+import thea.timing as timing
+
+# Imported by MainWindow.load_file() before any task is run. See the deferred
+# module.
+cl = deferred.defer('thea.cube_logic')
+pl = deferred.defer('thea.panel_logic')
+
+
+def fix_colorbar(status, signals):
+    """
+    Finds the range of a fixed colorbar across all of the slices, which
+    MainWindow.get_fixed_colorbar() leaves to a task, fills it in to the
+    status and sends it with the colorbar_fixed signal of the given signals.
+
+    """
+    colorbar_max, colorbar_min = cl.set_fixed_colorbar(
+        status['cube'], status['dim indices'], status['collapsed indices'])
+    status['colorbar range'] = {'max': colorbar_max,
+                                'min': colorbar_min}
+    signals.colorbar_fixed.emit(status, (colorbar_max, colorbar_min))
+
+
+class RenderCancelled(Exception):
+    """
+    Raised inside a RenderTask when it has been cancelled, to abandon the
+    remaining work.
+
+    """
+    pass
+
+
+class RenderSignals(QtCore.QObject):
+    """
+    QRunnable is not a QObject, so the signals of a RenderTask are held by this
+    separate object.
+
+    Each signal carries the generation of the task that sent it, so that the
+    receiver can ignore the results of any render that has been superseded.
+    The range of a fixed colorbar is sent with the status of the task as soon
+    as it is found instead, as it is worth keeping even if the render is
+    superseded.
+
+    """
+    finished = QtCore.Signal(int, object, object)
+    failed = QtCore.Signal(int, str)
+    colorbar_fixed = QtCore.Signal(object, object)
+
+
+class Rendered(object):
+    """
+    The figure drawn by a RenderTask, with the image rasterised from it.
+
+    """
+    def __init__(self, figure, image, set_global):
+        """
+        Args:
+
+        * figure
+            The matplotlib.figure.Figure that the sub cube was plotted on.
+
+        * image
+            QtGui.QImage holding the figure rasterised by Agg. See
+            matplotlib_widget.get_image().
+
+        * set_global
+            Boolean returned by cube_logic.plot_cube().
+
+        """
+        self.figure = figure
+        self.image = image
+        self.set_global = set_global
+
+
+class RenderTask(QtCore.QRunnable):
+    """
+    A RenderTask extracts the sub-cube to be plotted, reads its data from
+    disk, plots it on a figure of its own and rasterises the figure. This is
+    the slowest part of drawing a large cube, and is run in a QThreadPool so
+    that the interface stays responsive in the meantime. Only the finished
+    image is shown on the GUI thread.
+
+    The task can be cancelled at any time. It checks whether it has been
+    cancelled between each stage of the work, and if so stops without sending
+    any result.
+
+    """
+    def __init__(self, generation, status, timings=None, capture=None,
+                 figure_size=None):
+        """
+        Args:
+
+        * generation
+            int identifying this render. The MainWindow increases this for
+            every new render, and ignores results from older generations.
+
+        * status
+            A dictionary representing the state of the interface, as returned
+            by MainWindow.resolve_status().
+
+        Kwargs:
+
+        * timings
+            A timing.Timings to which the time spent in each stage of the work
+            is added.
+
+        * capture
+            A profile_capture.ProfileCapture to which the work is added, or
+            None.
+
+        * figure_size
+            Tuple holding the width and height in pixels and the dpi of the
+            figure to draw, or None to only extract the sub cube.
+
+        """
+        super(RenderTask, self).__init__()
+        self.generation = generation
+        self.status = status
+        self.signals = RenderSignals()
+        self.cancelled = False
+        self.timings = timings
+        self.capture = capture
+        self.figure_size = figure_size
+        # Used to trace how long the task waits for a thread, and how long
+        # its result waits to be received.
+        self.created = time.time()
+        self.emitted = None
+
+    def cancel(self):
+        """
+        Asks the task to stop at the next opportunity.
+
+        """
+        self.cancelled = True
+
+    def check_cancelled(self):
+        """
+        Raises RenderCancelled if the task has been cancelled.
+
+        """
+        if self.cancelled:
+            raise RenderCancelled()
+
+    def run(self):
+        """
+        Called by the QThreadPool. Emits finished with the sub-cube and the
+        Rendered figure, if one was drawn, or failed with the error message.
+
+        """
+        trace = timing.get_trace()
+        if trace is not None:
+            trace.name_thread('render worker')
+            trace.add_event('queued', self.created,
+                            time.time() - self.created, category='wait',
+                            args={'generation': self.generation})
+        try:
+            if self.capture is None:
+                sub_cube, rendered = self.work()
+            else:
+                with self.capture.profiling():
+                    sub_cube, rendered = self.work()
+        except RenderCancelled:
+            return
+        except Exception as e:
+            self.emitted = time.time()
+            self.signals.failed.emit(self.generation, str(e))
+            return
+        self.emitted = time.time()
+        self.signals.finished.emit(self.generation, sub_cube, rendered)
+
+    def work(self):
+        """
+        Returns the sub-cube to be plotted, and the Rendered figure, or None
+        if no figure_size was given. Raises RenderCancelled if the task is
+        cancelled along the way.
+
+        """
+        with timing.trace_span('render task'), \
+                timing.recording(self.timings):
+            self.check_cancelled()
+            if self.status.get('colorbar key') is not None:
+                self.fix_colorbar()
+            sub_cube = self.extract()
+            rendered = None
+            if self.figure_size is not None:
+                rendered = self.render(sub_cube)
+        return sub_cube, rendered
+
+    def fix_colorbar(self):
+        """
+        Finds the range of a fixed colorbar across all of the slices, which
+        MainWindow.get_fixed_colorbar() leaves to the task, fills it in to
+        the status and sends it.
+
+        """
+        fix_colorbar(self.status, self.signals)
+        self.check_cancelled()
+
+    def extract(self):
+        """
+        Returns the sub-cube to be plotted, with its data read from disk.
+
+        """
+        cache = self.status.get('result cache')
+        cache_key = self.status.get('cache key')
+        if cache_key is None:
+            cache = None
+        if cache is not None:
+            # Extracted by an earlier session. See the disk_cache module.
+            with timing.span('cache'):
+                sub_cube = cache.get(cache_key)
+            if sub_cube is not None:
+                return sub_cube
+        sub_cube = cl.get_plot_cube(self.status)
+        self.check_cancelled()
+        # Iris loads data lazily, so we touch it here to make sure that it is
+        # read from disk on this thread rather than while plotting.
+        with timing.span('read'):
+            sub_cube.data
+        self.check_cancelled()
+        if cache is not None:
+            # Written on another thread, while this one plots the sub cube,
+            # which may add to its coordinates.
+            with timing.span('cache'):
+                cache.put_later(cache_key, sub_cube.copy())
+        return sub_cube
+
+    def render(self, sub_cube):
+        """
+        Plots the sub cube on a new figure of figure_size, and rasterises it
+        with Agg. Returns a Rendered.
+
+        """
+        width, height, dpi = self.figure_size
+        figure = cl.new_figure(figsize=(width / float(dpi),
+                                        height / float(dpi)), dpi=dpi)
+        set_global = cl.plot_cube(sub_cube, self.status, figure)
+        self.check_cancelled()
+        with timing.span('draw'):
+            figure.canvas.draw()
+            image = matplotlib_widget.get_image(figure)
+        self.check_cancelled()
+        return Rendered(figure, image, set_global)
+
+
+class RangeSignals(QtCore.QObject):
+    """
+    Holds the signals of a RangeTask. Each carries the task that sent it.
+
+    """
+    finished = QtCore.Signal(object, object, object)
+    failed = QtCore.Signal(object, str)
+
+
+class RangeTask(QtCore.QRunnable):
+    """
+    A RangeTask reads a batch of slices along the sliced dimension, and finds
+    the maximum and minimum of each. Fixing the colorbar of a long dimension
+    is split into many of these, run at a low priority in the same pool as
+    the RenderTasks, so that renders can go ahead between batches.
+
+    """
+    def __init__(self, key, cube, dim_indices, collapsed_indices,
+                 slice_indices):
+        """
+        Args:
+
+        * key
+            Identifies the range being refined.
+
+        * cube, dim_indices, collapsed_indices, slice_indices
+            See cube_logic.get_slices_max_min().
+
+        """
+        super(RangeTask, self).__init__()
+        self.key = key
+        self.cube = cube
+        self.dim_indices = dim_indices
+        self.collapsed_indices = collapsed_indices
+        self.slice_indices = slice_indices
+        self.signals = RangeSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Stops the task from starting, if it has not already.
+
+        """
+        self.cancelled = True
+
+    def run(self):
+        """
+        Called by the QThreadPool. Emits finished with lists of the maximum
+        and minimum of each slice, or failed with the error message.
+
+        """
+        if self.cancelled:
+            return
+        try:
+            with timing.trace_span('range task'):
+                slice_max, slice_min = cl.get_slices_max_min(
+                    self.cube, self.dim_indices, self.collapsed_indices,
+                    self.slice_indices)
+        except Exception as e:
+            self.signals.failed.emit(self, str(e))
+            return
+        self.signals.finished.emit(self, slice_max, slice_min)
+
+
+class PyramidSignals(QtCore.QObject):
+    """
+    Holds the signals of a PyramidTask. Each carries the task that sent it.
+
+    """
+    finished = QtCore.Signal(object, object, object)
+    failed = QtCore.Signal(object, str)
+
+
+class PyramidTask(QtCore.QRunnable):
+    """
+    A PyramidTask builds the pyramid of a large 2D slice once it has been
+    drawn, or opens it if it is already in the store, so that the slice can
+    be redrawn at the resolution of the screen as it is zoomed and panned.
+    See the pyramid module. It is run at a low priority in the same pool as
+    the RenderTasks.
+
+    """
+    def __init__(self, generation, status, store, key):
+        """
+        Args:
+
+        * generation
+            int identifying the render of the slice. See RenderTask.
+
+        * status
+            A dictionary representing the state of the interface that the
+            slice was drawn with.
+
+        * store
+            The pyramid.PyramidStore to build the pyramid in.
+
+        * key
+            String identifying the slice in the store.
+
+        """
+        super(PyramidTask, self).__init__()
+        self.generation = generation
+        self.status = status
+        self.store = store
+        self.key = key
+        self.signals = PyramidSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Stops the task from starting, if it has not already.
+
+        """
+        self.cancelled = True
+
+    def run(self):
+        """
+        Called by the QThreadPool. Emits finished with the pyramid.Pyramid and
+        the cartopy CRS of its edges, or failed with the error message.
+        Nothing is sent if the slice can not be drawn from a pyramid.
+
+        """
+        if self.cancelled:
+            return
+        try:
+            with timing.trace_span('pyramid task'):
+                result = self.build()
+        except Exception as e:
+            self.signals.failed.emit(self, str(e))
+            return
+        if result is not None:
+            self.signals.finished.emit(self, *result)
+
+    def build(self):
+        """
+        Returns a tuple holding the pyramid.Pyramid of the slice and the CRS
+        of its edges, or None if the slice can not be drawn from a pyramid.
+
+        """
+        full_status = dict(self.status)
+        full_status['preview'] = False
+        full_status['max points'] = None
+        sub_cube = cl.get_plot_cube(full_status)
+        edges = cl.get_pyramid_edges(sub_cube, self.status)
+        if edges is None:
+            return None
+        y_edges, x_edges, crs = edges
+
+        def read_rows(start, stop):
+            # Only these rows are read from the file.
+            return sub_cube[start:stop].data
+
+        pyramid = self.store.build(self.key, read_rows, sub_cube.shape,
+                                   sub_cube.dtype, y_edges, x_edges)
+        return pyramid, crs
+
+
+class TranscodeSignals(QtCore.QObject):
+    """
+    Holds the signals of a TranscodeTask. Each carries the task that sent it.
+
+    """
+    finished = QtCore.Signal(object)
+    failed = QtCore.Signal(object, str)
+
+
+class TranscodeTask(QtCore.QRunnable):
+    """
+    A TranscodeTask writes the next batch of fields of a cube being
+    transcoded, and moves it into place in the store once every field has
+    been written. See the transcode module. Like a RangeTask, it is run at a
+    low priority so that renders can go ahead between batches.
+
+    """
+    def __init__(self, transcoder):
+        """
+        Args:
+
+        * transcoder
+            The transcode.Transcoder of the cube.
+
+        """
+        super(TranscodeTask, self).__init__()
+        self.transcoder = transcoder
+        self.signals = TranscodeSignals()
+
+    def run(self):
+        """
+        Called by the QThreadPool. Emits finished once the batch is written,
+        or failed with the error message. A transcoder which has been
+        cancelled is abandoned instead.
+
+        """
+        if self.transcoder.cancelled:
+            self.transcoder.abandon()
+            return
+        try:
+            with timing.trace_span('transcode task'):
+                if self.transcoder.write_batch():
+                    self.transcoder.finish()
+        except Exception as e:
+            self.transcoder.abandon()
+            self.signals.failed.emit(self, str(e))
+            return
+        self.signals.finished.emit(self)
+
+
+class IndexSignals(QtCore.QObject):
+    """
+    Holds the signals of an IndexTask. Each carries the task that sent it.
+
+    """
+    finished = QtCore.Signal(object, object)
+    failed = QtCore.Signal(object, str)
+
+
+class IndexTask(QtCore.QRunnable):
+    """
+    An IndexTask builds the field index of a PP file and writes it alongside
+    the file, so that the fields of its slices can be read directly from
+    then on. See the pp_index module.
+
+    """
+    def __init__(self, filename, cubes, stashes=None):
+        """
+        Args:
+
+        * filename
+            String holding the path of the PP file.
+
+        * cubes
+            The list of cubes loaded from the file.
+
+        Kwargs:
+
+        * stashes
+            Set of the STASH codes of the variables loaded, if only some of
+            the variables of the file were loaded. The index then only
+            covers those variables, so is not written.
+
+        """
+        super(IndexTask, self).__init__()
+        self.filename = filename
+        self.cubes = cubes
+        self.stashes = stashes
+        self.signals = IndexSignals()
+
+    def run(self):
+        """
+        Called by the QThreadPool. Emits finished with the index, or failed
+        with the error message.
+
+        """
+        try:
+            with timing.trace_span('index task'):
+                index = pp_index.build_index(self.filename, self.cubes,
+                                             self.stashes)
+                if self.stashes is None:
+                    pp_index.write_index(self.filename, index)
+        except Exception as e:
+            self.signals.failed.emit(self, str(e))
+            return
+        self.signals.finished.emit(self, index)
+
+
+class PanelSignals(QtCore.QObject):
+    """
+    Holds the signals of a PanelTask.
+
+    finished and failed carry the generation of the panels, and
+    colorbar_fixed carries the status and range of a fixed colorbar, as for
+    a RenderTask.
+
+    """
+    finished = QtCore.Signal(int, object, object, object)
+    failed = QtCore.Signal(int, str)
+    colorbar_fixed = QtCore.Signal(object, object)
+
+
+class PanelTask(QtCore.QRunnable):
+    """
+    A PanelTask prepares the panels of MainWindow.show_panels(). It finds the
+    range of a fixed colorbar if that was left to it, and the range shared by
+    the panels, which reads the data of each of them. The jobs it sends are
+    drawn by the worker processes of panel_logic, which are given the indices
+    of each panel rather than its data.
+
+    """
+    def __init__(self, generation, status, cube, dim_index, num_panels,
+                 titles, figsize, dpi):
+        """
+        Args:
+
+        * generation
+            int identifying the panels, as for a RenderTask.
+
+        * status
+            A dictionary representing the state of the interface, as returned
+            by MainWindow.resolve_status().
+
+        * cube, dim_index, num_panels, titles, figsize, dpi
+            See panel_logic.get_panel_jobs().
+
+        """
+        super(PanelTask, self).__init__()
+        self.generation = generation
+        self.status = status
+        self.cube = cube
+        self.dim_index = dim_index
+        self.num_panels = num_panels
+        self.titles = titles
+        self.figsize = figsize
+        self.dpi = dpi
+        self.signals = PanelSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Stops the task from starting, if it has not already.
+
+        """
+        self.cancelled = True
+
+    def run(self):
+        """
+        Called by the QThreadPool. Emits finished with the jobs of the
+        panels, their shared colorbar range and their colormap, or failed
+        with the error message.
+
+        """
+        if self.cancelled:
+            return
+        try:
+            with timing.trace_span('panel task'):
+                if self.status.get('colorbar key') is not None:
+                    fix_colorbar(self.status, self.signals)
+                jobs, colorbar_range, colormap = pl.get_panel_jobs(
+                    self.status, self.cube, self.dim_index, self.num_panels,
+                    self.titles, self.figsize, self.dpi)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+            return
+        self.signals.finished.emit(self.generation, jobs, colorbar_range,
+                                   colormap)
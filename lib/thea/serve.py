@@ -0,0 +1,586 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file runs a local HTTP service which returns PNG images of slices of
+cubes, drawn exactly as Thea draws them, so that web pages can show the same
+plots. It is started with::
+
+    thea serve --dir DATA
+
+and a slice is requested with, for example::
+
+    http://localhost:8000/render.png?file=air_temp.pp&dim1=longitude&
+        dim2=latitude&cmap=brewer_RdBu_11&coastlines=1
+
+Each image is drawn by cube_logic.update() in a pool of worker processes.
+The images are kept in a TileCache, keyed by the request and the size and
+modification time of the file, so that repeated requests are answered
+without drawing. They are also kept on disk in a disk_cache.DiskCache, so
+that they are reused after the service is restarted.
+
+The parameters of a request are:
+
+* file: the path of the file, relative to the data directory.
+* cube: the index of the cube within the file (default 0).
+* dim1, dim2: the plotted dimensions, by name or index (default the last
+  two).
+* sliced: the sliced dimension, by name or index (default the first other
+  dimension).
+* slice: the index along the sliced dimension (default 0).
+* collapsed: the indices chosen for any other dimensions, separated by
+  commas (default 0 for each).
+* plot: one of PLOT_TYPES (default pcolormesh).
+* projection: one of PROJECTIONS (default Automatic).
+* central_longitude: in degrees (default 0).
+* cmap: a colormap name, or Automatic (default).
+* contours: the number of contours (default 25).
+* min, max: the range of the colorbar (default the range of the slice).
+* coastlines, countries, rivers, gridlines, labels: 1 to draw them.
+* width, height: the size of the image in pixels (default 800 by 600).
+
+"""
+import argparse
+import BaseHTTPServer
+import collections
+import hashlib
+import json
+import multiprocessing
+import os.path
+import SocketServer
+import StringIO
+import sys
+import threading
+import urlparse
+
+import matplotlib
+matplotlib.use('Agg')
+
+import thea.deferred as deferred
+import thea.disk_cache as disk_cache
+import thea.features as features
+import thea.memory as memory
+
+# Only needed by the worker processes. See the deferred module.
+iris = deferred.defer('iris')
+cl = deferred.defer('thea.cube_logic')
+gl = deferred.defer('thea.gui_logic')
+
+
+# The values accepted for the plot and projection parameters, as offered by
+# the main window.
+PLOT_TYPES = ['pcolormesh', 'Filled Contour', 'Contour']
+PROJECTIONS = ['Automatic', 'Plate Carree', 'Lambert Cylindrical', 'Mercator',
+               'Miller', 'Orthographic', 'Robinson', 'Stereographic',
+               'Rotated Pole', 'OSGB', 'EuroPP', 'North Polar Stereo', 'OSNI',
+               'South Polar Stereo']
+
+# The resolution of the images, in dots per inch.
+DPI = 100
+
+# The largest image that can be requested, in pixels along each side.
+MAX_PIXELS = 4000
+
+# The number of files each worker process keeps loaded.
+MAX_OPEN_FILES = 4
+
+
+class RequestError(ValueError):
+    """
+    Raised when a request cannot be drawn because of the parameters it gave,
+    and reported to the client as a bad request.
+
+    """
+    pass
+
+
+def get_int(query, name, default=None):
+    """
+    Returns the parameter of the query as an int, or the default if it was
+    not given.
+
+    """
+    value = query.get(name, [None])[0]
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise RequestError('{} must be an integer.'.format(name))
+
+
+def get_float(query, name, default=None):
+    """
+    Returns the parameter of the query as a float, or the default if it was
+    not given.
+
+    """
+    value = query.get(name, [None])[0]
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise RequestError('{} must be a number.'.format(name))
+
+
+def get_choice(query, name, choices):
+    """
+    Returns the parameter of the query, which must be one of the choices. The
+    first choice is the default.
+
+    """
+    value = query.get(name, [choices[0]])[0]
+    if value not in choices:
+        raise RequestError('{} must be one of {}.'.format(
+            name, ', '.join(choices)))
+    return value
+
+
+def get_flag(query, name):
+    """
+    Returns whether the parameter of the query was given as 1.
+
+    """
+    return query.get(name, ['0'])[0] == '1'
+
+
+def parse_request(query, data_dir):
+    """
+    Reads and checks the parameters of a request, returning a dictionary
+    holding them with any defaults filled in. The dimensions are left as
+    given, as they can only be checked against the cube. See get_status().
+
+    Args:
+
+    * query
+        Dictionary mapping each parameter to a list of its values, as given
+        by urlparse.parse_qs().
+
+    * data_dir
+        String holding the directory from which files may be read.
+
+    """
+    if 'file' not in query:
+        raise RequestError('The file must be given.')
+    root = os.path.realpath(data_dir)
+    path = os.path.realpath(os.path.join(root, query['file'][0]))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        raise RequestError('No file {!r} in the data directory.'.format(
+            query['file'][0]))
+
+    collapsed = query.get('collapsed', [''])[0]
+    try:
+        collapsed = [int(index) for index in collapsed.split(',') if index]
+    except ValueError:
+        raise RequestError('collapsed must be integers separated by commas.')
+
+    colorbar_range = {'max': get_float(query, 'max'),
+                      'min': get_float(query, 'min')}
+    if (colorbar_range['max'] is None) != (colorbar_range['min'] is None):
+        raise RequestError('Both or neither of min and max must be given.')
+
+    width = get_int(query, 'width', 800)
+    height = get_int(query, 'height', 600)
+    if not (0 < width <= MAX_PIXELS and 0 < height <= MAX_PIXELS):
+        raise RequestError('width and height must be between 1 and '
+                           '{}.'.format(MAX_PIXELS))
+
+    return {'path': path,
+            'mtime': os.path.getmtime(path),
+            'size': os.path.getsize(path),
+            'cube': get_int(query, 'cube', 0),
+            'dim1': query.get('dim1', [None])[0],
+            'dim2': query.get('dim2', [None])[0],
+            'sliced': query.get('sliced', [None])[0],
+            'slice': get_int(query, 'slice', 0),
+            'collapsed': collapsed,
+            'plot type': get_choice(query, 'plot', PLOT_TYPES),
+            'projection': get_choice(query, 'projection', PROJECTIONS),
+            'central longitude': get_float(query, 'central_longitude', 0.0),
+            'cmap': query.get('cmap', ['Automatic'])[0],
+            'num contours': get_int(query, 'contours', 25),
+            'colorbar range': colorbar_range,
+            'cartographic': {'coastlines': get_flag(query, 'coastlines'),
+                             'countries': get_flag(query, 'countries'),
+                             'rivers': get_flag(query, 'rivers')},
+            'gridlines': get_flag(query, 'gridlines'),
+            'contour labels': get_flag(query, 'labels'),
+            'width': width,
+            'height': height}
+
+
+def get_cache_key(params):
+    """
+    Returns a String identifying the image drawn for the parameters, as
+    returned by parse_request(). It includes the size and modification time
+    of the file, so that images of a file which has changed are not reused.
+
+    """
+    text = json.dumps(params, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def get_dim_index(value, dim_names, name, default):
+    """
+    Returns the index of a dimension given by name or index, or the default
+    if it was not given.
+
+    """
+    if value is None:
+        return default
+    if value in dim_names:
+        return dim_names.index(value)
+    try:
+        index = int(value)
+    except ValueError:
+        raise RequestError('{} must be one of {}.'.format(
+            name, ', '.join(dim_names)))
+    if not 0 <= index < len(dim_names):
+        raise RequestError('{} is out of range.'.format(name))
+    return index
+
+
+def get_status(params, cube):
+    """
+    Returns the status of the interface, as built by MainWindow.get_status(),
+    that draws the requested slice of the cube.
+
+    """
+    ndim = cube.ndim
+    dim_names = gl.get_dim_names(cube)
+    dim_1 = get_dim_index(params['dim1'], dim_names, 'dim1', max(ndim - 2, 0))
+    dim_2 = -1
+    if ndim > 1:
+        dim_2 = get_dim_index(params['dim2'], dim_names, 'dim2', ndim - 1)
+    others = [dim for dim in xrange(ndim) if dim not in (dim_1, dim_2)]
+    sliced = -1
+    if ndim > 2:
+        sliced = get_dim_index(params['sliced'], dim_names, 'sliced',
+                               others[0])
+    used_dims = [dim for dim in (dim_1, dim_2, sliced) if dim >= 0]
+    if len(set(used_dims)) != len(used_dims):
+        raise RequestError('dim1, dim2 and sliced must be different.')
+
+    if ndim > 2 and not 0 <= params['slice'] < cube.shape[sliced]:
+        raise RequestError('slice is out of range.')
+    collapsed_dims = [dim for dim in others if dim != sliced]
+    collapsed = params['collapsed'] or [0] * len(collapsed_dims)
+    if len(collapsed) != len(collapsed_dims):
+        raise RequestError('collapsed must give an index for each of {}.'
+                           .format(', '.join(dim_names[dim]
+                                             for dim in collapsed_dims)))
+    for dim, index in zip(collapsed_dims, collapsed):
+        if not 0 <= index < cube.shape[dim]:
+            raise RequestError('The index along {} is out of range.'.format(
+                dim_names[dim]))
+
+    dim_1_name = dim_names[dim_1]
+    dim_2_name = dim_names[dim_2] if ndim > 1 else None
+    can_draw_map = (ndim > 1 and
+                    gl.get_can_draw_map(cube, dim_1_name, dim_2_name))
+    return {'cube': cube,
+            'dim indices': {'dim 1 index': dim_1,
+                            'dim 2 index': dim_2,
+                            'sliced dim index': sliced},
+            'slice index': params['slice'],
+            'collapsed indices': collapsed,
+            'plot method': "using quickplot",
+            'plot type': params['plot type'],
+            'projection': params['projection'],
+            'central longitude': params['central longitude'],
+            'cmap': params['cmap'],
+            'num contours': params['num contours'],
+            'cartographic': params['cartographic'],
+            'gridlines': params['gridlines'],
+            'contour labels': params['contour labels'],
+            'colorbar range': params['colorbar range'],
+            'can draw map': can_draw_map,
+            'dim 1 name': dim_1_name,
+            'dim 2 name': dim_2_name}
+
+
+# The files loaded by this worker process, keyed by path and modification
+# time, with the most recently used last.
+_loaded = collections.OrderedDict()
+
+
+def load_cube(params):
+    """
+    Returns the requested cube, loading its file unless this worker process
+    has done so recently.
+
+    """
+    key = (params['path'], params['mtime'])
+    cubes = _loaded.pop(key, None)
+    if cubes is None:
+        cubes = iris.load(params['path'])
+        while len(_loaded) >= MAX_OPEN_FILES:
+            _loaded.popitem(last=False)
+    _loaded[key] = cubes
+    if not 0 <= params['cube'] < len(cubes):
+        raise RequestError('The file holds {} cubes.'.format(len(cubes)))
+    return cubes[params['cube']]
+
+
+def render(params):
+    """
+    Draws the requested slice, and returns the PNG image as a String.
+
+    This is run in a worker process, so takes a single picklable argument.
+
+    """
+    cube = load_cube(params)
+    status = get_status(params, cube)
+    fig = cl.new_figure(figsize=(params['width'] / float(DPI),
+                                 params['height'] / float(DPI)), dpi=DPI)
+    cl.update(status, fig)
+    output = StringIO.StringIO()
+    fig.savefig(output, format='png', dpi=DPI)
+    return output.getvalue()
+
+
+class TileCache(object):
+    """
+    A TileCache holds the most recently used images, up to a total number of
+    bytes, and can be used from several threads at once.
+
+    """
+    def __init__(self, max_bytes):
+        """
+        Args:
+
+        * max_bytes
+            int holding the greatest number of bytes of images to be kept.
+
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.images = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.images)
+
+    def get(self, key):
+        """
+        Returns the image stored under the key, or None.
+
+        """
+        with self.lock:
+            image = self.images.pop(key, None)
+            if image is not None:
+                # Moved to the end, as the most recently used.
+                self.images[key] = image
+            return image
+
+    def put(self, key, image):
+        """
+        Stores the image under the key, removing the least recently used
+        images to stay within max_bytes. An image larger than max_bytes is
+        not stored.
+
+        """
+        with self.lock:
+            old = self.images.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            if len(image) > self.max_bytes:
+                return
+            self.images[key] = image
+            self.nbytes += len(image)
+            while self.nbytes > self.max_bytes:
+                _, evicted = self.images.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+
+class RenderHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answers requests for /render.png.
+
+    """
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        if url.path != '/render.png':
+            self.send_error(404, 'Only /render.png is served.')
+            return
+        try:
+            params = parse_request(urlparse.parse_qs(url.query),
+                                   self.server.data_dir)
+            key = get_cache_key(params)
+            image = self.server.get_cached(key)
+            cached = image is not None
+            if not cached:
+                image = self.server.pool.apply(render, (params,))
+                self.server.cache.put(key, image)
+                if self.server.result_cache is not None:
+                    self.server.result_cache.put_later(key, image)
+        except RequestError as e:
+            self.send_error(400, str(e))
+            return
+        except Exception as e:
+            self.send_error(500, 'Unable to draw the slice: {}'.format(e))
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(image)))
+        self.send_header('X-Thea-Cache', 'hit' if cached else 'miss')
+        self.end_headers()
+        self.wfile.write(image)
+
+
+class RenderServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    An HTTP server which handles each request on a thread of its own, and
+    draws the images in a pool of worker processes.
+
+    """
+    daemon_threads = True
+
+    def __init__(self, address, data_dir, processes=None,
+                 cache_bytes=256 * 1024 ** 2, result_cache=None):
+        """
+        Args:
+
+        * address
+            Tuple holding the host and port to listen on.
+
+        * data_dir
+            String holding the directory from which files may be read.
+
+        Kwargs:
+
+        * processes
+            int holding the number of worker processes. Defaults to the
+            number of cores.
+
+        * cache_bytes
+            int holding the greatest number of bytes of images to be cached.
+
+        * result_cache
+            disk_cache.DiskCache in which the images are also kept, or None.
+
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, RenderHandler)
+        self.data_dir = data_dir
+        self.cache = TileCache(cache_bytes)
+        self.result_cache = result_cache
+        self.pool = multiprocessing.Pool(processes)
+
+    def get_cached(self, key):
+        """
+        Returns the image stored under the key in memory, or failing that on
+        disk, or None.
+
+        """
+        image = self.cache.get(key)
+        if image is None and self.result_cache is not None:
+            image = self.result_cache.get(key)
+            if image is not None:
+                self.cache.put(key, image)
+        return image
+
+    def server_close(self):
+        BaseHTTPServer.HTTPServer.server_close(self)
+        self.pool.terminate()
+        self.pool.join()
+
+
+def parse_args(args):
+    """
+    Reads the command line arguments, returning an argparse.Namespace.
+
+    """
+    parser = argparse.ArgumentParser(
+        prog='thea serve',
+        description='Serves PNG images of slices of the cubes in a '
+        'directory over HTTP.')
+    parser.add_argument('--dir', required=True,
+                        help='the directory holding the files to be served')
+    parser.add_argument('--host', default='localhost',
+                        help='the address to listen on (default: '
+                        '%(default)s)')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='the port to listen on (default: %(default)s)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='the number of worker processes drawing images '
+                        '(default: the number of cores)')
+    parser.add_argument('--cache-size', type=memory.parse_size,
+                        default=256 * 1024 ** 2, metavar='SIZE',
+                        help='the memory used to cache images, such as 1G '
+                        '(default: 256M)')
+    parser.add_argument('--disk-cache', metavar='DIR', default=None,
+                        help='the directory in which images are kept after '
+                        'the service stops, which must be private to the '
+                        'user (default: $THEA_CACHE_DIR or '
+                        '{})'.format(disk_cache.DEFAULT_CACHE_DIR))
+    parser.add_argument('--disk-cache-size', type=memory.parse_size,
+                        default=disk_cache.DEFAULT_MAX_BYTES, metavar='SIZE',
+                        help='the disk used to cache images, such as 10G '
+                        '(default: 2G)')
+    parser.add_argument('--no-disk-cache', action='store_true',
+                        help='only cache images in memory')
+    parser.add_argument('--feature-store', metavar='DIR', default=None,
+                        help='the directory in which the Natural Earth '
+                        'features are kept. See thea --help')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(sys.argv[1:] if args is None else args)
+    if not os.path.isdir(args.dir):
+        sys.stderr.write('No directory {}\n'.format(args.dir))
+        return 1
+    if args.feature_store is not None:
+        # Set before the worker processes are started, so that they share it.
+        features.set_store_dir(args.feature_store)
+    result_cache = None
+    if not args.no_disk_cache:
+        result_cache = disk_cache.DiskCache(args.disk_cache,
+                                            args.disk_cache_size)
+    server = RenderServer((args.host, args.port), args.dir, args.processes,
+                          args.cache_size, result_cache)
+    print('Serving images of the files in {} at http://{}:{}/render.png'
+          .format(args.dir, args.host, server.server_port))
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file records a session as a sequence of snapshots of the state of the
+interface, so that it can be replayed later to measure its performance. See
+benchmarks/replay.py.
+
+"""
+import json
+import threading
+import time
+
+
+# The parts of the status of the interface, as returned by
+# MainWindow.get_status(), that can be stored as they are.
+SNAPSHOT_KEYS = ['filename', 'cube index', 'dim indices', 'slice index',
+                 'collapsed indices', 'plot method', 'plot type',
+                 'projection', 'central longitude', 'cmap', 'num contours',
+                 'cartographic', 'gridlines', 'contour labels',
+                 'colorbar scheme', 'colorbar range']
+
+
+def get_snapshot(status):
+    """
+    Returns a dictionary holding the parts of the given status of the
+    interface that are needed to restore it, all of which can be written as
+    JSON. The cube itself is identified by the filename and cube index.
+
+    Args:
+
+    * status
+        A dictionary representing the state of the interface, with a cube
+        loaded.
+
+    """
+    snapshot = {}
+    for key in SNAPSHOT_KEYS:
+        snapshot[key] = status.get(key)
+    # Only a manual range is chosen by the user. Any other is calculated
+    # again when the snapshot is replayed.
+    if snapshot['colorbar scheme'] != 'manual':
+        snapshot['colorbar range'] = None
+    return snapshot
+
+
+class SessionRecorder(object):
+    """
+    A SessionRecorder writes a snapshot of the interface to a file, as a line
+    of JSON, each time the plot is drawn.
+
+    """
+    def __init__(self, filename):
+        """
+        Args:
+
+        * filename
+            String holding the path of the file. Snapshots are appended to
+            any that it already holds.
+
+        """
+        self.filename = filename
+        self.lock = threading.Lock()
+
+    def record(self, status):
+        """
+        Appends a snapshot of the given status of the interface to the file,
+        with the time at which it was taken.
+
+        """
+        line = json.dumps({'time': time.time(),
+                           'snapshot': get_snapshot(status)}, sort_keys=True)
+        with self.lock:
+            with open(self.filename, 'a') as fh:
+                fh.write(line + '\n')
+
+
+def load_recording(filename):
+    """
+    Returns the list of snapshots recorded in the given file, in order.
+
+    """
+    snapshots = []
+    with open(filename) as fh:
+        for line in fh:
+            if line.strip():
+                snapshots.append(json.loads(line)['snapshot'])
+    return snapshots
+
+
+def get_interaction(previous, snapshot):
+    """
+    Returns a String naming the kind of interaction which took the interface
+    from the previous snapshot to the next: 'load', 'cube', 'dims', 'slice',
+    'options' or 'redraw'.
+
+    Args:
+
+    * previous
+        The snapshot before the interaction, or None at the start of the
+        session.
+
+    * snapshot
+        The snapshot after the interaction.
+
+    """
+    if previous is None or previous['filename'] != snapshot['filename']:
+        return 'load'
+    elif previous['cube index'] != snapshot['cube index']:
+        return 'cube'
+    elif previous['dim indices'] != snapshot['dim indices']:
+        return 'dims'
+    elif (previous['slice index'] != snapshot['slice index'] or
+            previous['collapsed indices'] != snapshot['collapsed indices']):
+        return 'slice'
+    elif previous != snapshot:
+        return 'options'
+    else:
+        return 'redraw'
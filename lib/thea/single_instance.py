@@ -0,0 +1,264 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file lets a running Thea open the files given to later calls of thea,
+so that they do not each start a new interpreter with empty caches.
+
+The first Thea started with --single-instance listens on a local socket,
+named for the user, with an InstanceServer. The socket is kept in a
+directory private to the user, as Qt would otherwise put it in the shared
+temporary directory, where another user could create it first. A later
+call hands its file to the running instance with send_file(), and exits if
+that succeeds. Each request is a line of JSON.
+
+"""
+import getpass
+import json
+import os
+import os.path
+
+from PySide import QtCore, QtNetwork
+
+import thea.disk_cache as disk_cache
+
+
+# The number of milliseconds to wait for a running instance to answer.
+CONNECT_TIMEOUT = 1000
+
+# The directory holding the local socket, unless another is given.
+DEFAULT_SOCKET_DIR = os.path.join(os.path.expanduser('~'), '.thea',
+                                  'sockets')
+
+
+def get_server_name(socket_dir=None, make=False):
+    """
+    Returns the full path of the local socket, which is different for each
+    user so that users sharing a machine do not open files in each other's
+    sessions. None is returned if the directory of the socket is not
+    private to the user, as checked by disk_cache.is_private(), as another
+    user could then put a socket of their own in its place.
+
+    Kwargs:
+
+    * socket_dir
+        String holding the path to the directory of the socket, by default
+        DEFAULT_SOCKET_DIR.
+
+    * make
+        Boolean holding whether to make the directory, private to the user,
+        if it does not exist yet.
+
+    """
+    name = 'thea-{}'.format(getpass.getuser())
+    if not hasattr(os, 'getuid'):
+        # Not a POSIX system. Qt uses a named pipe rather than a file.
+        return name
+    socket_dir = socket_dir or DEFAULT_SOCKET_DIR
+    if make and not os.path.isdir(socket_dir):
+        try:
+            os.makedirs(socket_dir, 0o700)
+        except OSError:
+            # Unless another process has just made it.
+            pass
+    try:
+        stat = os.stat(socket_dir)
+    except OSError:
+        return None
+    if not disk_cache.is_private(stat):
+        return None
+    return os.path.join(socket_dir, name)
+
+
+def encode_request(filename):
+    """
+    Returns the line sent to the running instance to open the given file.
+    The path is made absolute, as the running instance may have been started
+    in another directory.
+
+    """
+    request = {'open': os.path.abspath(filename)}
+    return (json.dumps(request) + '\n').encode('utf-8')
+
+
+def decode_request(line):
+    """
+    Returns the filename held by a line sent by encode_request(), or None if
+    the line cannot be read.
+
+    """
+    try:
+        return json.loads(line.decode('utf-8'))['open']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def is_running(server_name=None, timeout=CONNECT_TIMEOUT):
+    """
+    Returns whether an instance is listening on the local socket, and
+    answers within the timeout.
+
+    Kwargs:
+
+    * server_name, timeout
+        See send_file().
+
+    """
+    server_name = server_name or get_server_name()
+    if server_name is None:
+        return False
+    socket = QtNetwork.QLocalSocket()
+    socket.connectToServer(server_name)
+    if not socket.waitForConnected(timeout):
+        return False
+    socket.disconnectFromServer()
+    return True
+
+
+def send_file(filename, server_name=None, timeout=CONNECT_TIMEOUT):
+    """
+    Asks a running instance to open the file. Returns whether the request was
+    sent, which it is not if no instance is running.
+
+    Args:
+
+    * filename
+        String holding the path to the file.
+
+    Kwargs:
+
+    * server_name
+        String holding the name of the local socket, by default that given by
+        get_server_name().
+
+    * timeout
+        int holding the number of milliseconds to wait for the running
+        instance.
+
+    """
+    server_name = server_name or get_server_name()
+    if server_name is None:
+        return False
+    socket = QtNetwork.QLocalSocket()
+    socket.connectToServer(server_name)
+    if not socket.waitForConnected(timeout):
+        return False
+    socket.write(encode_request(filename))
+    sent = socket.waitForBytesWritten(timeout)
+    socket.disconnectFromServer()
+    return sent
+
+
+class InstanceServer(QtCore.QObject):
+    """
+    The InstanceServer listens for files sent by send_file() from later calls
+    of thea, and emits file_requested with the path of each.
+
+    """
+    file_requested = QtCore.Signal(str)
+
+    def __init__(self, server_name=None, parent=None):
+        """
+        Kwargs:
+
+        * server_name
+            String holding the name of the local socket, by default that
+            given by get_server_name(), whose directory is made if need be.
+
+        * parent
+            The parent QObject.
+
+        """
+        super(InstanceServer, self).__init__(parent)
+        self.server_name = server_name or get_server_name(make=True)
+        self.server = QtNetwork.QLocalServer(self)
+        self.server.newConnection.connect(self.accept)
+
+    def listen(self):
+        """
+        Starts listening, returning whether this succeeded. A socket left
+        behind by an instance that did not exit cleanly is removed first,
+        but one on which another instance answers is left alone, and False
+        is returned. See is_running().
+
+        """
+        if self.server_name is None:
+            return False
+        if self.server.listen(self.server_name):
+            return True
+        if is_running(self.server_name):
+            return False
+        QtNetwork.QLocalServer.removeServer(self.server_name)
+        return self.server.listen(self.server_name)
+
+    def error(self):
+        """
+        Returns a String describing why listen() failed.
+
+        """
+        if self.server_name is None:
+            return ('{} can be read or written by other users. Run chmod 700 '
+                    'on it to use it.'.format(DEFAULT_SOCKET_DIR))
+        return self.server.errorString()
+
+    def accept(self):
+        """
+        Called when another call of thea connects.
+
+        """
+        socket = self.server.nextPendingConnection()
+        while socket is not None:
+            socket.readyRead.connect(
+                lambda socket=socket: self.read_requests(socket))
+            socket.disconnected.connect(socket.deleteLater)
+            # The request may have arrived with the connection.
+            self.read_requests(socket)
+            socket = self.server.nextPendingConnection()
+
+    def read_requests(self, socket):
+        """
+        Reads each complete request sent over the socket.
+
+        """
+        while socket.canReadLine():
+            filename = decode_request(bytes(socket.readLine()))
+            if filename is not None:
+                self.file_requested.emit(filename)
+
+    def close(self):
+        """
+        Stops listening, so that later calls of thea start their own
+        instance.
+
+        """
+        self.server.close()
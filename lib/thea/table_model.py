@@ -49,15 +49,21 @@ class TableModel(QtCore.QAbstractTableModel):
     The QTableView is passed the data to display by the TableModel, which
     is where all of the calculation and data can be found.
 
+    If page_rows is given, the rows are converted from the array a page at a
+    time, as the user scrolls to the end of the table, using Qt's
+    canFetchMore() and fetchMore().
+
     """
-    def __init__(self, data_in, horiz_header_data, vert_header_data, *args):
+    def __init__(self, data_in, horiz_header_data, vert_header_data,
+                 parent=None, page_rows=None):
         """
         We define the instance variables from the arguments given
 
         Args:
 
         * data_in
-            np.array containing the data that you wish to display.
+            The data that you wish to display, as nested lists, or as an
+            np.array if page_rows is given.
 
         * horiz_header_data
             The values with which to fill the column headers
@@ -65,9 +71,24 @@ class TableModel(QtCore.QAbstractTableModel):
         * vert_header_data
             The values with which to fill the row headers
 
+        Kwargs:
+
+        * parent
+            The parent QObject.
+
+        * page_rows
+            int holding the number of rows to be added to the table at a
+            time, or None for all of them at once.
+
         """
-        QtCore.QAbstractTableModel.__init__(self, *args)
-        self.array_data = data_in
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self.page_rows = page_rows
+        if page_rows is None:
+            self.source_data = None
+            self.array_data = data_in
+        else:
+            self.source_data = data_in
+            self.array_data = data_in[:page_rows].tolist()
         self.horiz_header_data = horiz_header_data
         self.vert_header_data = vert_header_data
 
@@ -78,6 +99,25 @@ class TableModel(QtCore.QAbstractTableModel):
         """
         return len(self.array_data)
 
+    def canFetchMore(self, _):
+        """
+        Returns whether there are rows still to be added to the table.
+
+        """
+        return (self.source_data is not None and
+                len(self.array_data) < len(self.source_data))
+
+    def fetchMore(self, _):
+        """
+        Adds the next page of rows to the table.
+
+        """
+        start = len(self.array_data)
+        stop = min(start + self.page_rows, len(self.source_data))
+        self.beginInsertRows(QtCore.QModelIndex(), start, stop - 1)
+        self.array_data.extend(self.source_data[start:stop].tolist())
+        self.endInsertRows()
+
     def columnCount(self, _):
         """
         Returns the required number of columns
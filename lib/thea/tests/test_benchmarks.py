@@ -0,0 +1,165 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import thea.benchmarks.imports as imports
+import thea.benchmarks.runner as runner
+import thea.benchmarks.synthetic as synthetic
+import thea.gui_logic as gl
+
+
+class SyntheticCubeTests(unittest.TestCase):
+    """
+    This class contains tests to check that synthetic cubes have the
+    requested size, and can be drawn as maps.
+
+    """
+    def test_get_shape(self):
+        for num_cells in [10 ** 4, 10 ** 6, 10 ** 9]:
+            for ndim in [1, 2, 3, 7]:
+                shape = synthetic.get_shape(num_cells, ndim)
+                self.assertEqual(len(shape), ndim)
+                self.assertAlmostEqual(np.prod(shape, dtype=float) /
+                                       num_cells, 1, delta=0.5)
+
+    def test_get_shape_too_many_dims(self):
+        self.assertRaises(ValueError, synthetic.get_shape, 10 ** 4, 9)
+
+    def test_make_cube(self):
+        cube = synthetic.make_cube((2, 3, 4, 5))
+        self.assertEqual(gl.get_dim_names(cube),
+                         ['time', 'air_pressure', 'latitude', 'longitude'])
+        self.assertTrue(gl.get_can_draw_map(cube, 'longitude', 'latitude'))
+        self.assertEqual(cube.data[1, 0, 0, 1], 2)
+
+    def test_make_cube_in_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            original = synthetic.MAX_IN_MEMORY_CELLS
+            synthetic.MAX_IN_MEMORY_CELLS = 10
+            try:
+                cube = synthetic.make_cube((3, 4), directory)
+            finally:
+                synthetic.MAX_IN_MEMORY_CELLS = original
+            self.assertIsInstance(cube.data, np.memmap)
+            self.assertEqual(len(os.listdir(directory)), 1)
+            del cube
+        finally:
+            shutil.rmtree(directory)
+
+
+class RunnerTests(unittest.TestCase):
+    """
+    This class contains tests to check that results are compared correctly
+    against a stored baseline.
+
+    """
+    def test_time_call(self):
+        calls = []
+        result = runner.time_call(lambda: calls.append(1), 3)
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(result['min'] <= result['median'])
+
+    def test_baseline_round_trip(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'baselines', 'before.json')
+            results = {'update/cells=10000/ndim=3': {'min': 0.5,
+                                                     'median': 0.6,
+                                                     'repeat': 3}}
+            runner.save_baseline(path, results)
+            self.assertEqual(runner.load_baseline(path), results)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_get_baseline_path(self):
+        self.assertEqual(runner.get_baseline_path('before'),
+                         os.path.join(runner.BASELINE_DIR, 'before.json'))
+        self.assertEqual(runner.get_baseline_path('other/before.json'),
+                         'other/before.json')
+
+    def test_regressions(self):
+        baseline = {'a': {'min': 1.0}, 'b': {'min': 1.0}, 'c': {'min': 1.0}}
+        results = {'a': {'min': 1.1}, 'b': {'min': 2.0}, 'd': {'min': 1.0}}
+        comparisons = runner.compare(results, baseline)
+        self.assertEqual([key for key, _, _, _ in comparisons], ['a', 'b'])
+        regressions = runner.get_regressions(comparisons, 1.25)
+        self.assertEqual(regressions, [('b', 1.0, 2.0, 2.0)])
+
+    def test_run_case_skips(self):
+        class Case(object):
+            num_cells = 10
+            ndim = 2
+            skipped = set(['update'])
+
+        calls = []
+        results = runner.run_case(Case(), [('update', calls.append),
+                                           ('other', calls.append)], 1)
+        self.assertEqual(list(results), ['other/cells=10/ndim=2'])
+        self.assertEqual(len(calls), 1)
+
+
+class ImportTests(unittest.TestCase):
+    """
+    This class contains tests to check that the time taken to import a
+    module is measured in a fresh process, and broken down by module.
+
+    """
+    def test_measure_import(self):
+        measurement = imports.measure_import('thea.deferred')
+        times = measurement['modules']['thea.deferred']
+        self.assertGreaterEqual(times['inclusive'], times['self'])
+        self.assertGreaterEqual(measurement['total'], times['self'])
+
+    def test_gui_logic_defers_iris(self):
+        measurement = imports.measure_import('thea.gui_logic')
+        self.assertNotIn('iris', measurement['modules'])
+
+    def test_format_report(self):
+        measurement = {'total': 3.0,
+                       'modules': {'a': {'self': 1.0, 'inclusive': 3.0},
+                                   'b': {'self': 2.0, 'inclusive': 2.0}}}
+        lines = imports.format_report(measurement, limit=1)
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].endswith('  b'))
+        self.assertTrue(lines[2].endswith('  total'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+import iris.cube
+import numpy as np
+
+import thea.chunk_reader as chunk_reader
+
+
+def shuffle(data, itemsize):
+    """
+    Applies the HDF5 shuffle filter to the given bytes.
+
+    """
+    values = np.frombuffer(data, dtype=np.uint8)
+    return values.reshape(-1, itemsize).T.tostring()
+
+
+class ChunkTests(unittest.TestCase):
+    """
+    This class contains tests to check that the filters of a chunk are
+    undone, and that the chunks overlapping a slice are found and placed.
+
+    """
+    def test_unshuffle(self):
+        data = np.arange(10, dtype=np.float32).tostring()
+        self.assertEqual(chunk_reader.unshuffle(shuffle(data, 4), 4), data)
+
+    def test_decode_chunk(self):
+        data = np.arange(10, dtype=np.int16).tostring()
+        stored = zlib.compress(shuffle(data, 2))
+        filters = [chunk_reader.SHUFFLE, chunk_reader.DEFLATE]
+        self.assertEqual(chunk_reader.decode_chunk(stored, 0, filters, 2),
+                         data)
+        # The deflate filter was skipped for this chunk.
+        self.assertEqual(chunk_reader.decode_chunk(shuffle(data, 2), 2,
+                                                   filters, 2), data)
+
+    def test_ranges(self):
+        everything = slice(None)
+        self.assertEqual(chunk_reader.get_ranges((everything, 3, -1),
+                                                 (4, 5, 6)),
+                         [(0, 4), (3, 4), (5, 6)])
+        self.assertIsNone(chunk_reader.get_ranges((slice(1, 2), 0),
+                                                  (4, 5)))
+
+    def test_chunk_origins(self):
+        origins = chunk_reader.get_chunk_origins([(0, 10), (5, 6)], (4, 4))
+        self.assertEqual(origins, [(0, 4), (4, 4), (8, 4)])
+
+    def test_overlap(self):
+        out_keys, chunk_keys = chunk_reader.get_overlap([(0, 10), (5, 6)],
+                                                        (8, 4), (4, 4))
+        self.assertEqual(out_keys, (slice(8, 10), slice(0, 1)))
+        self.assertEqual(chunk_keys, (slice(0, 2), slice(1, 2)))
+
+
+@unittest.skipIf(chunk_reader.h5py is None, 'h5py is not installed')
+class ChunkReaderTests(unittest.TestCase):
+    """
+    This class contains tests to check that slices of a compressed variable
+    are read in the same way as iris would read them.
+
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'compressed.nc')
+        self.data = np.arange(6 * 10 * 12, dtype=np.int16).reshape(6, 10, 12)
+        with chunk_reader.h5py.File(self.filename, 'w') as nc_file:
+            dataset = nc_file.create_dataset(
+                'tas', data=self.data, chunks=(2, 4, 5), compression='gzip',
+                shuffle=True)
+            dataset.attrs['_FillValue'] = np.int16(7)
+            dataset.attrs['scale_factor'] = np.float32(0.5)
+        self.cubes = [iris.cube.Cube(np.zeros(self.data.shape),
+                                     var_name='tas')]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_read_slice(self):
+        readers = chunk_reader.get_chunk_readers(self.filename, self.cubes)
+        if not readers:
+            self.skipTest('h5py can not read chunks directly')
+        everything = slice(None)
+        data = readers[0].read((0, everything, everything))
+        expected = np.ma.masked_equal(self.data[0], 7) * np.float32(0.5)
+        np.testing.assert_array_equal(data, expected)
+        self.assertTrue(data.mask[0, 7])
+        data = readers[0].read((everything, 9, everything))
+        np.testing.assert_array_equal(data, self.data[:, 9] * 0.5)
+
+    def test_uncompressed_not_read(self):
+        with chunk_reader.h5py.File(self.filename, 'w') as nc_file:
+            nc_file.create_dataset('tas', data=self.data, chunks=(2, 4, 5))
+        self.assertEqual(chunk_reader.get_chunk_readers(self.filename,
+                                                        self.cubes), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import unittest
+
+import thea.cost as cost
+import thea.gui_logic as gl
+import thea.tests.test_cube_logic as tcl
+
+
+class CostTests(unittest.TestCase):
+    """
+    This class contains tests to check that the costs of the expensive
+    operations are estimated from the schema, and compared to the limits.
+
+    """
+    def setUp(self):
+        self.schema = gl.CubeSchema(tcl.setup_3d_cube())
+        self.dim_indices = {'dim 1 index': 1,
+                            'dim 2 index': 0,
+                            'sliced dim index': 2}
+
+    def test_fixed_colorbar(self):
+        estimate = cost.estimate_fixed_colorbar(self.schema, self.dim_indices)
+        shape = self.schema.shape
+        self.assertEqual(estimate['cells'], shape[0] * shape[1] * shape[2])
+        self.assertEqual(estimate['nbytes'],
+                         estimate['cells'] * self.schema.itemsize)
+
+    def test_contour_only_costs_contours(self):
+        estimate = cost.estimate_contour(self.schema, self.dim_indices,
+                                         "Contour", 25)
+        self.assertEqual(estimate['cells'],
+                         self.schema.shape[0] * self.schema.shape[1])
+        estimate = cost.estimate_contour(self.schema, self.dim_indices,
+                                         "pcolormesh", 25)
+        self.assertEqual(estimate['cells'], 0)
+
+    def test_is_over_limit(self):
+        limits = dict(cost.DEFAULT_LIMITS)
+        estimate = cost.estimate_fixed_colorbar(self.schema, self.dim_indices)
+        self.assertFalse(cost.is_over_limit(estimate, limits))
+        limits['scan'] = estimate['nbytes'] - 1
+        self.assertTrue(cost.is_over_limit(estimate, limits))
+
+    def test_downsample_points(self):
+        limits = dict(cost.DEFAULT_LIMITS, contour=10000)
+        estimate = cost.estimate_contour(self.schema, self.dim_indices,
+                                         "Filled Contour", 25)
+        self.assertEqual(cost.get_downsample_points(estimate, limits), 100)
+
+    def test_table(self):
+        estimate = cost.estimate_table((200, 300))
+        self.assertEqual(estimate['cells'], 60000)
+        self.assertTrue(cost.is_over_limit(estimate, {'table': 50000}))
+
+    def test_load_missing_file(self):
+        estimate = cost.estimate_load('no such file')
+        self.assertEqual(estimate['nbytes'], 0)
+
+    def test_parse_limit(self):
+        self.assertEqual(cost.parse_limit('scan=2G'), ('scan', 2 * 1024 ** 3))
+        self.assertEqual(cost.parse_limit('contour=1e7'),
+                         ('contour', 10 ** 7))
+        self.assertRaises(ValueError, cost.parse_limit, 'speed=1')
+        self.assertRaises(ValueError, cost.parse_limit, 'scan')
+
+    def test_describe(self):
+        estimate = cost.estimate_table((1000, 1000))
+        self.assertTrue(cost.describe(estimate).startswith(
+            'Showing the data will involve 1,000,000 cells'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -35,8 +35,7 @@ import unittest
 
 import cartopy.crs as ccrs
 import iris
-import iris.quickplot as qplt
-import matplotlib.pyplot as plt
+import iris.plot as iplt
 import numpy as np
 
 import thea.cube_logic as cl
@@ -127,7 +126,7 @@ class CubeLogicTests(unittest.TestCase):
         status['slice index'] = -1
         status['collapsed indices'] = []
 
-        sub_cube, _ = cl.update(status)
+        sub_cube, _ = cl.update(status, cl.new_figure())
         self.assertEqual(sub_cube, cube)
 
     def test_update_sub_cube_2d(self):
@@ -141,7 +140,7 @@ class CubeLogicTests(unittest.TestCase):
         status['slice index'] = -1
         status['collapsed indices'] = []
 
-        sub_cube, _ = cl.update(status)
+        sub_cube, _ = cl.update(status, cl.new_figure())
         self.assertEqual(sub_cube, cube)
 
     def test_update_sub_cube_3d(self):
@@ -155,7 +154,7 @@ class CubeLogicTests(unittest.TestCase):
         status['slice index'] = 2
         status['collapsed indices'] = []
 
-        sub_cube, _ = cl.update(status)
+        sub_cube, _ = cl.update(status, cl.new_figure())
         expected_cube = cube[:, :, 2]
         self.assertEqual(sub_cube, expected_cube)
 
@@ -170,7 +169,7 @@ class CubeLogicTests(unittest.TestCase):
         status['slice index'] = 2
         status['collapsed indices'] = [3]
 
-        sub_cube, _ = cl.update(status)
+        sub_cube, _ = cl.update(status, cl.new_figure())
         expected_cube = cube[:, :, 2, 3]
         self.assertEqual(sub_cube, expected_cube)
 
@@ -185,7 +184,7 @@ class CubeLogicTests(unittest.TestCase):
         status['slice index'] = 2
         status['collapsed indices'] = [2, 1, 2, 4]
 
-        sub_cube, _ = cl.update(status)
+        sub_cube, _ = cl.update(status, cl.new_figure())
         expected_cube = cube[2, 1, :, 2, :, 4, 2]
         self.assertEqual(sub_cube, expected_cube)
 
@@ -209,6 +208,43 @@ class CubeLogicTests(unittest.TestCase):
         expected = (76745, 1645)
         self.assertEqual(max_min, expected)
 
+    def test_slices_max_min(self):
+        cube = setup_7d_anonymous_cube()
+        dim_indices = {'dim 1 index': 1,
+                       'dim 2 index': 4,
+                       'sliced dim index': 0}
+        collapsed_indices = [2, 3, 4, 0]
+        slice_max, slice_min = cl.get_slices_max_min(
+            cube, dim_indices, collapsed_indices, range(5))
+        max_min = (max(slice_max), min(slice_min))
+        expected = cl.set_fixed_colorbar(cube, dim_indices, collapsed_indices)
+        self.assertEqual(max_min, expected)
+
+    def test_sampled_colorbar_within_fixed(self):
+        cube = setup_7d_anonymous_cube()
+        dim_indices = {'dim 1 index': 1,
+                       'dim 2 index': 4,
+                       'sliced dim index': 0}
+        collapsed_indices = [2, 3, 4, 0]
+        maximum, minimum, confidence = cl.sample_fixed_colorbar(
+            cube, dim_indices, collapsed_indices, num_slices=2, seed=0)
+        fixed_max, fixed_min = cl.set_fixed_colorbar(
+            cube, dim_indices, collapsed_indices)
+        self.assertLessEqual(maximum, fixed_max)
+        self.assertGreaterEqual(minimum, fixed_min)
+        self.assertEqual(confidence['slices'], 2)
+        self.assertEqual(confidence['total slices'], 5)
+        self.assertGreater(confidence['fraction'], 0)
+        self.assertLessEqual(confidence['fraction'], 0.4)
+
+    def test_sampled_colorbar_2d(self):
+        cube = setup_2d_cube()
+        dim_indices = {'dim 1 index': 1,
+                       'dim 2 index': 0,
+                       'sliced dim index': -1}
+        self.assertEqual(cl.sample_fixed_colorbar(cube, dim_indices, []),
+                         (None, None, None))
+
     def test_find_max_min(self):
         cube = setup_7d_anonymous_cube()
         maximum, minimum = cl.find_max_min(cube)
@@ -218,29 +254,82 @@ class CubeLogicTests(unittest.TestCase):
 
     def test_check_extent_without_quickplot(self):
         cube = setup_2d_cube()
-        plt.contourf(cube.data)
-        set_global = cl.check_extent("from data array", True)
+        ax = cl.new_figure().add_subplot(1, 1, 1)
+        ax.contourf(cube.data)
+        set_global = cl.check_extent(ax, "from data array", True)
         self.assertFalse(set_global)
 
     def test_check_extent_no_map(self):
         cube = setup_3d_cube()[0]
-        qplt.contourf(cube)
-        set_global = cl.check_extent("using quickplot", False)
+        ax = cl.set_projection(cl.new_figure(), cube, "Automatic", 0.0, False)
+        iplt.contourf(cube, axes=ax)
+        set_global = cl.check_extent(ax, "using quickplot", False)
         self.assertFalse(set_global)
 
     def test_check_extent_not_required(self):
         cube = setup_2d_cube()
-        qplt.contourf(cube)
-        set_global = cl.check_extent("using quickplot", True)
+        ax = cl.set_projection(cl.new_figure(), cube, "Automatic", 0.0, True)
+        iplt.contourf(cube, axes=ax)
+        set_global = cl.check_extent(ax, "using quickplot", True)
         self.assertFalse(set_global)
 
     def test_check_extent_required(self):
         cube = setup_2d_cube()
-        plt.axes(projection=ccrs.Stereographic())
-        qplt.pcolormesh(cube)
-        set_global = cl.check_extent("using quickplot", True)
+        fig = cl.new_figure()
+        ax = fig.add_subplot(1, 1, 1, projection=ccrs.Stereographic())
+        iplt.pcolormesh(cube, axes=ax)
+        set_global = cl.check_extent(ax, "using quickplot", True)
         self.assertTrue(set_global)
 
+    def test_update_uses_given_figure(self):
+        cube = setup_2d_cube()
+        status = self.setup_update()
+        dim_indices = {'dim 1 index': 1,
+                       'dim 2 index': 0,
+                       'sliced dim index': -1}
+        status['cube'] = cube
+        status['dim indices'] = dim_indices
+        status['slice index'] = -1
+        status['collapsed indices'] = []
+        fig_1 = cl.new_figure()
+        fig_2 = cl.new_figure()
+
+        cl.update(status, fig_1)
+        self.assertEqual(len(fig_2.axes), 0)
+        self.assertNotEqual(len(fig_1.axes), 0)
+
+    def test_preview_cube_reduced(self):
+        cube = setup_2d_cube()
+        preview = cl.get_preview_cube(cube, max_points=50)
+        expected_cube = cube[::2, ::2]
+        self.assertEqual(preview, expected_cube)
+
+    def test_preview_cube_small(self):
+        cube = setup_2d_cube()
+        preview = cl.get_preview_cube(cube, max_points=1000)
+        self.assertIs(preview, cube)
+
+    def test_slice_keys(self):
+        dim_indices = {'dim 1 index': 3, 'dim 2 index': 1,
+                       'sliced dim index': 2}
+        everything = slice(None)
+        keys = cl.get_slice_keys(4, dim_indices, 5, [2])
+        self.assertEqual(keys, (2, everything, 5, everything))
+        status = {'cube': setup_4d_cube(), 'dim indices': dim_indices,
+                  'slice index': 5, 'collapsed indices': [2]}
+        self.assertEqual(cl.get_plot_cube(status), status['cube'][keys])
+
+    def test_cube_identity(self):
+        cube = setup_4d_cube()
+        identity = cl.get_cube_identity(cube)
+        self.assertEqual(cl.get_cube_identity(cube.copy()), identity)
+        # The same name and shape on another grid.
+        moved = cube.copy()
+        moved.coord('grid_longitude').points = (
+            moved.coord('grid_longitude').points + 1)
+        self.assertEqual(cl.get_cube_identity(moved)[:-1], identity[:-1])
+        self.assertNotEqual(cl.get_cube_identity(moved), identity)
+
     def test_adding_labels_lat_long(self):
         cube = setup_2d_cube()
         axis_labels = ('latitude', 'longitude')
@@ -0,0 +1,67 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+import unittest
+
+import thea.deferred as deferred
+
+
+class DeferredModuleTests(unittest.TestCase):
+    """
+    This class contains tests to check that a deferred module is imported
+    when first used, and that only the modules asked for are preloaded.
+
+    """
+    def test_loaded_on_use(self):
+        module = deferred.DeferredModule('colorsys')
+        self.assertFalse(module.is_loaded())
+        self.assertEqual(module.rgb_to_hsv(0, 0, 0), (0, 0, 0))
+        self.assertTrue(module.is_loaded())
+
+    def test_preload_only_given(self):
+        wanted = deferred.DeferredModule('json')
+        other = deferred.DeferredModule('wave')
+        deferred.preload([wanted])
+        self.assertTrue(wanted.is_loaded())
+        self.assertFalse(other.is_loaded())
+
+    def test_preload_skips_missing(self):
+        missing = deferred.DeferredModule('thea.no_such_module')
+        wanted = deferred.DeferredModule('json')
+        deferred.preload([missing, wanted])
+        self.assertFalse(missing.is_loaded())
+        self.assertTrue(wanted.is_loaded())
+        self.assertRaises(ImportError, getattr, missing, 'anything')
+
+
+if __name__ == '__main__':
+    unittest.main()
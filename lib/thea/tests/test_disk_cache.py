@@ -0,0 +1,162 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+import thea.disk_cache as disk_cache
+
+
+class DiskCacheTests(unittest.TestCase):
+    """
+    This class contains tests to check that results are kept on disk by key,
+    and that those used least recently are removed to keep to the limit.
+
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = disk_cache.DiskCache(self.directory, max_bytes=None)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        self.assertTrue(self.cache.put('key', (1.5, -2.0)))
+        self.assertEqual(self.cache.get('key'), (1.5, -2.0))
+        # Shared with another process using the same directory.
+        other = disk_cache.DiskCache(self.directory)
+        self.assertEqual(other.get('key'), (1.5, -2.0))
+        self.assertIsNone(other.get('other'))
+
+    def test_unpicklable(self):
+        self.assertFalse(self.cache.put('key', lambda: None))
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_unreadable(self):
+        with open(os.path.join(self.directory, 'key'), 'wb') as fh:
+            fh.write(b'not a pickle')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_private(self):
+        directory = os.path.join(self.directory, 'made')
+        cache = disk_cache.DiskCache(directory)
+        self.assertTrue(cache.put('key', 1))
+        self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
+        # A result written by another user, or in a directory that others
+        # can write to, is never unpickled.
+        os.chmod(cache.get_path('key'), 0o644)
+        self.assertIsNone(cache.get('key'))
+        os.chmod(cache.get_path('key'), 0o600)
+        os.chmod(directory, 0o755)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertIsNone(cache.get('key'))
+            self.assertFalse(cache.put('other', 1))
+        self.assertEqual(len(caught), 1)
+        os.chmod(directory, 0o700)
+        self.assertEqual(cache.get('key'), 1)
+
+    def test_put_later(self):
+        for key in ['first', 'second']:
+            self.assertTrue(self.cache.put_later(key, key))
+        self.cache.flush()
+        self.assertEqual(self.cache.get('first'), 'first')
+        self.assertEqual(self.cache.get('second'), 'second')
+
+    def test_prune_amortised(self):
+        self.cache.max_bytes = 1000
+        # The first result prunes any left over from earlier sessions.
+        self.cache.put('first', b'x' * 10)
+        self.assertEqual(self.cache.unpruned_bytes, 0)
+        self.cache.put('second', b'x' * 10)
+        self.assertGreater(self.cache.unpruned_bytes, 10)
+        self.cache.put('third', b'x' * 100)
+        self.assertEqual(self.cache.unpruned_bytes, 0)
+
+    def test_entries(self):
+        self.cache.put('key', b'x' * 100)
+        # A result still being written by another process.
+        open(os.path.join(self.directory, 'other.tmp'), 'wb').close()
+        entries = self.cache.get_entries()
+        self.assertEqual([key for _, _, key in entries], ['key'])
+        self.assertGreater(entries[0][1], 100)
+
+    def test_prune(self):
+        for key in ['old', 'used', 'new']:
+            self.cache.put(key, b'x' * 100)
+        os.utime(self.cache.get_path('old'), (1, 1))
+        os.utime(self.cache.get_path('used'), (2, 2))
+        os.utime(self.cache.get_path('new'), (3, 3))
+        # Reading a result marks it as the most recently used.
+        self.cache.get('used')
+        self.cache.max_bytes = 150
+        self.cache.prune()
+        self.assertIsNone(self.cache.get('old'))
+        self.assertIsNone(self.cache.get('new'))
+        self.assertIsNotNone(self.cache.get('used'))
+
+    def test_prune_keeps_new(self):
+        self.cache.max_bytes = 1
+        self.cache.put('key', b'x' * 100)
+        self.assertIsNotNone(self.cache.get('key'))
+
+    def test_prune_directories(self):
+        for key, used in [('old', 1), ('new', 2)]:
+            path = os.path.join(self.directory, key)
+            os.mkdir(path)
+            with open(os.path.join(path, 'marker'), 'wb') as fh:
+                fh.write(b'x' * 100)
+            os.utime(os.path.join(path, 'marker'), (used, used))
+        # Not yet marked as complete.
+        os.mkdir(os.path.join(self.directory, 'partial'))
+        disk_cache.prune(self.directory, 100, marker='marker')
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['new', 'partial'])
+
+    def test_file_identity(self):
+        filename = os.path.join(self.directory, 'cube.nc')
+        with open(filename, 'wb') as fh:
+            fh.write(b'1234')
+        identity = disk_cache.get_file_identity(filename)
+        self.assertEqual(identity[:2], [filename, 4])
+        with open(filename, 'ab') as fh:
+            fh.write(b'5678')
+        self.assertNotEqual(disk_cache.get_file_identity(filename), identity)
+
+
+if __name__ == '__main__':
+    unittest.main()
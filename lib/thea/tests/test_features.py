@@ -0,0 +1,102 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os.path
+import shutil
+import tempfile
+import unittest
+import warnings
+
+import thea.features as features
+
+
+class FeatureStoreTests(unittest.TestCase):
+    """
+    This class contains tests to check that the indices of the Natural Earth
+    features are kept in the store, and that a missing feature is skipped.
+
+    """
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        features.set_store_dir(self.store_dir)
+
+    def tearDown(self):
+        features.set_store_dir(None)
+        shutil.rmtree(self.store_dir)
+
+    def test_index_in_store(self):
+        path = features.get_index_path('physical', 'coastline', '50m')
+        self.assertEqual(os.path.dirname(os.path.dirname(path)),
+                         self.store_dir)
+
+    def test_index_round_trip(self):
+        path = features.get_index_path('physical', 'lakes', '10m')
+        features.write_index(path, iter([b'first', b'second']))
+        self.assertEqual(features.read_index(path), [b'first', b'second'])
+        self.assertEqual(os.listdir(os.path.dirname(path)),
+                         [os.path.basename(path)])
+
+    def test_unreadable_index(self):
+        path = features.get_index_path('physical', 'lakes', '10m')
+        features.write_index(path, iter([b'first', b'second']))
+        with open(path, 'rb') as fh:
+            contents = fh.read()
+        for bad in [b'\x80\x02]q\x00.', contents[:-1], contents[:-8]]:
+            with open(path, 'wb') as fh:
+                fh.write(bad)
+            self.assertRaises(IOError, features.read_index, path)
+
+    def test_features_use_known_scales(self):
+        for specs in features.FEATURES.values():
+            for _, _, scale, _ in specs:
+                self.assertIn(scale, features.SCALES)
+
+    def test_missing_feature_skipped(self):
+        def fail(category, name, scale):
+            raise IOError('no connection')
+        original = features.build_index
+        features.build_index = fail
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                geometries = features.load_geometries('physical', 'lakes',
+                                                      '110m')
+        finally:
+            features.build_index = original
+        self.assertEqual(geometries, [])
+        self.assertEqual(len(caught), 1)
+        self.assertNotIn(('physical', 'lakes', '110m'), features._geometries)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -403,6 +403,51 @@ class GuiLogicTests(unittest.TestCase):
         can_draw_map = gl.get_can_draw_map(cube, dim_2_name, dim_1_name)
         self.assertFalse(can_draw_map)
 
+    def test_schema_dim_names_4d(self):
+        cube = tcl.setup_4d_cube()
+        schema = gl.CubeSchema(cube)
+        self.assertEqual(list(schema.dim_names), gl.get_dim_names(cube))
+        self.assertEqual(schema.shape, cube.shape)
+
+    def test_schema_coord_values_anonymous_dim(self):
+        cube = tcl.setup_7d_anonymous_cube()
+        schema = gl.CubeSchema(cube)
+        self.assertEqual(schema.coord_values("*ANONYMOUS*4"),
+                         tuple(range(5)))
+        self.assertEqual(schema.coord_labels("*ANONYMOUS*4"),
+                         ('0', '1', '2', '3', '4'))
+        self.assertEqual(schema.dim_size("*ANONYMOUS*4"), 5)
+
+    def test_schema_can_draw_map(self):
+        cube = tcl.setup_4d_cube()
+        schema = gl.CubeSchema(cube)
+        self.assertTrue(schema.can_draw_map("grid_latitude",
+                                            "grid_longitude"))
+        self.assertTrue(schema.can_draw_map("grid_longitude",
+                                            "grid_latitude"))
+        self.assertFalse(schema.can_draw_map("grid_longitude", "time"))
+        self.assertFalse(schema.can_draw_map(None, None))
+
+    def test_schema_immutable(self):
+        cube = tcl.setup_2d_cube()
+        schema = gl.CubeSchema(cube)
+        with self.assertRaises(AttributeError):
+            schema.summary = ''
+        self.assertEqual(schema.summary, str(cube))
+
+    def test_get_enabled_uses_schema(self):
+        cube = tcl.setup_2d_cube()
+        status = {'cube loaded': True,
+                  'plot method': 'using quickplot',
+                  'plot type': 'Filled Contour',
+                  'cube': cube,
+                  'schema': gl.CubeSchema(cube),
+                  'dim 1 name': 'latitude',
+                  'dim 2 name': 'longitude',
+                  'projection': 'Automatic'}
+        state = gl.get_enabled(status)
+        self.assertTrue(state['cartographic'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,108 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import thea.header_scan as header_scan
+import thea.pp_index as pp_index
+import thea.tests.test_pp_index as tpi
+
+
+class HeaderScanTests(unittest.TestCase):
+    """
+    This class contains tests to check that the variables of a file are
+    listed from its headers, and can be searched.
+
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'fields.pp')
+        data = np.zeros((3, 4), dtype=np.float32)
+        with open(self.filename, 'wb') as fh:
+            for _ in xrange(2):
+                tpi.write_field(fh, data, lbuser4=24, lbuser7=1)
+                tpi.write_field(fh, data[:2], lbuser4=3236, lbuser7=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_stash(self):
+        ints = [0] * 45
+        ints[pp_index.LBUSER4] = 3236
+        ints[pp_index.LBUSER7] = 1
+        self.assertEqual(pp_index.get_stash(ints), 'm01s03i236')
+
+    def test_scan_fields_of_stashes(self):
+        fields = list(pp_index.scan_fields(self.filename,
+                                           set(['m01s03i236'])))
+        self.assertEqual([field[1:3] for field in fields], [(2, 4), (2, 4)])
+
+    def test_scan_pp(self):
+        variables = header_scan.scan_variables(self.filename)
+        self.assertEqual([variable.key for variable in variables],
+                         ['m01s00i024', 'm01s03i236'])
+        self.assertEqual(variables[0].name, 'surface_temperature')
+        self.assertEqual(variables[0].units, 'K')
+        self.assertEqual(variables[1].shape, '2 fields of 2 x 4')
+
+    def test_scan_other_file(self):
+        other = os.path.join(self.directory, 'other.txt')
+        with open(other, 'w') as fh:
+            fh.write('Not a file of cubes')
+        self.assertIsNone(header_scan.scan_variables(other))
+        self.assertFalse(header_scan.is_netcdf_file(other))
+
+    def test_referenced_names(self):
+        self.assertEqual(header_scan.get_referenced_names('lat lon'),
+                         ['lat', 'lon'])
+        self.assertEqual(
+            header_scan.get_referenced_names('area: cell_area'),
+            ['cell_area'])
+        self.assertEqual(header_scan.get_referenced_names(None), [])
+
+    def test_matches(self):
+        variable = header_scan.Variable('air_temperature', '10 x 20', 'K',
+                                        var_name='tas')
+        self.assertEqual(variable.key, 'tas')
+        self.assertTrue(variable.matches('Temp'))
+        self.assertTrue(variable.matches('TAS'))
+        self.assertFalse(variable.matches('wind'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import unittest
+
+import thea.gui_logic as gl
+import thea.large_cube as large_cube
+import thea.tests.test_cube_logic as tcl
+
+
+class LargeCubeTests(unittest.TestCase):
+    """
+    This class contains tests to check that large cube mode is chosen from
+    the size of the cube, unless it is forced on or off.
+
+    """
+    def setUp(self):
+        self.schema = gl.CubeSchema(tcl.setup_3d_cube())
+        self.cells = large_cube.get_cells(self.schema)
+
+    def test_parse_threshold(self):
+        self.assertEqual(large_cube.parse_threshold('nbytes=1K'),
+                         ('nbytes', 1024))
+        self.assertEqual(large_cube.parse_threshold('cells=1e9'),
+                         ('cells', 10 ** 9))
+        self.assertRaises(ValueError, large_cube.parse_threshold, 'size=1')
+        self.assertRaises(ValueError, large_cube.parse_threshold, 'cells')
+
+    def test_small_cube(self):
+        self.assertFalse(large_cube.is_large(self.schema))
+
+    def test_over_cells(self):
+        thresholds = {'nbytes': large_cube.get_nbytes(self.schema),
+                      'cells': self.cells - 1}
+        self.assertTrue(large_cube.is_large(self.schema, thresholds))
+
+    def test_over_nbytes(self):
+        thresholds = {'nbytes': large_cube.get_nbytes(self.schema) - 1,
+                      'cells': self.cells}
+        self.assertTrue(large_cube.is_large(self.schema, thresholds))
+
+    def test_modes(self):
+        thresholds = {'nbytes': 0, 'cells': 0}
+        self.assertTrue(large_cube.use_large_cube_mode(
+            'auto', self.schema, thresholds))
+        self.assertFalse(large_cube.use_large_cube_mode(
+            'off', self.schema, thresholds))
+        self.assertTrue(large_cube.use_large_cube_mode('on', self.schema))
+        self.assertFalse(large_cube.use_large_cube_mode('auto', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
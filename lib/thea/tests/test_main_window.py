@@ -141,6 +141,37 @@ class MainWindowTests(unittest.TestCase):
             missing = None
         self.assertIsNone(missing)
 
+    def test_get_status_does_not_fix_colorbar(self):
+        window = main_window.MainWindow(None)
+        cubes = iris.load(iris.sample_data_path('A1B_north_america.nc'))
+        window.cubes = cubes
+        window.cube_loaded = True
+        window.filename = 'some string'
+        window.select_cube.addItem('cube')
+        window.select_cube.setCurrentIndex(0)
+        window.colorbar_dialog.autoselect_range.setChecked(False)
+        window.colorbar_dialog.fixed_colorbar.setChecked(True)
+        status = window.get_status()
+        self.assertEqual(status['colorbar scheme'], 'fixed')
+        self.assertEqual(status['colorbar range'], {'max': None,
+                                                    'min': None})
+        self.assertEqual(window.fixed_colorbar_ranges, {})
+
+    def test_large_cube_mode_approximates_fixed_colorbar(self):
+        window = main_window.MainWindow(None, large_cube_mode='on')
+        cubes = iris.load(iris.sample_data_path('A1B_north_america.nc'))
+        window.cubes = cubes
+        window.cube_loaded = True
+        window.filename = 'some string'
+        window.select_cube.addItem('cube')
+        window.select_cube.setCurrentIndex(0)
+        window.update_large_cube_mode()
+        window.colorbar_dialog.autoselect_range.setChecked(False)
+        window.colorbar_dialog.fixed_colorbar.setChecked(True)
+        status = window.get_status()
+        self.assertTrue(window.large_cube_mode)
+        self.assertEqual(status['colorbar scheme'], 'approximate')
+
 
 def main():
     app = QtGui.QApplication(sys.argv)
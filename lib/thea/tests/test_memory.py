@@ -0,0 +1,149 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import thea.memory as memory
+
+
+class MemoryTests(unittest.TestCase):
+    """
+    This class contains tests to check that the MemoryManager keeps within
+    its budget, evicting objects in order of priority.
+
+    """
+    def setup_manager(self, budget):
+        self.evicted = []
+        return memory.MemoryManager(budget)
+
+    def evict(self, name):
+        return lambda: self.evicted.append(name)
+
+    def test_parse_size(self):
+        self.assertEqual(memory.parse_size('512'), 512)
+        self.assertEqual(memory.parse_size('2K'), 2048)
+        self.assertEqual(memory.parse_size('1.5GB'), int(1.5 * 1024 ** 3))
+        self.assertEqual(memory.parse_size('3m'), 3 * 1024 ** 2)
+        self.assertRaises(ValueError, memory.parse_size, 'lots')
+
+    def test_format_size(self):
+        self.assertEqual(memory.format_size(100), '100 B')
+        self.assertEqual(memory.format_size(1536), '1.5 KB')
+        self.assertEqual(memory.format_size(2 * 1024 ** 3), '2.0 GB')
+
+    def test_no_budget(self):
+        manager = self.setup_manager(None)
+        manager.track('a', 10 ** 12, memory.TABLE, self.evict('a'))
+        self.assertEqual(self.evicted, [])
+        self.assertFalse(manager.is_over_budget())
+
+    def test_evicts_by_priority(self):
+        manager = self.setup_manager(100)
+        manager.track('data', 40, memory.DATA, self.evict('data'))
+        manager.track('table', 40, memory.TABLE, self.evict('table'))
+        manager.track('stats', 10, memory.STATS, self.evict('stats'))
+        evicted = manager.track('slice', 50)
+        self.assertEqual(evicted, ['table'])
+        self.assertEqual(self.evicted, ['table'])
+        self.assertEqual(manager.total(), 100)
+
+    def test_evicts_least_recent_first(self):
+        manager = self.setup_manager(100)
+        manager.track('cube 0', 40, memory.DATA, self.evict('cube 0'))
+        manager.track('cube 1', 40, memory.DATA, self.evict('cube 1'))
+        manager.track('cube 0', 40, memory.DATA, self.evict('cube 0'))
+        manager.track('figure', 30)
+        self.assertEqual(self.evicted, ['cube 1'])
+
+    def test_kept_objects_over_budget(self):
+        manager = self.setup_manager(100)
+        manager.track('slice', 150)
+        self.assertTrue(manager.is_over_budget())
+        self.assertEqual(manager.summary(), 'Memory: 150 B / 100 B')
+
+    def test_release(self):
+        changes = []
+        manager = memory.MemoryManager(on_change=lambda: changes.append(1))
+        manager.track('table', 40, memory.TABLE)
+        manager.release('table')
+        manager.release('table')
+        self.assertEqual(manager.total(), 0)
+        self.assertEqual(len(changes), 2)
+
+    def test_table_nbytes(self):
+        small = memory.get_table_nbytes((10, 10))
+        large = memory.get_table_nbytes((100, 10))
+        self.assertTrue(small > 100 * 8)
+        self.assertTrue(large > 9 * small)
+
+    def test_cube_nbytes(self):
+        class Cube(object):
+            def __init__(self, lazy):
+                self.data = np.zeros((10, 10))
+                self.lazy = lazy
+
+            def has_lazy_data(self):
+                return self.lazy
+
+        self.assertEqual(memory.get_cube_nbytes(Cube(False)), 800)
+        self.assertEqual(memory.get_cube_nbytes(Cube(True)), 0)
+
+    def test_has_lazy_data(self):
+        class Cube(object):
+            def __init__(self, data):
+                # As held by older versions of iris.
+                self._my_data = data
+
+        self.assertFalse(memory.has_lazy_data(Cube(np.zeros(3))))
+        self.assertTrue(memory.has_lazy_data(Cube(object())))
+
+    def test_mapped_data_not_counted(self):
+        handle, path = tempfile.mkstemp(suffix='.npy')
+        os.close(handle)
+        try:
+            np.save(path, np.zeros((10, 10)))
+            data = np.load(path, mmap_mode='r')
+            self.assertTrue(memory.is_mapped(data.T[2:]))
+            self.assertTrue(memory.is_mapped(np.ma.masked_array(data)))
+            self.assertFalse(memory.is_mapped(np.array(data)))
+            del data
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
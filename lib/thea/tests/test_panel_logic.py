@@ -0,0 +1,120 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import unittest
+
+import matplotlib.cm as cm
+
+import thea.panel_logic as pl
+import thea.tests.test_cube_logic as tcl
+
+
+class PanelLogicTests(unittest.TestCase):
+    """
+    This class contains tests to check that the panels are chosen, sized and
+    scaled correctly.
+
+    """
+    def setup_status(self):
+        cube = tcl.setup_7d_anonymous_cube()
+        dim_indices = {'dim 1 index': 4,
+                       'dim 2 index': 2,
+                       'sliced dim index': 6}
+        status = {'cube': cube,
+                  'dim indices': dim_indices,
+                  'slice index': 1,
+                  'collapsed indices': [2, 1, 2, 4]}
+        return status
+
+    def test_panel_statuses_sliced_dim(self):
+        status = self.setup_status()
+        statuses, indices = pl.get_panel_statuses(status, 6, 3)
+        self.assertEqual(indices, [1, 2, 3])
+        slice_indices = [panel['slice index'] for panel in statuses]
+        self.assertEqual(slice_indices, [1, 2, 3])
+
+    def test_panel_statuses_collapsed_dim(self):
+        status = self.setup_status()
+        statuses, indices = pl.get_panel_statuses(status, 3, 10)
+        self.assertEqual(indices, [2, 3, 4])
+        collapsed = [panel['collapsed indices'] for panel in statuses]
+        self.assertEqual(collapsed, [[2, 1, 2, 4], [2, 1, 3, 4],
+                                     [2, 1, 4, 4]])
+        self.assertEqual(status['collapsed indices'], [2, 1, 2, 4])
+
+    def test_grid_shape(self):
+        self.assertEqual(pl.get_grid_shape(1), (1, 1))
+        self.assertEqual(pl.get_grid_shape(4), (2, 2))
+        self.assertEqual(pl.get_grid_shape(5), (2, 3))
+
+    def test_shared_range(self):
+        cube = tcl.setup_7d_anonymous_cube()
+        sub_cubes = [cube[0, 0, 0, 0, 0], cube[4, 4, 4, 4, 4]]
+        colorbar_range = pl.get_shared_range(sub_cubes, {'max': None,
+                                                         'min': None})
+        self.assertEqual(colorbar_range, {'max': 5 ** 7 - 1, 'min': 0})
+
+    def test_panel_options(self):
+        status = dict((key, key) for key in pl.PANEL_KEYS)
+        status.update(self.setup_status())
+        status['result cache'] = object()
+        colorbar_range = {'max': 1, 'min': 0}
+        options = pl.get_panel_options(status, colorbar_range)
+        self.assertEqual(set(options),
+                         set(pl.PANEL_KEYS) | set(['colorbar range']))
+        self.assertEqual(options['colorbar range'], colorbar_range)
+
+    def test_panel_jobs_send_indices(self):
+        status = dict((key, key) for key in pl.PANEL_KEYS)
+        status.update(self.setup_status())
+        status['colorbar range'] = {'max': 1, 'min': 0}
+        status['cmap'] = 'jet'
+        jobs, colorbar_range, colormap = pl.get_panel_jobs(
+            status, status['cube'], 6, 2, range(5), (8, 6), 100)
+        slice_indices = [job['status']['slice index'] for job in jobs]
+        self.assertEqual(slice_indices, [1, 2])
+        self.assertIs(jobs[0]['cube'], status['cube'])
+        self.assertEqual(colorbar_range, {'max': 1, 'min': 0})
+        self.assertIs(jobs[0]['status']['cmap'], colormap)
+
+    def test_panel_colormap_from_data_array(self):
+        cube = tcl.setup_7d_anonymous_cube()
+        colormap = pl.get_panel_colormap('Automatic', 'from data array',
+                                         cube)
+        self.assertEqual(colormap.name, cm.get_cmap().name)
+        colormap = pl.get_panel_colormap('jet', 'from data array', cube)
+        self.assertEqual(colormap.name, 'jet')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+import thea.pp_index as pp_index
+
+
+def write_field(fh, data, lbpack=0, lbuser1=1, bmdi=-1e30, lbuser4=0,
+                lbuser7=0):
+    """
+    Writes a 32-bit PP field holding the given 2D data.
+
+    """
+    ints = [0] * 45
+    ints[pp_index.LBLREC] = data.size
+    ints[pp_index.LBROW], ints[pp_index.LBNPT] = data.shape
+    ints[pp_index.LBPACK] = lbpack
+    ints[pp_index.LBUSER1] = lbuser1
+    ints[pp_index.LBUSER4] = lbuser4
+    ints[pp_index.LBUSER7] = lbuser7
+    reals = [0.0] * 19
+    reals[pp_index.BMDI] = bmdi
+    header = struct.pack('>45i', *ints) + struct.pack('>19f', *reals)
+    fh.write(struct.pack('>i', len(header)) + header +
+             struct.pack('>i', len(header)))
+    values = data.astype('>f4' if lbuser1 == 1 else '>i4').tostring()
+    fh.write(struct.pack('>i', len(values)) + values +
+             struct.pack('>i', len(values)))
+
+
+class FieldIndexTests(unittest.TestCase):
+    """
+    This class contains tests to check that the fields of a PP file are
+    found from their headers and read directly, and that the index is kept
+    until the file changes.
+
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'fields.pp')
+        self.first = np.arange(12, dtype=np.float32).reshape(3, 4)
+        self.first[1, 2] = -1e30
+        self.second = np.arange(6).reshape(2, 3)
+        with open(self.filename, 'wb') as fh:
+            write_field(fh, self.first)
+            write_field(fh, self.second, lbuser1=2)
+            write_field(fh, self.first, lbpack=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_is_pp_file(self):
+        self.assertTrue(pp_index.is_pp_file(self.filename))
+        other = os.path.join(self.directory, 'other.nc')
+        with open(other, 'wb') as fh:
+            fh.write(b'CDF\x01')
+        self.assertFalse(pp_index.is_pp_file(other))
+
+    def test_scan_fields(self):
+        fields = list(pp_index.scan_fields(self.filename))
+        self.assertEqual(len(fields), 3)
+        self.assertEqual(fields[0][0], 268)
+        self.assertEqual(fields[1][0], 268 * 2 + 12 * 4 + 4)
+        self.assertEqual(fields[1][1:5], (2, 3, 0, '>i4'))
+        self.assertTrue(pp_index.is_readable(fields[0]))
+        self.assertFalse(pp_index.is_readable(fields[2]))
+
+    def test_read_field(self):
+        fields = list(pp_index.scan_fields(self.filename))
+        index = pp_index.FieldIndex(self.filename, {(0, 0): fields[0],
+                                                    (0, 1): fields[1]})
+        everything = slice(None)
+        first = index.read((0, 0, everything, everything))
+        np.testing.assert_array_equal(first, np.ma.masked_values(self.first,
+                                                                 -1e30))
+        self.assertTrue(first.mask[1, 2])
+        np.testing.assert_array_equal(
+            index.read((0, 1, everything, everything)), self.second)
+        self.assertIsNone(index.read((1, 0, everything, everything)))
+        # The plotted dimensions must be the last two.
+        self.assertIsNone(index.read((0, everything, 0, everything)))
+
+    def test_index_round_trip(self):
+        index = [{'name': 'air_temperature', 'shape': (2, 3, 4),
+                  'fields': {(1,): next(pp_index.scan_fields(
+                      self.filename))}}]
+        path = pp_index.write_index(self.filename, index)
+        self.assertEqual(path, self.filename + pp_index.INDEX_SUFFIX)
+        self.assertEqual(pp_index.read_index(self.filename), index)
+        stat = os.stat(self.filename)
+        os.utime(self.filename, (stat.st_atime, stat.st_mtime + 10))
+        self.assertIsNone(pp_index.read_index(self.filename))
+
+    def test_unreadable_index(self):
+        path = self.filename + pp_index.INDEX_SUFFIX
+        stat = os.stat(self.filename)
+        for contents in ['not json', '[]',
+                         '{{"size": {}, "mtime": {!r}, "index": 1}}'.format(
+                             stat.st_size, stat.st_mtime),
+                         '{{"size": {}, "mtime": {!r}, "index": [{{"name": '
+                         '"x", "shape": [1], "fields": [[[0], [0, 1, 1, 0, '
+                         '"O", 0]]]}}]}}'.format(stat.st_size,
+                                                 stat.st_mtime)]:
+            with open(path, 'w') as fh:
+                fh.write(contents)
+            self.assertIsNone(pp_index.read_index(self.filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+import unittest
+
+import thea.profile_capture as profile_capture
+import thea.tests.test_cube_logic as tcl
+
+
+class ProfileCaptureTests(unittest.TestCase):
+    """
+    This class contains tests to check that a ProfileCapture covers the
+    requested number of updates, includes work done on other threads, and
+    names its files after the cube and slice.
+
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def setup_status(self):
+        dim_indices = {'dim 1 index': 1,
+                       'dim 2 index': 0,
+                       'sliced dim index': 2}
+        status = {'cube loaded': True,
+                  'cube': tcl.setup_3d_cube(),
+                  'filename': '/data/air temp.pp',
+                  'cube index': 1,
+                  'dim indices': dim_indices,
+                  'slice index': 2,
+                  'collapsed indices': [3]}
+        return status
+
+    def test_capture_name(self):
+        name = profile_capture.get_capture_name(self.setup_status())
+        self.assertEqual(name, 'air-temp_cube1_slice2_dim4-3')
+
+    def test_capture_name_no_cube(self):
+        name = profile_capture.get_capture_name({'cube loaded': False})
+        self.assertEqual(name, 'thea_profile')
+
+    def test_update_finished(self):
+        capture = profile_capture.ProfileCapture(2, self.directory)
+        capture.start()
+        self.assertFalse(capture.update_finished(self.setup_status()))
+        self.assertTrue(capture.update_finished(self.setup_status()))
+        paths = capture.stop()
+        self.assertEqual(os.path.basename(paths[0])[:28],
+                         'air-temp_cube1_slice2_dim4-3')
+        self.assertTrue(paths[0].endswith('.prof'))
+        for path in paths:
+            self.assertTrue(os.path.exists(path))
+
+    def test_never_started(self):
+        capture = profile_capture.ProfileCapture(1, self.directory)
+        self.assertEqual(capture.stop(), [])
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_other_threads_included(self):
+        def busy():
+            return sorted(range(10))
+
+        def work():
+            with capture.profiling():
+                busy()
+
+        capture = profile_capture.ProfileCapture(1, self.directory)
+        capture.start()
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        paths = capture.stop()
+        stats = pstats.Stats(paths[0])
+        functions = [function for _, _, function in stats.stats]
+        self.assertIn('busy', functions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import thea.pyramid as pyramid
+
+
+class ReductionTests(unittest.TestCase):
+    """
+    This class contains tests to check the reduction of a slice to the levels
+    of a pyramid, and the mapping between the view and the cells of a level.
+
+    """
+    def test_block_reduce_mean(self):
+        data = np.arange(16, dtype=np.float32).reshape(4, 4)
+        reduced = pyramid.block_reduce(data)
+        np.testing.assert_array_equal(reduced, [[2.5, 4.5], [10.5, 12.5]])
+
+    def test_block_reduce_odd_shape(self):
+        data = np.arange(15).reshape(3, 5)
+        reduced = pyramid.block_reduce(data)
+        self.assertEqual(reduced.shape, (2, 3))
+        # The last row and column stand alone.
+        self.assertEqual(reduced[1, 2], 14)
+        self.assertEqual(reduced[0, 2], 6.5)
+
+    def test_block_reduce_masked(self):
+        data = np.ma.masked_array([[1.0, 3.0], [5.0, 7.0]],
+                                  mask=[[False, True], [True, True]])
+        self.assertEqual(pyramid.block_reduce(data)[0, 0], 1.0)
+        data.mask = True
+        self.assertTrue(pyramid.block_reduce(data).mask[0, 0])
+
+    def test_level_shapes(self):
+        shapes = pyramid.get_level_shapes((1000, 300), min_size=256)
+        self.assertEqual(shapes, [(1000, 300), (500, 150), (250, 75)])
+
+    def test_edges_from_points(self):
+        edges = pyramid.get_edges([0.0, 1.0, 3.0])
+        np.testing.assert_array_equal(edges, [-0.5, 0.5, 2.0, 4.0])
+
+    def test_edges_from_bounds(self):
+        edges = pyramid.get_edges([0.5, 1.5], bounds=[[0, 1], [1, 2]])
+        np.testing.assert_array_equal(edges, [0, 1, 2])
+
+    def test_level_edges(self):
+        edges = np.arange(6.0)
+        np.testing.assert_array_equal(
+            pyramid.get_level_edges(edges, 1, 1, 3), [2, 4, 5])
+
+    def test_index_range(self):
+        edges = np.arange(11.0)
+        self.assertEqual(pyramid.get_index_range(edges, 2.5, 5.5), (2, 6))
+        self.assertEqual(pyramid.get_index_range(edges, 5.5, 2.5), (2, 6))
+        self.assertEqual(pyramid.get_index_range(edges, -5, 20), (0, 10))
+        self.assertEqual(pyramid.get_index_range(edges, 12, 20), (10, 10))
+
+    def test_index_range_descending(self):
+        edges = np.arange(10.0, -1, -1)
+        self.assertEqual(pyramid.get_index_range(edges, 2.5, 5.5), (4, 8))
+
+    def test_choose_level(self):
+        self.assertEqual(pyramid.choose_level((4000, 4000), (500, 500), 5), 3)
+        self.assertEqual(pyramid.choose_level((4000, 600), (500, 500), 5), 0)
+        self.assertEqual(pyramid.choose_level((10 ** 6, 10 ** 6), (10, 10),
+                                              3), 2)
+
+    def test_level_window(self):
+        window = pyramid.get_level_window(2, (5, 13), (0, 4), (10, 10))
+        self.assertEqual(window, ((0, 5), (0, 2)))
+
+
+class PyramidStoreTests(unittest.TestCase):
+    """
+    This class contains tests to check that pyramids are built into the store
+    a strip at a time, read back, and pruned.
+
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = pyramid.PyramidStore(self.directory)
+        self.data = np.ma.masked_less(
+            np.arange(600 * 40, dtype=np.float32).reshape(600, 40), 3)
+        self.reads = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_rows(self, start, stop):
+        self.reads.append((start, stop))
+        return self.data[start:stop]
+
+    def build(self, key='key'):
+        return self.store.build(key, self.read_rows, self.data.shape,
+                                self.data.dtype, np.arange(601.0),
+                                np.arange(41.0))
+
+    def test_build_and_load(self):
+        built = self.build()
+        self.assertEqual(len(built.levels), 3)
+        self.assertIsNotNone(self.store.load('key'))
+        data, y_edges, x_edges = built.get_window(1, (0, 2), (0, 20))
+        np.testing.assert_array_equal(data,
+                                      pyramid.block_reduce(self.data[:4]))
+        # Only the unmasked cells of a block are averaged.
+        self.assertEqual(data[0, 0], 40.5)
+        data, _, _ = built.get_window(0, (0, 1), (0, 4))
+        np.testing.assert_array_equal(data.mask, [[True, True, True, False]])
+        np.testing.assert_array_equal(y_edges, [0, 2, 4])
+        self.assertEqual(len(x_edges), 21)
+
+    def test_build_reads_in_strips(self):
+        pyramid.write_levels(self.directory, self.read_rows, self.data.shape,
+                             self.data.dtype, strip_cells=4000)
+        self.assertEqual(self.reads, [(0, 100), (100, 200), (200, 300),
+                                      (300, 400), (400, 500), (500, 600)])
+
+    def test_build_once(self):
+        self.build()
+        self.build()
+        self.assertEqual(self.reads, [(0, 600)])
+
+    def test_prune(self):
+        self.build('old')
+        self.store.max_bytes = 1
+        self.build('new')
+        self.assertIsNone(self.store.load('old'))
+        self.assertIsNotNone(self.store.load('new'))
+
+    def test_key(self):
+        self.assertEqual(pyramid.get_key(['file.nc', 1, [0, 2]]),
+                         pyramid.get_key(['file.nc', 1, [0, 2]]))
+        self.assertNotEqual(pyramid.get_key(['file.nc', 1, [0, 2]]),
+                            pyramid.get_key(['file.nc', 1, [0, 3]]))
+
+
+if __name__ == '__main__':
+    unittest.main()
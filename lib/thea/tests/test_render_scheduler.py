@@ -0,0 +1,87 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+import unittest
+
+from PySide import QtCore
+
+import thea.render_scheduler as render_scheduler
+
+
+class RenderSchedulerTests(unittest.TestCase):
+    """
+    This class contains tests to check that requests are rendered after the
+    delay, and no later than the maximum wait.
+
+    """
+    def setUp(self):
+        if QtCore.QCoreApplication.instance() is None:
+            self.app = QtCore.QCoreApplication([])
+        self.scheduler = render_scheduler.RenderScheduler(
+            lambda: None, delay=40, max_wait=200)
+
+    def test_waits_for_delay(self):
+        self.scheduler.request()
+        self.assertTrue(self.scheduler.is_pending())
+        self.assertEqual(self.scheduler.timer.interval(), 40)
+        self.assertFalse(self.scheduler.overdue)
+
+    def test_waits_no_longer_than_max_wait(self):
+        self.scheduler.request()
+        self.scheduler.first_request -= 0.19
+        self.scheduler.request()
+        self.assertLessEqual(self.scheduler.timer.interval(), 10)
+        self.scheduler.first_request -= 1
+        self.scheduler.request()
+        self.assertEqual(self.scheduler.timer.interval(), 0)
+        self.assertTrue(self.scheduler.overdue)
+
+    def test_overdue_render_followed(self):
+        self.scheduler.request()
+        self.scheduler.first_request -= 1
+        self.scheduler.request()
+        self.scheduler.render_now()
+        self.assertFalse(self.scheduler.overdue)
+        self.assertTrue(self.scheduler.is_pending())
+        self.assertEqual(self.scheduler.timer.interval(), 40)
+
+    def test_render_resets_wait(self):
+        self.scheduler.request()
+        self.scheduler.first_request -= 1
+        self.scheduler.render_now()
+        self.assertFalse(self.scheduler.is_pending())
+        self.scheduler.request()
+        self.assertEqual(self.scheduler.timer.interval(), 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import unittest
+
+import thea.render_worker as render_worker
+import thea.tests.test_cube_logic as tcl
+
+
+class RenderTaskTests(unittest.TestCase):
+    """
+    This class contains tests to check that a RenderTask extracts the correct
+    sub cube, and sends nothing once it has been cancelled.
+
+    """
+    def setup_status(self):
+        cube = tcl.setup_3d_cube()
+        dim_indices = {'dim 1 index': 1,
+                       'dim 2 index': 0,
+                       'sliced dim index': 2}
+        status = {'cube': cube,
+                  'dim indices': dim_indices,
+                  'slice index': 2,
+                  'collapsed indices': []}
+        return status
+
+    def test_run_emits_sub_cube(self):
+        status = self.setup_status()
+        task = render_worker.RenderTask(3, status)
+        results = []
+        task.signals.finished.connect(
+            lambda generation, cube, rendered: results.append(
+                (generation, cube, rendered)))
+        task.run()
+        # Nothing is drawn without a figure size.
+        self.assertEqual(results, [(3, status['cube'][:, :, 2], None)])
+
+    def test_cancelled_emits_nothing(self):
+        status = self.setup_status()
+        task = render_worker.RenderTask(1, status)
+        results = []
+        task.signals.finished.connect(
+            lambda generation, cube, rendered: results.append(cube))
+        task.signals.failed.connect(
+            lambda generation, message: results.append(message))
+        task.cancel()
+        task.run()
+        self.assertEqual(results, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os
+import os.path
+import shutil
+import tempfile
+import unittest
+
+import thea.serve as serve
+import thea.tests.test_cube_logic as tcl
+
+
+class ParseRequestTests(unittest.TestCase):
+    """
+    This class contains tests to check that the parameters of a request are
+    checked, and given defaults, before anything is drawn.
+
+    """
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.data_dir, 'cube.nc')
+        open(self.path, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def parse(self, **query):
+        query = dict((name, [value]) for name, value in query.items())
+        return serve.parse_request(query, self.data_dir)
+
+    def test_defaults(self):
+        params = self.parse(file='cube.nc')
+        self.assertEqual(params['path'], os.path.realpath(self.path))
+        self.assertEqual(params['plot type'], 'pcolormesh')
+        self.assertEqual(params['projection'], 'Automatic')
+        self.assertEqual(params['colorbar range'], {'max': None,
+                                                    'min': None})
+        self.assertEqual((params['width'], params['height']), (800, 600))
+
+    def test_file_outside_data_dir(self):
+        self.assertRaises(serve.RequestError, self.parse,
+                          file='../' + os.path.basename(self.data_dir))
+        self.assertRaises(serve.RequestError, self.parse, file='missing.nc')
+        self.assertRaises(serve.RequestError, self.parse)
+
+    def test_bad_values(self):
+        self.assertRaises(serve.RequestError, self.parse, file='cube.nc',
+                          plot='bar chart')
+        self.assertRaises(serve.RequestError, self.parse, file='cube.nc',
+                          min='1')
+        self.assertRaises(serve.RequestError, self.parse, file='cube.nc',
+                          width='0')
+        self.assertRaises(serve.RequestError, self.parse, file='cube.nc',
+                          collapsed='1,a')
+
+    def test_cache_key(self):
+        key = serve.get_cache_key(self.parse(file='cube.nc'))
+        self.assertEqual(key, serve.get_cache_key(self.parse(file='cube.nc')))
+        self.assertNotEqual(key, serve.get_cache_key(
+            self.parse(file='cube.nc', slice='1')))
+
+
+class GetStatusTests(unittest.TestCase):
+    """
+    This class contains tests to check that the dimensions of a request are
+    resolved against the cube.
+
+    """
+    def setUp(self):
+        self.cube = tcl.setup_3d_cube()
+        self.params = {'dim1': None, 'dim2': None, 'sliced': None,
+                       'slice': 0, 'collapsed': [],
+                       'plot type': 'pcolormesh', 'projection': 'Automatic',
+                       'central longitude': 0.0, 'cmap': 'Automatic',
+                       'num contours': 25,
+                       'colorbar range': {'max': None, 'min': None},
+                       'cartographic': {'coastlines': False,
+                                        'countries': False,
+                                        'rivers': False},
+                       'gridlines': False, 'contour labels': False}
+
+    def test_default_dims(self):
+        status = serve.get_status(self.params, self.cube)
+        self.assertEqual(status['dim indices'], {'dim 1 index': 1,
+                                                 'dim 2 index': 2,
+                                                 'sliced dim index': 0})
+
+    def test_dims_by_name(self):
+        self.params['dim1'] = 'grid_longitude'
+        self.params['dim2'] = 'grid_latitude'
+        status = serve.get_status(self.params, self.cube)
+        self.assertEqual(status['dim indices'], {'dim 1 index': 2,
+                                                 'dim 2 index': 1,
+                                                 'sliced dim index': 0})
+
+    def test_bad_dims(self):
+        self.params['dim1'] = 'height'
+        self.assertRaises(serve.RequestError, serve.get_status, self.params,
+                          self.cube)
+        self.params['dim1'] = '2'
+        self.params['dim2'] = '2'
+        self.assertRaises(serve.RequestError, serve.get_status, self.params,
+                          self.cube)
+
+
+class TileCacheTests(unittest.TestCase):
+    """
+    This class contains tests to check that the TileCache keeps the most
+    recently used images within its size.
+
+    """
+    def test_evicts_least_recently_used(self):
+        cache = serve.TileCache(10)
+        cache.put('a', b'1234')
+        cache.put('b', b'1234')
+        cache.get('a')
+        cache.put('c', b'1234')
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), b'1234')
+        self.assertEqual(cache.nbytes, 8)
+
+    def test_too_large(self):
+        cache = serve.TileCache(10)
+        cache.put('a', b'x' * 11)
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import thea.benchmarks.replay as replay
+import thea.session as session
+
+
+def setup_snapshot():
+    cartographic = {'coastlines': True,
+                    'countries': False,
+                    'rivers': False}
+    dim_indices = {'dim 1 index': 1,
+                   'dim 2 index': 0,
+                   'sliced dim index': 2}
+    snapshot = {'filename': 'A1B_north_america.nc',
+                'cube index': 0,
+                'dim indices': dim_indices,
+                'slice index': 2,
+                'collapsed indices': [],
+                'plot method': "using quickplot",
+                'plot type': "Contour",
+                'projection': "Automatic",
+                'central longitude': 0.0,
+                'cmap': "Automatic",
+                'num contours': 25,
+                'cartographic': cartographic,
+                'gridlines': False,
+                'contour labels': False,
+                'colorbar scheme': "auto",
+                'colorbar range': None}
+    return snapshot
+
+
+class SessionTests(unittest.TestCase):
+    """
+    This class contains tests to check that sessions are recorded and
+    replayed correctly.
+
+    """
+    def test_snapshot_drops_calculated_range(self):
+        status = setup_snapshot()
+        status['colorbar scheme'] = "fixed"
+        status['colorbar range'] = {'max': 300.0, 'min': 200.0}
+        status['cube'] = object()
+        snapshot = session.get_snapshot(status)
+        self.assertNotIn('cube', snapshot)
+        self.assertIsNone(snapshot['colorbar range'])
+
+    def test_record_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'session.jsonl')
+            recorder = session.SessionRecorder(filename)
+            first = setup_snapshot()
+            second = setup_snapshot()
+            second['slice index'] = 3
+            recorder.record(first)
+            recorder.record(second)
+            self.assertEqual(session.load_recording(filename),
+                             [first, second])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_get_interaction(self):
+        first = setup_snapshot()
+        self.assertEqual(session.get_interaction(None, first), 'load')
+        second = setup_snapshot()
+        second['slice index'] = 3
+        self.assertEqual(session.get_interaction(first, second), 'slice')
+        third = setup_snapshot()
+        third['cartographic']['coastlines'] = False
+        self.assertEqual(session.get_interaction(first, third), 'options')
+        fourth = setup_snapshot()
+        fourth['dim indices']['sliced dim index'] = 0
+        fourth['dim indices']['dim 2 index'] = 2
+        self.assertEqual(session.get_interaction(first, fourth), 'dims')
+        self.assertEqual(session.get_interaction(first, first), 'redraw')
+
+    def test_percentile(self):
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(replay.percentile(values, 50), 3)
+        self.assertEqual(replay.percentile(values, 100), 5)
+        self.assertAlmostEqual(replay.percentile(values, 95), 4.8)
+        self.assertIsNone(replay.percentile([], 50))
+
+    def test_summarise(self):
+        latencies = [('load', 2.0), ('slice', 0.1), ('slice', 0.3)]
+        summary = replay.summarise(latencies)
+        self.assertEqual(list(summary.keys()), ['all', 'load', 'slice'])
+        self.assertEqual(summary['all']['count'], 3)
+        self.assertAlmostEqual(summary['slice']['p50'], 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
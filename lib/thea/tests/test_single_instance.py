@@ -0,0 +1,98 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os
+import os.path
+import shutil
+import tempfile
+import unittest
+
+from PySide import QtCore
+
+import thea.single_instance as single_instance
+
+
+class SingleInstanceTests(unittest.TestCase):
+    """
+    This class contains tests to check that the requests sent to a running
+    instance of Thea can be read back.
+
+    """
+    def test_round_trip(self):
+        line = single_instance.encode_request('some/file.nc')
+        self.assertTrue(line.endswith(b'\n'))
+        self.assertEqual(single_instance.decode_request(line),
+                         os.path.abspath('some/file.nc'))
+
+    def test_bad_request(self):
+        self.assertIsNone(single_instance.decode_request(b'not json\n'))
+        self.assertIsNone(single_instance.decode_request(b'{"close": 1}\n'))
+        self.assertIsNone(single_instance.decode_request(b'[]\n'))
+
+    def test_server_name_is_per_user(self):
+        directory = tempfile.mkdtemp()
+        try:
+            socket_dir = os.path.join(directory, 'sockets')
+            server_name = single_instance.get_server_name(socket_dir,
+                                                          make=True)
+            self.assertEqual(os.path.dirname(server_name), socket_dir)
+            self.assertIn(single_instance.getpass.getuser(),
+                          os.path.basename(server_name))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_shared_socket_dir_refused(self):
+        directory = tempfile.mkdtemp()
+        try:
+            os.chmod(directory, 0o777)
+            self.assertIsNone(single_instance.get_server_name(directory))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_running_server_kept(self):
+        if QtCore.QCoreApplication.instance() is None:
+            self.app = QtCore.QCoreApplication([])
+        server_name = 'thea-test-{}'.format(os.getpid())
+        first = single_instance.InstanceServer(server_name)
+        self.assertTrue(first.listen())
+        try:
+            second = single_instance.InstanceServer(server_name)
+            self.assertFalse(second.listen())
+            self.assertTrue(single_instance.is_running(server_name))
+        finally:
+            first.close()
+        self.assertFalse(single_instance.is_running(server_name, 100))
+
+
+if __name__ == '__main__':
+    unittest.main()
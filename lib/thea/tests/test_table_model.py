@@ -0,0 +1,69 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import unittest
+
+import numpy as np
+
+import thea.table_model as table_model
+
+
+class TableModelTests(unittest.TestCase):
+    """
+    This class contains tests to check that the TableModel can add the rows
+    of a large array to the table a page at a time.
+
+    """
+    def setUp(self):
+        self.data = np.arange(50).reshape(10, 5)
+
+    def test_all_rows(self):
+        model = table_model.TableModel(self.data.tolist(), range(5),
+                                       range(10))
+        self.assertEqual(model.rowCount(None), 10)
+        self.assertFalse(model.canFetchMore(None))
+
+    def test_pages(self):
+        model = table_model.TableModel(self.data, range(5), range(10),
+                                       page_rows=4)
+        rows = [model.rowCount(None)]
+        while model.canFetchMore(None):
+            model.fetchMore(None)
+            rows.append(model.rowCount(None))
+        self.assertEqual(rows, [4, 8, 10])
+        self.assertEqual(model.columnCount(None), 5)
+        self.assertEqual(model.array_data, self.data.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
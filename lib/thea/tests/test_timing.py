@@ -0,0 +1,206 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import thea.timing as timing
+
+
+class TimingTests(unittest.TestCase):
+    """
+    This class contains tests to check that spans are recorded against the
+    correct Timings, and that the log is written as JSON lines.
+
+    """
+    def test_span_without_recording(self):
+        with timing.span('stage'):
+            pass
+
+    def test_span_accumulates(self):
+        timings = timing.Timings('update')
+        with timing.recording(timings):
+            with timing.span('plot'):
+                pass
+            with timing.span('draw'):
+                pass
+            with timing.span('plot'):
+                pass
+        self.assertEqual(list(timings.stages.keys()), ['plot', 'draw'])
+        self.assertEqual(timings.total(), sum(timings.stages.values()))
+
+    def test_recording_restores_previous(self):
+        outer = timing.Timings('outer')
+        inner = timing.Timings('inner')
+        with timing.recording(outer):
+            with timing.recording(inner):
+                with timing.span('inner stage'):
+                    pass
+            with timing.span('outer stage'):
+                pass
+        self.assertEqual(list(inner.stages.keys()), ['inner stage'])
+        self.assertEqual(list(outer.stages.keys()), ['outer stage'])
+
+    def test_log_json_lines(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'profile.jsonl')
+            log = timing.TimingLog(filename)
+            timings = timing.Timings('load')
+            timings.add('parse', 1.5)
+            log.write(timings, filename='data.pp')
+            log.write(timings)
+            with open(filename) as fh:
+                records = [json.loads(line) for line in fh]
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['operation'], 'load')
+        self.assertEqual(records[0]['stages'], {'parse': 1.5})
+        self.assertEqual(records[0]['filename'], 'data.pp')
+
+
+class TraceTests(unittest.TestCase):
+    """
+    This class contains tests to check that spans are recorded as trace
+    events while a trace is running, and saved in the Trace Event Format.
+
+    """
+    def tearDown(self):
+        timing.stop_trace()
+
+    def test_no_events_after_stop(self):
+        trace = timing.start_trace()
+        self.assertIs(timing.stop_trace(), trace)
+        with timing.trace_span('update'):
+            with timing.span('plot'):
+                pass
+        self.assertEqual(list(trace.events), [])
+
+    def test_events_limited(self):
+        trace = timing.Trace(max_events=2)
+        for start in xrange(3):
+            trace.add_event('update', start, 0.5)
+        self.assertEqual([event['ts'] for event in trace.events],
+                         [1e6, 2e6])
+
+    def test_traced(self):
+        class Window(object):
+            @timing.traced('update')
+            def update(self):
+                return 'updated'
+
+        trace = timing.start_trace()
+        self.assertEqual(Window().update(), 'updated')
+        self.assertEqual([event['name'] for event in trace.events],
+                         ['update'])
+
+    def test_nested_spans(self):
+        trace = timing.start_trace()
+        timings = timing.Timings('update')
+        with timing.recording(timings):
+            with timing.trace_span('update'):
+                with timing.span('plot'):
+                    pass
+        # The operation is traced, but not added to the timings.
+        self.assertEqual(list(timings.stages.keys()), ['plot'])
+        inner, outer = trace.events
+        self.assertEqual((inner['name'], outer['name']), ('plot', 'update'))
+        self.assertEqual(inner['ph'], 'X')
+        self.assertEqual(inner['tid'], outer['tid'])
+        self.assertTrue(outer['ts'] <= inner['ts'])
+        self.assertTrue(inner['ts'] + inner['dur'] <=
+                        outer['ts'] + outer['dur'])
+
+    def test_events_from_threads(self):
+        trace = timing.start_trace()
+
+        def work():
+            trace.name_thread('worker')
+            with timing.span('read'):
+                pass
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        with timing.span('plot'):
+            pass
+        read, plot = trace.events
+        self.assertNotEqual(read['tid'], plot['tid'])
+        self.assertEqual(trace.thread_names[read['tid']], 'worker')
+
+    def test_save(self):
+        trace = timing.start_trace()
+        trace.add_event('queued', 10.0, 0.5, category='wait',
+                        args={'generation': 1})
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'trace.json')
+            trace.save(filename)
+            with open(filename) as fh:
+                saved = json.load(fh)
+        finally:
+            shutil.rmtree(directory)
+        event, metadata = saved['traceEvents']
+        self.assertEqual(event['ts'], 10.0e6)
+        self.assertEqual(event['dur'], 0.5e6)
+        self.assertEqual(event['args'], {'generation': 1})
+        self.assertEqual(metadata['ph'], 'M')
+        self.assertEqual(metadata['tid'], event['tid'])
+
+    def test_save_only_over_trace(self):
+        trace = timing.start_trace()
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'data.nc')
+            with open(filename, 'wb') as fh:
+                fh.write(b'CDF\x01')
+            self.assertFalse(timing.is_trace_file(filename))
+            self.assertRaises(IOError, trace.save, filename)
+            with open(filename, 'rb') as fh:
+                self.assertEqual(fh.read(), b'CDF\x01')
+            filename = os.path.join(directory, 'trace.json')
+            trace.save(filename)
+            self.assertTrue(timing.is_trace_file(filename))
+            # An earlier trace is replaced.
+            trace.save(filename)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import iris.cube
+import numpy as np
+
+import thea.memory as memory
+import thea.transcode as transcode
+
+
+class LayoutTests(unittest.TestCase):
+    """
+    This class contains tests to check that the plotted dimensions of a cube
+    are stored innermost, with the sliced dimension next.
+
+    """
+    def test_layout(self):
+        dim_indices = {'dim 1 index': 3, 'dim 2 index': 1,
+                       'sliced dim index': 0}
+        self.assertEqual(transcode.get_layout(4, dim_indices), (2, 0, 1, 3))
+
+    def test_no_layout_for_2d(self):
+        dim_indices = {'dim 1 index': 0, 'dim 2 index': 1,
+                       'sliced dim index': -1}
+        self.assertIsNone(transcode.get_layout(2, dim_indices))
+
+    def test_inverse(self):
+        data = np.zeros((2, 3, 4, 5))
+        layout = (2, 0, 1, 3)
+        stored = data.transpose(layout)
+        self.assertEqual(stored.transpose(transcode.get_inverse(layout)).shape,
+                         data.shape)
+
+
+class TranscodeStoreTests(unittest.TestCase):
+    """
+    This class contains tests to check that a cube is transcoded in batches,
+    and read back from the store as a memory map.
+
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = transcode.TranscodeStore(self.directory)
+        self.cube = iris.cube.Cube(
+            np.arange(3 * 4 * 5 * 6, dtype=np.float32).reshape(3, 4, 5, 6))
+        self.layout = (2, 0, 1, 3)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def transcode(self, cube, key='key', max_bytes=transcode.BATCH_BYTES):
+        transcoder = self.store.start(key, cube, self.layout)
+        batches = 1
+        while not transcoder.write_batch(max_bytes):
+            batches += 1
+        transcoder.finish()
+        return batches
+
+    def test_round_trip(self):
+        self.assertIsNone(self.store.open('key', self.cube))
+        self.transcode(self.cube)
+        cube = self.store.open('key', self.cube)
+        self.assertTrue(memory.is_mapped(cube.data))
+        self.assertEqual(memory.get_cube_nbytes(cube), 0)
+        np.testing.assert_array_equal(cube.data, self.cube.data)
+        np.testing.assert_array_equal(cube[1, :, 2].data,
+                                      self.cube[1, :, 2].data)
+
+    def test_batches(self):
+        # Each field of the plotted dimensions holds 4 * 6 float32s.
+        self.assertEqual(self.transcode(self.cube, max_bytes=4 * 24 * 3), 5)
+        self.assertEqual(os.listdir(self.directory), ['key'])
+
+    def test_masked(self):
+        data = np.ma.masked_greater(self.cube.data, 300)
+        cube = self.cube.copy(data=data)
+        self.transcode(cube)
+        stored = self.store.open('key', cube)
+        np.testing.assert_array_equal(np.ma.getmaskarray(stored.data),
+                                      np.ma.getmaskarray(data))
+
+    def test_identity(self):
+        transcoder = self.store.start('key', self.cube, self.layout,
+                                      ['cube.pp', 1, 'digest'])
+        transcoder.write_batch()
+        transcoder.finish()
+        self.assertIsNotNone(self.store.open('key', self.cube,
+                                             ['cube.pp', 1, 'digest']))
+        self.assertIsNone(self.store.open('key', self.cube,
+                                          ['cube.pp', 1, 'other']))
+        self.assertIsNone(self.store.open('key', self.cube))
+        other = self.cube.copy(data=self.cube.data.astype(np.float64))
+        self.assertIsNone(self.store.open('key', other,
+                                          ['cube.pp', 1, 'digest']))
+
+    def test_abandon(self):
+        transcoder = self.store.start('key', self.cube, self.layout)
+        transcoder.write_batch()
+        transcoder.abandon()
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertIsNone(self.store.open('key', self.cube))
+
+    def test_prune(self):
+        self.transcode(self.cube, key='old')
+        self.transcode(self.cube, key='new')
+        self.store.max_bytes = 1
+        self.store.prune(keep='new')
+        self.assertIsNone(self.store.open('old', self.cube))
+        self.assertIsNotNone(self.store.open('new', self.cube))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,352 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file contains a Library used to time the stages of slow operations, such
+as loading a file or drawing a plot.
+
+The functions that do the work mark each stage with span(). The time spent is
+added to the Timings object installed on the current thread by recording(),
+if there is one, and is otherwise ignored.
+
+While a Trace is running (see start_trace()), every span, and every
+trace_span() marking a wider operation, is also recorded as an event with its
+thread, so that the whole session can be viewed as a timeline in
+chrome://tracing or Perfetto.
+
+"""
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+_local = threading.local()
+_trace = None
+
+# The number of the latest events kept by a Trace.
+MAX_TRACE_EVENTS = 200000
+
+
+class Timings(object):
+    """
+    Holds the time spent in each stage of a single operation. If a stage is
+    entered more than once, the times are added together.
+
+    """
+    def __init__(self, operation):
+        """
+        Args:
+
+        * operation
+            String naming the operation being timed, eg. "update".
+
+        """
+        self.operation = operation
+        self.start = time.time()
+        self.stages = collections.OrderedDict()
+
+    def add(self, stage, seconds):
+        """
+        Adds the given number of seconds to the named stage.
+
+        """
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def total(self):
+        """
+        Returns the total number of seconds spent in all of the stages.
+
+        """
+        return sum(self.stages.values())
+
+    def summary(self):
+        """
+        Returns a short String describing the time spent in each stage,
+        suitable for the status bar.
+
+        """
+        return ', '.join('{} {:.2f}s'.format(stage, seconds)
+                         for stage, seconds in self.stages.items())
+
+    def to_dict(self, **details):
+        """
+        Returns a dictionary describing the timings, which can be written out
+        as JSON. Any keyword arguments are included as further details.
+
+        """
+        record = {'operation': self.operation,
+                  'start': self.start,
+                  'total': self.total(),
+                  'stages': dict(self.stages)}
+        record.update(details)
+        return record
+
+
+@contextlib.contextmanager
+def recording(timings):
+    """
+    Installs the given Timings on the current thread for the duration of the
+    with statement, so that any spans entered are added to it.
+
+    """
+    previous = getattr(_local, 'timings', None)
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+@contextlib.contextmanager
+def span(stage):
+    """
+    Times the body of the with statement as the named stage of the Timings
+    installed on the current thread, and adds it to the Trace if one is
+    running. Does nothing otherwise.
+
+    """
+    timings = getattr(_local, 'timings', None)
+    trace = _trace
+    if timings is None and trace is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        duration = time.time() - start
+        if timings is not None:
+            timings.add(stage, duration)
+        if trace is not None:
+            trace.add_event(stage, start, duration, category='stage')
+
+
+@contextlib.contextmanager
+def trace_span(operation):
+    """
+    Adds the body of the with statement to the Trace as the named operation,
+    if a trace is running. Unlike span(), this is not added to the Timings,
+    so it can be used to mark operations which contain stages of their own.
+
+    """
+    trace = _trace
+    if trace is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        trace.add_event(operation, start, time.time() - start)
+
+
+def traced(operation):
+    """
+    Returns a decorator which marks each call of a method as an operation
+    with trace_span(). The method may take no arguments other than self, and
+    the wrapper keeps that signature, as PySide passes a slot only as many
+    of the arguments of a signal as its signature takes.
+
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self):
+            with trace_span(operation):
+                return method(self)
+        return wrapper
+    return decorator
+
+
+class Trace(object):
+    """
+    Collects events from all threads, to be saved in the Trace Event Format
+    read by chrome://tracing and Perfetto. Only the latest max_events are
+    kept, so that a long session does not grow without limit.
+
+    """
+    def __init__(self, max_events=MAX_TRACE_EVENTS):
+        self.pid = os.getpid()
+        self.events = collections.deque(maxlen=max_events)
+        self.thread_names = {}
+        self.lock = threading.Lock()
+
+    def add_event(self, name, start, duration, category='operation',
+                  args=None):
+        """
+        Records a complete event on the current thread.
+
+        Args:
+
+        * name
+            String naming the event.
+
+        * start
+            The time at which the event started, as given by time.time().
+
+        * duration
+            The length of the event in seconds.
+
+        Kwargs:
+
+        * category
+            String used to group the events.
+
+        * args
+            Dictionary of further details to be shown with the event.
+
+        """
+        thread = threading.current_thread()
+        event = {'name': name,
+                 'cat': category,
+                 'ph': 'X',
+                 'ts': start * 1e6,
+                 'dur': duration * 1e6,
+                 'pid': self.pid,
+                 'tid': thread.ident}
+        if args:
+            event['args'] = args
+        with self.lock:
+            self.thread_names.setdefault(thread.ident, thread.name)
+            self.events.append(event)
+
+    def name_thread(self, name):
+        """
+        Sets the name under which the current thread is shown. Threads
+        started by Qt are otherwise only given a generic name by Python.
+
+        """
+        with self.lock:
+            self.thread_names[threading.current_thread().ident] = name
+
+    def save(self, filename):
+        """
+        Writes the events to the given file as JSON. Raises IOError rather
+        than overwrite a file which is not a trace.
+
+        """
+        if os.path.exists(filename) and not is_trace_file(filename):
+            raise IOError('{} exists and is not a trace, so was not '
+                          'overwritten'.format(filename))
+        with self.lock:
+            events = list(self.events)
+            thread_names = dict(self.thread_names)
+        for tid, name in thread_names.items():
+            events.append({'name': 'thread_name',
+                           'ph': 'M',
+                           'pid': self.pid,
+                           'tid': tid,
+                           'args': {'name': name}})
+        with open(filename, 'w') as fh:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fh)
+
+
+def is_trace_file(filename):
+    """
+    Returns whether the file holds a trace, as written by Trace.save(), or
+    is empty.
+
+    """
+    with open(filename, 'rb') as fh:
+        start = fh.read(1)
+        if not start:
+            return True
+        if start != b'{':
+            # Not JSON, so not read any further.
+            return False
+        fh.seek(0)
+        try:
+            contents = json.load(fh)
+        except ValueError:
+            return False
+    return isinstance(contents, dict) and 'traceEvents' in contents
+
+
+def start_trace():
+    """
+    Starts recording a new Trace, and returns it.
+
+    """
+    global _trace
+    _trace = Trace()
+    return _trace
+
+
+def stop_trace():
+    """
+    Stops recording, and returns the Trace that was running, or None.
+
+    """
+    global _trace
+    trace, _trace = _trace, None
+    return trace
+
+
+def get_trace():
+    """
+    Returns the Trace that is running, or None.
+
+    """
+    return _trace
+
+
+class TimingLog(object):
+    """
+    Writes Timings to a file, one JSON object per line.
+
+    """
+    def __init__(self, filename):
+        """
+        Args:
+
+        * filename
+            String holding the path of the log file. New records are appended
+            to any that are already there.
+
+        """
+        self.filename = filename
+        self.lock = threading.Lock()
+
+    def write(self, timings, **details):
+        """
+        Appends a record of the given Timings to the log. Any keyword
+        arguments are included as further details.
+
+        """
+        line = json.dumps(timings.to_dict(**details), default=str)
+        with self.lock:
+            with open(self.filename, 'a') as fh:
+                fh.write(line + '\n')
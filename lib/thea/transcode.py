@@ -0,0 +1,343 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file transcodes the data of a cube into a local store laid out for the
+way that Thea reads it, as a memory map.
+
+Files are often laid out badly for stepping through slices, such as a file
+written level by level being viewed one time at a time, which touches bytes
+scattered throughout the file, perhaps over a network. Once transcoded, the
+data is held in a .npy file with the dimensions reordered so that each field
+of the two plotted dimensions is contiguous, with the sliced dimension next.
+The cube is then given this data as a read-only memory map, so that
+extracting a slice reads a single run of bytes from a local disk, and
+viewing the same slices again is only limited by the speed of memory.
+
+A Transcoder writes a cube a batch of fields at a time, so that the work can
+be spread between the renders of the interface.
+
+"""
+import json
+import os
+import os.path
+import shutil
+import tempfile
+
+import numpy as np
+
+import thea.disk_cache as disk_cache
+
+
+# The store used unless another directory is given, or by the
+# THEA_TRANSCODE_STORE environment variable.
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser('~'), '.thea',
+                                 'transcoded')
+
+# The size to which a store is pruned after each new cube.
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+
+# The number of bytes of fields written by each call of write_batch().
+BATCH_BYTES = 64 * 1024 ** 2
+
+# Written last when transcoding a cube, so its presence marks one that is
+# complete.
+DESCRIPTION_FILE = 'description.json'
+
+
+def get_layout(ndim, dim_indices):
+    """
+    Returns a tuple holding the dimensions of a cube in the order in which
+    they are stored: the collapsed dimensions, then the sliced dimension,
+    then the two plotted dimensions in their order in the cube. Returns None
+    for a cube of fewer than 3 dimensions, which is plotted whole.
+
+    Args:
+
+    * ndim
+        int holding the number of dimensions of the cube.
+
+    * dim_indices
+        Dictionary holding the indices of the plotted and sliced dimensions.
+        See cube_logic.get_sub_cube().
+
+    """
+    if ndim < 3:
+        return None
+    plotted = sorted([dim_indices['dim 1 index'], dim_indices['dim 2 index']])
+    sliced = dim_indices['sliced dim index']
+    collapsed = [dim for dim in xrange(ndim)
+                 if dim not in plotted and dim != sliced]
+    return tuple(collapsed + [sliced] + plotted)
+
+
+def get_inverse(layout):
+    """
+    Returns the order of axes which transposes an array stored in the given
+    layout back to the order of the cube.
+
+    """
+    return tuple(np.argsort(layout))
+
+
+class Transcoder(object):
+    """
+    Writes the data of a cube to a temporary directory of the store, in the
+    given layout, and moves it into place once complete.
+
+    """
+    def __init__(self, cube, layout, temp_path, path, identity=None):
+        """
+        Args:
+
+        * cube
+            The cube to transcode.
+
+        * layout
+            Tuple returned by get_layout().
+
+        * temp_path
+            String holding the directory to write to.
+
+        * path
+            String holding the directory that the cube is moved to once
+            complete.
+
+        Kwargs:
+
+        * identity
+            A list which can be written as JSON identifying the cube, which
+            is checked when the cube is opened. See TranscodeStore.open().
+
+        """
+        self.cube = cube
+        self.layout = layout
+        self.identity = identity
+        self.temp_path = temp_path
+        self.path = path
+        self.shape = tuple(cube.shape[dim] for dim in layout)
+        self.num_fields = int(np.prod(self.shape[:-2]))
+        self.next_field = 0
+        self.data = np.lib.format.open_memmap(
+            os.path.join(temp_path, 'data.npy'), 'w+', cube.dtype,
+            self.shape)
+        # Only written if a field has masked points. A new file reads as
+        # zeros, which leaves the fields before it unmasked.
+        self.mask = None
+        self.cancelled = False
+
+    def is_complete(self):
+        """
+        Returns whether every field has been written.
+
+        """
+        return self.next_field >= self.num_fields
+
+    def get_field_keys(self, field):
+        """
+        Returns a tuple holding the index of a field in the store, and the
+        keys which extract it from the cube.
+
+        """
+        index = np.unravel_index(field, self.shape[:-2])
+        keys = [slice(None)] * self.cube.ndim
+        for dim, dim_index in zip(self.layout[:-2], index):
+            keys[dim] = dim_index
+        return tuple(index), tuple(keys)
+
+    def write_batch(self, max_bytes=BATCH_BYTES):
+        """
+        Reads and writes the next fields, up to max_bytes of them. Returns
+        whether every field has now been written.
+
+        """
+        field_bytes = self.data.itemsize * self.shape[-2] * self.shape[-1]
+        stop = min(self.next_field + max(max_bytes // field_bytes, 1),
+                   self.num_fields)
+        for field in xrange(self.next_field, stop):
+            index, keys = self.get_field_keys(field)
+            values = self.cube[keys].data
+            self.data[index] = np.ma.getdata(values)
+            mask = np.ma.getmask(values)
+            if mask is not np.ma.nomask and mask.any():
+                if self.mask is None:
+                    self.mask = np.lib.format.open_memmap(
+                        os.path.join(self.temp_path, 'mask.npy'), 'w+',
+                        np.bool_, self.shape)
+                self.mask[index] = mask
+        self.next_field = stop
+        return self.is_complete()
+
+    def finish(self):
+        """
+        Moves the transcoded cube into place in the store. Must only be called
+        once every field has been written.
+
+        """
+        masked = self.mask is not None
+        # Flushes the memory maps.
+        self.data = self.mask = None
+        with open(os.path.join(self.temp_path, DESCRIPTION_FILE),
+                  'w') as description_file:
+            json.dump({'layout': list(self.layout), 'masked': masked,
+                       'identity': self.identity}, description_file)
+        try:
+            os.rename(self.temp_path, self.path)
+        except OSError:
+            # Another process has transcoded the same cube in the meantime.
+            self.abandon()
+
+    def cancel(self):
+        """
+        Asks for the transcoding to be abandoned by whoever next works on it.
+
+        """
+        self.cancelled = True
+
+    def abandon(self):
+        """
+        Removes the fields written so far.
+
+        """
+        self.data = self.mask = None
+        shutil.rmtree(self.temp_path, ignore_errors=True)
+
+
+class TranscodeStore(object):
+    """
+    A directory holding the transcoded data of each cube, keyed by
+    pyramid.get_key() of the file, the cube and its layout. Cubes are
+    transcoded in a temporary directory and moved into place once complete,
+    so a store may be shared between processes. The cubes used least
+    recently are removed once the store grows over its size limit.
+
+    """
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Kwargs:
+
+        * directory
+            String holding the directory of the store, or None for the
+            default.
+
+        * max_bytes
+            int holding the size to which the store is pruned, or None for no
+            limit.
+
+        """
+        if directory is None:
+            directory = os.environ.get('THEA_TRANSCODE_STORE',
+                                       DEFAULT_STORE_DIR)
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def get_path(self, key):
+        """
+        Returns the directory of the cube with the given key.
+
+        """
+        return os.path.join(self.directory, key)
+
+    def open(self, key, cube, identity=None):
+        """
+        Returns a copy of the cube whose data is a memory map of its
+        transcoded data, or None if it has not been transcoded, or what was
+        transcoded under the key does not match the cube.
+
+        Args:
+
+        * key
+            String identifying the cube and its layout.
+
+        * cube
+            The cube that was transcoded.
+
+        Kwargs:
+
+        * identity
+            The list identifying the cube that it was transcoded with. See
+            Transcoder.
+
+        """
+        path = self.get_path(key)
+        description_path = os.path.join(path, DESCRIPTION_FILE)
+        if not os.path.exists(description_path):
+            return None
+        try:
+            with open(description_path) as description_file:
+                description = json.load(description_file)
+            data = np.load(os.path.join(path, 'data.npy'), mmap_mode='r')
+            if description['masked']:
+                mask = np.load(os.path.join(path, 'mask.npy'), mmap_mode='r')
+                data = np.ma.masked_array(data, mask=mask, copy=False)
+        except (IOError, OSError, ValueError):
+            return None
+        # As the identity would read back from JSON.
+        if (description.get('identity') !=
+                json.loads(json.dumps(identity))):
+            return None
+        data = data.transpose(get_inverse(description['layout']))
+        if data.shape != cube.shape or data.dtype != cube.dtype:
+            return None
+        # Marks the cube as recently used. See prune().
+        disk_cache.touch(description_path)
+        return cube.copy(data=data)
+
+    def start(self, key, cube, layout, identity=None):
+        """
+        Returns a Transcoder which writes the cube into the store under the
+        given key, along with its identity. See Transcoder.
+
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        temp_path = tempfile.mkdtemp(prefix=key + '.', dir=self.directory)
+        return Transcoder(cube, layout, temp_path, self.get_path(key),
+                          identity)
+
+    def get_entries(self):
+        """
+        Returns a list of (last used, nbytes, key) tuples for each complete
+        cube in the store.
+
+        """
+        return disk_cache.get_entries(self.directory, DESCRIPTION_FILE)
+
+    def prune(self, keep=None):
+        """
+        Removes the cubes used least recently until the store is within its
+        size limit. The cube with the key given as keep is left alone.
+
+        """
+        disk_cache.prune(self.directory, self.max_bytes, keep,
+                         DESCRIPTION_FILE)
@@ -0,0 +1,127 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+
+"""
+This file contains the VariablePicker Class
+
+This Class is a Dialog box which lists the variables of a file, as found by
+header_scan.scan_variables(), so that the user can choose which to load.
+
+"""
+import os.path
+
+from PySide import QtGui
+
+from thea.variable_picker_layout import Ui_Dialog
+
+
+class VariablePicker(QtGui.QDialog, Ui_Dialog):
+    """
+    The VariablePicker Class is a dialog box which shows the name, shape and
+    units of each variable of a file, and can be searched. The class extends
+    the QDialog class, and includes variable_picker_layout.Ui_Dialog, from
+    where it will get the layout.
+
+    """
+    def __init__(self):
+        """
+        On start, we setup the layout of the dialog, and filter the list of
+        variables as the search text is typed.
+
+        """
+        super(VariablePicker, self).__init__()
+        self.setupUi(self)
+        self.variables = []
+        self.search_edit.textChanged.connect(self.filter_variables)
+        self.variable_table.itemDoubleClicked.connect(self.accept)
+
+    def set_variables(self, variables):
+        """
+        Fills the table with the given list of header_scan.Variables, and
+        selects the first.
+
+        """
+        self.variables = variables
+        self.variable_table.setRowCount(len(variables))
+        for row, variable in enumerate(variables):
+            for column, text in enumerate([variable.name, variable.shape,
+                                           variable.units]):
+                item = QtGui.QTableWidgetItem(text)
+                item.setToolTip(variable.key)
+                self.variable_table.setItem(row, column, item)
+        self.variable_table.resizeColumnsToContents()
+        self.variable_table.selectRow(0)
+
+    def filter_variables(self, text):
+        """
+        Hides the variables that do not match the search text. See
+        header_scan.Variable.matches().
+
+        """
+        for row, variable in enumerate(self.variables):
+            self.variable_table.setRowHidden(row, not variable.matches(text))
+
+    def get_selected(self):
+        """
+        Returns a sorted list of the indices of the chosen variables which
+        are shown.
+
+        """
+        rows = set(index.row() for index
+                   in self.variable_table.selectionModel().selectedRows())
+        return sorted(row for row in rows
+                      if not self.variable_table.isRowHidden(row))
+
+    def pick(self, filename, variables):
+        """
+        Shows the variables of the file, and waits for the user to choose.
+        Returns the sorted list of the indices of the chosen variables, or
+        None if the dialog was cancelled or nothing was chosen.
+
+        Args:
+
+        * filename
+            String holding the path of the file.
+
+        * variables
+            List of header_scan.Variables of the file.
+
+        """
+        self.setWindowTitle('Choose Variables from ' +
+                            os.path.basename(filename))
+        self.search_edit.clear()
+        self.set_variables(variables)
+        self.search_edit.setFocus()
+        if self.exec_() != QtGui.QDialog.Accepted:
+            return None
+        return self.get_selected() or None
@@ -0,0 +1,79 @@
+# -*- coding: iso-8859-1 -*-
+#
+# (C) British Crown Copyright 2013, Met Office
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#    Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#    Neither the name of the Met Office nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+#
+# This file is part of Thea.
+"""
+This file holds the pool of worker processes in which panel_logic draws its
+panels.
+
+The workers are forked from the main process. A thread holding a lock at the
+moment of a fork leaves that lock held forever in the child, so the pool is
+started by main() before any other thread exists, such as those of Qt, of
+deferred.preload_in_background(), of the disk cache writer or of the chunk
+reader. Only multiprocessing is imported here, so that starting the pool adds
+little to the start up of the program, and the workers import the modules
+they need when they are given their first job.
+
+"""
+import atexit
+import multiprocessing
+
+
+# The pool of worker processes, once started by start().
+_pool = None
+
+
+def start(processes=None):
+    """
+    Starts the pool, if it has not been started already, and returns it. The
+    workers are terminated when the program exits.
+
+    Kwargs:
+
+    * processes
+        int holding the number of worker processes, or None for one for each
+        core.
+
+    """
+    global _pool
+    if _pool is None:
+        _pool = multiprocessing.Pool(processes)
+        atexit.register(_pool.terminate)
+    return _pool
+
+
+def get_pool():
+    """
+    Returns the pool started by start(). Scripts that start no threads of
+    their own before drawing panels may leave it to this to start the pool.
+
+    """
+    return start()